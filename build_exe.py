@@ -47,6 +47,7 @@ args = [
     '--hidden-import', 'components',
     '--hidden-import', 'threads',
     '--hidden-import', 'utils',
+    '--hidden-import', 'repositories',
     '--collect-all', 'qfluentwidgets',
     '--collect-all', 'imageio_ffmpeg',
     '--collect-all', 'PyQt5',
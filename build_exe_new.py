@@ -150,6 +150,7 @@ hiddenimports = [
     'components',
     'threads',
     'utils',
+    'repositories',
     'models',
 ]
 
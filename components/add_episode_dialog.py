@@ -2,7 +2,6 @@
 添加剧集对话框
 """
 
-import sqlite3
 from pathlib import Path
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QFileDialog, QLabel
@@ -11,6 +10,7 @@ from qfluentwidgets import (
     InfoBar, InfoBarPosition, TextEdit
 )
 from database_manager import db_manager
+from repositories import episode_repo
 from loguru import logger
 
 
@@ -288,14 +288,7 @@ class AddEpisodeDialog(QDialog):
         
         # 检查集数是否已存在
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id FROM episodes
-                WHERE project_id = ? AND episode_number = ?
-            ''', (self.project_id, episode_number))
-            existing = cursor.fetchone()
-            conn.close()
+            existing = episode_repo.find_by_number(self.project_id, episode_number)
             
             if existing:
                 InfoBar.warning(
@@ -324,19 +317,14 @@ class AddEpisodeDialog(QDialog):
             shutil.copy2(self.document_path, dest_path)
             
             # 保存到数据库
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO episodes (project_id, episode_number, episode_name, file_path)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                self.project_id,
-                episode_number,
-                f"第{episode_number}集",
-                str(dest_path)
-            ))
-            conn.commit()
-            conn.close()
+            episode_id = episode_repo.create(
+                project_id=self.project_id,
+                episode_number=episode_number,
+                episode_name=f"第{episode_number}集",
+                file_path=str(dest_path),
+            )
+            if episode_id is None:
+                raise RuntimeError("写入数据库失败，详见日志")
             
             InfoBar.success(
                 title='成功',
@@ -9,8 +9,8 @@ from qfluentwidgets import (
     TitleLabel, LineEdit, PushButton, PrimaryPushButton, TextEdit, BodyLabel
 )
 from pathlib import Path
-import sqlite3
 from database_manager import db_manager
+from repositories import project_repo
 from loguru import logger
 from threads.novel_analysis_thread import NovelAnalysisThread
 from qfluentwidgets import InfoBar, InfoBarPosition
@@ -314,23 +314,17 @@ class AddProjectDialog(QDialog):
             
         # 保存到数据库
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO projects 
-                (title, cover_image, novel_file_path, novel_folder_path, style, aspect_ratio, description)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                title,
-                self.cover_image_path,
-                self.novel_file_path,
-                self.novel_folder_path,
-                self.style_input.text().strip(),
-                self.aspect_ratio_combo.currentText(),
-                self.description_input.toPlainText().strip()
-            ))
-            conn.commit()
-            conn.close()
+            project_id = project_repo.create(
+                title=title,
+                cover_image=self.cover_image_path,
+                novel_file_path=self.novel_file_path,
+                novel_folder_path=self.novel_folder_path,
+                style=self.style_input.text().strip(),
+                aspect_ratio=self.aspect_ratio_combo.currentText(),
+                description=self.description_input.toPlainText().strip(),
+            )
+            if project_id is None:
+                raise RuntimeError("写入数据库失败，详见日志")
             
             from qfluentwidgets import InfoBar, InfoBarPosition
             InfoBar.success(
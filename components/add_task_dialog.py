@@ -11,7 +11,7 @@ from qfluentwidgets import (
 )
 
 from database_manager import db_manager, model_manager
-from utils.global_thread_pool import global_thread_pool
+from utils.task_executor import PRIORITY_HIGH, RESOURCE_UPLOAD, task_executor
 from threads.image_upload_thread import ImageUploadThread
 from ui.drag_drop_text_edit import DragDropTextEdit
 
@@ -193,10 +193,16 @@ class AddTaskDialog(QDialog):
         upload_thread = ImageUploadThread(file_path, token)
         upload_thread.progress.connect(self.on_upload_progress)
         upload_thread.finished.connect(self.on_upload_finished)
-        global_thread_pool.submit(upload_thread)
+        task_executor.submit(upload_thread, resource=RESOURCE_UPLOAD, priority=PRIORITY_HIGH)
 
         self.upload_threads.append(upload_thread)
 
+    def reject(self):
+        """关闭对话框时取消尚未开始的上传"""
+        for thread in self.upload_threads:
+            task_executor.cancel(thread)
+        super().reject()
+
     def update_uploaded_images_display(self):
         """更新已上传图片显示"""
         count = len(self.image_urls)
@@ -8,10 +8,10 @@ from qfluentwidgets import (
     TitleLabel, PushButton, PrimaryPushButton, BodyLabel, TextEdit, InfoBar, InfoBarPosition
 )
 from database_manager import db_manager
+from repositories import character_repo, voice_repo
 from pathlib import Path
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QDialog
-import sqlite3
 from loguru import logger
 from threads.character_image_generation_thread import CharacterImageGenerationThread
 from threads.sora_character_upload_thread import SoraCharacterUploadThread
@@ -112,32 +112,24 @@ class CharacterDetailDialog(QDialog):
     def load_character_data(self):
         """加载角色数据"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT name, description, front_image, side_image, back_image, 
-                       id_card_image, sora_character_id, sora_character_username, sora_status, voice_id
-                FROM characters
-                WHERE id = ?
-            ''', (self.character_id,))
-            character = cursor.fetchone()
+            character = character_repo.get(self.character_id)
             
             if character:
                 # 更新界面
-                self.character_name_label.setText(character[0] or "未命名角色")
+                self.character_name_label.setText(character.name or "未命名角色")
                 
                 # 描述
-                description = character[1] or ""
+                description = character.description or ""
                 self.description_text.setPlainText(description)
                 
                 # 角色图片（优先使用正面图）
-                front_image = character[2] or ""
+                front_image = character.front_image or ""
                 if front_image:
                     self.load_character_image(front_image)
                 
                 # Sora状态
-                sora_status = character[8] or "未上传"
-                sora_username = character[7] or ""
+                sora_status = character.sora_status or "未上传"
+                sora_username = character.sora_character_username or ""
                 if sora_status == "已上传" and sora_username:
                     # 在用户名前添加@符号
                     display_username = f"@{sora_username}" if not sora_username.startswith("@") else sora_username
@@ -148,18 +140,11 @@ class CharacterDetailDialog(QDialog):
                     self.sora_status_label.setStyleSheet("color: #666; font-size: 12px;")
                 
                 # 绑定音色状态
-                voice_id = character[9] if len(character) > 9 else None
+                voice_id = character.voice_id
                 if voice_id:
-                    # 获取音色名称（使用同一个连接）
-                    cursor.execute('''
-                        SELECT name, sequence_number
-                        FROM voice_library
-                        WHERE id = ?
-                    ''', (voice_id,))
-                    voice_result = cursor.fetchone()
-                    if voice_result:
-                        voice_name, voice_sequence = voice_result
-                        self.voice_status_label.setText(f"绑定音色: {voice_sequence}. {voice_name}")
+                    voice = voice_repo.get(voice_id)
+                    if voice:
+                        self.voice_status_label.setText(f"绑定音色: {voice.sequence_number}. {voice.name}")
                         self.voice_status_label.setStyleSheet("color: #4CAF50; font-size: 12px;")
                     else:
                         self.voice_status_label.setText("绑定音色: 未绑定（音色已删除）")
@@ -167,9 +152,6 @@ class CharacterDetailDialog(QDialog):
                 else:
                     self.voice_status_label.setText("绑定音色: 未绑定")
                     self.voice_status_label.setStyleSheet("color: #666; font-size: 12px;")
-            
-            # 在所有操作完成后再关闭连接
-            conn.close()
                     
         except Exception as e:
             logger.error(f"加载角色数据失败: {e}")
@@ -227,11 +209,13 @@ class CharacterDetailDialog(QDialog):
             parent=self
         )
         
-        # 创建并启动生成线程
+        # 创建并启动生成线程；角色已有图片时是要重新生成，不使用生成图片缓存
+        character = character_repo.get(self.character_id)
         self.generation_thread = CharacterImageGenerationThread(
             self.character_id,
             self.project_id,
-            self
+            self,
+            force_regenerate=bool(character and character.front_image),
         )
         self.generation_thread.progress.connect(self.on_generation_progress)
         self.generation_thread.finished.connect(self.on_generation_finished)
@@ -360,17 +344,13 @@ class CharacterDetailDialog(QDialog):
         
         # 检查角色图片和音色
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT front_image, voice_id FROM characters WHERE id = ?', (self.character_id,))
-            result = cursor.fetchone()
-            conn.close()
+            character = character_repo.get(self.character_id)
             
-            if not result:
+            if not character:
                 raise RuntimeError("无法获取角色信息")
             
-            image_path = result[0]
-            voice_id = result[1]
+            image_path = character.front_image
+            voice_id = character.voice_id
             
             if not image_path or not Path(image_path).exists():
                 InfoBar.warning(
@@ -526,12 +506,8 @@ class CharacterDetailDialog(QDialog):
         """绑定音色"""
         try:
             # 获取当前绑定的音色ID
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT voice_id FROM characters WHERE id = ?', (self.character_id,))
-            result = cursor.fetchone()
-            current_voice_id = result[0] if result and result[0] else None
-            conn.close()
+            character = character_repo.get(self.character_id)
+            current_voice_id = character.voice_id if character and character.voice_id else None
             
             # 打开音色选择对话框
             dialog = VoiceSelectionDialog(current_voice_id, self)
@@ -539,15 +515,8 @@ class CharacterDetailDialog(QDialog):
                 selected_voice_id = dialog.selected_voice_id
                 if selected_voice_id:
                     # 更新数据库
-                    conn = sqlite3.connect(db_manager.db_path)
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        UPDATE characters
-                        SET voice_id = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (selected_voice_id, self.character_id))
-                    conn.commit()
-                    conn.close()
+                    if not character_repo.update(self.character_id, voice_id=selected_voice_id):
+                        raise RuntimeError("写入数据库失败，详见日志")
                     
                     InfoBar.success(
                         title='绑定成功',
@@ -563,15 +532,8 @@ class CharacterDetailDialog(QDialog):
                     self.load_character_data()
                 else:
                     # 解绑音色
-                    conn = sqlite3.connect(db_manager.db_path)
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        UPDATE characters
-                        SET voice_id = NULL, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (self.character_id,))
-                    conn.commit()
-                    conn.close()
+                    if not character_repo.update(self.character_id, voice_id=None):
+                        raise RuntimeError("写入数据库失败，详见日志")
                     
                     InfoBar.success(
                         title='解绑成功',
@@ -2,6 +2,10 @@
 导出视频进度对话框
 """
 
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout
 from qfluentwidgets import (
@@ -10,6 +14,10 @@ from qfluentwidgets import (
 from loguru import logger
 
 
+# 导出进度消息的最小间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+
 class ExportVideoThread(QThread):
     """导出视频线程"""
     progress = pyqtSignal(str)  # 进度消息
@@ -21,12 +29,14 @@ class ExportVideoThread(QThread):
         self.episode_data = episode_data
         self.project_data = project_data
         self._stop = False
+        self._progress_lock = threading.Lock()
+        self._download_progress = {}
+        self._last_progress = 0.0
         
     def run(self):
         """执行导出任务"""
         try:
-            import sqlite3
-            import requests
+            from utils.downloader import DownloadCancelled
             import subprocess
             import imageio_ffmpeg
             import tempfile
@@ -34,21 +44,11 @@ class ExportVideoThread(QThread):
             import os
             from pathlib import Path
             from database_manager import db_manager
+            from repositories import storyboard_repo
             
             # 1. 获取所有已生成视频的分镜（按sequence_number排序）
             self.progress.emit("正在获取视频列表...")
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, sequence_number, video_url, title
-                FROM storyboards
-                WHERE episode_id = ? 
-                  AND video_url IS NOT NULL 
-                  AND video_url != ''
-                ORDER BY sequence_number ASC
-            """, (self.episode_id,))
-            storyboards = cursor.fetchall()
-            conn.close()
+            storyboards = storyboard_repo.list_with_video(self.episode_id)
             
             if not storyboards:
                 self.finished.emit(False, "没有已生成的视频可以导出", "")
@@ -67,43 +67,44 @@ class ExportVideoThread(QThread):
             logger.info(f"临时目录: {temp_dir}")
             
             try:
-                # 4. 下载所有视频到临时目录
+                ffmpeg_exe = imageio_ffmpeg.get_ffmpeg_exe()
+                
+                # 4. 经本地视频缓存并行获取所有视频（只下载未缓存的），每个视频下载后即读取流参数
                 self.progress.emit(f"正在下载 {len(storyboards)} 个视频...")
-                video_files = []
-                for idx, (storyboard_id, sequence_number, video_url, title) in enumerate(storyboards, 1):
-                    if self._stop:
-                        return
-                    
-                    self.progress.emit(f"正在下载视频 [{idx}/{len(storyboards)}]: 分镜{sequence_number}")
-                    
-                    try:
-                        # 下载视频
-                        response = requests.get(video_url, stream=True, timeout=300)
-                        response.raise_for_status()
-                        
-                        # 保存到临时文件
-                        temp_video_path = os.path.join(temp_dir, f"video_{sequence_number:03d}.mp4")
-                        with open(temp_video_path, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                if self._stop:
-                                    return
-                                if chunk:
-                                    f.write(chunk)
-                        
-                        video_files.append(temp_video_path)
-                        logger.info(f"视频下载完成: {temp_video_path}")
-                        
-                    except Exception as e:
-                        logger.error(f"下载视频失败 (分镜{sequence_number}): {e}")
-                        self.finished.emit(False, f"下载分镜{sequence_number}的视频失败: {str(e)}", "")
-                        shutil.rmtree(temp_dir, ignore_errors=True)
-                        return
+                try:
+                    clips = self._fetch_videos(storyboards, ffmpeg_exe)
+                except DownloadCancelled:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    return
+                except Exception as e:
+                    logger.error(f"下载视频失败: {e}")
+                    self.finished.emit(False, str(e), "")
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    return
                 
-                if not video_files:
+                if not clips:
                     self.finished.emit(False, "没有成功下载的视频", "")
                     return
                 
-                # 5. 合并视频
+                # 5. 参数一致时直接拼接；不一致的视频并行转码为统一格式
+                try:
+                    video_files = self._prepare_clips(clips, temp_dir, ffmpeg_exe)
+                except Exception as e:
+                    logger.error(f"统一视频格式失败: {e}")
+                    self.finished.emit(False, f"统一视频格式失败: {e}", "")
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    return
+                if video_files is None:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    return
+                concat_file = os.path.join(temp_dir, "concat_list.txt")
+                with open(concat_file, 'w', encoding='utf-8') as f:
+                    for video_file in video_files:
+                        # 转义路径中的特殊字符
+                        escaped_path = video_file.replace('\\', '/').replace("'", "'\\''")
+                        f.write(f"file '{escaped_path}'\n")
+                
+                # 6. 合并视频
                 self.progress.emit(f"正在合并 {len(video_files)} 个视频...")
                 
                 # 生成输出文件名
@@ -123,17 +124,6 @@ class ExportVideoThread(QThread):
                     output_path = f"{base_name}_{counter}.mp4"
                     counter += 1
                 
-                # 使用ffmpeg合并视频
-                ffmpeg_exe = imageio_ffmpeg.get_ffmpeg_exe()
-                
-                # 创建文件列表（用于concat demuxer）
-                concat_file = os.path.join(temp_dir, "concat_list.txt")
-                with open(concat_file, 'w', encoding='utf-8') as f:
-                    for video_file in video_files:
-                        # 转义路径中的特殊字符
-                        escaped_path = video_file.replace('\\', '/').replace("'", "'\\''")
-                        f.write(f"file '{escaped_path}'\n")
-                
                 # 使用concat demuxer合并视频
                 cmd = [
                     ffmpeg_exe,
@@ -156,10 +146,10 @@ class ExportVideoThread(QThread):
                     self.finished.emit(False, f"合并视频失败: {error_msg}", "")
                     return
                 
-                # 6. 清理临时文件
+                # 7. 清理临时文件
                 shutil.rmtree(temp_dir, ignore_errors=True)
                 
-                # 7. 完成
+                # 8. 完成
                 self.progress.emit("导出完成")
                 self.finished.emit(True, f"视频已导出到: {output_path}", output_path)
                 
@@ -179,6 +169,130 @@ class ExportVideoThread(QThread):
             logger.error(traceback.format_exc())
             self.finished.emit(False, f"导出视频失败: {str(e)}", "")
     
+    def _fetch_videos(self, storyboards, ffmpeg_exe):
+        """
+        并行获取所有分镜视频（下载并发受任务执行器限制），每个视频下载后即读取流参数
+
+        返回按分镜顺序排列的 (视频路径, 流参数)，取消时抛出 DownloadCancelled，下载失败时抛出 RuntimeError
+        """
+        from utils.downloader import DownloadCancelled
+        from utils.task_executor import RESOURCE_DOWNLOAD, task_executor
+
+        total = len(storyboards)
+        self._download_progress = {}
+        futures = [
+            task_executor.submit_call(
+                self._fetch_and_probe,
+                storyboard.video_url,
+                self._make_progress_handler(idx, total),
+                ffmpeg_exe,
+                resource=RESOURCE_DOWNLOAD,
+            )
+            for idx, storyboard in enumerate(storyboards)
+        ]
+        clips = []
+        sequence_number = None
+        try:
+            for storyboard, future in zip(storyboards, futures):
+                sequence_number = storyboard.sequence_number
+                clip = self._wait_future(future)
+                if clip is None:
+                    raise DownloadCancelled("导出已取消")
+                clips.append(clip)
+                logger.info(f"视频已就绪 (分镜{sequence_number}): {clip[0]} [{clip[1]}]")
+        except DownloadCancelled:
+            for future in futures:
+                task_executor.cancel(future)
+            raise
+        except Exception as e:
+            self._stop = True
+            for future in futures:
+                task_executor.cancel(future)
+            raise RuntimeError(f"下载分镜{sequence_number}的视频失败: {e}") from e
+        self.progress.emit(f"已获取 {total} 个视频")
+        return clips
+
+    def _fetch_and_probe(self, video_url, progress, ffmpeg_exe):
+        """（下载线程中）获取视频并读取流参数"""
+        from utils.media_cache import media_cache
+        from utils.media_probe import media_probe
+
+        video_path = media_cache.fetch(video_url, progress=progress, should_stop=lambda: self._stop)
+        return video_path, media_probe.probe(video_path, ffmpeg_exe)
+
+    def _prepare_clips(self, clips, temp_dir, ffmpeg_exe):
+        """
+        检查各视频的编码、分辨率、帧率与音频参数：全部一致时直接拼接；
+        否则以最常见的参数为目标，只把不一致的视频并行转码（并发受 ffmpeg 资源上限限制）
+
+        返回用于拼接的视频路径列表，取消时返回 None，转码失败时抛出 RuntimeError
+        """
+        import os
+        from utils.media_probe import choose_target, clips_to_normalize, normalize_clip
+        from utils.task_executor import RESOURCE_FFMPEG, task_executor
+
+        video_files = [path for path, _ in clips]
+        infos = [info for _, info in clips]
+        target = choose_target(infos)
+        if target is None:
+            logger.warning("无法识别视频参数，直接拼接")
+            return video_files
+        mismatched = clips_to_normalize(infos, target)
+        if not mismatched:
+            logger.info(f"所有视频参数一致 ({target})，直接拼接")
+            return video_files
+
+        logger.info(f"{len(mismatched)}/{len(clips)} 个视频参数不一致，转码为 {target}")
+        self.progress.emit(f"正在统一 {len(mismatched)} 个视频的格式...")
+        futures = {}
+        for index in mismatched:
+            output = os.path.join(temp_dir, f"normalized_{index:03d}.mp4")
+            futures[index] = (output, task_executor.submit_call(
+                normalize_clip, ffmpeg_exe, video_files[index], output, target, infos[index],
+                resource=RESOURCE_FFMPEG,
+            ))
+        try:
+            for done, (index, (output, future)) in enumerate(futures.items(), 1):
+                self._wait_future(future)
+                if self._stop:
+                    for _, pending in futures.values():
+                        task_executor.cancel(pending)
+                    return None
+                video_files[index] = output
+                self.progress.emit(f"正在统一视频格式 [{done}/{len(futures)}]")
+        except Exception:
+            for _, pending in futures.values():
+                task_executor.cancel(pending)
+            raise
+        return video_files
+
+    def _wait_future(self, future):
+        """等待后台任务完成，期间响应取消；已取消时返回 None"""
+        while True:
+            if self._stop:
+                return None
+            try:
+                return future.result(timeout=0.2)
+            except FutureTimeoutError:
+                continue
+
+    def _make_progress_handler(self, index, total):
+        def handler(downloaded, size):
+            with self._progress_lock:
+                self._download_progress[index] = (downloaded, size)
+                now = time.monotonic()
+                finished = downloaded >= size > 0
+                if not finished and now - self._last_progress < PROGRESS_INTERVAL:
+                    return
+                self._last_progress = now
+                done_count = sum(1 for d, s in self._download_progress.values() if s and d >= s)
+                done_bytes = sum(d for d, _ in self._download_progress.values())
+                known_bytes = sum(s for _, s in self._download_progress.values())
+            self.progress.emit(
+                f"正在下载视频 [{done_count}/{total}]: {done_bytes / 1048576:.1f}/{known_bytes / 1048576:.1f} MB"
+            )
+        return handler
+
     def stop(self):
         """停止导出"""
         self._stop = True
@@ -16,7 +16,7 @@ from qfluentwidgets import (
 )
 
 from threads.image_upload_thread import ImageUploadThread
-from utils.global_thread_pool import global_thread_pool
+from utils.task_executor import PRIORITY_LOW, RESOURCE_UPLOAD, task_executor
 
 
 class ImageBatchAddDialog(QDialog):
@@ -305,9 +305,15 @@ class ImageBatchAddDialog(QDialog):
         # 闭包捕获行索引
         row_index = self.table.rowCount() - 1
         thread.finished.connect(lambda success, message, url: self._on_upload_finished(row_index, success, message, url))
-        global_thread_pool.submit(thread)
+        task_executor.submit(thread, resource=RESOURCE_UPLOAD, priority=PRIORITY_LOW)
         self._upload_threads.append(thread)
 
+    def reject(self):
+        """关闭对话框时取消尚未开始的上传"""
+        for thread in self._upload_threads:
+            task_executor.cancel(thread)
+        super().reject()
+
     def _on_upload_finished(self, row: int, success: bool, message: str, image_url: str):
         if row < 0 or row >= self.table.rowCount():
             return
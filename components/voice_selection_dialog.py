@@ -2,7 +2,6 @@
 音色选择对话框
 """
 
-import sqlite3
 from pathlib import Path
 from PyQt5.QtCore import Qt, QUrl
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
@@ -10,7 +9,7 @@ from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTa
 from qfluentwidgets import (
     TitleLabel, BodyLabel, PushButton, PrimaryPushButton, InfoBar, InfoBarPosition
 )
-from database_manager import db_manager
+from repositories import voice_repo
 from loguru import logger
 
 
@@ -100,22 +99,14 @@ class VoiceSelectionDialog(QDialog):
     def load_voices(self):
         """加载音色列表"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, sequence_number, name, file_path
-                FROM voice_library
-                ORDER BY sequence_number ASC
-            ''')
-            voices = cursor.fetchall()
-            conn.close()
+            voices = voice_repo.list_all()
             
             # 清空表格
             self.voice_table.setRowCount(0)
             
             # 填充表格
             for voice in voices:
-                voice_id, sequence, name, file_path = voice
+                voice_id, sequence, name, file_path = voice.id, voice.sequence_number, voice.name, voice.file_path
                 row = self.voice_table.rowCount()
                 self.voice_table.insertRow(row)
                 
@@ -3,16 +3,32 @@
 用于存储历史记录和用户设置
 """
 
-import sqlite3
+import copy
 import json
 import os
 import sys
 import platform
-from constants import API_BASE_URL
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 from loguru import logger
+from utils.db_connection import ConnectionManager, PooledConnection
+from utils import db_migrations
+from utils.db_write_behind import WriteBehindQueue
+
+
+# 配置缓存中的占位值：配置项不存在 / 配置值无法按类型转换
+_MISSING = object()
+_INVALID = object()
+
+# 允许通过批量接口写入的分镜列
+STORYBOARD_WRITABLE_COLUMNS = frozenset((
+    'sequence_number', 'storyboard_detail', 'scene_image', 'video_prompt',
+    'video_url', 'video_task_id', 'video_status', 'title', 'duration',
+    'dialogue', 'screen_content', 'sound_effect', 'camera_movement',
+    'prompt', 'video_file', 'thumbnail_path',
+))
 
 
 class DatabaseManager:
@@ -40,6 +56,24 @@ class DatabaseManager:
         logger.info(f"日志目录: {self.logs_dir}")
         logger.info(f"数据库备份目录: {self.database_dir}")
 
+        # 线程级长连接管理
+        self.connections = ConnectionManager(self.db_path)
+        # 状态/进度类更新的延迟写队列（调用方通过 deferred=True 启用）
+        self.write_behind = WriteBehindQueue(
+            self.get_connection, on_flushed=self._on_write_behind_flushed
+        )
+        # 行变更回调（数据访问层据此使缓存的行失效）
+        self._row_listeners: List[Callable[[str, List[int]], None]] = []
+
+        # 配置缓存：首次 load_config 时整体载入，save_config 时更新
+        self._config_cache: Optional[Dict[str, Any]] = None
+        self._config_lock = threading.Lock()
+        self._config_generation = 0  # 每次配置变更递增，用于丢弃过期的整体载入结果
+        self._config_listeners: List[Tuple[Callable[[str, Any], None], Optional[set]]] = []
+
+        # 全文索引是否可用（首次搜索时检测）
+        self._fts_ready: Optional[bool] = None
+
         # 检查和初始化数据库
         self._check_and_init_database()
     
@@ -108,110 +142,60 @@ class DatabaseManager:
         except Exception:
             return ""
 
-    def _check_and_init_database(self):
-        """检查并初始化数据库"""
-        try:
-            # 检查数据库文件是否存在
-            db_exists = os.path.exists(self.db_path)
+    def get_connection(self) -> PooledConnection:
+        """获取当前线程的数据库连接（close() 仅归还连接，不会真正关闭）"""
+        return self.connections.connect()
 
-            if not db_exists:
-                logger.info("数据库文件不存在，正在创建...")
-            else:
-                logger.info("数据库文件已存在，检查表结构...")
+    def flush_pending_writes(self) -> int:
+        """立即提交延迟写队列中的所有更新，返回后可读到之前的写入"""
+        return self.write_behind.flush()
 
-            # 连接数据库并检查表
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def close_connections(self):
+        """提交延迟写入并关闭所有线程的数据库连接（应用退出时调用）"""
+        self.write_behind.stop()
+        self.connections.close_all()
 
-            # 获取所有表名
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            existing_tables = [row[0] for row in cursor.fetchall()]
-
-            logger.info(f"现有数据表: {existing_tables}")
-
-            # 需要创建的表（已移除 goods_videos）
-            required_tables = ['config', 'tasks', 'voice_library']
-
-            # 检查每个表是否存在
-            for table in required_tables:
-                if table not in existing_tables:
-                    logger.info(f"创建数据表: {table}")
-
-            conn.close()
+    def _check_and_init_database(self):
+        """检查并初始化数据库（按 schema_version 执行待执行的迁移）"""
+        try:
+            if not os.path.exists(self.db_path):
+                logger.info("数据库文件不存在，正在创建...")
 
-            # 初始化所有表结构
             self._init_database()
 
-            # 验证表是否创建成功
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            final_tables = [row[0] for row in cursor.fetchall()]
-            conn.close()
-
-            missing_tables = [t for t in required_tables if t not in final_tables]
-            if missing_tables:
-                logger.error(f"以下表创建失败: {missing_tables}")
-                raise Exception(f"数据库表创建失败: {missing_tables}")
-            else:
-                logger.info("所有数据表创建/验证完成")
-
         except Exception as e:
             logger.error(f"数据库初始化失败: {e}")
             raise
 
     def _init_database(self):
         """初始化数据库表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 创建logs表（如果不存在）
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                level TEXT NOT NULL,
-                message TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-
-        # 创建config、tasks和chat_tasks表
-        self.create_config_table()
-        self.create_tasks_table()
-        self.create_chat_tasks_table()
-        # 创建高清放大服务器表
-        self.create_upscale_servers_table()
-        # 创建项目相关表
-        self.create_projects_table()
-        self.create_episodes_table()
-        self.create_characters_table()
-        self.create_storyboards_table()
-        # 创建音色库表
-        self.create_voice_library_table()
-        # 删除已废弃的带货视频表（如果存在）
+        conn = self.get_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('DROP TABLE IF EXISTS goods_videos')
-            conn.commit()
+            from_version, to_version = db_migrations.migrate(conn)
+        finally:
             conn.close()
-            logger.info("已删除废弃的 goods_videos 表（如存在）")
-        except Exception as e:
-            logger.warning(f"尝试删除 goods_videos 表失败: {e}")
+
+        if from_version == to_version:
+            logger.info(f"数据库结构已是最新版本: v{to_version}")
+        else:
+            logger.info(f"数据库结构已从 v{from_version} 升级到 v{to_version}")
 
     def init_db(self):
         """公开的初始化数据库方法"""
         self._init_database()
-    
-  
-  
+
+    def get_schema_version(self) -> int:
+        """获取当前数据库结构版本"""
+        conn = self.get_connection()
+        try:
+            return db_migrations.get_schema_version(conn)
+        finally:
+            conn.close()
+
     def add_log(self, level: str, message: str) -> bool:
         """添加日志记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -229,7 +213,7 @@ class DatabaseManager:
     def get_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
         """获取日志记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -259,7 +243,7 @@ class DatabaseManager:
     def clear_logs(self) -> bool:
         """清空日志"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('DELETE FROM logs')
@@ -274,158 +258,23 @@ class DatabaseManager:
 
     
     def create_config_table(self) -> bool:
-        """创建config配置表"""
+        """写入默认配置（已存在的配置项保持不变）"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS config (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    key TEXT UNIQUE NOT NULL,
-                    value TEXT,
-                    type TEXT DEFAULT 'string',
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 插入默认配置
-            default_configs = [
-                ('api_key', '', 'string', 'Sora API Key'),
-                ('api_base_url', API_BASE_URL, 'string', 'API Base URL'),
-                ('image_token', '1c17b11693cb5ec63859b091c5b9c1b2', 'string', '图床Token'),
-                ('default_model', 'sora-2', 'string', '默认模型'),
-                ('default_duration', '10', 'integer', '默认时长(秒)'),
-                ('add_task_default_resolution', '16:9', 'string', '添加任务默认分辨率'),
-                ('add_task_default_duration', '10', 'integer', '添加任务默认时长'),
-                ('auto_download', 'true', 'boolean', '自动下载视频'),
-                ('video_save_path', '', 'string', '视频保存路径'),
-                ('theme', 'auto', 'string', '主题设置(light/dark/auto)'),
-                # AI 标题相关默认配置
-                ('ai_title_enabled', 'false', 'boolean', 'AI标题开关'),
-                ('ai_title_prompt', '只返回一个中文视频标题，不要返回任何解释或额外内容；不使用引号、编号、前后缀；不换行；不超过30字，风格有趣吸引人', 'string', 'AI标题提示词'),
-                # 提示词设置默认值
-                ('main_image_prompt', '根据提供的商品主图生成标准电商白底图：\n- 背景：纯白(#FFFFFF)，干净无纹理；\n- 主体：保持原始外观与质感，不改变颜色与结构；\n- 抠图：边缘干净无锯齿，无残留背景；\n- 光线：均匀柔和，无明显阴影或色偏；\n- 构图：产品居中，适度留白，画面整洁；\n- 分辨率：至少 2048×2048；\n- 输出：PNG(透明背景)或JPEG(白底)，适合电商展示。', 'string', '主图处理提示词(白底图生成)'),
-                ('scene_generation_prompt', '请基于白底图与商品标题生成一个 15 秒的产品介绍视频脚本与镜头计划。要求：\n1) 产品简短描述与核心卖点(中文)。\n2) 旁白文案(中文、自然口语，节奏紧凑)。\n3) 背景音乐风格：轻快现代，音量不压旁白。\n4) 运镜设计：推进/摇移/环绕等，流畅自然。\n5) 时间轴划分为 2–3 个镜头，每个镜头标注【时长/画面内容/镜头运动/旁白/字幕】。\n6) 画面以白底图为核心，可加入品牌色点缀。\n7) 结尾包含行动号召(如“立即了解/购买”)。\n总时长严格控制在 15 秒。\n请按如下格式输出：\nShot 1（0–5s）：画面内容…｜镜头运动…｜旁白…｜字幕…\nShot 2（5–10s）：…\nShot 3（10–15s）：…', 'string', '场景生成提示词(15秒产品介绍)')
-            ]
-
-            for key, value, type_, desc in default_configs:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO config (key, value, type, description)
-                    VALUES (?, ?, ?, ?)
-                ''', (key, value, type_, desc))
-
+            db_migrations.insert_default_configs(cursor)
             conn.commit()
             conn.close()
+            self.invalidate_config_cache()
             return True
         except Exception as e:
-            logger.error(f"创建config表失败: {e}")
-            return False
-
-    def create_tasks_table(self) -> bool:
-        """创建tasks任务表"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT UNIQUE NOT NULL,
-                    prompt TEXT NOT NULL,
-                    model TEXT DEFAULT 'sora-2',
-                    orientation TEXT DEFAULT 'portrait',
-                    size TEXT DEFAULT 'small',
-                    duration INTEGER DEFAULT 10,
-                    images TEXT,
-                    video_url TEXT,
-                    thumbnail_url TEXT,
-                    status TEXT DEFAULT 'pending',
-                    error_message TEXT,
-                    progress INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    started_at TIMESTAMP,
-                    completed_at TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 创建索引
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_task_id ON tasks(task_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)')
-
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            logger.error(f"创建tasks表失败: {e}")
-            return False
-
-    def create_chat_tasks_table(self) -> bool:
-        """创建chat_tasks表 - 记录Chat模式的任务"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS chat_tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT UNIQUE NOT NULL,
-                    model TEXT NOT NULL,
-                    is_chat_mode INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (task_id) REFERENCES tasks(task_id) ON DELETE CASCADE
-                )
-            ''')
-
-            # 创建索引
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_tasks_task_id ON chat_tasks(task_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_tasks_model ON chat_tasks(model)')
-
-            conn.commit()
-            conn.close()
-            logger.info("chat_tasks表创建成功")
-            return True
-        except Exception as e:
-            logger.error(f"创建chat_tasks表失败: {e}")
-            return False
-
-    def create_upscale_servers_table(self) -> bool:
-        """创建高清放大服务器表"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS upscale_servers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    url TEXT NOT NULL,
-                    enabled INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 为url建立唯一索引，避免重复配置同一地址
-            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_upscale_servers_url ON upscale_servers(url)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_servers_enabled ON upscale_servers(enabled)')
-
-            conn.commit()
-            conn.close()
-            logger.info("upscale_servers表创建成功")
-            return True
-        except Exception as e:
-            logger.error(f"创建upscale_servers表失败: {e}")
+            logger.error(f"写入默认配置失败: {e}")
             return False
 
     def create_goods_videos_table(self) -> bool:
         """创建带货视频表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -460,7 +309,7 @@ class DatabaseManager:
                         prompt: str = None, task_id: Optional[int] = None) -> Optional[int]:
         """新增一条带货视频记录，返回插入的ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO goods_videos (title, main_image, white_image, prompt, task_id, created_at, updated_at)
@@ -493,7 +342,7 @@ class DatabaseManager:
             sql = f"UPDATE goods_videos SET {', '.join(set_clauses)} WHERE id = ?"
             values.append(goods_id)
 
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute(sql, tuple(values))
             conn.commit()
@@ -507,7 +356,7 @@ class DatabaseManager:
     def get_goods_videos(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """分页查询带货视频记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, title, main_image, white_image, prompt, task_id, created_at, updated_at
@@ -538,7 +387,7 @@ class DatabaseManager:
     def get_goods_video_by_id(self, goods_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取带货视频记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, title, main_image, white_image, prompt, task_id, created_at, updated_at
@@ -566,7 +415,7 @@ class DatabaseManager:
     def get_upscale_servers(self, enabled_only: bool = False) -> List[Dict[str, Any]]:
         """获取高清放大服务器列表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             if enabled_only:
@@ -603,7 +452,7 @@ class DatabaseManager:
     def add_upscale_server(self, name: str, url: str, enabled: bool = True) -> bool:
         """添加高清放大服务器"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -622,7 +471,7 @@ class DatabaseManager:
     def update_upscale_server(self, server_id: int, name: Optional[str] = None, url: Optional[str] = None, enabled: Optional[bool] = None) -> bool:
         """更新高清放大服务器"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             set_clauses = []
@@ -661,7 +510,7 @@ class DatabaseManager:
     def delete_upscale_server(self, server_id: int) -> bool:
         """删除高清放大服务器"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM upscale_servers WHERE id = ?', (server_id,))
             conn.commit()
@@ -676,9 +525,9 @@ class DatabaseManager:
         return self.get_upscale_servers(enabled_only=True)
 
     def save_config(self, key: str, value: Any, type_: str = 'string', description: Optional[str] = None) -> bool:
-        """保存配置到config表"""
+        """保存配置到config表（同时更新配置缓存并通知监听者）"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             # 转换值为字符串
@@ -696,45 +545,152 @@ class DatabaseManager:
 
             conn.commit()
             conn.close()
-            return True
         except Exception as e:
             logger.error(f"保存配置失败: {e}")
             return False
 
+        self._update_config_cache(key, value_str, type_)
+        return True
+
     def load_config(self, key: str, default: Any = None) -> Any:
-        """从config表加载配置"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        """从配置缓存加载配置（首次调用时从config表整体载入）"""
+        cache = self._config_cache
+        if cache is None:
+            cache = self._load_config_cache()
+            if cache is None:
+                return default
 
-            cursor.execute('SELECT value, type FROM config WHERE key = ?', (key,))
-            row = cursor.fetchone()
+        value = cache.get(key, _MISSING)
+        if value is _MISSING or value is _INVALID:
+            return default
+        if isinstance(value, (dict, list)):
+            # 避免调用方修改缓存中的对象
+            return copy.deepcopy(value)
+        return value
+
+    def invalidate_config_cache(self):
+        """清空配置缓存（绕过 save_config 直接修改 config 表后调用）"""
+        with self._config_lock:
+            self._config_cache = None
+            self._config_generation += 1
+
+    def add_config_listener(self, callback: Callable[[str, Any], None], keys: Optional[List[str]] = None):
+        """
+        注册配置变更回调
+
+        Args:
+            callback: 回调函数 callback(key, new_value)，在调用 save_config 的线程中执行
+            keys: 只关注的配置项，为空时关注所有配置项
+        """
+        with self._config_lock:
+            self._config_listeners.append((callback, set(keys) if keys else None))
+
+    def remove_config_listener(self, callback: Callable[[str, Any], None]):
+        """移除配置变更回调"""
+        with self._config_lock:
+            self._config_listeners = [
+                (cb, keys) for cb, keys in self._config_listeners if cb != callback
+            ]
+
+    def add_row_listener(self, callback: Callable[[str, List[int]], None]):
+        """
+        注册行变更回调
+
+        DatabaseManager 自身写入分镜等表（含延迟写队列的提交）后调用 callback(table, ids)，
+        回调可能在任意线程中执行
+        """
+        if callback not in self._row_listeners:
+            self._row_listeners.append(callback)
 
+    def remove_row_listener(self, callback: Callable[[str, List[int]], None]):
+        """移除行变更回调"""
+        if callback in self._row_listeners:
+            self._row_listeners.remove(callback)
+
+    def _notify_rows_changed(self, table: str, ids: List[int]):
+        for callback in list(self._row_listeners):
+            try:
+                callback(table, ids)
+            except Exception as e:
+                logger.error(f"行变更回调出错: {e}")
+
+    def _on_write_behind_flushed(self, row_keys):
+        changed: Dict[str, List[int]] = {}
+        for table, key_column, key in row_keys:
+            if key_column == 'id':
+                changed.setdefault(table, []).append(key)
+        for table, ids in changed.items():
+            self._notify_rows_changed(table, ids)
+
+    def _load_config_cache(self) -> Optional[Dict[str, Any]]:
+        """从config表载入全部配置到缓存"""
+        with self._config_lock:
+            generation = self._config_generation
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT key, value, type FROM config')
+            rows = cursor.fetchall()
             conn.close()
+        except Exception as e:
+            logger.error(f"加载配置失败: {e}")
+            return None
 
-            if row:
-                value_str, type_ = row
-                # 根据类型转换值
-                if type_ == 'boolean':
-                    return value_str.lower() == 'true'
-                elif type_ == 'integer':
-                    return int(value_str)
-                elif type_ == 'float':
-                    return float(value_str)
-                elif type_ == 'json':
-                    return json.loads(value_str)
-                else:
-                    return value_str
+        cache = {}
+        for key, value_str, type_ in rows:
+            cache[key] = self._decode_config_value(key, value_str, type_)
+        with self._config_lock:
+            if self._config_cache is not None:
+                return self._config_cache
+            if generation != self._config_generation:
+                # 载入期间配置被修改，本次结果可能已过期，不写入缓存
+                return cache
+            self._config_cache = cache
+            return cache
+
+    def _update_config_cache(self, key: str, value_str: str, type_: str):
+        """更新单个配置项的缓存，值变化时通知监听者"""
+        value = self._decode_config_value(key, value_str, type_)
+        with self._config_lock:
+            cache = self._config_cache
+            old = cache.get(key, _MISSING) if cache is not None else _MISSING
+            if cache is not None:
+                cache[key] = value
+            self._config_generation += 1
+            listeners = list(self._config_listeners)
+
+        if old == value or value is _INVALID:
+            return
+        for callback, keys in listeners:
+            if keys is not None and key not in keys:
+                continue
+            try:
+                callback(key, copy.deepcopy(value) if isinstance(value, (dict, list)) else value)
+            except Exception as e:
+                logger.error(f"配置变更回调执行失败 ({key}): {e}")
+
+    @staticmethod
+    def _decode_config_value(key: str, value_str: Optional[str], type_: str) -> Any:
+        """根据类型转换配置值"""
+        try:
+            if type_ == 'boolean':
+                return value_str.lower() == 'true'
+            elif type_ == 'integer':
+                return int(value_str)
+            elif type_ == 'float':
+                return float(value_str)
+            elif type_ == 'json':
+                return json.loads(value_str)
             else:
-                return default
+                return value_str
         except Exception as e:
-            logger.error(f"加载配置失败: {e}")
-            return default
+            logger.error(f"加载配置失败 ({key}): {e}")
+            return _INVALID
 
     def add_task(self, task_data: Dict[str, Any]) -> bool:
         """添加任务到tasks表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             images_json = json.dumps(task_data.get('images', []))
@@ -768,7 +724,7 @@ class DatabaseManager:
     def get_tasks(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
         """获取任务列表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             if status:
@@ -778,7 +734,7 @@ class DatabaseManager:
                            created_at, started_at, completed_at, updated_at
                     FROM tasks
                     WHERE status = ?
-                    ORDER BY created_at DESC
+                    ORDER BY created_at DESC, id DESC
                     LIMIT ?
                 ''', (status, limit))
             else:
@@ -823,7 +779,7 @@ class DatabaseManager:
     def get_tasks_paginated(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """获取任务列表（支持分页）"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -864,10 +820,131 @@ class DatabaseManager:
             logger.error(f"获取任务失败: {e}")
             return []
 
+    def get_tasks_page(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[Tuple[str, int]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """
+        按创建时间倒序游标分页获取任务（翻页代价与页码无关）
+
+        Args:
+            status: 只返回该状态的任务，为空时返回全部
+            limit: 每页数量
+            cursor: 上一页返回的游标，为空时从第一页开始
+
+        Returns:
+            Tuple[List[Dict], Optional[Tuple[str, int]]]: (任务列表, 下一页游标)，没有更多数据时游标为None
+        """
+        try:
+            conn = self.get_connection()
+            db_cursor = conn.cursor()
+
+            where = []
+            params: List[Any] = []
+            if status:
+                where.append("status = ?")
+                params.append(status)
+            if cursor is not None:
+                where.append("(created_at, id) < (?, ?)")
+                params.extend(cursor)
+            where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+            params.append(limit)
+
+            db_cursor.execute(f'''
+                SELECT {self._TASK_COLUMNS}
+                FROM tasks
+                {where_sql}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', params)
+
+            tasks = [self._row_to_task(row) for row in db_cursor.fetchall()]
+            conn.close()
+
+            next_cursor = None
+            if len(tasks) == limit:
+                last = tasks[-1]
+                next_cursor = (last['created_at'], last['id'])
+            return tasks, next_cursor
+        except Exception as e:
+            logger.error(f"获取任务失败: {e}")
+            return [], None
+
+    def get_active_tasks(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        获取进行中和待处理的任务（仅 task_id 与 status，供状态轮询使用）
+
+        每种状态最多返回 limit 条，进行中的任务在前；查询只读取索引
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            tasks = []
+            for status in ('processing', 'pending'):
+                cursor.execute('''
+                    SELECT task_id, status
+                    FROM tasks
+                    WHERE status = ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', (status, limit))
+                tasks.extend({'task_id': row[0], 'status': row[1]} for row in cursor.fetchall())
+
+            conn.close()
+            return tasks
+        except Exception as e:
+            logger.error(f"获取未完成任务失败: {e}")
+            return []
+
+    _TASK_COLUMNS = '''id, task_id, prompt, model, orientation, size, duration, images,
+                       video_url, thumbnail_url, status, error_message, progress,
+                       created_at, started_at, completed_at, updated_at'''
+
+    @staticmethod
+    def _row_to_task(row) -> Dict[str, Any]:
+        """将tasks表的一行转换为字典（列顺序同 _TASK_COLUMNS）"""
+        return {
+            'id': row[0],
+            'task_id': row[1],
+            'prompt': row[2],
+            'model': row[3],
+            'orientation': row[4],
+            'size': row[5],
+            'duration': row[6],
+            'images': json.loads(row[7]) if row[7] else [],
+            'video_url': row[8],
+            'thumbnail_url': row[9],
+            'status': row[10],
+            'error_message': row[11],
+            'progress': row[12],
+            'created_at': row[13],
+            'started_at': row[14],
+            'completed_at': row[15],
+            'updated_at': row[16]
+        }
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """按任务ID获取任务，不存在或失败返回 None"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(f'SELECT {self._TASK_COLUMNS} FROM tasks WHERE task_id = ?', (task_id,))
+            row = cursor.fetchone()
+
+            conn.close()
+            return self._row_to_task(row) if row else None
+        except Exception as e:
+            logger.error(f"获取任务 {task_id} 失败: {e}")
+            return None
+
     def get_tasks_count(self) -> int:
         """获取任务总数"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('SELECT COUNT(*) FROM tasks')
@@ -879,10 +956,30 @@ class DatabaseManager:
             logger.error(f"获取任务总数失败: {e}")
             return 0
 
-    def update_task(self, task_id: str, updates: Dict[str, Any]) -> bool:
-        """更新任务"""
+    def update_task(self, task_id: str, updates: Dict[str, Any], deferred: bool = False) -> bool:
+        """
+        更新任务
+
+        Args:
+            task_id: 任务ID
+            updates: 要更新的字段
+            deferred: 为True时写入延迟写队列，与同一任务的后续更新合并后批量提交
+        """
+        if deferred:
+            fields = {}
+            for key, value in updates.items():
+                if key == 'updated_at':
+                    continue
+                if key == 'images':
+                    value = json.dumps(value)
+                fields[key] = value
+            self.write_behind.put('tasks', 'task_id', task_id, fields)
+            return True
+
         try:
-            conn = sqlite3.connect(self.db_path)
+            self.write_behind.discard('tasks', 'task_id', task_id, updates.keys())
+
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             set_clauses = []
@@ -915,7 +1012,7 @@ class DatabaseManager:
     def delete_task(self, task_id: str) -> bool:
         """删除任务(同时会自动删除chat_tasks表中的关联记录)"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             # 先删除chat_tasks表中的记录(如果存在)
@@ -945,7 +1042,7 @@ class DatabaseManager:
     def add_chat_task(self, task_id: str, model: str) -> bool:
         """添加Chat模式任务记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -964,7 +1061,7 @@ class DatabaseManager:
     def is_chat_task(self, task_id: str) -> bool:
         """检查是否为Chat模式任务"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('SELECT COUNT(*) FROM chat_tasks WHERE task_id = ?', (task_id,))
@@ -979,7 +1076,7 @@ class DatabaseManager:
     def get_chat_tasks(self, limit: int = 50) -> List[Dict[str, Any]]:
         """获取所有Chat模式任务列表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -1007,7 +1104,7 @@ class DatabaseManager:
     def clear_tasks(self) -> bool:
         """清空所有任务"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('DELETE FROM tasks')
@@ -1024,7 +1121,7 @@ class DatabaseManager:
         """删除所有状态为 completed 和 failed 的任务，同时清理关联的 chat_tasks 记录。
         返回删除的任务数量。"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             # 先删除关联的 chat_tasks 记录（若未启用外键约束，手动清理）
@@ -1051,7 +1148,7 @@ class DatabaseManager:
     def get_task_statistics(self) -> Dict[str, int]:
         """获取任务统计信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -1096,7 +1193,7 @@ class DatabaseManager:
                 return health_info
 
             # 检查表结构
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
 
             # 获取所有表
@@ -1153,7 +1250,7 @@ class DatabaseManager:
                 info['modified_time'] = stat.st_mtime
 
                 # 获取表统计信息
-                conn = sqlite3.connect(self.db_path)
+                conn = self.get_connection()
                 cursor = conn.cursor()
 
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
@@ -1172,270 +1269,283 @@ class DatabaseManager:
             logger.error(f"获取数据库信息失败: {e}")
             return {'error': str(e), 'path': self.db_path}
 
-    def create_projects_table(self) -> bool:
-        """创建项目表"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS projects (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    cover_image TEXT,
-                    novel_file_path TEXT,
-                    novel_folder_path TEXT,
-                    style TEXT,
-                    aspect_ratio TEXT DEFAULT '9:16',
-                    description TEXT,
-                    chapter_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+    def update_storyboard_video_info(
+        self,
+        storyboard_id: int,
+        video_task_id: str = None,
+        video_url: str = None,
+        video_status: str = None,
+        deferred: bool = False
+    ) -> bool:
+        """
+        更新分镜的视频相关信息
+
+        deferred 为 True 时写入延迟写队列，同一分镜的多次轮询结果会被合并，
+        值未变化的更新不会产生写入
+        """
+        fields = {}
+        if video_task_id is not None:
+            fields['video_task_id'] = video_task_id
+        if video_url is not None:
+            fields['video_url'] = video_url
+        if video_status is not None:
+            fields['video_status'] = video_status
+
+        if not fields:
+            return False
 
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_created_at ON projects(created_at)')
-            conn.commit()
-            conn.close()
-            logger.info("projects表创建成功")
+        if deferred:
+            self.write_behind.put('storyboards', 'id', storyboard_id, fields)
             return True
-        except Exception as e:
-            logger.error(f"创建projects表失败: {e}")
-            return False
 
-    def create_episodes_table(self) -> bool:
-        """创建剧集表"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            self.write_behind.discard('storyboards', 'id', storyboard_id, fields.keys())
+
+            conn = self.get_connection()
             cursor = conn.cursor()
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS episodes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id INTEGER NOT NULL,
-                    episode_number INTEGER NOT NULL,
-                    episode_name TEXT,
-                    file_path TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
-                )
-            ''')
+            updates = [f"{column} = ?" for column in fields]
+            values = list(fields.values())
 
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_episodes_project_id ON episodes(project_id)')
-            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_episodes_project_episode ON episodes(project_id, episode_number)')
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            values.append(storyboard_id)
+            
+            query = f"""
+                UPDATE storyboards
+                SET {', '.join(updates)}
+                WHERE id = ?
+            """
+            
+            cursor.execute(query, values)
             conn.commit()
             conn.close()
-            logger.info("episodes表创建成功")
+            self._notify_rows_changed('storyboards', [storyboard_id])
+            
+            logger.info(f"更新分镜 {storyboard_id} 的视频信息成功")
             return True
         except Exception as e:
-            logger.error(f"创建episodes表失败: {e}")
+            logger.error(f"更新分镜视频信息失败: {e}")
             return False
 
-    def create_characters_table(self) -> bool:
-        """创建角色表"""
+    def get_pending_video_storyboards(self, episode_id: int) -> List[Tuple[int, str]]:
+        """获取剧集中需要刷新视频状态的分镜 (id, video_task_id)：生成中/等待中或尚无视频地址"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS characters (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    front_image TEXT,
-                    side_image TEXT,
-                    back_image TEXT,
-                    id_card_image TEXT,
-                    sora_character_id TEXT,
-                    sora_character_username TEXT,
-                    sora_status TEXT DEFAULT '未上传',
-                    voice_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE,
-                    FOREIGN KEY (voice_id) REFERENCES voice_library(id) ON DELETE SET NULL
-                )
-            ''')
-            
-            # 检查并添加voice_id列（如果表已存在但列不存在）
-            cursor.execute("PRAGMA table_info(characters)")
-            columns = [column[1] for column in cursor.fetchall()]
-            if 'voice_id' not in columns:
-                cursor.execute('ALTER TABLE characters ADD COLUMN voice_id INTEGER')
-                logger.info("已为characters表添加voice_id列")
-
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_characters_project_id ON characters(project_id)')
-            conn.commit()
+            cursor.execute("""
+                SELECT id, video_task_id
+                FROM storyboards
+                WHERE episode_id = ?
+                  AND video_task_id IS NOT NULL
+                  AND video_task_id != ''
+                  AND (video_status IN ('生成中', '等待中') OR video_url IS NULL)
+            """, (episode_id,))
+            rows = cursor.fetchall()
             conn.close()
-            logger.info("characters表创建成功")
-            return True
+            return rows
         except Exception as e:
-            logger.error(f"创建characters表失败: {e}")
-            return False
+            logger.error(f"获取待刷新分镜失败: {e}")
+            return []
 
-    def create_storyboards_table(self) -> bool:
-        """创建分镜表"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def bulk_upsert_storyboards(self, episode_id: int, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        批量写入分镜（按 episode_id + sequence_number 匹配，已存在则更新，否则插入）
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS storyboards (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    episode_id INTEGER NOT NULL,
-                    sequence_number INTEGER NOT NULL,
-                    storyboard_detail TEXT,
-                    scene_image TEXT,
-                    video_prompt TEXT,
-                    video_url TEXT,
-                    video_task_id TEXT,
-                    video_status TEXT DEFAULT '未生成',
-                    title TEXT,
-                    duration TEXT,
-                    dialogue TEXT,
-                    screen_content TEXT,
-                    sound_effect TEXT,
-                    camera_movement TEXT,
-                    prompt TEXT,
-                    video_file TEXT,
-                    thumbnail_path TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (episode_id) REFERENCES episodes(id) ON DELETE CASCADE
-                )
-            ''')
-            
-            # 检查并添加缺失的列（用于兼容旧表结构）
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN title TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN duration TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN dialogue TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN screen_content TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN sound_effect TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN camera_movement TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN prompt TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN video_file TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE storyboards ADD COLUMN thumbnail_path TEXT")
-            except:
-                pass
+        所有写入在一个事务中通过 executemany 完成；行中未出现的列保持不变（插入时取默认值）。
 
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_storyboards_episode_id ON storyboards(episode_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_storyboards_sequence ON storyboards(episode_id, sequence_number)')
-            conn.commit()
-            conn.close()
-            logger.info("storyboards表创建成功")
-            return True
-        except Exception as e:
-            logger.error(f"创建storyboards表失败: {e}")
-            return False
-    
-    def create_voice_library_table(self) -> bool:
-        """创建音色库表"""
+        Args:
+            episode_id: 剧集ID
+            rows: 分镜字段字典列表，每行必须包含 sequence_number
+
+        Returns:
+            List[int]: 与 rows 顺序对应的分镜ID，失败返回空列表
+        """
+        if not rows:
+            return []
+
+        # 同一序号出现多次时后者覆盖前者
+        merged: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            unknown = set(row) - STORYBOARD_WRITABLE_COLUMNS
+            if unknown:
+                logger.error(f"批量写入分镜失败: 未知字段 {sorted(unknown)}")
+                return []
+            if row.get('sequence_number') is None:
+                logger.error("批量写入分镜失败: 缺少 sequence_number")
+                return []
+            merged.setdefault(row['sequence_number'], {}).update(row)
+
+        conn = self.get_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
+            # 先丢弃待更新分镜在延迟写队列中的同名字段（需在获取写锁之前，避免与后台刷新互相等待）
+            for sequence_number, storyboard_id in self._storyboard_ids_by_sequence(cursor, episode_id).items():
+                if sequence_number in merged:
+                    self.write_behind.discard('storyboards', 'id', storyboard_id, merged[sequence_number])
+
+            # 立即获取写锁，保证查询已有序号与写入之间没有其他写入
+            cursor.execute('BEGIN IMMEDIATE')
+            existing = self._storyboard_ids_by_sequence(cursor, episode_id)
+
+            inserts: Dict[Tuple[str, ...], List[tuple]] = {}
+            updates: Dict[Tuple[str, ...], List[tuple]] = {}
+            for sequence_number, fields in merged.items():
+                storyboard_id = existing.get(sequence_number)
+                if storyboard_id is None:
+                    columns = tuple(fields)
+                    inserts.setdefault(columns, []).append(
+                        (episode_id,) + tuple(fields[c] for c in columns)
+                    )
+                else:
+                    columns = tuple(c for c in fields if c != 'sequence_number')
+                    if columns:
+                        updates.setdefault(columns, []).append(
+                            tuple(fields[c] for c in columns) + (storyboard_id,)
+                        )
+
+            for columns, params in inserts.items():
+                cursor.executemany(f"""
+                    INSERT INTO storyboards (episode_id, {', '.join(columns)})
+                    VALUES (?, {', '.join('?' for _ in columns)})
+                """, params)
+            for columns, params in updates.items():
+                set_clause = ', '.join(f"{c} = ?" for c in columns)
+                cursor.executemany(f"""
+                    UPDATE storyboards
+                    SET {set_clause}, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, params)
+
+            ids = self._storyboard_ids_by_sequence(cursor, episode_id)
+            conn.commit()
+            self._notify_rows_changed('storyboards', [ids[n] for n in merged])
+            logger.info(
+                f"批量写入剧集 {episode_id} 的分镜: 新增 {sum(len(p) for p in inserts.values())} 个，"
+                f"更新 {sum(len(p) for p in updates.values())} 个"
+            )
+            return [ids[row['sequence_number']] for row in rows]
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"批量写入分镜失败: {e}")
+            return []
+        finally:
+            conn.close()
 
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS voice_library (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sequence_number INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    file_path TEXT NOT NULL,
-                    file_size INTEGER,
-                    duration REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+    def bulk_insert_storyboards(self, episode_id: int, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        批量追加分镜（不与已有分镜合并，序号相同也新增一行）
 
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_voice_library_sequence ON voice_library(sequence_number)')
+        所有插入在一个事务中通过 executemany 完成；行中未出现的列取默认值。
+
+        Args:
+            episode_id: 剧集ID
+            rows: 分镜字段字典列表
+
+        Returns:
+            List[int]: 与 rows 顺序对应的新分镜ID，失败返回空列表
+        """
+        if not rows:
+            return []
+        for row in rows:
+            unknown = set(row) - STORYBOARD_WRITABLE_COLUMNS
+            if unknown:
+                logger.error(f"批量新增分镜失败: 未知字段 {sorted(unknown)}")
+                return []
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            # 立即获取写锁，使新插入的行ID连续且可按ID查回
+            cursor.execute('BEGIN IMMEDIATE')
+            last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM storyboards').fetchone()[0]
+
+            # 按原顺序插入：列相同的连续行合并为一次 executemany
+            position = 0
+            while position < len(rows):
+                columns = tuple(rows[position])
+                end = position
+                while end < len(rows) and tuple(rows[end]) == columns:
+                    end += 1
+                placeholders = ', '.join('?' for _ in columns)
+                cursor.executemany(f"""
+                    INSERT INTO storyboards (episode_id{''.join(f', {c}' for c in columns)})
+                    VALUES (?{', ' + placeholders if columns else ''})
+                """, [(episode_id,) + tuple(row[c] for c in columns) for row in rows[position:end]])
+                position = end
+
+            ids = [r[0] for r in cursor.execute(
+                'SELECT id FROM storyboards WHERE id > ? ORDER BY id', (last_id,)
+            ).fetchall()]
             conn.commit()
-            conn.close()
-            logger.info("voice_library表创建成功")
-            return True
+            self._notify_rows_changed('storyboards', ids)
+            logger.info(f"批量新增剧集 {episode_id} 的分镜 {len(ids)} 个")
+            return ids
         except Exception as e:
-            logger.error(f"创建voice_library表失败: {e}")
-            return False
+            conn.rollback()
+            logger.error(f"批量新增分镜失败: {e}")
+            return []
+        finally:
+            conn.close()
 
-    def update_storyboard_video_info(
-        self,
-        storyboard_id: int,
-        video_task_id: str = None,
-        video_url: str = None,
-        video_status: str = None
-    ) -> bool:
-        """更新分镜的视频相关信息"""
+    def bulk_update_storyboards(self, ids: List[int], fields: Dict[str, Any]) -> Optional[int]:
+        """
+        将一批分镜的指定字段更新为相同的值（单个事务，executemany）
+
+        值未变化的分镜不会被写入。
+
+        Returns:
+            Optional[int]: 实际修改的分镜数，失败返回 None
+        """
+        if not ids or not fields:
+            return 0
+        unknown = set(fields) - STORYBOARD_WRITABLE_COLUMNS
+        if unknown:
+            logger.error(f"批量更新分镜失败: 未知字段 {sorted(unknown)}")
+            return None
+
+        columns = tuple(fields)
+        values = tuple(fields[c] for c in columns)
+        for storyboard_id in ids:
+            self.write_behind.discard('storyboards', 'id', storyboard_id, columns)
+
+        conn = self.get_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
-            
-            updates = []
-            values = []
-            
-            if video_task_id is not None:
-                updates.append("video_task_id = ?")
-                values.append(video_task_id)
-            
-            if video_url is not None:
-                updates.append("video_url = ?")
-                values.append(video_url)
-            
-            if video_status is not None:
-                updates.append("video_status = ?")
-                values.append(video_status)
-            
-            if not updates:
-                conn.close()
-                return False
-            
-            updates.append("updated_at = CURRENT_TIMESTAMP")
-            values.append(storyboard_id)
-            
-            query = f"""
+            set_clause = ', '.join(f"{c} = ?" for c in columns)
+            changed = ' OR '.join(f"{c} IS NOT ?" for c in columns)
+            cursor.executemany(f"""
                 UPDATE storyboards
-                SET {', '.join(updates)}
-                WHERE id = ?
-            """
-            
-            cursor.execute(query, values)
+                SET {set_clause}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND ({changed})
+            """, [values + (storyboard_id,) + values for storyboard_id in ids])
+            affected = max(cursor.rowcount, 0)
             conn.commit()
-            conn.close()
-            
-            logger.info(f"更新分镜 {storyboard_id} 的视频信息成功")
-            return True
+            if affected:
+                self._notify_rows_changed('storyboards', list(ids))
+            logger.info(f"批量更新 {len(ids)} 个分镜的 {', '.join(columns)}，实际修改 {affected} 个")
+            return affected
         except Exception as e:
-            logger.error(f"更新分镜视频信息失败: {e}")
-            return False
+            conn.rollback()
+            logger.error(f"批量更新分镜失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _storyboard_ids_by_sequence(cursor, episode_id: int) -> Dict[int, int]:
+        """剧集内 序号 -> 分镜ID（序号重复时取最早的分镜）"""
+        cursor.execute("""
+            SELECT sequence_number, MIN(id)
+            FROM storyboards
+            WHERE episode_id = ?
+            GROUP BY sequence_number
+        """, (episode_id,))
+        return dict(cursor.fetchall())
 
     def get_storyboard_by_id(self, storyboard_id: int) -> Optional[Dict]:
         """根据ID获取分镜信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, episode_id, sequence_number, title, screen_content,
@@ -1470,6 +1580,175 @@ class DatabaseManager:
             return None
 
 
+    # === 全文搜索 ===
+
+    SEARCH_SCOPES = ('tasks', 'storyboards', 'characters')
+
+    def search(
+        self,
+        query: str,
+        scope: str = 'all',
+        limit: int = 50,
+        episode_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        全文搜索任务提示词、分镜文本和角色
+
+        使用 FTS5 trigram 索引按相关度排序；trigram 无法匹配少于3个字符的关键词，
+        这类关键词以 LIKE 条件附加在索引结果上，全部关键词都过短时退化为 LIKE 查询。
+
+        Args:
+            query: 搜索词，空格分隔的多个词需同时命中
+            scope: 'all'、'tasks'、'storyboards' 或 'characters'
+            limit: 最多返回条数
+            episode_id: 只搜索该剧集的分镜（仅对分镜生效）
+
+        Returns:
+            List[Dict]: 命中结果，包含 scope、id、title、snippet、rank 以及定位所需的关联ID
+        """
+        terms = [t for t in (query or '').split() if t]
+        if not terms:
+            return []
+        scopes = self.SEARCH_SCOPES if scope == 'all' else (scope,)
+        long_terms = [t for t in terms if len(t) >= 3]
+        short_terms = [t for t in terms if len(t) < 3]
+        use_fts = bool(long_terms) and self._fts_available()
+
+        results: List[Dict[str, Any]] = []
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            for name in scopes:
+                if name not in self.SEARCH_SCOPES:
+                    continue
+                if use_fts:
+                    results.extend(self._search_fts(cursor, name, long_terms, short_terms, limit, episode_id))
+                else:
+                    results.extend(self._search_like(cursor, name, terms, limit, episode_id))
+            conn.close()
+        except Exception as e:
+            logger.error(f"搜索失败: {e}")
+            return []
+
+        results.sort(key=lambda r: r['rank'])
+        return results[:limit]
+
+    def _fts_available(self) -> bool:
+        if self._fts_ready is None:
+            try:
+                conn = self.get_connection()
+                row = conn.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'storyboards_fts'"
+                ).fetchone()
+                conn.close()
+                self._fts_ready = bool(row and row[0])
+            except Exception:
+                self._fts_ready = False
+        return self._fts_ready
+
+    # 各搜索范围的查询：(结果列, 主表别名, 关联表)，结果列顺序与 _search_row 对应
+    _SEARCH_SELECT = {
+        'tasks': (
+            "t.id, t.task_id, t.task_id, t.status",
+            "t",
+            "",
+        ),
+        'storyboards': (
+            "s.id, COALESCE(s.title, ''), s.episode_id, s.sequence_number, e.episode_number, e.project_id, p.title",
+            "s",
+            "LEFT JOIN episodes e ON e.id = s.episode_id LEFT JOIN projects p ON p.id = e.project_id",
+        ),
+        'characters': (
+            "c.id, c.name, c.project_id, p.title",
+            "c",
+            "LEFT JOIN projects p ON p.id = c.project_id",
+        ),
+    }
+
+    def _search_fts(self, cursor, scope: str, terms: List[str], short_terms: List[str],
+                    limit: int, episode_id: Optional[int]):
+        columns, alias, joins = self._SEARCH_SELECT[scope]
+        fts_table = f"{scope}_fts"
+        match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        where = f"{fts_table} MATCH ?"
+        params: List[Any] = [match]
+        if short_terms:
+            text_expr = self._search_text_expr(scope, alias)
+            for term in short_terms:
+                where += f" AND ({text_expr}) LIKE ?"
+                params.append(f"%{term}%")
+        if scope == 'storyboards' and episode_id is not None:
+            where += " AND s.episode_id = ?"
+            params.append(episode_id)
+        params.append(limit)
+        cursor.execute(f'''
+            SELECT {columns}, snippet({fts_table}, -1, '[', ']', '…', 16), bm25({fts_table})
+            FROM {fts_table}
+            JOIN {scope} {alias} ON {alias}.id = {fts_table}.rowid
+            {joins}
+            WHERE {where}
+            ORDER BY bm25({fts_table})
+            LIMIT ?
+        ''', params)
+        return [self._search_row(scope, row[:-2], row[-2], row[-1]) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _search_text_expr(scope: str, alias: str) -> str:
+        """被索引列拼接成的文本表达式（LIKE 查询使用）"""
+        text_columns = next(cols for _, table, cols in db_migrations.FTS_INDEXES if table == scope)
+        return " || ' ' || ".join(f"COALESCE({alias}.{c}, '')" for c in text_columns)
+
+    def _search_like(self, cursor, scope: str, terms: List[str], limit: int, episode_id: Optional[int]):
+        columns, alias, joins = self._SEARCH_SELECT[scope]
+        text_expr = self._search_text_expr(scope, alias)
+        where = " AND ".join(f"({text_expr}) LIKE ?" for _ in terms)
+        params: List[Any] = [f"%{t}%" for t in terms]
+        if scope == 'storyboards' and episode_id is not None:
+            where += " AND s.episode_id = ?"
+            params.append(episode_id)
+        params.append(limit)
+        cursor.execute(f'''
+            SELECT {columns}, {text_expr}
+            FROM {scope} {alias}
+            {joins}
+            WHERE {where}
+            ORDER BY {alias}.id DESC
+            LIMIT ?
+        ''', params)
+        return [
+            self._search_row(scope, row[:-1], self._make_snippet(row[-1], terms[0]), 0.0)
+            for row in cursor.fetchall()
+        ]
+
+    @staticmethod
+    def _make_snippet(text: str, term: str, width: int = 16) -> str:
+        """在文本中截取关键词附近的片段，关键词用[]标出"""
+        index = text.lower().find(term.lower())
+        if index < 0:
+            return text[:width * 2]
+        start = max(0, index - width)
+        end = index + len(term)
+        prefix = '…' if start > 0 else ''
+        suffix = '…' if end + width < len(text) else ''
+        return f"{prefix}{text[start:index]}[{text[index:end]}]{text[end:end + width]}{suffix}"
+
+    @staticmethod
+    def _search_row(scope: str, row, snippet: str, rank: float) -> Dict[str, Any]:
+        hit = {'scope': scope, 'id': row[0], 'title': row[1], 'snippet': snippet, 'rank': rank}
+        if scope == 'tasks':
+            hit.update({'task_id': row[2], 'status': row[3]})
+        elif scope == 'storyboards':
+            hit.update({
+                'episode_id': row[2],
+                'sequence_number': row[3],
+                'episode_number': row[4],
+                'project_id': row[5],
+                'project_title': row[6],
+            })
+        elif scope == 'characters':
+            hit.update({'project_id': row[2], 'project_title': row[3]})
+        return hit
+
 class ModelManager:
     """模型管理器"""
 
@@ -32,6 +32,7 @@ class MainWindow(FluentWindow):
         # 存储导航项到episode_id的映射 {navigation_item: episode_id}
         self.nav_item_to_episode = {}
         self.init_ui()
+        self.start_pipeline()
 
     def init_ui(self):
         """初始化UI"""
@@ -71,6 +72,17 @@ class MainWindow(FluentWindow):
         # 设置最小宽度
         self.setMinimumWidth(1000)
     
+    def start_pipeline(self):
+        """启动生成流水线，继续执行上次退出时未完成的任务"""
+        try:
+            from threads import storyboard_pipeline
+            from threads.job_runner import job_runner
+            storyboard_pipeline.register_stages()
+            job_runner.start()
+        except Exception as e:
+            from loguru import logger
+            logger.error(f"启动生成流水线失败: {e}")
+
     def add_episode_detail_page(self, episode_id, project_id, episode_number, project_title):
         """添加剧集详情页面到侧边栏"""
         # 如果页面已存在，直接切换到该页面
@@ -173,17 +185,8 @@ class MainWindow(FluentWindow):
         
         # 如果删除数据，从数据库删除剧集
         if delete_data:
-            try:
-                import sqlite3
-                from database_manager import db_manager
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM episodes WHERE id = ?', (episode_id,))
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                from loguru import logger
-                logger.error(f"删除剧集数据失败: {e}")
+            from repositories import episode_repo
+            episode_repo.delete(episode_id)
         
         # 从导航界面移除（尝试多种方法确保成功）
         nav = getattr(self, "navigationInterface", None)
@@ -233,3 +236,34 @@ class MainWindow(FluentWindow):
     def closeEvent(self, a0):
         """窗口关闭事件"""
         super().closeEvent(a0)
+        try:
+            from threads.job_runner import job_runner
+            job_runner.stop()
+        except Exception as e:
+            from loguru import logger
+            logger.error(f"停止生成流水线失败: {e}")
+        try:
+            from utils.task_executor import task_executor
+            task_executor.log_stats()
+            task_executor.shutdown()
+        except Exception as e:
+            from loguru import logger
+            logger.error(f"停止任务执行器失败: {e}")
+        try:
+            from threads.status_poll_scheduler import status_poll_scheduler
+            status_poll_scheduler.stop()
+        except Exception as e:
+            from loguru import logger
+            logger.error(f"停止状态轮询失败: {e}")
+        try:
+            from database_manager import db_manager
+            db_manager.close_connections()
+        except Exception as e:
+            from loguru import logger
+            logger.error(f"关闭数据库连接失败: {e}")
+        try:
+            from utils import http_client
+            http_client.close_all()
+        except Exception as e:
+            from loguru import logger
+            logger.error(f"关闭网络连接失败: {e}")
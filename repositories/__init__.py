@@ -0,0 +1,25 @@
+"""
+数据访问层
+
+界面与线程通过以下仓库读写项目、剧集、分镜、角色和音色，而不是直接编写 SQL：
+
+    from repositories import storyboard_repo
+    rows = storyboard_repo.list_by_episode(episode_id)
+    storyboard_repo.list_by_episode_async(episode_id, on_result=self.on_loaded, owner=self)
+"""
+
+from repositories.base import Repository, Row, run_async
+from repositories.projects import ProjectRepository, ProjectRow, project_repo
+from repositories.episodes import EpisodeRepository, EpisodeRow, episode_repo
+from repositories.storyboards import StoryboardRepository, StoryboardRow, storyboard_repo
+from repositories.characters import CharacterRepository, CharacterRow, character_repo
+from repositories.voices import VoiceRepository, VoiceRow, voice_repo
+
+__all__ = [
+    'Repository', 'Row', 'run_async',
+    'ProjectRepository', 'ProjectRow', 'project_repo',
+    'EpisodeRepository', 'EpisodeRow', 'episode_repo',
+    'StoryboardRepository', 'StoryboardRow', 'storyboard_repo',
+    'CharacterRepository', 'CharacterRow', 'character_repo',
+    'VoiceRepository', 'VoiceRow', 'voice_repo',
+]
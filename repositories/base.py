@@ -0,0 +1,370 @@
+"""
+数据访问层基础设施
+行对象、带标识映射的仓库基类，以及在后台线程执行查询的异步调用
+"""
+
+import itertools
+import threading
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PyQt5 import sip
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from loguru import logger
+
+from database_manager import db_manager
+
+
+class Row:
+    """
+    数据行基类
+
+    子类通过 __slots__ 声明列（顺序与 SELECT 的列顺序一致，第一列为 id）。
+    兼容原先的字典用法：row['title']、row.get('title', '')。
+    """
+
+    __slots__ = ('__weakref__',)
+
+    @classmethod
+    def columns(cls) -> Tuple[str, ...]:
+        return cls.__slots__
+
+    def __init__(self, **fields):
+        for name in self.columns():
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_values(cls, values: Sequence[Any]) -> 'Row':
+        row = cls.__new__(cls)
+        row._assign(values)
+        return row
+
+    def _assign(self, values: Sequence[Any]):
+        for name, value in zip(self.columns(), values):
+            setattr(self, name, value)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name) if name in self.columns() else default
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.columns():
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.columns()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+
+class _AsyncSignals(QObject):
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+
+class _AsyncCall(QRunnable):
+    """在线程池中执行的一次查询"""
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        # 在调用线程（GUI 线程）中创建，信号以排队方式回到该线程
+        self.signals = _AsyncSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.error(f"后台查询失败: {e}")
+            self.signals.error.emit(str(e))
+            return
+        self.signals.result.emit(result)
+
+
+# 执行中的调用，避免信号对象在结果送达前被回收
+_pending_calls = set()
+# (owner, tag) -> 最近一次调用的序号，只有最近一次调用的结果会被送达
+_latest_calls: Dict[Tuple[int, str], int] = {}
+_call_sequence = itertools.count(1)
+
+
+def run_async(
+    fn: Callable,
+    *args,
+    on_result: Optional[Callable[[Any], None]] = None,
+    on_error: Optional[Callable[[str], None]] = None,
+    owner: Optional[QObject] = None,
+    tag: str = '',
+    **kwargs,
+):
+    """
+    在后台线程执行 fn(*args, **kwargs)，结果在调用线程（需有事件循环，通常为 GUI 线程）中回调
+
+    指定 owner 时，同一 owner + tag 只有最后一次调用的结果会被送达，
+    用于界面重复刷新时丢弃过期结果；owner 已销毁时不再回调。
+    """
+    call = _AsyncCall(fn, args, kwargs)
+    latest_key = None
+    if owner is not None:
+        latest_key = (id(owner), tag)
+        sequence = next(_call_sequence)
+        _latest_calls[latest_key] = sequence
+
+        def is_latest():
+            return _latest_calls.get(latest_key) == sequence and not sip.isdeleted(owner)
+    else:
+        def is_latest():
+            return True
+
+    def finish(_value=None):
+        _pending_calls.discard(call)
+        if latest_key is not None and _latest_calls.get(latest_key) == sequence:
+            _latest_calls.pop(latest_key, None)
+
+    if on_result is not None:
+        call.signals.result.connect(lambda value: on_result(value) if is_latest() else None)
+    if on_error is not None:
+        call.signals.error.connect(lambda message: on_error(message) if is_latest() else None)
+    call.signals.result.connect(finish)
+    call.signals.error.connect(finish)
+
+    _pending_calls.add(call)
+    QThreadPool.globalInstance().start(call)
+    return call.signals
+
+
+class Repository:
+    """
+    单表仓库基类
+
+    启用标识映射（identity_map=True）时，GUI 线程中同一 ID 的行只对应一个对象：
+    get() 优先返回已载入的对象，重新查询时原对象被就地刷新。
+    通过本仓库或 DatabaseManager 写入的行会被标记为过期，下次 get() 时重新读取。
+    其他线程（含异步查询）总是直接查询数据库并得到独立的行对象。
+    """
+
+    table = ''
+    row_class = Row
+    default_order = 'id ASC'
+
+    def __init__(self, identity_map: bool = False):
+        self._columns = self.row_class.columns()
+        self._select = f"SELECT {', '.join(self._columns)} FROM {self.table}"
+        self._writable = frozenset(c for c in self._columns if c not in ('id', 'created_at', 'updated_at'))
+        self._has_updated_at = 'updated_at' in self._columns
+        self._identity: Optional[weakref.WeakValueDictionary] = (
+            weakref.WeakValueDictionary() if identity_map else None
+        )
+        self._stale = set()
+        self._lock = threading.Lock()
+        if identity_map:
+            db_manager.add_row_listener(self._on_rows_changed)
+
+    # ---------------- 标识映射 ----------------
+
+    def _use_identity_map(self) -> bool:
+        return self._identity is not None and threading.current_thread() is threading.main_thread()
+
+    def _on_rows_changed(self, table: str, ids: Iterable[int]):
+        if table == self.table:
+            self.invalidate(ids)
+
+    def invalidate(self, ids: Optional[Iterable[int]] = None):
+        """将指定（为空时全部）已缓存的行标记为过期"""
+        if self._identity is None:
+            return
+        with self._lock:
+            if ids is None:
+                self._stale.update(self._identity.keys())
+            else:
+                self._stale.update(ids)
+
+    def _materialize(self, values: Sequence[Any]) -> Row:
+        if not self._use_identity_map():
+            return self.row_class.from_values(values)
+        row_id = values[0]
+        with self._lock:
+            row = self._identity.get(row_id)
+            if row is None:
+                row = self.row_class.from_values(values)
+                self._identity[row_id] = row
+            else:
+                row._assign(values)
+            self._stale.discard(row_id)
+        return row
+
+    def adopt(self, rows):
+        """把其他线程查询得到的行并入标识映射（在 GUI 线程中调用）"""
+        if isinstance(rows, Row):
+            return self._materialize([getattr(rows, c) for c in self._columns])
+        if isinstance(rows, list):
+            return [self.adopt(row) if isinstance(row, Row) else row for row in rows]
+        return rows
+
+    # ---------------- 查询 ----------------
+
+    def _query(self, where: str = '', params: Sequence[Any] = (), order_by: Optional[str] = None) -> List[Row]:
+        sql = self._select
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order_by or self.default_order}"
+        conn = db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            return [self._materialize(values) for values in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def _scalar(self, sql: str, params: Sequence[Any] = ()) -> Any:
+        conn = db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def get(self, row_id: int, refresh: bool = False) -> Optional[Row]:
+        """按ID获取一行，不存在或失败返回 None"""
+        if not refresh and self._use_identity_map():
+            with self._lock:
+                row = self._identity.get(row_id)
+                if row is not None and row_id not in self._stale:
+                    return row
+        try:
+            rows = self._query('id = ?', (row_id,))
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.error(f"获取{self.table}记录 {row_id} 失败: {e}")
+            return None
+
+    # ---------------- 写入 ----------------
+
+    def _check_columns(self, fields: Dict[str, Any]):
+        unknown = set(fields) - self._writable
+        if unknown:
+            raise ValueError(f"{self.table} 不支持的字段: {sorted(unknown)}")
+
+    def create(self, **fields) -> Optional[int]:
+        """插入一行，返回新行ID，失败返回 None"""
+        try:
+            self._check_columns(fields)
+            columns = list(fields)
+            conn = db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"INSERT INTO {self.table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    [fields[c] for c in columns],
+                )
+                conn.commit()
+                return cursor.lastrowid
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"新增{self.table}记录失败: {e}")
+            return None
+
+    def update(self, row_id: int, **fields) -> bool:
+        """更新一行的指定字段"""
+        if not fields:
+            return True
+        try:
+            self._check_columns(fields)
+            set_clause = ', '.join(f"{c} = ?" for c in fields)
+            if self._has_updated_at:
+                set_clause += ', updated_at = CURRENT_TIMESTAMP'
+            conn = db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"UPDATE {self.table} SET {set_clause} WHERE id = ?",
+                    list(fields.values()) + [row_id],
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"更新{self.table}记录 {row_id} 失败: {e}")
+            return False
+        self._apply_to_cached(row_id, fields)
+        return True
+
+    def update_each(self, column: str, values: Dict[int, Any]) -> bool:
+        """为多行分别设置同一列的值（单个事务，executemany）"""
+        if not values:
+            return True
+        try:
+            self._check_columns({column: None})
+            set_clause = f"{column} = ?"
+            if self._has_updated_at:
+                set_clause += ', updated_at = CURRENT_TIMESTAMP'
+            conn = db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    f"UPDATE {self.table} SET {set_clause} WHERE id = ?",
+                    [(value, row_id) for row_id, value in values.items()],
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"批量更新{self.table}.{column} 失败: {e}")
+            return False
+        for row_id, value in values.items():
+            self._apply_to_cached(row_id, {column: value})
+        return True
+
+    def delete(self, row_id: int) -> bool:
+        """删除一行"""
+        try:
+            conn = db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"DELETE FROM {self.table} WHERE id = ?", (row_id,))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"删除{self.table}记录 {row_id} 失败: {e}")
+            return False
+        self.invalidate([row_id])
+        return True
+
+    def _apply_to_cached(self, row_id: int, fields: Dict[str, Any]):
+        """写入成功后同步已缓存的行"""
+        if self._identity is None:
+            return
+        with self._lock:
+            row = self._identity.get(row_id)
+            if row is None:
+                return
+            if threading.current_thread() is threading.main_thread():
+                for name, value in fields.items():
+                    setattr(row, name, value)
+            else:
+                # 缓存的行只在 GUI 线程中修改，其他线程写入时标记过期
+                self._stale.add(row_id)
+
+    # ---------------- 异步 ----------------
+
+    def _submit(self, fn: Callable, *args, on_result=None, on_error=None, owner=None, tag: str = ''):
+        """在后台线程执行本仓库的查询方法，结果并入标识映射后回调"""
+        if on_result is not None and self._identity is not None:
+            callback = on_result
+            on_result = lambda rows: callback(self.adopt(rows))  # noqa: E731
+        return run_async(
+            fn, *args,
+            on_result=on_result, on_error=on_error,
+            owner=owner, tag=tag or fn.__name__,
+        )
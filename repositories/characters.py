@@ -0,0 +1,80 @@
+"""
+角色仓库
+"""
+
+from typing import Iterable, List, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+from repositories.base import Repository, Row
+
+
+class CharacterRow(Row):
+    """角色"""
+
+    __slots__ = (
+        'id', 'project_id', 'name', 'description', 'front_image', 'side_image',
+        'back_image', 'id_card_image', 'sora_character_id', 'sora_character_username',
+        'sora_status', 'voice_id', 'created_at', 'updated_at',
+    )
+
+
+class CharacterRepository(Repository):
+    """characters 表"""
+
+    table = 'characters'
+    row_class = CharacterRow
+    default_order = 'created_at ASC, id ASC'
+
+    def list_by_project(self, project_id: int) -> List[CharacterRow]:
+        """项目下的全部角色（按创建时间），失败返回空列表"""
+        try:
+            return self._query('project_id = ?', (project_id,))
+        except Exception as e:
+            logger.error(f"获取角色列表失败: {e}")
+            return []
+
+    def list_by_project_async(self, project_id: int, on_result, on_error=None, owner=None):
+        return self._submit(self.list_by_project, project_id, on_result=on_result, on_error=on_error, owner=owner)
+
+    def upsert_descriptions(self, project_id: int, characters: Iterable[Tuple[str, str]]):
+        """
+        按角色名写入角色描述：已存在的角色更新描述，其余新增（单个事务）
+
+        失败时抛出异常，由调用方处理
+        """
+        conn = db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT name FROM characters WHERE project_id = ?', (project_id,))
+            existing = {row[0] for row in cursor.fetchall()}
+
+            updates, inserts = [], []
+            for name, description in characters:
+                if name in existing:
+                    updates.append((description, project_id, name))
+                else:
+                    inserts.append((project_id, name, description))
+                    existing.add(name)
+
+            cursor.executemany('''
+                UPDATE characters
+                SET description = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE project_id = ? AND name = ?
+            ''', updates)
+            cursor.executemany('''
+                INSERT INTO characters (project_id, name, description)
+                VALUES (?, ?, ?)
+            ''', inserts)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self.invalidate()
+
+
+character_repo = CharacterRepository(identity_map=True)
@@ -0,0 +1,46 @@
+"""
+剧集仓库
+"""
+
+from typing import List, Optional
+
+from loguru import logger
+
+from repositories.base import Repository, Row
+
+
+class EpisodeRow(Row):
+    """剧集"""
+
+    __slots__ = ('id', 'project_id', 'episode_number', 'episode_name', 'file_path', 'created_at')
+
+
+class EpisodeRepository(Repository):
+    """episodes 表"""
+
+    table = 'episodes'
+    row_class = EpisodeRow
+    default_order = 'episode_number ASC'
+
+    def list_by_project(self, project_id: int) -> List[EpisodeRow]:
+        """项目下的全部剧集（按集数），失败返回空列表"""
+        try:
+            return self._query('project_id = ?', (project_id,))
+        except Exception as e:
+            logger.error(f"获取剧集列表失败: {e}")
+            return []
+
+    def list_by_project_async(self, project_id: int, on_result, on_error=None, owner=None):
+        return self._submit(self.list_by_project, project_id, on_result=on_result, on_error=on_error, owner=owner)
+
+    def find_by_number(self, project_id: int, episode_number: int) -> Optional[EpisodeRow]:
+        """按集数查找剧集，不存在或失败返回 None"""
+        try:
+            rows = self._query('project_id = ? AND episode_number = ?', (project_id, episode_number))
+            return rows[0] if rows else None
+        except Exception as e:
+            logger.error(f"查找剧集失败: {e}")
+            return None
+
+
+episode_repo = EpisodeRepository(identity_map=True)
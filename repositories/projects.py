@@ -0,0 +1,41 @@
+"""
+项目仓库
+"""
+
+from typing import List
+
+from loguru import logger
+
+from repositories.base import Repository, Row
+
+
+class ProjectRow(Row):
+    """项目"""
+
+    __slots__ = (
+        'id', 'title', 'cover_image', 'novel_file_path', 'novel_folder_path',
+        'style', 'aspect_ratio', 'description', 'chapter_name',
+        'created_at', 'updated_at',
+    )
+
+
+class ProjectRepository(Repository):
+    """projects 表"""
+
+    table = 'projects'
+    row_class = ProjectRow
+    default_order = 'created_at DESC, id DESC'
+
+    def list_all(self) -> List[ProjectRow]:
+        """全部项目（最新创建的在前），失败返回空列表"""
+        try:
+            return self._query()
+        except Exception as e:
+            logger.error(f"获取项目列表失败: {e}")
+            return []
+
+    def list_all_async(self, on_result, on_error=None, owner=None):
+        return self._submit(self.list_all, on_result=on_result, on_error=on_error, owner=owner)
+
+
+project_repo = ProjectRepository(identity_map=True)
@@ -0,0 +1,103 @@
+"""
+分镜仓库
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+from repositories.base import Repository, Row
+
+
+class StoryboardRow(Row):
+    """分镜"""
+
+    __slots__ = (
+        'id', 'episode_id', 'sequence_number', 'title', 'duration', 'dialogue',
+        'screen_content', 'sound_effect', 'camera_movement', 'prompt',
+        'storyboard_detail', 'scene_image', 'video_prompt', 'thumbnail_path',
+        'video_file', 'video_url', 'video_task_id', 'video_status',
+        'created_at', 'updated_at',
+    )
+
+
+class StoryboardRepository(Repository):
+    """
+    storyboards 表
+
+    视频状态与批量写入沿用 DatabaseManager 的实现（延迟写队列、executemany），
+    写入后通过行变更回调使本仓库缓存的行失效。
+    """
+
+    table = 'storyboards'
+    row_class = StoryboardRow
+    default_order = 'sequence_number ASC, id ASC'
+
+    def list_by_episode(self, episode_id: int) -> List[StoryboardRow]:
+        """剧集下的全部分镜（按序号），失败返回空列表"""
+        try:
+            return self._query('episode_id = ?', (episode_id,))
+        except Exception as e:
+            logger.error(f"获取分镜列表失败: {e}")
+            return []
+
+    def list_by_episode_async(self, episode_id: int, on_result, on_error=None, owner=None):
+        return self._submit(self.list_by_episode, episode_id, on_result=on_result, on_error=on_error, owner=owner)
+
+    def list_with_video(self, episode_id: int) -> List[StoryboardRow]:
+        """剧集下已有视频地址的分镜（按序号），失败返回空列表"""
+        try:
+            return self._query(
+                "episode_id = ? AND video_url IS NOT NULL AND video_url != ''", (episode_id,)
+            )
+        except Exception as e:
+            logger.error(f"获取已生成视频的分镜失败: {e}")
+            return []
+
+    def count_with_video(self, episode_id: int) -> int:
+        """剧集下已有视频地址的分镜数"""
+        try:
+            return self._scalar("""
+                SELECT COUNT(*) FROM storyboards
+                WHERE episode_id = ? AND video_url IS NOT NULL AND video_url != ''
+            """, (episode_id,)) or 0
+        except Exception as e:
+            logger.error(f"统计已生成视频的分镜失败: {e}")
+            return 0
+
+    def list_pending_video(self, episode_id: int) -> List[Tuple[int, str]]:
+        """需要刷新视频状态的分镜 (id, video_task_id)"""
+        return db_manager.get_pending_video_storyboards(episode_id)
+
+    def update_video_info(
+        self,
+        storyboard_id: int,
+        video_task_id: str = None,
+        video_url: str = None,
+        video_status: str = None,
+        deferred: bool = False
+    ) -> bool:
+        """更新视频任务ID/地址/状态（参见 DatabaseManager.update_storyboard_video_info）"""
+        return db_manager.update_storyboard_video_info(
+            storyboard_id,
+            video_task_id=video_task_id,
+            video_url=video_url,
+            video_status=video_status,
+            deferred=deferred,
+        )
+
+    def bulk_upsert(self, episode_id: int, rows: List[Dict[str, Any]]) -> List[int]:
+        """按序号批量写入分镜，返回分镜ID（参见 DatabaseManager.bulk_upsert_storyboards）"""
+        return db_manager.bulk_upsert_storyboards(episode_id, rows)
+
+    def bulk_insert(self, episode_id: int, rows: List[Dict[str, Any]]) -> List[int]:
+        """批量追加分镜，返回新分镜ID（参见 DatabaseManager.bulk_insert_storyboards）"""
+        return db_manager.bulk_insert_storyboards(episode_id, rows)
+
+    def bulk_update(self, ids: List[int], fields: Dict[str, Any]) -> Optional[int]:
+        """把一批分镜的字段设为相同的值，返回实际修改数（参见 DatabaseManager.bulk_update_storyboards）"""
+        return db_manager.bulk_update_storyboards(ids, fields)
+
+
+storyboard_repo = StoryboardRepository(identity_map=True)
@@ -0,0 +1,73 @@
+"""
+音色库仓库
+"""
+
+from typing import List
+
+from loguru import logger
+
+from database_manager import db_manager
+from repositories.base import Repository, Row
+
+
+class VoiceRow(Row):
+    """音色"""
+
+    __slots__ = ('id', 'sequence_number', 'name', 'file_path', 'file_size', 'duration', 'created_at', 'updated_at')
+
+
+class VoiceRepository(Repository):
+    """voice_library 表"""
+
+    table = 'voice_library'
+    row_class = VoiceRow
+    default_order = 'sequence_number ASC'
+
+    def list_all(self) -> List[VoiceRow]:
+        """全部音色（按序号），失败返回空列表"""
+        try:
+            return self._query()
+        except Exception as e:
+            logger.error(f"获取音色列表失败: {e}")
+            return []
+
+    def list_all_async(self, on_result, on_error=None, owner=None):
+        return self._submit(self.list_all, on_result=on_result, on_error=on_error, owner=owner)
+
+    def next_sequence_number(self) -> int:
+        """下一个可用序号"""
+        try:
+            current = self._scalar(f"SELECT MAX(sequence_number) FROM {self.table}")
+            return current + 1 if current is not None else 1
+        except Exception as e:
+            logger.error(f"获取下一个序号失败: {e}")
+            return 1
+
+    def delete(self, row_id: int) -> bool:
+        """删除音色，并把其后的序号依次前移"""
+        try:
+            conn = db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT sequence_number FROM voice_library WHERE id = ?', (row_id,))
+                result = cursor.fetchone()
+                deleted_sequence = result[0] if result else None
+
+                cursor.execute('DELETE FROM voice_library WHERE id = ?', (row_id,))
+                if deleted_sequence:
+                    cursor.execute('''
+                        UPDATE voice_library
+                        SET sequence_number = sequence_number - 1
+                        WHERE sequence_number > ?
+                    ''', (deleted_sequence,))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"删除音色 {row_id} 失败: {e}")
+            return False
+        self.invalidate()
+        return True
+
+
+voice_repo = VoiceRepository()
@@ -0,0 +1,66 @@
+"""
+测试公共设置
+导入项目模块之前把应用数据目录（~/.local/share/sora2 等）指向临时目录，
+db_manager 在其中新建数据库并迁移到最新版本，不会读写本机的真实数据
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_DATA_HOME = tempfile.mkdtemp(prefix="sora2-tests-")
+os.environ["HOME"] = _DATA_HOME
+os.environ["APPDATA"] = _DATA_HOME
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_DATA_HOME, ignore_errors=True)
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """本地测试服务的请求处理基类（HTTP/1.1 长连接，不输出访问日志）"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def reply(self, status: int, body: bytes = b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def http_server():
+    """启动本地 HTTP 服务：http_server(handler_class) 返回服务地址，测试结束后关闭"""
+    servers = []
+
+    def start(handler) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
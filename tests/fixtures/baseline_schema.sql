@@ -0,0 +1,148 @@
+-- 基线版本（引入 schema_version 之前）启动后建出的数据库结构
+-- 由基线提交的 database_manager.py 在空目录中初始化后导出，外加少量示例数据
+
+CREATE TABLE characters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    front_image TEXT,
+    side_image TEXT,
+    back_image TEXT,
+    id_card_image TEXT,
+    sora_character_id TEXT,
+    sora_character_username TEXT,
+    sora_status TEXT DEFAULT '未上传',
+    voice_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE,
+    FOREIGN KEY (voice_id) REFERENCES voice_library(id) ON DELETE SET NULL
+);
+CREATE TABLE chat_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT UNIQUE NOT NULL,
+    model TEXT NOT NULL,
+    is_chat_mode INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (task_id) REFERENCES tasks(task_id) ON DELETE CASCADE
+);
+CREATE TABLE config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    value TEXT,
+    type TEXT DEFAULT 'string',
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE episodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL,
+    episode_number INTEGER NOT NULL,
+    episode_name TEXT,
+    file_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+);
+CREATE TABLE logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    cover_image TEXT,
+    novel_file_path TEXT,
+    novel_folder_path TEXT,
+    style TEXT,
+    aspect_ratio TEXT DEFAULT '9:16',
+    description TEXT,
+    chapter_name TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE storyboards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    episode_id INTEGER NOT NULL,
+    sequence_number INTEGER NOT NULL,
+    storyboard_detail TEXT,
+    scene_image TEXT,
+    video_prompt TEXT,
+    video_url TEXT,
+    video_task_id TEXT,
+    video_status TEXT DEFAULT '未生成',
+    title TEXT,
+    duration TEXT,
+    dialogue TEXT,
+    screen_content TEXT,
+    sound_effect TEXT,
+    camera_movement TEXT,
+    prompt TEXT,
+    video_file TEXT,
+    thumbnail_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (episode_id) REFERENCES episodes(id) ON DELETE CASCADE
+);
+CREATE TABLE tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT UNIQUE NOT NULL,
+    prompt TEXT NOT NULL,
+    model TEXT DEFAULT 'sora-2',
+    orientation TEXT DEFAULT 'portrait',
+    size TEXT DEFAULT 'small',
+    duration INTEGER DEFAULT 10,
+    images TEXT,
+    video_url TEXT,
+    thumbnail_url TEXT,
+    status TEXT DEFAULT 'pending',
+    error_message TEXT,
+    progress INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE upscale_servers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    enabled INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE voice_library (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sequence_number INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size INTEGER,
+    duration REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_characters_project_id ON characters(project_id);
+CREATE INDEX idx_chat_tasks_model ON chat_tasks(model);
+CREATE INDEX idx_chat_tasks_task_id ON chat_tasks(task_id);
+CREATE UNIQUE INDEX idx_episodes_project_episode ON episodes(project_id, episode_number);
+CREATE INDEX idx_episodes_project_id ON episodes(project_id);
+CREATE INDEX idx_projects_created_at ON projects(created_at);
+CREATE INDEX idx_storyboards_episode_id ON storyboards(episode_id);
+CREATE INDEX idx_storyboards_sequence ON storyboards(episode_id, sequence_number);
+CREATE INDEX idx_tasks_created_at ON tasks(created_at);
+CREATE INDEX idx_tasks_status ON tasks(status);
+CREATE INDEX idx_tasks_task_id ON tasks(task_id);
+CREATE INDEX idx_upscale_servers_enabled ON upscale_servers(enabled);
+CREATE UNIQUE INDEX idx_upscale_servers_url ON upscale_servers(url);
+CREATE INDEX idx_voice_library_sequence ON voice_library(sequence_number);
+
+INSERT INTO config (key, value, type, description) VALUES ('api_key', 'sk-baseline', 'string', 'Sora API Key');
+INSERT INTO tasks (task_id, prompt, status, created_at) VALUES ('task-done', '海边日落', 'completed', '2025-01-01 10:00:00');
+INSERT INTO tasks (task_id, prompt, status, created_at) VALUES ('task-running', '城市夜景', 'processing', '2025-01-02 10:00:00');
+INSERT INTO projects (title) VALUES ('示例项目');
+INSERT INTO episodes (project_id, episode_number, episode_name) VALUES (1, 1, '第一集');
+INSERT INTO characters (project_id, name, front_image) VALUES (1, '主角', '/images/hero.png');
+INSERT INTO storyboards (episode_id, sequence_number, storyboard_detail, video_status) VALUES (1, 1, '主角走进雨中的街道', '未生成');
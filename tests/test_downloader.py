@@ -0,0 +1,153 @@
+"""
+可续传分段下载：对本地支持 Range 的服务测试中断后续传、分段在已收到部分数据后失败的处理
+"""
+
+import json
+import os
+import re
+import threading
+
+import pytest
+
+from conftest import QuietHandler
+from utils import downloader
+
+KB = 1024
+SIZE = 1024 * KB
+# 4 段时每段的大小
+SEGMENT = SIZE // 4
+DATA = os.urandom(SIZE)
+ETAG = '"v1"'
+
+
+def range_server(http_server, cut_after=None, fail_after_cut=False):
+    """
+    启动支持 Range 的文件服务，返回 (地址, 状态)
+
+    Args:
+        cut_after: {分段起点: 字节数}，该起点的第一次请求只发送这么多数据就断开连接
+        fail_after_cut: 为 True 时，断开过的分段（按 4 段计）之后的请求一律返回 500，
+            可通过状态中的 fail_after_cut 关闭
+    """
+    cut_after = dict(cut_after or {})
+    state = {"ranges": [], "cut": set(), "fail_after_cut": fail_after_cut}
+    lock = threading.Lock()
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if not match:
+                self.reply(200, DATA, {"ETag": ETAG})
+                return
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else SIZE - 1
+            with lock:
+                if (start, end) != (0, 0):
+                    state["ranges"].append((start, end))
+                failing = state["fail_after_cut"] and any(c <= start < c + SEGMENT for c in state["cut"])
+                limit = cut_after.pop(start, None)
+                if limit is not None:
+                    state["cut"].add(start)
+            if failing:
+                self.reply(500, b"error")
+                return
+            body = DATA[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{SIZE}")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            if limit is not None:
+                # 只发送部分数据后断开，模拟连接中断
+                self.wfile.write(body[:limit])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return http_server(Handler), state
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    """按 1 MB 文件缩小分段与缓冲区，4 段各 256 KB"""
+    monkeypatch.setattr(downloader, "MIN_SEGMENT_SIZE", 64 * KB)
+    monkeypatch.setattr(downloader, "CHUNK_SIZE", 8 * KB)
+    monkeypatch.setattr(downloader, "BUFFER_SIZE", 16 * KB)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("segments", [1, 4])
+def test_resume_after_cancel_requests_only_missing_ranges(http_server, tmp_path, segments):
+    url, state = range_server(http_server)
+    dest = str(tmp_path / "video.mp4")
+
+    checks = {"count": 0}
+
+    def stop_after_some_data():
+        checks["count"] += 1
+        return checks["count"] > 4 * segments
+
+    with pytest.raises(downloader.DownloadCancelled):
+        downloader.download(f"{url}/video.mp4", dest, segments=segments,
+                            should_stop=stop_after_some_data, trust_env=False)
+    assert not os.path.exists(dest)
+    with open(f"{dest}.part.json", encoding="utf-8") as f:
+        saved = json.load(f)["segments"]
+    assert len(saved) == segments
+    done = sum(pos - start for start, _, pos in saved)
+    assert 0 < done < SIZE
+
+    state["ranges"].clear()
+    size = downloader.download(f"{url}/video.mp4", dest, segments=segments, trust_env=False)
+
+    assert size == SIZE
+    assert read(dest) == DATA
+    assert not os.path.exists(f"{dest}.part") and not os.path.exists(f"{dest}.part.json")
+    # 续传只请求每段尚未下载的部分
+    expected = sorted((pos, end) for start, end, pos in saved if pos <= end)
+    assert sorted(state["ranges"]) == expected
+
+
+def test_segment_cut_after_partial_data_resumes_from_received_bytes(http_server, tmp_path):
+    segment_start = SEGMENT
+    partial = 24 * KB
+    url, state = range_server(http_server, cut_after={segment_start: partial})
+    dest = str(tmp_path / "video.mp4")
+
+    assert downloader.download(f"{url}/video.mp4", dest, segments=4, trust_env=False) == SIZE
+    assert read(dest) == DATA
+
+    retried = [r for r in state["ranges"] if segment_start <= r[0] < segment_start + SEGMENT]
+    # 第一次请求整段；断开后从已收到的数据之后继续，而不是整段重下
+    assert retried[0] == (segment_start, segment_start + SEGMENT - 1)
+    assert retried[1][0] == segment_start + partial
+    assert len(retried) == 2
+
+
+def test_failed_segment_keeps_progress_for_next_download(http_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "MAX_RETRIES", 1)
+    segment_start = 2 * SEGMENT
+    partial = 24 * KB
+    url, state = range_server(http_server, cut_after={segment_start: partial}, fail_after_cut=True)
+    dest = str(tmp_path / "video.mp4")
+
+    with pytest.raises(downloader.DownloadError):
+        downloader.download(f"{url}/video.mp4", dest, segments=4, trust_env=False)
+
+    with open(f"{dest}.part.json", encoding="utf-8") as f:
+        saved = {start: (end, pos) for start, end, pos in json.load(f)["segments"]}
+    # 失败分段保留已收到的数据，其他分段已完成
+    assert saved[segment_start][1] == segment_start + partial
+    assert all(pos > end for start, (end, pos) in saved.items() if start != segment_start)
+
+    # 服务恢复后续传：只请求失败分段剩余的部分
+    state["ranges"].clear()
+    state["fail_after_cut"] = False
+    assert downloader.download(f"{url}/video.mp4", dest, segments=4, trust_env=False) == SIZE
+    assert read(dest) == DATA
+    assert state["ranges"] == [(segment_start + partial, segment_start + SEGMENT - 1)]
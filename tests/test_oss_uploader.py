@@ -0,0 +1,190 @@
+"""
+OSS 上传：对本地模拟的 OSS 服务测试流式 PUT，以及中断后通过 ListParts 继续分片上传
+"""
+
+import hashlib
+import os
+import re
+import threading
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from conftest import QuietHandler
+from utils import oss_uploader
+from utils.oss_uploader import OSSUploader
+
+KB = 1024
+
+
+def oss_server(http_server):
+    """启动模拟的 OSS 服务（公共写），返回 (Bucket 地址, 状态)"""
+    state = {
+        "objects": {},           # 对象键 -> 内容
+        "uploads": {},           # uploadId -> {分片号: (ETag, 内容)}
+        "requests": [],          # (方法, 路径, 查询参数)
+        "put_headers": [],       # 普通 PUT 的请求头
+        "fail_parts": set(),     # 这些分片号的上传返回 500
+    }
+    lock = threading.Lock()
+
+    class Handler(QuietHandler):
+        def _parse(self):
+            parts = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+            with lock:
+                state["requests"].append((self.command, parts.path, query))
+            return parts.path, query
+
+        def do_PUT(self):
+            key, query = self._parse()
+            body = self.read_body()
+            if "partNumber" in query:
+                number = int(query["partNumber"])
+                parts = state["uploads"].get(query["uploadId"])
+                if parts is None:
+                    return self.reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                if number in state["fail_parts"]:
+                    return self.reply(500, b"<Error><Code>InternalError</Code></Error>")
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                with lock:
+                    parts[number] = (etag, body)
+                return self.reply(200, headers={"ETag": etag})
+            with lock:
+                state["put_headers"].append(dict(self.headers))
+                state["objects"][key] = body
+            self.reply(200)
+
+        def do_POST(self):
+            key, query = self._parse()
+            body = self.read_body()
+            if "uploads" in query:
+                upload_id = uuid.uuid4().hex
+                state["uploads"][upload_id] = {}
+                return self.reply(200, (
+                    "<InitiateMultipartUploadResult><Key>%s</Key><UploadId>%s</UploadId>"
+                    "</InitiateMultipartUploadResult>" % (key, upload_id)
+                ).encode())
+            parts = state["uploads"].pop(query["uploadId"], None)
+            if parts is None:
+                return self.reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+            numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+            state["objects"][key] = b"".join(parts[n][1] for n in numbers)
+            self.reply(200, b"<CompleteMultipartUploadResult/>")
+
+        def do_GET(self):
+            _, query = self._parse()
+            parts = state["uploads"].get(query.get("uploadId"))
+            if parts is None:
+                return self.reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+            listed = "".join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag><Size>{len(data)}</Size></Part>"
+                for n, (etag, data) in sorted(parts.items())
+            )
+            self.reply(200, f"<ListPartsResult><IsTruncated>false</IsTruncated>{listed}</ListPartsResult>".encode())
+
+    return http_server(Handler), state
+
+
+def write_file(path, size):
+    data = os.urandom(size)
+    with open(path, "wb") as f:
+        f.write(data)
+    return data
+
+
+def object_key(bucket, url):
+    assert url.startswith(bucket + "/")
+    return url[len(bucket):]
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    """100 KB 分片，不小于 256 KB 的文件分片上传，失败不重试"""
+    monkeypatch.setattr(oss_uploader, "MULTIPART_THRESHOLD", 256 * KB)
+    monkeypatch.setattr(oss_uploader, "PART_SIZE", 100 * KB)
+    monkeypatch.setattr(oss_uploader, "PART_RETRIES", 0)
+
+
+def test_small_file_is_streamed_in_one_put(http_server, tmp_path, monkeypatch):
+    bucket, state = oss_server(http_server)
+    path = tmp_path / "scene.png"
+    data = write_file(path, 300 * KB)
+
+    reads = []
+    read = oss_uploader._StreamBody.read
+
+    def recording_read(self, n=-1):
+        chunk = read(self, n)
+        reads.append(len(chunk))
+        return chunk
+
+    monkeypatch.setattr(oss_uploader._StreamBody, "read", recording_read)
+    progress = []
+    url = OSSUploader(bucket).upload_file(str(path), prefix="images",
+                                          progress=lambda sent, total: progress.append((sent, total)))
+
+    key = object_key(bucket, url)
+    assert key.startswith("/images/") and key.endswith(".png")
+    assert state["objects"][key] == data
+    assert [r[0] for r in state["requests"]] == ["PUT"]
+    headers = state["put_headers"][0]
+    # 按 Content-Length 发送（不是 chunked），且从文件分块读取而不是整体读入内存
+    assert headers["Content-Length"] == str(len(data))
+    assert "Transfer-Encoding" not in headers
+    assert headers["Content-Type"] == "image/png"
+    assert len(reads) > 1 and max(reads) < len(data)
+    assert progress[-1] == (len(data), len(data))
+
+
+def test_upload_stream_from_iterator(http_server):
+    bucket, state = oss_server(http_server)
+    chunks = [os.urandom(10 * KB) for _ in range(7)]
+    url = OSSUploader(bucket).upload_stream(iter(chunks), 70 * KB, "videos/clip.mp4", "video/mp4")
+    assert state["objects"][object_key(bucket, url)] == b"".join(chunks)
+
+
+def test_multipart_upload_resumes_from_listed_parts(http_server, tmp_path, small_parts):
+    bucket, state = oss_server(http_server)
+    path = tmp_path / "episode.mp4"
+    data = write_file(path, 550 * KB)   # 6 个分片，最后一片 50 KB
+    uploader = OSSUploader(bucket)
+
+    state["fail_parts"] = {3}
+    with pytest.raises(RuntimeError):
+        uploader.upload_file(str(path), prefix="videos")
+    (upload_id, uploaded), = state["uploads"].items()
+    assert sorted(uploaded) == [1, 2, 4, 5, 6]
+
+    state["fail_parts"] = set()
+    state["requests"].clear()
+    url = uploader.upload_file(str(path), prefix="videos")
+
+    assert state["objects"][object_key(bucket, url)] == data
+    methods = [(method, query.get("uploadId"), query.get("partNumber")) for method, _, query in state["requests"]]
+    # 先 ListParts 查询已上传的分片，只补传缺失的分片，再合并
+    assert methods == [("GET", upload_id, None), ("PUT", upload_id, "3"), ("POST", upload_id, None)]
+    assert not os.listdir(os.path.join(oss_uploader.db_manager.app_data_dir, "oss_uploads"))
+
+
+def test_multipart_upload_restarts_when_upload_expired(http_server, tmp_path, small_parts):
+    bucket, state = oss_server(http_server)
+    path = tmp_path / "episode.mp4"
+    data = write_file(path, 550 * KB)
+    uploader = OSSUploader(bucket)
+
+    state["fail_parts"] = {6}
+    with pytest.raises(RuntimeError):
+        uploader.upload_file(str(path), prefix="videos")
+    # 服务端已清理未完成的分片上传，ListParts 返回 404
+    state["uploads"].clear()
+    state["fail_parts"] = set()
+    state["requests"].clear()
+
+    url = uploader.upload_file(str(path), prefix="videos")
+    assert state["objects"][object_key(bucket, url)] == data
+    requests_made = [(method, "uploads" in query, query.get("partNumber")) for method, _, query in state["requests"]]
+    assert requests_made[0][0] == "GET"
+    assert requests_made[1] == ("POST", True, None)
+    assert sorted(int(n) for method, _, n in requests_made if method == "PUT") == [1, 2, 3, 4, 5, 6]
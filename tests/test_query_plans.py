@@ -0,0 +1,78 @@
+"""
+任务列表、状态轮询与分镜视频刷新查询的执行计划
+在迁移到最新版本的临时数据库上对实际执行的 SQL 运行 EXPLAIN QUERY PLAN，确认使用组合索引
+"""
+
+from typing import Callable, List
+
+import pytest
+
+from database_manager import db_manager
+from utils import db_migrations
+
+
+def query_plans(call: Callable[[], object]) -> List[List[str]]:
+    """执行 call()，返回其间每条 SELECT 语句的执行计划（EXPLAIN QUERY PLAN 的 detail 列）"""
+    conn = db_manager.get_connection()
+    statements: List[str] = []
+    # 同一线程内 db_manager 复用同一个连接，跟踪回调能捕获到方法内执行的语句（参数已展开）
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    try:
+        return [
+            [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            for sql in statements
+            if sql.lstrip().upper().startswith("SELECT")
+        ]
+    finally:
+        conn.close()
+
+
+def assert_uses_index(plan: List[str], index: str, covering: bool = False):
+    using = f"USING COVERING INDEX {index}" if covering else f"INDEX {index}"
+    assert any(using in step for step in plan), plan
+    # 排序由索引完成，不需要临时排序
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+@pytest.fixture(scope="module", autouse=True)
+def migrated_database():
+    assert db_manager.get_schema_version() == db_migrations.LATEST_VERSION
+
+
+def test_tasks_page_with_status_filter():
+    plans = query_plans(lambda: db_manager.get_tasks_page(status="completed", limit=20))
+    assert len(plans) == 1
+    assert_uses_index(plans[0], "idx_tasks_status_created_at")
+
+
+def test_tasks_page_with_status_filter_and_cursor():
+    plans = query_plans(
+        lambda: db_manager.get_tasks_page(status="completed", limit=20, cursor=("2025-01-01 00:00:00", 100))
+    )
+    assert len(plans) == 1
+    assert_uses_index(plans[0], "idx_tasks_status_created_at")
+
+
+@pytest.mark.parametrize("cursor", [None, ("2025-01-01 00:00:00", 100)])
+def test_tasks_page_without_status_filter(cursor):
+    plans = query_plans(lambda: db_manager.get_tasks_page(limit=20, cursor=cursor))
+    assert len(plans) == 1
+    assert_uses_index(plans[0], "idx_tasks_created_at")
+
+
+def test_active_tasks_read_only_the_index():
+    plans = query_plans(lambda: db_manager.get_active_tasks(limit=50))
+    # 进行中、待处理各一次查询
+    assert len(plans) == 2
+    for plan in plans:
+        assert_uses_index(plan, "idx_tasks_status_created_at", covering=True)
+
+
+def test_pending_video_storyboards_read_only_the_index():
+    plans = query_plans(lambda: db_manager.get_pending_video_storyboards(1))
+    assert len(plans) == 1
+    assert_uses_index(plans[0], "idx_storyboards_episode_video_status", covering=True)
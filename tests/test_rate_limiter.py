@@ -0,0 +1,94 @@
+"""
+令牌桶在 429 暂停下的行为：对本地模拟的 API 服务并发请求，
+第一次请求返回 429（Retry-After），检查暂停期间没有请求发出、暂停结束后按限流间隔依次发出
+"""
+
+import threading
+import time
+
+import pytest
+
+from conftest import QuietHandler
+from utils import http_client, rate_limiter
+
+RATE = 10.0
+RETRY_AFTER = 1.0
+REQUESTS = 8
+# 429 响应的延迟：其余请求在此期间都已预约令牌并在等待
+RESPONSE_DELAY = 0.06
+
+
+class TooManyRequestsOnce(QuietHandler):
+    """第一次请求返回 429，之后返回 200；记录每个请求到达的时间"""
+
+    arrivals = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.arrivals.append(time.monotonic())
+            first = len(self.arrivals) == 1
+        if first:
+            time.sleep(RESPONSE_DELAY)
+            self.reply(429, b"busy", {"Retry-After": int(RETRY_AFTER)})
+        else:
+            self.reply(200, b"ok")
+
+
+@pytest.fixture
+def limited_server(http_server, monkeypatch):
+    """本地服务按 API 主机限流（'default' 类别：每秒 RATE 个，桶容量 1）"""
+    monkeypatch.setattr(rate_limiter, "LIMITED_HOSTS", {"127.0.0.1"})
+    monkeypatch.setattr(rate_limiter, "_guards", {})
+    limits = {family: dict(values) for family, values in rate_limiter.FAMILY_LIMITS.items()}
+    limits["default"] = {"rate": RATE, "burst": 1}
+    monkeypatch.setattr(rate_limiter, "FAMILY_LIMITS", limits)
+    TooManyRequestsOnce.arrivals = []
+    return http_server(TooManyRequestsOnce)
+
+
+def test_waiters_resume_after_429_without_losing_tokens(limited_server):
+    statuses = []
+
+    def call():
+        response = http_client.get(f"{limited_server}/v1/models", trust_env=False, timeout=10)
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=call) for _ in range(REQUESTS)]
+    for thread in threads:
+        thread.start()
+        # 保证第一个线程先取得令牌
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert sorted(statuses) == [200] * (REQUESTS - 1) + [429]
+    arrivals = sorted(TooManyRequestsOnce.arrivals)
+    first, rest = arrivals[0], arrivals[1:]
+
+    # 暂停期间没有请求发出
+    assert rest[0] - first >= RESPONSE_DELAY + RETRY_AFTER - 0.05
+    # 暂停结束后按限流间隔依次发出，而不是同时发出
+    gaps = [later - earlier for earlier, later in zip(rest, rest[1:])]
+    assert min(gaps) >= 0.5 / RATE, gaps
+    # 每个等待者只占用一个令牌：全部请求在 暂停 + (REQUESTS-1)/RATE 左右完成，
+    # 重复预约时会再多出约 (REQUESTS-1)/RATE
+    assert rest[-1] - first <= RESPONSE_DELAY + RETRY_AFTER + (REQUESTS - 1) / RATE + 0.25
+
+
+def test_pause_shifts_reserved_waiter_without_charging_it_again():
+    # 每 0.5 秒一个令牌，桶容量 1
+    bucket = rate_limiter.TokenBucket(2.0, 1)
+    start = time.monotonic()
+    bucket.acquire()
+
+    released = []
+    waiter = threading.Thread(target=lambda: (bucket.acquire(), released.append(time.monotonic() - start)))
+    waiter.start()
+    # 等待者已预约 0.5 秒处的令牌，此时收到 429 暂停 0.5 秒
+    time.sleep(0.02)
+    bucket.pause(0.5)
+    waiter.join(timeout=5)
+
+    # 预约时刻随暂停顺延到约 1.0 秒；重复预约时要排到约 1.5 秒
+    assert released and 0.95 <= released[0] < 1.25, released
@@ -0,0 +1,105 @@
+"""
+启动时的数据库迁移开销
+已是最新版本的数据库再次启动时只读取版本号并检查全文索引表，不执行任何建表/改表语句；
+基线版本（引入 schema_version 之前）建出的数据库能直接升级到最新版本且保留数据
+"""
+
+import os
+import sqlite3
+import time
+from typing import List
+
+import pytest
+
+from utils import db_migrations
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(__file__), "fixtures", "baseline_schema.sql")
+
+
+def connect(path) -> sqlite3.Connection:
+    # 与 db_manager 一致：自动提交模式，迁移自行管理事务
+    return sqlite3.connect(str(path), isolation_level=None)
+
+
+def traced_migrate(conn: sqlite3.Connection) -> List[str]:
+    """执行 migrate()，返回其间执行的全部语句"""
+    statements: List[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        assert db_migrations.migrate(conn) == (db_migrations.LATEST_VERSION, db_migrations.LATEST_VERSION)
+    finally:
+        conn.set_trace_callback(None)
+    return statements
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    path = tmp_path / "sora2.db"
+    conn = connect(path)
+    assert db_migrations.migrate(conn) == (0, db_migrations.LATEST_VERSION)
+    conn.close()
+    return path
+
+
+def test_startup_on_latest_schema_runs_no_ddl(migrated_db):
+    conn = connect(migrated_db)
+    try:
+        if not db_migrations.fts5_available(conn.cursor()):
+            pytest.skip("当前 SQLite 不支持 FTS5 trigram，启动时会探测补建全文索引")
+        statements = traced_migrate(conn)
+    finally:
+        conn.close()
+
+    assert len(statements) == 2, statements
+    assert statements[0] == "SELECT MAX(version) FROM schema_version"
+    assert statements[1].startswith("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'")
+    assert "fts" in statements[1]
+
+
+def test_startup_on_latest_schema_is_fast(migrated_db):
+    conn = connect(migrated_db)
+    try:
+        db_migrations.migrate(conn)
+        timings = []
+        for _ in range(20):
+            started = time.perf_counter()
+            db_migrations.migrate(conn)
+            timings.append(time.perf_counter() - started)
+    finally:
+        conn.close()
+    timings.sort()
+    # 只有两条读语句，中位数应在 1ms 量级；留足余量避免机器负载导致误报
+    assert timings[len(timings) // 2] < 0.02, timings
+
+
+def test_upgrade_database_created_by_baseline(tmp_path):
+    path = tmp_path / "sora2.db"
+    conn = connect(path)
+    with open(BASELINE_SCHEMA, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    assert db_migrations.get_schema_version(conn) == 0
+
+    try:
+        assert db_migrations.migrate(conn) == (0, db_migrations.LATEST_VERSION)
+        assert db_migrations.get_schema_version(conn) == db_migrations.LATEST_VERSION
+
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [m.version for m in db_migrations.MIGRATIONS]
+
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_tasks_status_created_at", "idx_storyboards_episode_video_status"} <= indexes
+
+        # 原有数据保留，已有配置不被默认值覆盖，缺失的默认配置被补齐
+        assert conn.execute("SELECT value FROM config WHERE key = 'api_key'").fetchone() == ("sk-baseline",)
+        assert conn.execute("SELECT COUNT(*) FROM config").fetchone()[0] == len(db_migrations.DEFAULT_CONFIGS)
+        assert [row[0] for row in conn.execute("SELECT task_id FROM tasks ORDER BY id")] == ["task-done", "task-running"]
+        assert conn.execute("SELECT front_image FROM characters WHERE name = '主角'").fetchone() == ("/images/hero.png",)
+        assert conn.execute("SELECT storyboard_detail FROM storyboards").fetchone() == ("主角走进雨中的街道",)
+
+        if db_migrations.fts5_available(conn.cursor()):
+            # 全文索引包含升级前已有的数据
+            assert conn.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH '海边日落'").fetchall() == [(1,)]
+            # 升级后再次启动不再执行迁移
+            assert len(traced_migrate(conn)) == 2
+    finally:
+        conn.close()
@@ -2,7 +2,7 @@
 AI编剧线程 - 用于分析剧集文件生成分镜脚本
 """
 
-import requests
+from utils import http_client
 import json
 import re
 from pathlib import Path
@@ -102,7 +102,7 @@ class AIScriptThread(QThread):
                         }
                     ]
                 }
-                response = requests.post(
+                response = http_client.post(
                     url,
                     json=payload,
                     headers=headers,
@@ -128,7 +128,7 @@ class AIScriptThread(QThread):
                     ],
                     "max_tokens": 4000
                 }
-                response = requests.post(url, json=payload, headers=headers, timeout=300)
+                response = http_client.post(url, json=payload, headers=headers, timeout=300)
             
             if response.status_code != 200:
                 self.error.emit(f"API调用失败: {response.status_code} - {response.text[:200]}")
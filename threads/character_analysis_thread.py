@@ -2,13 +2,13 @@
 角色分析线程 - 用于分析小说内容提取角色信息
 """
 
-import requests
+from utils import http_client
 import json
-import sqlite3
 from pathlib import Path
 from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
 from database_manager import db_manager
+from repositories import character_repo, project_repo
 from constants import API_BASE_URL, API_CHAT_COMPLETIONS_URL
 
 
@@ -107,7 +107,7 @@ class CharacterAnalysisThread(QThread):
                         }
                     ]
                 }
-                response = requests.post(
+                response = http_client.post(
                     url,
                     json=payload,
                     headers=headers,
@@ -133,7 +133,7 @@ class CharacterAnalysisThread(QThread):
                     ],
                     "max_tokens": 2000
                 }
-                response = requests.post(url, json=payload, headers=headers, timeout=180)
+                response = http_client.post(url, json=payload, headers=headers, timeout=180)
             
             if response.status_code != 200:
                 self.error.emit(f"API调用失败: {response.status_code} - {response.text[:200]}")
@@ -156,30 +156,14 @@ class CharacterAnalysisThread(QThread):
 
     def get_project_data(self):
         """获取项目数据"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT novel_file_path, novel_folder_path
-                FROM projects
-                WHERE id = ?
-            ''', (self.project_id,))
-            project = cursor.fetchone()
-            conn.close()
-            
-            if project:
-                return {
-                    'novel_file_path': project[0] if project[0] else '',
-                    'novel_folder_path': project[1] if project[1] else ''
-                }
-            else:
-                logger.error(f"项目ID {self.project_id} 不存在于数据库中")
-                return None
-        except Exception as e:
-            logger.error(f"获取项目数据失败: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return None
+        project = project_repo.get(self.project_id)
+        if project:
+            return {
+                'novel_file_path': project.novel_file_path or '',
+                'novel_folder_path': project.novel_folder_path or ''
+            }
+        logger.error(f"项目ID {self.project_id} 不存在于数据库中")
+        return None
 
     def read_novel_file(self, project_data):
         """读取小说文件内容"""
@@ -292,40 +276,18 @@ class CharacterAnalysisThread(QThread):
     def save_characters(self, characters):
         """保存角色到数据库"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            
+            items = []
             for char in characters:
                 name = char.get('name', '').strip()
                 description = char.get('description', '').strip()
                 
                 if not name:
                     continue
-                
-                # 检查角色是否已存在
-                cursor.execute('''
-                    SELECT id FROM characters
-                    WHERE project_id = ? AND name = ?
-                ''', (self.project_id, name))
-                
-                if cursor.fetchone():
-                    # 更新现有角色
-                    cursor.execute('''
-                        UPDATE characters
-                        SET description = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE project_id = ? AND name = ?
-                    ''', (description, self.project_id, name))
-                else:
-                    # 插入新角色
-                    cursor.execute('''
-                        INSERT INTO characters (project_id, name, description)
-                        VALUES (?, ?, ?)
-                    ''', (self.project_id, name, description))
+                items.append((name, description))
             
-            conn.commit()
-            conn.close()
+            # 已存在的同名角色更新描述，其余新增
+            character_repo.upsert_descriptions(self.project_id, items)
             
         except Exception as e:
             logger.error(f"保存角色失败: {e}")
             raise
-
@@ -2,14 +2,19 @@
 角色图片生成线程
 """
 
-import requests
+from utils import http_client
 import json
-import sqlite3
+import shutil
 from pathlib import Path
 from PyQt5.QtCore import QThread, pyqtSignal
 from database_manager import db_manager
+from repositories import character_repo, project_repo
 from constants import API_BASE_URL
 from loguru import logger
+from utils.image_gen_cache import cache_key, image_gen_cache
+
+# 请求参数中的画面比例（提示词中另有 9:16 的要求）
+ASPECT_RATIO = "16:9"
 
 
 class CharacterImageGenerationThread(QThread):
@@ -19,10 +24,12 @@ class CharacterImageGenerationThread(QThread):
     finished = pyqtSignal(str)  # 完成信号，参数为图片路径
     error = pyqtSignal(str)  # 错误信号
     
-    def __init__(self, character_id, project_id, parent=None):
+    def __init__(self, character_id, project_id, parent=None, force_regenerate=False):
         super().__init__(parent)
         self.character_id = character_id
         self.project_id = project_id
+        # 为 True 时不使用生成图片缓存，总是调用模型重新生成
+        self.force_regenerate = force_regenerate
         
     def run(self):
         """执行生成任务"""
@@ -38,8 +45,8 @@ class CharacterImageGenerationThread(QThread):
             if not character_data:
                 raise RuntimeError("无法获取角色信息")
             
-            character_name = character_data[0]
-            character_description = character_data[1] or ""
+            character_name = character_data.name
+            character_description = character_data.description or ""
             
             # 2. 获取项目信息（获取风格）
             if self.isInterruptionRequested():
@@ -49,7 +56,7 @@ class CharacterImageGenerationThread(QThread):
             if not project_data:
                 raise RuntimeError("无法获取项目信息")
             
-            style = project_data[0] or ""
+            style = project_data.style or ""
             
             # 3. 获取生图模型
             if self.isInterruptionRequested():
@@ -62,20 +69,28 @@ class CharacterImageGenerationThread(QThread):
             self.progress.emit("正在构建生成提示词...")
             prompt = self.build_prompt(character_name, character_description, style)
             
-            # 5. 调用API生成图片
+            # 5. 调用API生成图片（开启生成图片缓存时，相同参数直接复用之前生成的图片）
             if self.isInterruptionRequested():
                 return
-            self.progress.emit("正在调用AI生成图片...")
-            image_url = self.generate_image(prompt, image_model)
-            
-            if not image_url:
-                raise RuntimeError("图片生成失败，未返回图片URL")
-            
-            # 6. 下载图片
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("正在下载生成的图片...")
-            image_path = self.download_image(image_url, character_id=self.character_id)
+            key = cache_key(image_model, prompt, ASPECT_RATIO)
+            cached = None if self.force_regenerate else image_gen_cache.lookup(key)
+            if cached:
+                logger.info(f"角色ID {self.character_id} 使用缓存的角色图: {cached}")
+                self.progress.emit("使用缓存的角色图...")
+                image_path = self.copy_cached_image(cached)
+            else:
+                self.progress.emit("正在调用AI生成图片...")
+                image_url = self.generate_image(prompt, image_model)
+                
+                if not image_url:
+                    raise RuntimeError("图片生成失败，未返回图片URL")
+                
+                # 6. 下载图片
+                if self.isInterruptionRequested():
+                    return
+                self.progress.emit("正在下载生成的图片...")
+                image_path = self.download_image(image_url, character_id=self.character_id)
+                image_gen_cache.store(key, image_path, image_model, ASPECT_RATIO)
             
             # 7. 更新数据库
             if self.isInterruptionRequested():
@@ -104,38 +119,12 @@ class CharacterImageGenerationThread(QThread):
     
     def get_character_data(self):
         """获取角色数据"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT name, description
-                FROM characters
-                WHERE id = ?
-            ''', (self.character_id,))
-            result = cursor.fetchone()
-            conn.close()
-            return result
-        except Exception as e:
-            logger.error(f"获取角色数据失败: {e}")
-            return None
-    
+        return character_repo.get(self.character_id)
+
     def get_project_data(self):
         """获取项目数据"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT style
-                FROM projects
-                WHERE id = ?
-            ''', (self.project_id,))
-            result = cursor.fetchone()
-            conn.close()
-            return result
-        except Exception as e:
-            logger.error(f"获取项目数据失败: {e}")
-            return None
-    
+        return project_repo.get(self.project_id)
+
     def build_prompt(self, character_name, character_description, style):
         """构建生成提示词"""
         # 构建详细的提示词，要求生成9:16比例的图片，只包含正面视图
@@ -179,7 +168,7 @@ class CharacterImageGenerationThread(QThread):
                     }
                 ],
                 "generationConfig": {
-                    "aspectRatio": "16:9",
+                    "aspectRatio": ASPECT_RATIO,
                     "safetySettings": [
                         {
                             "category": "HARM_CATEGORY_HATE_SPEECH",
@@ -205,7 +194,7 @@ class CharacterImageGenerationThread(QThread):
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(url, params=params, json=payload, headers=headers, timeout=300)
+            response = http_client.post(url, params=params, json=payload, headers=headers, timeout=300)
             
             if response.status_code != 200:
                 raise RuntimeError(f"API调用失败: {response.status_code} - {response.text}")
@@ -272,6 +261,17 @@ class CharacterImageGenerationThread(QThread):
         
         return str(temp_path)
     
+    def copy_cached_image(self, cached_path):
+        """把缓存的图片复制为本角色的图片（缓存文件可能被淘汰，不能直接引用）"""
+        from datetime import datetime
+        images_dir = Path(db_manager.app_data_dir) / "character_images"
+        images_dir.mkdir(parents=True, exist_ok=True)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        image_path = images_dir / f"character_{self.character_id}_{timestamp}{Path(cached_path).suffix or '.png'}"
+        shutil.copyfile(cached_path, image_path)
+        return str(image_path)
+    
     def download_image(self, image_url, character_id):
         """下载图片"""
         # 如果已经是本地路径，直接返回
@@ -279,7 +279,7 @@ class CharacterImageGenerationThread(QThread):
             return image_url
         
         # 下载图片
-        response = requests.get(image_url, timeout=300)
+        response = http_client.get(image_url, timeout=300)
         if response.status_code != 200:
             raise RuntimeError(f"下载图片失败: {response.status_code}")
         
@@ -298,20 +298,6 @@ class CharacterImageGenerationThread(QThread):
     
     def update_character_images(self, image_path):
         """更新角色图片信息"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            
-            # 更新正面图（使用生成的图片）
-            cursor.execute('''
-                UPDATE characters
-                SET front_image = ?
-                WHERE id = ?
-            ''', (image_path, self.character_id))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"更新角色图片失败: {e}")
-            raise
-
+        # 更新正面图（使用生成的图片）
+        if not character_repo.update(self.character_id, front_image=image_path):
+            raise RuntimeError("更新角色图片失败")
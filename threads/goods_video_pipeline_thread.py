@@ -12,7 +12,7 @@
 
 import re
 import json
-import requests
+from utils import http_client
 from typing import Dict, Any, Optional, List
 from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
@@ -20,7 +20,8 @@ from loguru import logger
 from utils.nanobanana_util import upload_image_to_bed, call_nano_banana_image_generation
 from constants import API_BASE_URL, API_CHAT_COMPLETIONS_URL
 from database_manager import db_manager
-from sora_client import SoraClient
+from sora_client import get_sora_client
+from threads.status_poll_scheduler import status_poll_scheduler
 
 
 def _extract_image_url_from_chat_response(resp: Dict[str, Any]) -> Optional[str]:
@@ -192,7 +193,7 @@ class GoodsVideoPipelineThread(QThread):
                 "messages": messages,
             }
 
-            resp = requests.post(url, json=payload, headers=headers, timeout=60)
+            resp = http_client.post(url, json=payload, headers=headers, timeout=60)
             if resp.status_code != 200:
                 raise RuntimeError(f"生成提示词失败: {resp.status_code} - {resp.text}")
             j = resp.json()
@@ -234,7 +235,7 @@ class GoodsVideoPipelineThread(QThread):
 
             # 创建视频生成任务（Sora2），竖屏15秒，使用白底图
             self._emit("创建视频生成任务…")
-            client = SoraClient(base_url=base_url, api_key=api_key)
+            client = get_sora_client(api_key, base_url=base_url)
             result = client.create_sora2_video(
                 prompt=video_prompt,
                 model="sora-2",
@@ -268,6 +269,7 @@ class GoodsVideoPipelineThread(QThread):
             }
             db_manager.add_task(task_data)
             self._log_info(f"tasks 记录已写入，task_id={task_id}")
+            status_poll_scheduler.watch_task(str(task_id))
 
             self._emit("流水线完成")
             self._log_info("流水线完成")
@@ -9,12 +9,13 @@
 """
 
 from pathlib import Path
-import requests
 from requests.exceptions import ProxyError, ConnectionError
 from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
 from database_manager import db_manager
 from constants import API_BASE_URL
+from utils import http_client
+from utils.upload_cache import files_target, files_ttl, upload_cache
 
 class ImageUploadThread(QThread):
     """图片上传线程 - 通过 BASE_URL/v1/files 上传"""
@@ -56,6 +57,13 @@ class ImageUploadThread(QThread):
             endpoint = f"{base_url.rstrip('/')}/v1/files"
 
             logger.info(f"endpoint: {endpoint}")
+
+            # 同一图片已上传过时直接复用 URL
+            cached_url = upload_cache.lookup_file(self.file_path, files_target(endpoint))
+            if cached_url:
+                logger.info(f"上传缓存命中，跳过上传: {self.file_path} -> {cached_url}")
+                self.finished.emit(True, "图片上传成功", cached_url)
+                return
             logger.info(f"api_key: {api_key}")
 
             suffix = p.suffix or '.jpg'
@@ -75,34 +83,25 @@ class ImageUploadThread(QThread):
             self.progress.emit(f"正在上传图片到文件服务: {p.name}")
             logger.info(f"开始上传图片: path={self.file_path} endpoint={endpoint} ct={content_type}")
 
-            # 使用独立会话且禁用系统代理，避免 127.0.0.1:7890 等代理导致连接失败
-            session = requests.Session()
-            session.trust_env = False
+            # 使用共享的直连会话（禁用系统代理），避免 127.0.0.1:7890 等代理导致连接失败
             try:
-                resp = session.post(
+                resp = http_client.post(
                     endpoint,
                     files=files,
                     headers=headers,
                     timeout=180,
-                    proxies={"http": None, "https": None}
+                    trust_env=False
                 )
             except (ProxyError, ConnectionError) as e:
                 logger.warning(f"首次上传因代理/网络异常失败，将在禁用代理下重试: {e}")
-                try:
-                    resp = requests.post(
-                        endpoint,
-                        files=files,
-                        headers=headers,
-                        timeout=180,
-                        proxies={"http": None, "https": None}
-                    )
-                except Exception as e2:
-                    raise e2
-            finally:
-                try:
-                    session.close()
-                except Exception:
-                    pass
+                f.seek(0)
+                resp = http_client.post(
+                    endpoint,
+                    files=files,
+                    headers=headers,
+                    timeout=180,
+                    trust_env=False
+                )
             logger.info(f"文件服务上传完成，状态码: {resp.status_code}")
             try:
                 f.close()
@@ -131,6 +130,7 @@ class ImageUploadThread(QThread):
 
                 if image_url:
                     logger.info(f"图片上传成功，URL: {image_url}")
+                    upload_cache.store_file(self.file_path, files_target(endpoint), image_url, files_ttl())
                     self.finished.emit(True, "图片上传成功", image_url)
                 else:
                     msg = "上传成功但响应未提供可访问URL"
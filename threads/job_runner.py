@@ -0,0 +1,236 @@
+"""
+流水线任务执行器
+从持久化任务队列（utils.job_queue）按阶段领取任务，交给全局任务执行器（utils.task_executor）执行；
+同时执行的任务数不超过该阶段的并发上限，也与界面发起的同类操作共用资源上限；有空闲位置时立即补充，吞吐平稳
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from loguru import logger
+
+from utils.job_queue import Job, JobAbort, JobDeferred, JobQueue, JobWaiting, job_queue
+from utils.task_executor import PRIORITY_LOW, RESOURCE_DEFAULT, TaskExecutor, task_executor
+
+
+# 没有可执行任务时，检查到期任务（重试、延迟执行）的间隔（秒）
+IDLE_INTERVAL = 1.0
+# 统计吞吐量的时间窗口（秒）
+THROUGHPUT_WINDOW = 600
+
+
+class StageSpec:
+    """一个阶段的处理函数与执行参数"""
+
+    __slots__ = ('name', 'handler', 'concurrency', 'lease_seconds', 'retry_delay', 'resource', 'running',
+                 'completed_at', 'busy_since')
+
+    def __init__(self, name: str, handler: Callable[[Job], Optional[Dict[str, Any]]],
+                 concurrency: int, lease_seconds: float, retry_delay: float, resource: str):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, int(concurrency))
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.resource = resource
+        self.running: Dict[int, Job] = {}
+        # 最近完成的任务的完成时间（time.monotonic），用于统计吞吐量
+        self.completed_at: Deque[float] = deque()
+        # 本轮开始执行的时间（空闲后领取第一个任务时记录）
+        self.busy_since = 0.0
+
+
+class JobRunner(QObject):
+    """
+    流水线任务执行器
+
+    处理函数在工作线程中调用，参数为 Job，返回结果字典（传给依赖它的任务）。
+    可抛出 JobDeferred（稍后再执行）、JobWaiting（交给外部，等待通知）、
+    JobAbort（不再重试）；其他异常按阶段的 retry_delay 重试，直至达到最多执行次数。
+    """
+
+    job_succeeded = pyqtSignal(int, str, dict, dict)   # job_id, stage, payload, result
+    job_failed = pyqtSignal(int, str, dict, str)       # job_id, stage, payload, 错误信息（不再重试）
+
+    def __init__(self, queue: JobQueue = job_queue, executor: TaskExecutor = task_executor, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+        self.executor = executor
+        self._stages: Dict[str, StageSpec] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._last_renew = 0.0
+
+    def register(
+        self,
+        stage: str,
+        handler: Callable[[Job], Optional[Dict[str, Any]]],
+        concurrency: int = 2,
+        lease_seconds: float = 600,
+        retry_delay: float = 30,
+        resource: str = RESOURCE_DEFAULT,
+    ):
+        """
+        注册阶段处理函数（在 start 之前调用）
+
+        Args:
+            stage: 阶段名
+            handler: 处理函数
+            concurrency: 同时执行的任务数上限
+            lease_seconds: 租约时长；执行中的任务定期续约，进程异常退出后租约过期即可被重新领取
+            retry_delay: 失败后重试前的等待时间（秒）
+            resource: 任务执行器中的资源类别，与界面发起的同类操作共用并发上限
+        """
+        with self._cond:
+            self._stages[stage] = StageSpec(stage, handler, concurrency, lease_seconds, retry_delay, resource)
+
+    def enqueue(self, stage: str, payload: Optional[Dict[str, Any]] = None, **kwargs) -> Tuple[Optional[int], bool]:
+        """添加任务并唤醒调度线程，参数与返回值同 JobQueue.enqueue"""
+        result = self.queue.enqueue(stage, payload, **kwargs)
+        if result[1]:
+            self.wake()
+        return result
+
+    def wake(self):
+        """有新任务或任务状态变化时唤醒调度线程"""
+        with self._cond:
+            self._cond.notify()
+
+    def start(self):
+        """恢复上次未完成的任务并开始执行"""
+        with self._cond:
+            if self._thread is not None or self._stopped:
+                return
+        self.queue.recover()
+        with self._cond:
+            self._thread = threading.Thread(target=self._dispatch_loop, name="job-runner", daemon=True)
+            self._thread.start()
+        logger.info(f"流水线任务执行器已启动: {', '.join(f'{s.name}x{s.concurrency}' for s in self._stages.values())}")
+
+    def stop(self):
+        """停止领取新任务（执行中的任务在后台结束，未结束的任务下次启动时恢复）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def set_concurrency(self, stage: str, concurrency: int):
+        """修改阶段的并发上限（立即生效；已在执行的任务超出新上限时执行完为止）"""
+        with self._cond:
+            spec = self._stages.get(stage)
+            if spec is None:
+                return
+            spec.concurrency = max(1, int(concurrency))
+            self._cond.notify()
+        logger.info(f"流水线阶段 {stage} 并发上限调整为 {spec.concurrency}")
+
+    def concurrency(self, stage: str) -> int:
+        with self._cond:
+            spec = self._stages.get(stage)
+            return spec.concurrency if spec else 0
+
+    def throughput(self, stage: str) -> float:
+        """阶段最近 THROUGHPUT_WINDOW 秒内（从本轮开始执行算起）完成的任务数折合每分钟"""
+        now = time.monotonic()
+        with self._cond:
+            spec = self._stages.get(stage)
+            if spec is None:
+                return 0.0
+            self._trim_completed(spec, now)
+            if not spec.completed_at:
+                return 0.0
+            elapsed = now - max(now - THROUGHPUT_WINDOW, spec.busy_since)
+            return len(spec.completed_at) / elapsed * 60 if elapsed > 0 else 0.0
+
+    @staticmethod
+    def _trim_completed(spec: StageSpec, now: float):
+        while spec.completed_at and spec.completed_at[0] < now - THROUGHPUT_WINDOW:
+            spec.completed_at.popleft()
+
+    def running_count(self) -> int:
+        """执行中的任务数"""
+        with self._cond:
+            return sum(len(spec.running) for spec in self._stages.values())
+
+    # ---------------- 调度 ----------------
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                wants = {
+                    spec.name: spec.concurrency - len(spec.running)
+                    for spec in self._stages.values()
+                }
+            claimed = 0
+            for name, free in wants.items():
+                if free <= 0:
+                    continue
+                spec = self._stages[name]
+                for job in self.queue.claim(name, free, spec.lease_seconds):
+                    with self._cond:
+                        if self._stopped:
+                            return
+                        if not spec.running:
+                            self._trim_completed(spec, time.monotonic())
+                            if not spec.completed_at:
+                                spec.busy_since = time.monotonic()
+                        spec.running[job.id] = job
+                    self.executor.submit_call(self._run, spec, job, resource=spec.resource, priority=PRIORITY_LOW)
+                    claimed += 1
+            self._renew_leases()
+            if claimed:
+                continue
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(IDLE_INTERVAL)
+
+    def _renew_leases(self):
+        now = time.monotonic()
+        with self._cond:
+            specs = [(spec.lease_seconds, list(spec.running)) for spec in self._stages.values() if spec.running]
+        if not specs or now - self._last_renew < min(lease for lease, _ in specs) / 3:
+            return
+        self._last_renew = now
+        for lease_seconds, job_ids in specs:
+            self.queue.renew(job_ids, lease_seconds)
+
+    def _run(self, spec: StageSpec, job: Job):
+        if self._stopped:
+            # 已停止时尚在执行器中排队的任务不再执行，保持执行中状态，下次启动时恢复
+            with self._cond:
+                spec.running.pop(job.id, None)
+            return
+        try:
+            result = spec.handler(job) or {}
+        except JobDeferred as e:
+            self.queue.defer(job.id, e.delay)
+        except JobWaiting:
+            self.queue.wait(job.id)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            retry_delay = None if isinstance(e, JobAbort) else spec.retry_delay * job.attempts
+            if self.queue.fail(job.id, error, retry_delay):
+                logger.warning(f"流水线任务失败，将重试 ({job}, 第 {job.attempts} 次): {error}")
+            else:
+                logger.error(f"流水线任务失败 ({job}): {error}")
+                self.job_failed.emit(job.id, spec.name, job.payload, error)
+        else:
+            if self.queue.complete(job.id, result):
+                with self._cond:
+                    spec.completed_at.append(time.monotonic())
+                    self._trim_completed(spec, spec.completed_at[-1])
+                self.job_succeeded.emit(job.id, spec.name, job.payload, result)
+        finally:
+            with self._cond:
+                spec.running.pop(job.id, None)
+                # 空出位置后立即领取下一个任务
+                self._cond.notify()
+
+
+# 全局流水线任务执行器
+job_runner = JobRunner()
@@ -2,7 +2,7 @@
 网络图片加载线程
 """
 
-import requests
+from utils import http_client
 from io import BytesIO
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QPixmap
@@ -31,8 +31,8 @@ class NetworkImageLoader(QThread):
         while self.load_queue:
             image_url = self.load_queue.pop(0)
             try:
-                # 使用requests下载图片
-                response = requests.get(image_url, timeout=10)
+                # 通过共享连接池下载图片
+                response = http_client.get(image_url, timeout=10)
                 if response.status_code == 200:
                     # 从字节数据创建QPixmap
                     image_data = BytesIO(response.content)
@@ -2,7 +2,7 @@
 小说分析线程 - 用于分析小说内容生成简介
 """
 
-import requests
+from utils import http_client
 from pathlib import Path
 from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
@@ -80,7 +80,7 @@ class NovelAnalysisThread(QThread):
                     ]
                 }
                 # Gemini使用query参数传递key
-                response = requests.post(
+                response = http_client.post(
                     url,
                     json={"contents": payload["contents"]},
                     headers=headers,
@@ -106,7 +106,7 @@ class NovelAnalysisThread(QThread):
                     ],
                     "max_tokens": 500
                 }
-                response = requests.post(url, json=payload, headers=headers, timeout=120)
+                response = http_client.post(url, json=payload, headers=headers, timeout=120)
             
             if response.status_code != 200:
                 self.error.emit(f"API调用失败: {response.status_code} - {response.text[:200]}")
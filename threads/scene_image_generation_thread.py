@@ -2,145 +2,122 @@
 场景图生成线程
 """
 
-import requests
+from utils import http_client
 import json
-import sqlite3
 import base64
+import shutil
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Optional
 from PyQt5.QtCore import QThread, pyqtSignal
 from database_manager import db_manager
+from repositories import project_repo, storyboard_repo
 from constants import API_BASE_URL
 from loguru import logger
+from utils.image_gen_cache import cache_key, image_gen_cache
 
+# 场景图的画面比例
+ASPECT_RATIO = "16:9"
 
-class SceneImageGenerationThread(QThread):
-    """场景图生成线程"""
+
+class NoScreenContentError(RuntimeError):
+    """分镜没有画面内容，无法生成场景图（重试也不会成功）"""
+
+
+def generate_scene_image(
+    storyboard_id: int,
+    project_id: int,
+    force_regenerate: bool = False,
+    progress: Optional[Callable[[str], None]] = None,
+    interrupted: Optional[Callable[[], bool]] = None,
+) -> Optional[str]:
+    """
+    生成场景图并保存到分镜（在调用线程中执行，供 SceneImageGenerationThread 与流水线任务使用）
+
+    Args:
+        storyboard_id: 分镜ID
+        project_id: 项目ID（获取风格）
+        force_regenerate: 为 True 时不使用生成图片缓存，总是调用模型重新生成
+        progress: 进度回调，参数为进度文本
+        interrupted: 返回 True 时在下一步之前停止
+
+    Returns:
+        图片路径；被中断时返回 None
+
+    Raises:
+        NoScreenContentError: 分镜没有画面内容
+        RuntimeError: 生成或保存失败
+    """
+    progress = progress or (lambda message: None)
+    interrupted = interrupted or (lambda: False)
+
+    # 1. 获取分镜信息
+    if interrupted():
+        return None
+    progress("正在获取分镜信息...")
+    storyboard_data = storyboard_repo.get(storyboard_id)
+    if not storyboard_data:
+        raise RuntimeError("无法获取分镜信息")
     
-    progress = pyqtSignal(str)  # 进度信号
-    finished = pyqtSignal(int, str)  # 完成信号，参数为(storyboard_id, 图片路径)
-    error = pyqtSignal(int, str)  # 错误信号，参数为(storyboard_id, 错误信息)
+    screen_content = storyboard_data.screen_content if storyboard_data.screen_content is not None else ""
+    # 去除空白字符后检查
+    screen_content = screen_content.strip() if screen_content else ""
+    logger.info(f"分镜ID {storyboard_id} 的画面内容: {screen_content[:100] if screen_content else '(空)'}")
     
-    def __init__(self, storyboard_id, project_id, parent=None):
-        super().__init__(parent)
-        self.storyboard_id = storyboard_id
-        self.project_id = project_id
-        
-    def run(self):
-        """执行生成任务"""
-        try:
-            # 检查是否被请求中断
-            if self.isInterruptionRequested():
-                return
-            
-            # 1. 获取分镜信息
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("正在获取分镜信息...")
-            storyboard_data = self.get_storyboard_data()
-            if not storyboard_data:
-                raise RuntimeError("无法获取分镜信息")
-            
-            screen_content = storyboard_data[0] if storyboard_data[0] is not None else ""
-            # 去除空白字符后检查
-            screen_content = screen_content.strip() if screen_content else ""
-            logger.info(f"分镜ID {self.storyboard_id} 的画面内容: {screen_content[:100] if screen_content else '(空)'}")
-            
-            if not screen_content:
-                raise RuntimeError("分镜详情中没有画面内容")
-            
-            # 2. 获取项目信息（获取风格）
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("正在获取项目信息...")
-            project_data = self.get_project_data()
-            if not project_data:
-                raise RuntimeError("无法获取项目信息")
-            
-            style = project_data[0] or ""
-            
-            # 3. 获取生图模型
-            if self.isInterruptionRequested():
-                return
-            image_model = db_manager.load_config('image_model', 'gemini-3-pro-image-preview')
-            
-            # 4. 构建提示词
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("正在构建生成提示词...")
-            prompt = self.build_prompt(screen_content, style)
-            
-            # 5. 调用API生成图片
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("正在调用AI生成图片...")
-            image_path = self.generate_image(prompt, image_model)
-            
-            if not image_path:
-                raise RuntimeError("图片生成失败，未返回图片路径")
-            
-            # 6. 更新数据库
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("正在保存图片信息...")
-            self.update_storyboard_image(image_path)
-            
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit("生成完成")
-            self.finished.emit(self.storyboard_id, image_path)
-            
-        except Exception as e:
-            # 如果是因为中断请求导致的，不发送错误信号
-            if self.isInterruptionRequested():
-                logger.info("生成任务被用户中断")
-                return
-            error_msg = f"生成场景图失败: {str(e)}"
-            logger.error(error_msg)
-            try:
-                self.error.emit(self.storyboard_id, error_msg)
-            except RuntimeError:
-                # 如果接收者不存在，忽略错误
-                pass
+    if not screen_content:
+        raise NoScreenContentError("分镜详情中没有画面内容")
     
-    def get_storyboard_data(self):
-        """获取分镜数据"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT screen_content
-                FROM storyboards
-                WHERE id = ?
-            ''', (self.storyboard_id,))
-            result = cursor.fetchone()
-            conn.close()
-            return result
-        except Exception as e:
-            logger.error(f"获取分镜数据失败: {e}")
-            return None
+    # 2. 获取项目信息（获取风格）
+    if interrupted():
+        return None
+    progress("正在获取项目信息...")
+    project_data = project_repo.get(project_id)
+    if not project_data:
+        raise RuntimeError("无法获取项目信息")
     
-    def get_project_data(self):
-        """获取项目数据"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT style
-                FROM projects
-                WHERE id = ?
-            ''', (self.project_id,))
-            result = cursor.fetchone()
-            conn.close()
-            return result
-        except Exception as e:
-            logger.error(f"获取项目数据失败: {e}")
-            return None
+    style = project_data.style or ""
+    
+    # 3. 获取生图模型
+    if interrupted():
+        return None
+    image_model = db_manager.load_config('image_model', 'gemini-3-pro-image-preview')
+    
+    # 4. 构建提示词
+    if interrupted():
+        return None
+    progress("正在构建生成提示词...")
+    prompt = build_prompt(screen_content, style)
+    
+    # 5. 调用API生成图片（开启生成图片缓存时，相同参数直接复用之前生成的图片）
+    if interrupted():
+        return None
+    key = cache_key(image_model, prompt, ASPECT_RATIO)
+    cached = None if force_regenerate else image_gen_cache.lookup(key)
+    if cached:
+        logger.info(f"分镜ID {storyboard_id} 使用缓存的场景图: {cached}")
+        progress("使用缓存的场景图...")
+        image_path = copy_cached_image(storyboard_id, cached)
+    else:
+        progress("正在调用AI生成图片...")
+        image_path = generate_image(storyboard_id, prompt, image_model)
+        image_gen_cache.store(key, image_path, image_model, ASPECT_RATIO)
+    
+    if not image_path:
+        raise RuntimeError("图片生成失败，未返回图片路径")
     
-    def build_prompt(self, screen_content, style):
-        """构建生成提示词"""
-        # 构建详细的提示词，要求生成16:9比例的纯场景图片，不能出现人物
-        prompt = f"""请根据以下画面内容生成一张16:9比例的纯场景图片：
+    # 6. 更新数据库
+    if interrupted():
+        return None
+    progress("正在保存图片信息...")
+    if not storyboard_repo.update(storyboard_id, thumbnail_path=image_path):
+        raise RuntimeError("更新分镜场景图失败")
+    return image_path
+
+
+def build_prompt(screen_content, style):
+    """构建生成提示词"""
+    # 构建详细的提示词，要求生成16:9比例的纯场景图片，不能出现人物
+    prompt = f"""请根据以下画面内容生成一张16:9比例的纯场景图片：
 
 画面内容：{screen_content}
 
@@ -153,160 +130,194 @@ class SceneImageGenerationThread(QThread):
 - 风格要与项目风格一致：{style if style else "写实风格"}
 - 图片中不能有任何文字、水印、标签、标识等元素
 - 场景要美观、有氛围感，适合作为视频背景"""
-        
-        return prompt
     
-    def generate_image(self, prompt, model):
-        """调用API生成图片"""
-        api_key = db_manager.load_config('api_key', '')
-        if not api_key:
-            raise RuntimeError("未配置API Key，请在设置中配置")
+    return prompt
+
+
+def generate_image(storyboard_id, prompt, model):
+    """调用API生成图片"""
+    api_key = db_manager.load_config('api_key', '')
+    if not api_key:
+        raise RuntimeError("未配置API Key，请在设置中配置")
+    
+    # 根据模型选择不同的API端点
+    if model in ['gemini-3-pro-image-preview', 'gemini-2.5-flash-image-preview']:
+        # 使用Gemini原生API
+        url = f"{API_BASE_URL}/v1beta/models/{model}:generateContent"
+        params = {"key": api_key}
         
-        # 根据模型选择不同的API端点
-        if model in ['gemini-3-pro-image-preview', 'gemini-2.5-flash-image-preview']:
-            # 使用Gemini原生API
-            url = f"{API_BASE_URL}/v1beta/models/{model}:generateContent"
-            params = {"key": api_key}
-            
-            payload = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "aspectRatio": "16:9",
-                    "safetySettings": [
+        payload = {
+            "contents": [
+                {
+                    "parts": [
                         {
-                            "category": "HARM_CATEGORY_HATE_SPEECH",
-                            "threshold": "BLOCK_NONE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_HARASSMENT",
-                            "threshold": "BLOCK_NONE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                            "threshold": "BLOCK_NONE"
-                        },
-                        {
-                            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                            "threshold": "BLOCK_NONE"
+                            "text": prompt
                         }
                     ]
                 }
+            ],
+            "generationConfig": {
+                "aspectRatio": ASPECT_RATIO,
+                "safetySettings": [
+                    {
+                        "category": "HARM_CATEGORY_HATE_SPEECH",
+                        "threshold": "BLOCK_NONE"
+                    },
+                    {
+                        "category": "HARM_CATEGORY_HARASSMENT",
+                        "threshold": "BLOCK_NONE"
+                    },
+                    {
+                        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                        "threshold": "BLOCK_NONE"
+                    },
+                    {
+                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+                        "threshold": "BLOCK_NONE"
+                    }
+                ]
             }
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(url, params=params, json=payload, headers=headers, timeout=300)
-            
-            if response.status_code != 200:
-                raise RuntimeError(f"API调用失败: {response.status_code} - {response.text}")
-            
-            result = response.json()
-            logger.info(f"API返回结果: {json.dumps(result, ensure_ascii=False, indent=2)[:500]}")
-            
-            # 解析返回的图片数据
-            if "candidates" in result and len(result["candidates"]) > 0:
-                candidate = result["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    for part in candidate["content"]["parts"]:
-                        if "inlineData" in part:
-                            # 如果是base64编码的图片数据，需要先保存
-                            inline_data = part["inlineData"]
-                            mime_type = inline_data.get("mimeType", "image/png")
-                            data = inline_data.get("data", "")
-                            if data:
-                                image_data = base64.b64decode(data)
-                                # 保存图片
-                                image_path = self.save_image(image_data, mime_type)
-                                return image_path
-                        elif "url" in part:
-                            # 如果是URL，下载图片
-                            image_path = self.download_image(part["url"])
-                            return image_path
-                # 也可能直接在candidate中有图片数据
-                if "inlineData" in candidate:
-                    inline_data = candidate["inlineData"]
-                    mime_type = inline_data.get("mimeType", "image/png")
-                    data = inline_data.get("data", "")
-                    if data:
-                        image_data = base64.b64decode(data)
-                        image_path = self.save_image(image_data, mime_type)
-                        return image_path
-            
-            # 如果都没有找到，记录详细日志
-            logger.error(f"无法解析API返回: {json.dumps(result, ensure_ascii=False, indent=2)}")
-            raise RuntimeError("API返回格式异常，未找到图片数据")
-        else:
-            raise RuntimeError(f"不支持的模型: {model}")
-    
-    def save_image(self, image_data, mime_type="image/png"):
-        """保存图片数据"""
-        # 根据mime_type确定文件扩展名
-        if "jpeg" in mime_type or "jpg" in mime_type:
-            ext = ".jpg"
-        elif "png" in mime_type:
-            ext = ".png"
-        elif "webp" in mime_type:
-            ext = ".webp"
-        else:
-            ext = ".png"  # 默认使用png
-        
-        # 保存到场景图目录
-        images_dir = Path(db_manager.app_data_dir) / "scene_images"
-        images_dir.mkdir(parents=True, exist_ok=True)
+        }
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        image_path = images_dir / f"scene_{self.storyboard_id}_{timestamp}{ext}"
+        headers = {
+            "Content-Type": "application/json"
+        }
         
-        with open(image_path, 'wb') as f:
-            f.write(image_data)
+        response = http_client.post(url, params=params, json=payload, headers=headers, timeout=300)
         
-        return str(image_path)
-    
-    def download_image(self, image_url):
-        """下载图片"""
-        # 下载图片
-        response = requests.get(image_url, timeout=300)
         if response.status_code != 200:
-            raise RuntimeError(f"下载图片失败: {response.status_code}")
-        
-        # 保存图片
-        images_dir = Path(db_manager.app_data_dir) / "scene_images"
-        images_dir.mkdir(parents=True, exist_ok=True)
+            raise RuntimeError(f"API调用失败: {response.status_code} - {response.text}")
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        image_path = images_dir / f"scene_{self.storyboard_id}_{timestamp}.png"
+        result = response.json()
+        logger.info(f"API返回结果: {json.dumps(result, ensure_ascii=False, indent=2)[:500]}")
         
-        with open(image_path, 'wb') as f:
-            f.write(response.content)
+        # 解析返回的图片数据
+        if "candidates" in result and len(result["candidates"]) > 0:
+            candidate = result["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                for part in candidate["content"]["parts"]:
+                    if "inlineData" in part:
+                        # 如果是base64编码的图片数据，需要先保存
+                        inline_data = part["inlineData"]
+                        mime_type = inline_data.get("mimeType", "image/png")
+                        data = inline_data.get("data", "")
+                        if data:
+                            image_data = base64.b64decode(data)
+                            # 保存图片
+                            image_path = save_image(storyboard_id, image_data, mime_type)
+                            return image_path
+                    elif "url" in part:
+                        # 如果是URL，下载图片
+                        image_path = download_image(storyboard_id, part["url"])
+                        return image_path
+            # 也可能直接在candidate中有图片数据
+            if "inlineData" in candidate:
+                inline_data = candidate["inlineData"]
+                mime_type = inline_data.get("mimeType", "image/png")
+                data = inline_data.get("data", "")
+                if data:
+                    image_data = base64.b64decode(data)
+                    image_path = save_image(storyboard_id, image_data, mime_type)
+                    return image_path
         
-        return str(image_path)
+        # 如果都没有找到，记录详细日志
+        logger.error(f"无法解析API返回: {json.dumps(result, ensure_ascii=False, indent=2)}")
+        raise RuntimeError("API返回格式异常，未找到图片数据")
+    else:
+        raise RuntimeError(f"不支持的模型: {model}")
+
+
+def save_image(storyboard_id, image_data, mime_type="image/png"):
+    """保存图片数据"""
+    # 根据mime_type确定文件扩展名
+    if "jpeg" in mime_type or "jpg" in mime_type:
+        ext = ".jpg"
+    elif "png" in mime_type:
+        ext = ".png"
+    elif "webp" in mime_type:
+        ext = ".webp"
+    else:
+        ext = ".png"  # 默认使用png
+    
+    # 保存到场景图目录
+    images_dir = Path(db_manager.app_data_dir) / "scene_images"
+    images_dir.mkdir(parents=True, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    image_path = images_dir / f"scene_{storyboard_id}_{timestamp}{ext}"
+    
+    with open(image_path, 'wb') as f:
+        f.write(image_data)
     
-    def update_storyboard_image(self, image_path):
-        """更新分镜场景图信息"""
+    return str(image_path)
+
+
+def copy_cached_image(storyboard_id, cached_path):
+    """把缓存的图片复制为本分镜的场景图（缓存文件可能被淘汰，不能直接引用）"""
+    images_dir = Path(db_manager.app_data_dir) / "scene_images"
+    images_dir.mkdir(parents=True, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    image_path = images_dir / f"scene_{storyboard_id}_{timestamp}{Path(cached_path).suffix or '.png'}"
+    shutil.copyfile(cached_path, image_path)
+    return str(image_path)
+
+
+def download_image(storyboard_id, image_url):
+    """下载图片"""
+    # 下载图片
+    response = http_client.get(image_url, timeout=300)
+    if response.status_code != 200:
+        raise RuntimeError(f"下载图片失败: {response.status_code}")
+    
+    # 保存图片
+    images_dir = Path(db_manager.app_data_dir) / "scene_images"
+    images_dir.mkdir(parents=True, exist_ok=True)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    image_path = images_dir / f"scene_{storyboard_id}_{timestamp}.png"
+    
+    with open(image_path, 'wb') as f:
+        f.write(response.content)
+    
+    return str(image_path)
+
+
+class SceneImageGenerationThread(QThread):
+    """场景图生成线程"""
+    
+    progress = pyqtSignal(str)  # 进度信号
+    finished = pyqtSignal(int, str)  # 完成信号，参数为(storyboard_id, 图片路径)
+    error = pyqtSignal(int, str)  # 错误信号，参数为(storyboard_id, 错误信息)
+    
+    def __init__(self, storyboard_id, project_id, parent=None, force_regenerate=False):
+        super().__init__(parent)
+        self.storyboard_id = storyboard_id
+        self.project_id = project_id
+        # 为 True 时不使用生成图片缓存，总是调用模型重新生成
+        self.force_regenerate = force_regenerate
+        
+    def run(self):
+        """执行生成任务"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            
-            # 更新场景图路径
-            cursor.execute('''
-                UPDATE storyboards
-                SET thumbnail_path = ?
-                WHERE id = ?
-            ''', (image_path, self.storyboard_id))
+            image_path = generate_scene_image(
+                self.storyboard_id, self.project_id, self.force_regenerate,
+                progress=self.progress.emit, interrupted=self.isInterruptionRequested,
+            )
+            if image_path is None or self.isInterruptionRequested():
+                return
+            self.progress.emit("生成完成")
+            self.finished.emit(self.storyboard_id, image_path)
             
-            conn.commit()
-            conn.close()
         except Exception as e:
-            logger.error(f"更新分镜场景图失败: {e}")
-            raise
-
+            # 如果是因为中断请求导致的，不发送错误信号
+            if self.isInterruptionRequested():
+                logger.info("生成任务被用户中断")
+                return
+            error_msg = f"生成场景图失败: {str(e)}"
+            logger.error(error_msg)
+            try:
+                self.error.emit(self.storyboard_id, error_msg)
+            except RuntimeError:
+                # 如果接收者不存在，忽略错误
+                pass
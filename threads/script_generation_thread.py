@@ -6,7 +6,7 @@
 
 from typing import List
 import json
-import requests
+from utils import http_client
 from constants import API_CHAT_COMPLETIONS_URL
 from PyQt5.QtCore import QThread, pyqtSignal
 from database_manager import db_manager
@@ -73,7 +73,7 @@ class ScriptGenerationThread(QThread):
                     ]
                 }
 
-                resp = requests.post(base_url, json=payload, headers=headers, timeout=60)
+                resp = http_client.post(base_url, json=payload, headers=headers, timeout=60)
                 if resp.status_code != 200:
                     self.error.emit(f'提示词生成失败: {resp.status_code} - {resp.text}')
                     continue
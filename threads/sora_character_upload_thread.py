@@ -4,11 +4,11 @@ Sora2角色上传线程
 
 import os
 import subprocess
-import sqlite3
-import requests
+from utils import http_client
 from pathlib import Path
 from PyQt5.QtCore import QThread, pyqtSignal
 from database_manager import db_manager
+from repositories import character_repo, voice_repo
 from constants import API_BASE_URL
 from loguru import logger
 import imageio_ffmpeg
@@ -40,8 +40,8 @@ class SoraCharacterUploadThread(QThread):
             if not character_data:
                 raise RuntimeError("无法获取角色信息")
             
-            image_path = character_data[0]
-            voice_id = character_data[1]
+            image_path = character_data.front_image
+            voice_id = character_data.voice_id
             
             if not image_path or not Path(image_path).exists():
                 raise RuntimeError("角色图片不存在，请先生成角色图片")
@@ -96,34 +96,13 @@ class SoraCharacterUploadThread(QThread):
     
     def get_character_data(self):
         """获取角色数据（图片路径和音色ID）"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT front_image, voice_id
-                FROM characters
-                WHERE id = ?
-            ''', (self.character_id,))
-            result = cursor.fetchone()
-            conn.close()
-            return result
-        except Exception as e:
-            logger.error(f"获取角色数据失败: {e}")
-            return None
-    
+        return character_repo.get(self.character_id)
+
     def get_voice_file_path(self, voice_id):
         """获取音色文件路径"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT file_path FROM voice_library WHERE id = ?', (voice_id,))
-            result = cursor.fetchone()
-            conn.close()
-            return result[0] if result and result[0] else None
-        except Exception as e:
-            logger.error(f"获取音色文件路径失败: {e}")
-            return None
-    
+        voice = voice_repo.get(voice_id)
+        return voice.file_path if voice and voice.file_path else None
+
     def merge_image_and_audio(self, image_path, audio_path):
         """使用ffmpeg将图片和音频合并成视频"""
         try:
@@ -241,7 +220,7 @@ class SoraCharacterUploadThread(QThread):
         
         logger.info(f"创建Sora2角色: url={video_url}, timestamps={timestamps}")
         
-        response = requests.post(url, json=payload, headers=headers, timeout=300)
+        response = http_client.post(url, json=payload, headers=headers, timeout=300)
         
         if response.status_code != 200:
             error_text = response.text[:500] if response.text else "无响应内容"
@@ -262,26 +241,11 @@ class SoraCharacterUploadThread(QThread):
     
     def update_character_info(self, character_info):
         """更新角色信息到数据库"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE characters
-                SET sora_character_id = ?,
-                    sora_character_username = ?,
-                    sora_status = '已上传',
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (
-                character_info["id"],
-                character_info["username"],
-                self.character_id
-            ))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"更新角色信息失败: {e}")
-            raise
-
+        updated = character_repo.update(
+            self.character_id,
+            sora_character_id=character_info["id"],
+            sora_character_username=character_info["username"],
+            sora_status='已上传',
+        )
+        if not updated:
+            raise RuntimeError("更新角色信息失败")
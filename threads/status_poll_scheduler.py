@@ -0,0 +1,493 @@
+"""
+视频任务状态轮询调度器
+所有进行中的 Sora 任务（分镜视频 v1、任务列表 v2）由一个调度线程按到期时间统一调度，
+查询在有界线程池中执行，状态变化通过统一的信号发布
+"""
+
+import calendar
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from loguru import logger
+
+from database_manager import db_manager
+from repositories import storyboard_repo
+from sora_client import get_sora_client
+from utils.api_utils import extract_video_url_from_response
+from utils.poll_policy import PollPolicy, poll_policy, profile_key
+from utils.rate_limiter import CircuitOpenError
+
+
+# 单个任务最长轮询时间（秒），超时后分镜标记为生成失败
+MAX_WAIT_TIME = 1200
+# 分镜任务连续查询失败达到该次数后标记为生成失败
+MAX_CONSECUTIVE_ERRORS = 3
+# 同时进行中的查询数
+MAX_WORKERS = 8
+
+# 分镜视频状态的显示文本
+VIDEO_STATUS_TEXT = {
+    'pending': '等待中',
+    'processing': '生成中',
+    'completed': '已完成',
+    'failed': '生成失败',
+}
+
+KIND_STORYBOARD = 'storyboard'   # 分镜视频任务，使用 v1 query_video_task
+KIND_TASK = 'task'               # 任务列表中的任务，使用 v2 query_task
+
+# 分镜视频任务的模型与尺寸（与 VideoGenerationSora2Thread 提交的参数一致）
+STORYBOARD_VIDEO_MODEL = 'sora-2'
+STORYBOARD_VIDEO_SIZE = 'small'
+
+
+# 各版本接口返回的状态值 -> 统一的任务状态
+_STATUS_ALIASES = {
+    'success': 'completed',
+    'succeeded': 'completed',
+    'completed': 'completed',
+    'failure': 'failed',
+    'failed': 'failed',
+    'error': 'failed',
+    'in_progress': 'processing',
+    'processing': 'processing',
+    'running': 'processing',
+    'not_start': 'pending',
+    'queued': 'pending',
+    'pending': 'pending',
+}
+
+
+def normalize_task_status(response_data: Dict[str, Any]) -> str:
+    """
+    从任务查询响应中解析统一的任务状态
+
+    兼容 v1（status / detail.status，小写）与 v2（SUCCESS、FAILURE 等大写）接口，
+    detail 中有状态时优先使用（更准确）。
+
+    Returns:
+        str: completed / failed / processing / pending，无法识别时返回原始状态的小写形式
+    """
+    status = str(response_data.get('status') or '').lower()
+    detail = response_data.get('detail')
+    if isinstance(detail, dict) and detail.get('status'):
+        status = str(detail['status']).lower()
+    return _STATUS_ALIASES.get(status, status)
+
+
+def is_final_status(status: str) -> bool:
+    """是否为终态（completed / failed）"""
+    return status in ('completed', 'failed')
+
+
+class PollJob:
+    """一个被轮询的任务"""
+
+    __slots__ = (
+        'key', 'kind', 'target', 'task_id', 'status', 'profile', 'submitted_at',
+        'started_at', 'errors', 'token', 'in_flight', 'last_reported',
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        target: Any,
+        task_id: str,
+        status: str = '',
+        profile: Optional[str] = None,
+        submitted_at: Optional[float] = None,
+    ):
+        self.key: Tuple[str, Any] = (kind, target)
+        self.kind = kind
+        self.target = target          # 分镜ID 或 任务ID
+        self.task_id = task_id
+        self.status = status          # 最近一次已知的状态
+        self.profile = profile        # 任务类别（模型|时长|尺寸），用于估算完成时间
+        self.submitted_at = submitted_at  # 任务提交时间（时间戳），未知时为 None
+        self.started_at = time.monotonic()
+        self.errors = 0               # 连续查询失败次数
+        self.token = 0                # 调度序号，堆中序号不一致的条目已失效
+        self.in_flight = False
+        self.last_reported: Optional[Tuple[str, str]] = None
+
+    def elapsed(self) -> Optional[float]:
+        """任务提交后经过的秒数，未知时为 None"""
+        return time.time() - self.submitted_at if self.submitted_at is not None else None
+
+
+class StatusPollScheduler(QObject):
+    """
+    任务状态轮询调度器
+
+    任务按下次到期时间存放在最小堆中，调度线程取出到期任务后交给有界线程池查询，
+    查询完成后按轮询策略（PollPolicy，根据同类任务的历史耗时）计算的间隔重新入堆。
+    轮询上千个任务也只占用调度线程与少量工作线程。
+    信号在工作线程中发出，连接到 GUI 线程中的槽时自动排队执行。
+    """
+
+    storyboard_status_updated = pyqtSignal(int, str, str)  # storyboard_id, status, video_url
+    task_status_updated = pyqtSignal(str, dict)            # task_id, 更新的字段
+
+    def __init__(
+        self,
+        max_workers: int = MAX_WORKERS,
+        policy: PollPolicy = poll_policy,
+        max_wait_time: float = MAX_WAIT_TIME,
+    ):
+        super().__init__()
+        self.max_workers = max_workers
+        self.policy = policy
+        self.max_wait_time = max_wait_time
+        self._jobs: Dict[Tuple[str, Any], PollJob] = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.stats = {
+            'polls': 0,      # 查询次数
+            'errors': 0,     # 查询失败次数
+            'finished': 0,   # 到达终态（或超时）的任务数
+        }
+
+    # ---------------- 注册 ----------------
+
+    def watch_storyboard(
+        self,
+        storyboard_id: int,
+        task_id: str,
+        refresh: bool = False,
+        submitted_at: Optional[float] = None,
+    ) -> bool:
+        """
+        开始轮询分镜的视频任务（分镜已有其他任务时替换）
+
+        Args:
+            refresh: 已在轮询同一任务时，是否立即查询一次
+            submitted_at: 任务提交时间（时间戳）；已知时按预计完成时间调整轮询间隔，并记录完成耗时
+        """
+        job = PollJob(
+            KIND_STORYBOARD, storyboard_id, task_id,
+            profile=self._storyboard_profile(storyboard_id), submitted_at=submitted_at,
+        )
+        return self._add(job, refresh)
+
+    @staticmethod
+    def _storyboard_profile(storyboard_id: int) -> Optional[str]:
+        storyboard = storyboard_repo.get(storyboard_id)
+        if storyboard is None:
+            return None
+        duration = 15 if '15' in (storyboard.duration or '') else 10
+        return profile_key(STORYBOARD_VIDEO_MODEL, duration, STORYBOARD_VIDEO_SIZE)
+
+    def unwatch_storyboard(self, storyboard_id: int):
+        """停止轮询分镜的视频任务"""
+        with self._cond:
+            self._jobs.pop((KIND_STORYBOARD, storyboard_id), None)
+
+    def is_watching_storyboard(self, storyboard_id: int) -> bool:
+        with self._cond:
+            return (KIND_STORYBOARD, storyboard_id) in self._jobs
+
+    def watch_task(self, task_id: str, status: str = 'pending', refresh: bool = False) -> bool:
+        """开始轮询任务列表中的任务（类别与提交时间从任务记录中读取）"""
+        with self._cond:
+            if (KIND_TASK, task_id) in self._jobs and not refresh:
+                return False
+        profile = submitted_at = None
+        task = db_manager.get_task(task_id)
+        if task:
+            profile = profile_key(task.get('model'), task.get('duration'), task.get('size'))
+            try:
+                # created_at 为 SQLite CURRENT_TIMESTAMP（UTC）
+                submitted_at = calendar.timegm(time.strptime(task.get('created_at') or '', '%Y-%m-%d %H:%M:%S'))
+            except ValueError:
+                submitted_at = None
+        job = PollJob(KIND_TASK, task_id, task_id, status, profile=profile, submitted_at=submitted_at)
+        return self._add(job, refresh)
+
+    def watch_active_tasks(self, limit: int = 50) -> int:
+        """将任务列表中未完成的任务（Chat 模式除外）加入轮询，返回新加入的数量"""
+        added = 0
+        for task in db_manager.get_active_tasks(limit=limit):
+            task_id = task.get('task_id')
+            if not task_id or db_manager.is_chat_task(task_id):
+                continue
+            if self.watch_task(str(task_id), task.get('status') or ''):
+                added += 1
+        return added
+
+    def pending_count(self) -> int:
+        """轮询中的任务数"""
+        with self._cond:
+            return len(self._jobs)
+
+    def _add(self, job: PollJob, refresh: bool) -> bool:
+        # 刚提交的任务按预计完成时间安排首次查询，其余立即查询一次
+        elapsed = job.elapsed()
+        delay = self.policy.next_interval(job.profile, elapsed) if elapsed is not None and not refresh else 0
+        with self._cond:
+            if self._stopped:
+                return False
+            existing = self._jobs.get(job.key)
+            if existing is not None and existing.task_id == job.task_id:
+                if refresh and not existing.in_flight:
+                    self._schedule(existing, 0)
+                return False
+            self._jobs[job.key] = job
+            self._schedule(job, delay)
+        self._ensure_started()
+        return True
+
+    def _schedule(self, job: PollJob, delay: float):
+        """（持有锁时调用）将任务放入堆，之前的堆条目随之失效"""
+        job.token += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), job.token, job))
+        self._cond.notify()
+
+    def _is_current(self, job: PollJob) -> bool:
+        with self._cond:
+            return self._jobs.get(job.key) is job
+
+    # ---------------- 调度 ----------------
+
+    def _ensure_started(self):
+        with self._cond:
+            if self._thread is not None or self._stopped:
+                return
+            self.policy.log_report()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="status-poll"
+            )
+            self._thread = threading.Thread(target=self._run, name="status-poll-scheduler", daemon=True)
+            self._thread.start()
+
+    def _next_due_job(self) -> Optional[PollJob]:
+        """阻塞直到有任务到期，返回该任务；调度器停止时返回 None"""
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, token, job = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                if self._jobs.get(job.key) is not job or job.token != token:
+                    continue
+                job.in_flight = True
+                return job
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_due_job()
+            if job is None:
+                return
+            # 工作线程全部忙碌时在此等待，到期任务依次顺延
+            while not self._slots.acquire(timeout=1):
+                if self._stopped:
+                    return
+            try:
+                self._executor.submit(self._poll, job)
+            except RuntimeError:
+                # 线程池已关闭
+                self._slots.release()
+                return
+
+    def _poll(self, job: PollJob):
+        throttle = 0.0
+        try:
+            finished = self._poll_once(job)
+        except Exception as e:
+            self.stats['errors'] += 1
+            throttle = self._throttle_delay(job, e)
+            finished = False if throttle else self._on_poll_error(job, e)
+        finally:
+            self._slots.release()
+
+        if not finished and time.monotonic() - job.started_at >= self.max_wait_time:
+            self._on_timeout(job)
+            finished = True
+
+        if finished:
+            delay = 0
+        else:
+            delay = throttle or self.policy.next_interval(job.profile, job.elapsed(), job.errors)
+        with self._cond:
+            job.in_flight = False
+            if self._jobs.get(job.key) is not job:
+                return
+            if finished:
+                del self._jobs[job.key]
+                self.stats['finished'] += 1
+            elif not self._stopped:
+                self._schedule(job, delay)
+
+    def _poll_once(self, job: PollJob) -> bool:
+        """查询一次并处理结果，返回任务是否结束"""
+        api_key = db_manager.load_config('api_key', '')
+        if not api_key:
+            raise RuntimeError("未设置API密钥")
+        client = get_sora_client(api_key)
+        if job.kind == KIND_STORYBOARD:
+            result = client.query_video_task(job.task_id)
+        else:
+            result = client.query_task(job.task_id)
+        self.stats['polls'] += 1
+
+        # 查询期间任务被替换或取消，丢弃结果
+        if not self._is_current(job):
+            return True
+        job.errors = 0
+        if job.kind == KIND_STORYBOARD:
+            return self._apply_storyboard_result(job, result)
+        return self._apply_task_result(job, result)
+
+    # ---------------- 分镜视频任务 ----------------
+
+    def _apply_storyboard_result(self, job: PollJob, result: Dict) -> bool:
+        status = normalize_task_status(result)
+        video_url = extract_video_url_from_response(result) or ''
+        finished = is_final_status(status)
+        logger.info(f"查询任务状态: task_id={job.task_id}, status={status}, video_url={video_url or '(无)'}")
+
+        # 进行中的状态走延迟写队列（合并、未变化不写），终态立即写入
+        storyboard_repo.update_video_info(
+            storyboard_id=job.target,
+            video_url=video_url or None,
+            video_status=VIDEO_STATUS_TEXT.get(status, status) or None,
+            deferred=not finished
+        )
+
+        if status == 'completed':
+            self._record_duration(job)
+
+        # 状态有变化时才通知界面刷新
+        if (status, video_url) != job.last_reported:
+            job.last_reported = (status, video_url)
+            self.storyboard_status_updated.emit(job.target, status, video_url)
+        return finished
+
+    def _fail_storyboard(self, job: PollJob):
+        storyboard_repo.update_video_info(storyboard_id=job.target, video_status='生成失败')
+        self.storyboard_status_updated.emit(job.target, 'failed', '')
+
+    # ---------------- 任务列表任务 ----------------
+
+    def _apply_task_result(self, job: PollJob, result: Dict) -> bool:
+        status = normalize_task_status(result) if result.get('status') else job.status
+        if status not in VIDEO_STATUS_TEXT:
+            status = 'processing'
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        updates: Dict[str, Any] = {'updated_at': now}
+
+        if status == 'completed':
+            video_url = self._task_video_url(result)
+            if video_url:
+                updates['video_url'] = video_url
+                updates['completed_at'] = now
+                logger.info(f"任务 {job.task_id} 视频URL: {video_url}")
+            else:
+                logger.warning(f"未能从任务详情中获取视频URL: {job.task_id}")
+        elif status == 'failed':
+            updates['error_message'] = result.get('fail_reason') or '生成失败'
+            updates['completed_at'] = now
+
+        finished = is_final_status(status)
+        if status == 'completed' and job.status != 'completed':
+            self._record_duration(job)
+        # 只有状态发生变化时才更新数据库
+        if status != job.status or 'video_url' in updates or 'error_message' in updates:
+            updates['status'] = status
+            # 进行中的状态走延迟写队列，终态立即写入
+            if db_manager.update_task(job.task_id, updates, deferred=not finished):
+                logger.info(f"任务 {job.task_id} 状态更新: {job.status} -> {status}")
+                job.status = status
+                self.task_status_updated.emit(job.task_id, {**updates, 'task_id': job.task_id})
+        return finished
+
+    def _record_duration(self, job: PollJob):
+        """记录任务完成耗时（提交时间已知时）"""
+        elapsed = job.elapsed()
+        if job.profile and elapsed is not None:
+            self.policy.record(job.profile, elapsed)
+
+    @staticmethod
+    def _task_video_url(result: Dict) -> Optional[str]:
+        data = result.get('data')
+        if isinstance(data, dict) and data.get('output'):
+            return data['output']
+        return extract_video_url_from_response(result)
+
+    # ---------------- 错误与超时 ----------------
+
+    def _throttle_delay(self, job: PollJob, error: Exception) -> float:
+        """
+        服务端限流（429）或接口熔断时的重试等待时间，其他错误返回 0
+
+        限流不代表任务本身出错，不计入连续失败次数
+        """
+        if isinstance(error, CircuitOpenError):
+            return max(error.retry_in, self.policy.next_interval(job.profile, job.elapsed(), 1))
+        response = getattr(error, 'response', None)
+        if getattr(response, 'status_code', None) == 429:
+            logger.warning(f"查询任务状态被限流 (task_id={job.task_id})，稍后重试")
+            return self.policy.next_interval(job.profile, job.elapsed(), 1)
+        return 0.0
+
+    def _on_poll_error(self, job: PollJob, error: Exception) -> bool:
+        """处理查询失败，返回任务是否结束"""
+        if not self._is_current(job):
+            return True
+        job.errors += 1
+        response = getattr(error, 'response', None)
+        status_code = getattr(response, 'status_code', None)
+        logger.warning(f"查询任务状态失败 (task_id={job.task_id}, status_code={status_code}): {error}")
+
+        if job.kind != KIND_STORYBOARD:
+            # 任务列表中的任务继续轮询，直到超时
+            return False
+        if status_code == 404:
+            logger.warning(f"任务不存在 (404): {job.task_id}，标记为失败")
+            self._fail_storyboard(job)
+            return True
+        if job.errors >= MAX_CONSECUTIVE_ERRORS:
+            logger.error(f"查询任务状态多次失败，标记为失败: {job.task_id}")
+            self._fail_storyboard(job)
+            return True
+        return False
+
+    def _on_timeout(self, job: PollJob):
+        if not self._is_current(job):
+            return
+        logger.warning(f"查询任务状态超时: {job.task_id}")
+        if job.kind == KIND_STORYBOARD:
+            self._fail_storyboard(job)
+
+    # ---------------- 停止 ----------------
+
+    def stop(self):
+        """停止调度（应用退出时调用），进行中的查询不再重新入队"""
+        with self._cond:
+            self._stopped = True
+            self._jobs.clear()
+            self._heap.clear()
+            self._cond.notify_all()
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局调度器（在 GUI 线程中导入时创建，信号可直接连接到界面）
+status_poll_scheduler = StatusPollScheduler()
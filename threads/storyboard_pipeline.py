@@ -0,0 +1,224 @@
+"""
+分镜生成流水线
+场景图 → 上传场景图 → 创建视频任务 → 轮询视频状态，每一步是持久化任务队列中的一条任务，
+程序重启后未完成的步骤自动继续
+"""
+
+import time
+from typing import Dict, Iterable
+
+from PyQt5.QtCore import Qt
+
+from database_manager import db_manager
+from repositories import storyboard_repo
+from threads.job_runner import JobRunner, job_runner
+from threads.scene_image_generation_thread import NoScreenContentError, generate_scene_image
+from threads.status_poll_scheduler import status_poll_scheduler
+from threads.video_generation_sora2_thread import create_video_task, upload_scene_image
+from utils.job_queue import CANCELLED, DONE, FAILED, PENDING, RUNNING, Job, JobAbort, JobWaiting
+from utils.task_executor import (
+    RESOURCE_DEFAULT, RESOURCE_IMAGE, RESOURCE_SORA_CREATE, RESOURCE_UPLOAD, task_executor
+)
+
+
+STAGE_SCENE_IMAGE = 'scene_image'
+STAGE_UPLOAD_IMAGE = 'upload_image'
+STAGE_CREATE_VIDEO = 'create_video'
+STAGE_POLL_VIDEO = 'poll_video'
+
+VIDEO_STAGES = (STAGE_UPLOAD_IMAGE, STAGE_CREATE_VIDEO, STAGE_POLL_VIDEO)
+
+# 各阶段同时执行的任务数
+STAGE_CONCURRENCY = {
+    STAGE_SCENE_IMAGE: 3,
+    STAGE_UPLOAD_IMAGE: 4,
+    STAGE_CREATE_VIDEO: 2,
+    STAGE_POLL_VIDEO: 4,
+}
+# 场景图并发数的配置项与可选范围
+SCENE_IMAGE_CONCURRENCY_KEY = 'scene_image_concurrency'
+SCENE_IMAGE_CONCURRENCY_RANGE = range(1, 9)
+# 各阶段在任务执行器中的资源类别
+STAGE_RESOURCES = {
+    STAGE_SCENE_IMAGE: RESOURCE_IMAGE,
+    STAGE_UPLOAD_IMAGE: RESOURCE_UPLOAD,
+    STAGE_CREATE_VIDEO: RESOURCE_SORA_CREATE,
+    STAGE_POLL_VIDEO: RESOURCE_DEFAULT,
+}
+
+
+def job_key(stage: str, storyboard_id: int) -> str:
+    """分镜某个阶段的任务去重键"""
+    return f"{stage}:{storyboard_id}"
+
+
+# ---------------- 阶段处理函数 ----------------
+
+def _scene_image(job: Job):
+    try:
+        image_path = generate_scene_image(
+            job.payload['storyboard_id'], job.payload['project_id'],
+            force_regenerate=job.payload.get('force_regenerate', False),
+        )
+    except NoScreenContentError as e:
+        raise JobAbort(str(e))
+    return {'image_path': image_path}
+
+
+def _upload_image(job: Job):
+    return {'image_url': upload_scene_image(job.payload['storyboard_id'])}
+
+
+def _create_video(job: Job):
+    image_url = job.inputs.get('image_url')
+    if not image_url:
+        raise JobAbort("缺少场景图地址")
+    task_id = create_video_task(job.payload['storyboard_id'], job.payload['project_id'], image_url)
+    return {'task_id': task_id, 'submitted_at': time.time()}
+
+
+def _poll_video(job: Job):
+    task_id = job.inputs.get('task_id')
+    if not task_id:
+        raise JobAbort("缺少视频任务ID")
+    # 交给状态轮询调度器，视频完成或失败时由 _on_storyboard_status 结束本任务
+    status_poll_scheduler.watch_storyboard(
+        job.payload['storyboard_id'], task_id, submitted_at=job.inputs.get('submitted_at')
+    )
+    raise JobWaiting()
+
+
+def _on_storyboard_status(storyboard_id: int, status: str, video_url: str):
+    """（轮询线程中调用）视频到达终态时结束对应的轮询任务"""
+    key = job_key(STAGE_POLL_VIDEO, storyboard_id)
+    if status == 'completed':
+        job_runner.queue.complete_key(key, {'video_url': video_url})
+    elif status == 'failed':
+        job_runner.queue.fail_key(key, '视频生成失败')
+
+
+def _on_job_failed(job_id: int, stage: str, payload: Dict, error: str):
+    """视频任务未能提交时，分镜标记为生成失败"""
+    if stage in (STAGE_UPLOAD_IMAGE, STAGE_CREATE_VIDEO):
+        storyboard_repo.update_video_info(storyboard_id=payload.get('storyboard_id'), video_status='生成失败')
+
+
+def scene_image_concurrency() -> int:
+    """场景图同时生成的数量（配置项 scene_image_concurrency）"""
+    try:
+        value = int(db_manager.load_config(SCENE_IMAGE_CONCURRENCY_KEY, STAGE_CONCURRENCY[STAGE_SCENE_IMAGE]))
+    except (TypeError, ValueError):
+        value = STAGE_CONCURRENCY[STAGE_SCENE_IMAGE]
+    return min(max(value, SCENE_IMAGE_CONCURRENCY_RANGE.start), SCENE_IMAGE_CONCURRENCY_RANGE.stop - 1)
+
+
+def set_scene_image_concurrency(value: int, runner: JobRunner = job_runner):
+    """修改并保存场景图并发数（流水线阶段与生图资源的上限同时调整，立即生效）"""
+    value = min(max(int(value), SCENE_IMAGE_CONCURRENCY_RANGE.start), SCENE_IMAGE_CONCURRENCY_RANGE.stop - 1)
+    db_manager.save_config(SCENE_IMAGE_CONCURRENCY_KEY, value, 'integer', '场景图同时生成的数量')
+    runner.set_concurrency(STAGE_SCENE_IMAGE, value)
+    task_executor.set_limit(STAGE_RESOURCES[STAGE_SCENE_IMAGE], value)
+
+
+def register_stages(runner: JobRunner = job_runner):
+    """注册流水线各阶段（在 runner.start 之前调用）"""
+    concurrency = scene_image_concurrency()
+    task_executor.set_limit(STAGE_RESOURCES[STAGE_SCENE_IMAGE], concurrency)
+    runner.register(STAGE_SCENE_IMAGE, _scene_image, concurrency, retry_delay=30,
+                    resource=STAGE_RESOURCES[STAGE_SCENE_IMAGE])
+    runner.register(STAGE_UPLOAD_IMAGE, _upload_image, STAGE_CONCURRENCY[STAGE_UPLOAD_IMAGE], retry_delay=10,
+                    resource=STAGE_RESOURCES[STAGE_UPLOAD_IMAGE])
+    runner.register(STAGE_CREATE_VIDEO, _create_video, STAGE_CONCURRENCY[STAGE_CREATE_VIDEO], retry_delay=30,
+                    resource=STAGE_RESOURCES[STAGE_CREATE_VIDEO])
+    runner.register(STAGE_POLL_VIDEO, _poll_video, STAGE_CONCURRENCY[STAGE_POLL_VIDEO], retry_delay=10,
+                    resource=STAGE_RESOURCES[STAGE_POLL_VIDEO])
+    runner.job_failed.connect(_on_job_failed, Qt.DirectConnection)
+    status_poll_scheduler.storyboard_status_updated.connect(_on_storyboard_status, Qt.DirectConnection)
+
+
+# ---------------- 入队与取消 ----------------
+
+def enqueue_scene_images(storyboard_ids: Iterable[int], project_id: int, force_regenerate: bool = False) -> int:
+    """
+    为分镜生成场景图，返回新加入队列的数量（已在队列中的分镜不重复加入，也不计入）
+
+    force_regenerate 为 True 时不使用生成图片缓存（重新生成已有的场景图）；
+    分镜已在队列中且尚未开始生成时，同样为其排队中的任务加上该标记
+    """
+    count = 0
+    for storyboard_id in storyboard_ids:
+        payload = {'storyboard_id': storyboard_id, 'project_id': project_id}
+        if force_regenerate:
+            payload['force_regenerate'] = True
+        _, created = job_runner.enqueue(
+            STAGE_SCENE_IMAGE,
+            payload,
+            dedup_key=job_key(STAGE_SCENE_IMAGE, storyboard_id),
+            update_pending=force_regenerate,
+        )
+        if created:
+            count += 1
+    return count
+
+
+def prioritize_scene_image(storyboard_id: int) -> bool:
+    """分镜的场景图任务排到队首（用户正在查看的分镜优先生成）"""
+    if job_runner.queue.prioritize([job_key(STAGE_SCENE_IMAGE, storyboard_id)]):
+        job_runner.wake()
+        return True
+    return False
+
+
+def scene_image_progress(storyboard_ids: Iterable[int]) -> Dict[str, float]:
+    """
+    一批分镜的场景图进度：排队、生成中、完成、失败的数量，以及最近的生成速度（张/分钟）
+    """
+    counts = job_runner.queue.key_counts(job_key(STAGE_SCENE_IMAGE, sid) for sid in storyboard_ids)
+    return {
+        'queued': counts.get(PENDING, 0),
+        'running': counts.get(RUNNING, 0),
+        'done': counts.get(DONE, 0),
+        'failed': counts.get(FAILED, 0) + counts.get(CANCELLED, 0),
+        'per_minute': job_runner.throughput(STAGE_SCENE_IMAGE),
+    }
+
+
+def enqueue_video(storyboard_id: int, project_id: int) -> bool:
+    """
+    为分镜生成视频：上传场景图 → 创建任务 → 轮询状态
+
+    Returns:
+        是否新加入了任务（各阶段均已在队列中或添加失败时为 False）
+    """
+    payload = {'storyboard_id': storyboard_id, 'project_id': project_id}
+    upload_id, upload_created = job_runner.enqueue(
+        STAGE_UPLOAD_IMAGE, payload, dedup_key=job_key(STAGE_UPLOAD_IMAGE, storyboard_id)
+    )
+    create_id, create_created = job_runner.enqueue(
+        STAGE_CREATE_VIDEO, payload, depends_on=[upload_id],
+        dedup_key=job_key(STAGE_CREATE_VIDEO, storyboard_id),
+    )
+    poll_id, poll_created = job_runner.enqueue(
+        STAGE_POLL_VIDEO, payload, depends_on=[create_id], max_attempts=5,
+        dedup_key=job_key(STAGE_POLL_VIDEO, storyboard_id),
+    )
+    if not (upload_id and create_id and poll_id):
+        return False
+    return upload_created or create_created or poll_created
+
+
+def is_video_queued(storyboard_id: int) -> bool:
+    """分镜是否已有未结束的视频任务（上传、创建或轮询中）"""
+    return any(
+        job_runner.queue.is_active(job_key(stage, storyboard_id))
+        for stage in VIDEO_STAGES
+    )
+
+
+def cancel_video(storyboard_id: int) -> int:
+    """取消分镜未结束的视频任务并停止轮询，返回取消的任务数"""
+    status_poll_scheduler.unwatch_storyboard(storyboard_id)
+    return job_runner.queue.cancel(
+        job_key(stage, storyboard_id) for stage in VIDEO_STAGES
+    )
+
@@ -11,6 +11,7 @@ import requests
 
 from constants import APP_VERSION, GITEE_LATEST_RELEASE_API, GITEE_RELEASES_URL
 from version import compare_versions
+from utils import http_client
 
 
 class VersionCheckThread(QThread):
@@ -56,12 +57,9 @@ class VersionCheckThread(QThread):
             "error": "",
         }
         try:
-            session = requests.Session()
-            session.trust_env = False  # 禁用系统代理
-            session.proxies = {"http": None, "https": None}
-
             logger.info("正在检查最新版本...")
-            resp = session.get(self._latest_api, timeout=8)
+            # 禁用系统代理
+            resp = http_client.get(self._latest_api, timeout=8, trust_env=False)
             if resp.status_code != 200:
                 result["error"] = f"HTTP {resp.status_code}"
                 self.check_finished.emit(result)
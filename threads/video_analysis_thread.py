@@ -3,7 +3,6 @@
 调用自定义API代理分析视频
 """
 
-import requests
 from requests.exceptions import ProxyError, ConnectionError
 import json
 import os
@@ -14,7 +13,9 @@ from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
 from database_manager import db_manager
 from constants import API_BASE_URL
+from utils import http_client
 from utils.file_utils import format_file_size
+from utils.upload_cache import files_target, files_ttl, upload_cache
 
 class VideoAnalysisThread(QThread):
     """视频分析工作线程"""
@@ -89,6 +90,12 @@ class VideoAnalysisThread(QThread):
 
             logger.info(f"api_key: {api_key}")
 
+            # 同一视频已上传过时直接复用 URL
+            cached_url = upload_cache.lookup_file(self.video_path, files_target(endpoint))
+            if cached_url:
+                logger.info(f"上传缓存命中，跳过上传: {self.video_path} -> {cached_url}")
+                return cached_url
+
             logger.info(f"开始上传视频到文件服务: path={self.video_path} endpoint={endpoint}")
 
             # 内容类型推断
@@ -127,34 +134,24 @@ class VideoAnalysisThread(QThread):
             self.progress.emit("正在上传视频文件到文件服务...")
 
             # 禁用系统代理，避免 127.0.0.1:7890 等导致连接失败
-            session = requests.Session()
-            session.trust_env = False
-            session.proxies = {}
             try:
-                resp = session.post(
+                resp = http_client.post(
                     endpoint,
                     files=files,
                     headers=headers,
                     timeout=300,
-                    proxies={}
+                    trust_env=False
                 )
             except (ProxyError, ConnectionError) as e:
                 logger.warning(f"首次上传因代理/网络异常失败，将在禁用代理下重试: {e}")
-                try:
-                    resp = requests.post(
-                        endpoint,
-                        files=files,
-                        headers=headers,
-                        timeout=300,
-                        proxies={}
-                    )
-                except Exception as e2:
-                    raise e2
-            finally:
-                try:
-                    session.close()
-                except Exception:
-                    pass
+                f.seek(0)
+                resp = http_client.post(
+                    endpoint,
+                    files=files,
+                    headers=headers,
+                    timeout=300,
+                    trust_env=False
+                )
 
             logger.info(f"文件服务上传完成，状态码: {resp.status_code}")
             try:
@@ -179,6 +176,7 @@ class VideoAnalysisThread(QThread):
 
                 if video_url:
                     logger.info(f"视频上传成功，URL: {video_url}")
+                    upload_cache.store_file(self.video_path, files_target(endpoint), video_url, files_ttl())
                     return video_url
                 else:
                     raise Exception("上传成功但响应未提供可访问URL")
@@ -246,30 +244,23 @@ class VideoAnalysisThread(QThread):
             
             # 发送请求（禁用系统代理，避免 127.0.0.1:7890 等代理导致连接失败）
             logger.info("开始发送分析请求")
-            session = requests.Session()
-            session.trust_env = False
             try:
-                response = session.post(
+                response = http_client.post(
                     url,
                     headers=headers,
                     json=payload,
                     timeout=120,
-                    proxies={"http": None, "https": None}
+                    trust_env=False
                 )
             except (ProxyError, ConnectionError) as e:
                 logger.warning(f"分析请求因代理/网络异常失败，将在禁用代理下重试: {e}")
-                response = requests.post(
+                response = http_client.post(
                     url,
                     headers=headers,
                     json=payload,
                     timeout=120,
-                    proxies={"http": None, "https": None}
+                    trust_env=False
                 )
-            finally:
-                try:
-                    session.close()
-                except Exception:
-                    pass
             logger.info(f"分析请求完成，状态码: {response.status_code}")
             
             if response.status_code == 200:
@@ -2,12 +2,12 @@
 视频下载线程
 """
 
-import requests
 import os
 from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
 from pathlib import Path
 from database_manager import db_manager
+from utils.media_cache import media_cache
 from utils.title_utils import generate_ai_title, sanitize_filename
 
 class VideoDownloadThread(QThread):
@@ -45,40 +45,26 @@ class VideoDownloadThread(QThread):
             except Exception as e:
                 logger.warning(f"AI标题生成流程异常，使用原始文件名: {e}")
             
-            # 使用普通requests下载视频，不带特殊认证头
-            logger.info(f"发送下载请求到: {self.video_url}")
-            response = requests.get(self.video_url, stream=True, timeout=300)  # 5分钟超时
-            response.raise_for_status()
-            
-            # 获取文件大小
-            total_size = int(response.headers.get('content-length', 0))
-            logger.info(f"文件总大小: {total_size} bytes")
-            
-            # 保存视频文件
+            # 经本地视频缓存获取（已下载过的视频直接复制），未缓存时分段并行下载、中断后续传
             logger.info(f"保存文件到: {self.save_path}")
-            downloaded_size = 0
-            
-            # 确保保存目录存在
-            os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
-            
-            with open(self.save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        
-                        # 每下载1MB报告一次进度
-                        if downloaded_size % (1024 * 1024) == 0:
-                            progress_mb = downloaded_size // (1024 * 1024)
-                            total_mb = total_size // (1024 * 1024) if total_size > 0 else '?'
-                            logger.info(f"已下载: {progress_mb}MB / {total_mb}MB")
-            
-            logger.info(f"视频下载完成: {self.save_path}")
-            file_size = os.path.getsize(self.save_path)
-            logger.info(f"最终文件大小: {file_size} bytes")
+            file_size = media_cache.copy_to(
+                self.video_url,
+                self.save_path,
+                progress=self._on_download_progress,
+                should_stop=self.isInterruptionRequested,
+            )
+            logger.info(f"视频下载完成: {self.save_path} ({file_size} bytes)")
             self.finished.emit(True, '视频下载完成', self.save_path)
                 
         except Exception as e:
             error_msg = f'下载出错: {str(e)}'
             logger.error(f"下载失败: URL={self.video_url}, 错误={e}")
             self.finished.emit(False, error_msg, '')
+
+    def _on_download_progress(self, downloaded, total):
+        """下载进度（已节流）"""
+        if total:
+            self.progress.emit(f'正在下载视频... {downloaded * 100 // total}% '
+                               f'({downloaded / 1048576:.1f}/{total / 1048576:.1f} MB)')
+        else:
+            self.progress.emit(f'正在下载视频... {downloaded / 1048576:.1f} MB')
@@ -2,14 +2,103 @@
 Sora2视频生成线程
 """
 
-import sqlite3
 from PyQt5.QtCore import QThread, pyqtSignal
 from database_manager import db_manager
-from sora_client import SoraClient
+from repositories import project_repo, storyboard_repo
+from sora_client import get_sora_client
 from utils.oss_uploader import OSSUploader
 from loguru import logger
 
 
+def _load_storyboard(storyboard_id: int):
+    storyboard_data = storyboard_repo.get(storyboard_id)
+    if not storyboard_data:
+        raise RuntimeError("无法获取分镜信息")
+    if not storyboard_data.get('thumbnail_path'):
+        raise RuntimeError("分镜没有场景图，无法生成视频")
+    if not storyboard_data.get('prompt'):
+        raise RuntimeError("分镜没有提示词，无法生成视频")
+    return storyboard_data
+
+
+def upload_scene_image(storyboard_id: int) -> str:
+    """上传分镜场景图到OSS，返回图片URL（供 VideoGenerationSora2Thread 与流水线任务使用）"""
+    storyboard_data = _load_storyboard(storyboard_id)
+    image_url = upload_image_to_oss(storyboard_data.get('thumbnail_path'))
+    if not image_url:
+        raise RuntimeError("上传场景图失败")
+    return image_url
+
+
+def create_video_task(storyboard_id: int, project_id: int, image_url: str) -> str:
+    """提交分镜的视频生成任务并保存任务ID，返回任务ID（供 VideoGenerationSora2Thread 与流水线任务使用）"""
+    storyboard_data = _load_storyboard(storyboard_id)
+    
+    # 获取项目信息（用于确定视频方向）
+    project = project_repo.get(project_id)
+    if not project:
+        raise RuntimeError("无法获取项目信息")
+    
+    video_aspect_ratio = project.aspect_ratio if project.aspect_ratio else '16:9'
+    orientation = 'landscape' if video_aspect_ratio == '16:9' else 'portrait'
+    
+    api_key = db_manager.load_config('api_key', '')
+    if not api_key:
+        raise RuntimeError("未设置API密钥")
+    
+    # 创建Sora2客户端并提交视频生成任务
+    sora_client = get_sora_client(api_key)
+    
+    # 解析时长
+    duration_str = storyboard_data.get('duration', '10s')
+    duration = 10
+    if '15' in duration_str:
+        duration = 15
+    
+    # 调用API创建视频任务
+    result = sora_client.create_video_with_image(
+        images=[image_url],
+        prompt=storyboard_data.get('prompt'),
+        model="sora-2",
+        orientation=orientation,
+        size="small",
+        duration=duration,
+        watermark=False
+    )
+    
+    # 获取任务ID并保存到数据库
+    task_id = result.get('id')
+    if not task_id:
+        raise RuntimeError("API返回的任务ID为空")
+    
+    storyboard_repo.update_video_info(
+        storyboard_id=storyboard_id,
+        video_task_id=task_id,
+        video_status='生成中'
+    )
+    return task_id
+
+
+def upload_image_to_oss(image_path):
+    """上传图片到OSS"""
+    try:
+        # 获取OSS配置
+        bucket_domain = db_manager.load_config('oss_bucket_domain', '')
+        if not bucket_domain:
+            logger.warning("OSS未配置，无法上传图片")
+            return None
+        
+        # 创建OSS上传器
+        oss_uploader = OSSUploader(bucket_domain)
+        
+        # 上传图片
+        image_url = oss_uploader.upload_image(image_path)
+        return image_url
+    except Exception as e:
+        logger.error(f"上传图片到OSS失败: {e}")
+        return None
+
+
 class VideoGenerationSora2Thread(QThread):
     """Sora2视频生成线程"""
     
@@ -29,127 +118,18 @@ class VideoGenerationSora2Thread(QThread):
             if self.isInterruptionRequested():
                 return
             
-            # 1. 获取分镜信息
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit(self.storyboard_id, "正在获取分镜信息...")
-            storyboard_data = db_manager.get_storyboard_by_id(self.storyboard_id)
-            if not storyboard_data:
-                raise RuntimeError("无法获取分镜信息")
-            
-            # 检查必要字段
-            thumbnail_path = storyboard_data.get('thumbnail_path')
-            prompt = storyboard_data.get('prompt')
-            
-            if not thumbnail_path:
-                raise RuntimeError("分镜没有场景图，无法生成视频")
-            
-            if not prompt:
-                raise RuntimeError("分镜没有提示词，无法生成视频")
-            
-            # 2. 获取项目信息（用于确定视频方向）
-            if self.isInterruptionRequested():
-                return
-            self.progress.emit(self.storyboard_id, "正在获取项目信息...")
-            project_data = self.get_project_data()
-            if not project_data:
-                raise RuntimeError("无法获取项目信息")
-            
-            video_aspect_ratio = project_data.get('video_aspect_ratio', '16:9')
-            orientation = 'landscape' if video_aspect_ratio == '16:9' else 'portrait'
-            
-            # 3. 上传场景图到OSS（如果需要）
-            if self.isInterruptionRequested():
-                return
+            # 1. 上传场景图到OSS
             self.progress.emit(self.storyboard_id, "正在上传场景图...")
-            image_url = self.upload_image_to_oss(thumbnail_path)
-            if not image_url:
-                raise RuntimeError("上传场景图失败")
+            image_url = upload_scene_image(self.storyboard_id)
             
-            # 4. 获取API密钥
+            # 2. 提交视频生成任务
             if self.isInterruptionRequested():
                 return
             self.progress.emit(self.storyboard_id, "正在创建视频任务...")
-            api_key = db_manager.load_config('api_key', '')
-            if not api_key:
-                raise RuntimeError("未设置API密钥")
-            
-            # 5. 创建Sora2客户端并提交视频生成任务
-            sora_client = SoraClient(api_key=api_key)
-            
-            # 解析时长
-            duration_str = storyboard_data.get('duration', '10s')
-            duration = 10
-            if '15' in duration_str:
-                duration = 15
-            
-            # 调用API创建视频任务
-            result = sora_client.create_video_with_image(
-                images=[image_url],
-                prompt=prompt,
-                model="sora-2",
-                orientation=orientation,
-                size="small",
-                duration=duration,
-                watermark=False
-            )
-            
-            # 6. 获取任务ID并保存到数据库
-            task_id = result.get('id')
-            if not task_id:
-                raise RuntimeError("API返回的任务ID为空")
-            
-            # 更新数据库
-            db_manager.update_storyboard_video_info(
-                storyboard_id=self.storyboard_id,
-                video_task_id=task_id,
-                video_status='生成中'
-            )
+            task_id = create_video_task(self.storyboard_id, self.project_id, image_url)
             
             self.finished.emit(self.storyboard_id, task_id)
             
         except Exception as e:
             logger.error(f"生成视频失败 (分镜ID: {self.storyboard_id}): {e}")
             self.error.emit(self.storyboard_id, str(e))
-    
-    def get_project_data(self):
-        """获取项目数据"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT aspect_ratio
-                FROM projects
-                WHERE id = ?
-            ''', (self.project_id,))
-            project = cursor.fetchone()
-            conn.close()
-            
-            if project:
-                return {
-                    'video_aspect_ratio': project[0] if project[0] else '16:9'
-                }
-            return None
-        except Exception as e:
-            logger.error(f"获取项目数据失败: {e}")
-            return None
-    
-    def upload_image_to_oss(self, image_path):
-        """上传图片到OSS"""
-        try:
-            # 获取OSS配置
-            bucket_domain = db_manager.load_config('oss_bucket_domain', '')
-            if not bucket_domain:
-                logger.warning("OSS未配置，无法上传图片")
-                return None
-            
-            # 创建OSS上传器
-            oss_uploader = OSSUploader(bucket_domain)
-            
-            # 上传图片
-            image_url = oss_uploader.upload_image(image_path)
-            return image_url
-        except Exception as e:
-            logger.error(f"上传图片到OSS失败: {e}")
-            return None
-
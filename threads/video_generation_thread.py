@@ -3,7 +3,7 @@
 """
 
 from PyQt5.QtCore import QThread, pyqtSignal
-from sora_client import SoraClient
+from sora_client import get_sora_client
 from constants import API_BASE_URL
 from loguru import logger
 
@@ -28,7 +28,7 @@ class VideoGenerationThread(QThread):
         """实际的视频生成实现"""
         try:
             # 使用SoraClient进行API调用
-            client = SoraClient(base_url=API_BASE_URL, api_key=self.api_key)
+            client = get_sora_client(self.api_key, base_url=API_BASE_URL)
 
             self.progress.emit("正在创建视频生成任务...")
 
@@ -4,7 +4,8 @@
 
 import json
 import time
-import requests
+from utils import http_client
+from utils.media_cache import media_cache
 from pathlib import Path
 from PyQt5.QtCore import QThread, pyqtSignal
 
@@ -39,6 +40,11 @@ class VideoUpscaleThread(QThread):
             with open(template_path, 'r', encoding='utf-8') as f:
                 workflow = json.load(f)
                 
+            # 在线视频经本地视频缓存获取，已下载过的不再重复下载
+            if str(self.video_path).startswith(('http://', 'https://')):
+                self.progress.emit("正在获取视频文件...")
+                self.video_path = media_cache.fetch(self.video_path, should_stop=self.isInterruptionRequested)
+
             # 修改模板参数
             # 设置视频文件路径
             video_filename = Path(self.video_path).name
@@ -56,7 +62,7 @@ class VideoUpscaleThread(QThread):
             self.progress.emit("正在上传视频文件...")
             with open(self.video_path, 'rb') as video_file:
                 files = {'image': (video_filename, video_file, 'video/mp4')}
-                upload_response = requests.post(f"{self._base()}/upload/image", files=files)
+                upload_response = http_client.post(f"{self._base()}/upload/image", files=files)
             
             if upload_response.status_code != 200:
                 self.finished.emit(False, f"上传视频文件失败: {upload_response.status_code}: {upload_response.text}", "")
@@ -64,7 +70,7 @@ class VideoUpscaleThread(QThread):
                 
             # 发送工作流到ComfyUI
             self.progress.emit("正在发送处理请求...")
-            workflow_response = requests.post(
+            workflow_response = http_client.post(
                 f"{self._base()}/prompt",
                 json={"prompt": workflow}
             )
@@ -93,7 +99,7 @@ class VideoUpscaleThread(QThread):
             while wait_time < max_wait_time:
                 # 检查处理状态
                 try:
-                    status_response = requests.get(f"{self._base()}/history")
+                    status_response = http_client.get(f"{self._base()}/history")
                     if status_response.status_code == 200:
                         history_data = status_response.json()
                         # 查找我们的prompt_id
@@ -196,7 +202,7 @@ class VideoUpscaleThread(QThread):
                 download_params["subfolder"] = subfolder
 
             # 发送下载请求
-            download_response = requests.get(
+            download_response = http_client.get(
                 f"{self._base()}/view",
                 params=download_params,
                 timeout=60
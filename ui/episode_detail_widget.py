@@ -8,10 +8,9 @@
 """
 
 import os
-import sqlite3
 from pathlib import Path
 
-from PyQt5.QtCore import Qt, QThread, QUrl
+from PyQt5.QtCore import Qt, QThread, QTimer, QUrl
 from PyQt5.QtGui import QPixmap, QWheelEvent
 from PyQt5.QtWidgets import (
     QWidget,
@@ -31,11 +30,15 @@ from qfluentwidgets import (
     PushButton,
     InfoBar,
     InfoBarPosition,
+    SearchLineEdit,
 )
 
 from database_manager import db_manager
+from repositories import character_repo, episode_repo, project_repo, run_async, storyboard_repo
 from threads.ai_script_thread import AIScriptThread
-from threads.scene_image_generation_thread import SceneImageGenerationThread
+from threads import storyboard_pipeline
+from threads.job_runner import job_runner
+from threads.status_poll_scheduler import status_poll_scheduler
 
 
 class EpisodeDetailWidget(QWidget):
@@ -53,12 +56,26 @@ class EpisodeDetailWidget(QWidget):
         self.project_data = None
 
         self.ai_script_thread: QThread | None = None
-        self.scene_generation_threads = []
         # 行选中指示条（左侧蓝色条）
         self._row_indicator_bars: dict[int, QLabel] = {}
+        # 当前搜索词（为空时显示全部分镜）
+        self._search_text = ""
+        # 正在生成场景图的分镜（一键场景图 / 单行生成），用于显示进度与优先生成当前查看的分镜
+        self._scene_batch_ids: list[int] = []
+        self._scene_progress_timer = QTimer(self)
+        self._scene_progress_timer.setInterval(1000)
+        self._scene_progress_timer.timeout.connect(self._refresh_scene_progress)
+        # 批量生成期间合并表格刷新，避免每完成一张都重建表格
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(800)
+        self._reload_timer.timeout.connect(self.load_storyboards)
 
         self._init_ui()
         self.load_data()
+        status_poll_scheduler.storyboard_status_updated.connect(self._on_scheduled_status_updated)
+        job_runner.job_succeeded.connect(self._on_job_succeeded)
+        job_runner.job_failed.connect(self._on_job_failed)
 
     # ---------------- UI ----------------
 
@@ -76,8 +93,22 @@ class EpisodeDetailWidget(QWidget):
         self.title_label = BodyLabel("项目标题-第X集", self)
         self.title_label.setStyleSheet("font-size: 18px; font-weight: 600;")
         header_layout.addWidget(self.title_label)
+
+        self.search_edit = SearchLineEdit(self)
+        self.search_edit.setPlaceholderText("搜索分镜")
+        self.search_edit.setFixedWidth(200)
+        self.search_edit.searchSignal.connect(self.on_search_storyboards)
+        self.search_edit.returnPressed.connect(self.search_edit.search)
+        self.search_edit.clearSignal.connect(self.on_search_cleared)
+        header_layout.addWidget(self.search_edit)
         header_layout.addStretch()
 
+        # 场景图生成进度（排队 / 生成中 / 完成 / 速度）
+        self.scene_progress_label = BodyLabel("", self)
+        self.scene_progress_label.setStyleSheet("color: #666; font-size: 12px;")
+        self.scene_progress_label.hide()
+        header_layout.addWidget(self.scene_progress_label)
+
         self.ai_script_btn = PrimaryPushButton("AI编剧", self)
         self.ai_script_btn.clicked.connect(self.on_ai_script)
         header_layout.addWidget(self.ai_script_btn)
@@ -194,6 +225,11 @@ class EpisodeDetailWidget(QWidget):
                     # 恢复默认文字颜色，确保不会因为选中而变白
                     item.setForeground(default_text_color)
         
+        # 正在查看的分镜若在排队生成场景图，提前生成
+        storyboard_id = self._row_to_storyboard_id.get(currentRow)
+        if storyboard_id in self._scene_batch_ids and self._scene_progress_timer.isActive():
+            storyboard_pipeline.prioritize_scene_image(storyboard_id)
+
         # 当前行高亮：左侧蓝色条 + 轻微灰色背景（和侧边栏一样）
         if currentRow >= 0 and currentRow < self.storyboards_table.rowCount():
             # 设置左侧蓝色条
@@ -223,21 +259,9 @@ class EpisodeDetailWidget(QWidget):
     def load_data(self):
         """加载剧集和项目数据"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute(
-                """
-                SELECT id, episode_number, episode_name, file_path
-                FROM episodes
-                WHERE id = ?
-                """,
-                (self.episode_id,),
-            )
-            episode = cursor.fetchone()
+            episode = episode_repo.get(self.episode_id)
 
             if not episode:
-                conn.close()
                 # 剧集不存在，显示错误提示并关闭页面
                 from qfluentwidgets import InfoBar, InfoBarPosition
                 InfoBar.warning(
@@ -254,29 +278,11 @@ class EpisodeDetailWidget(QWidget):
                 QTimer.singleShot(2000, self._close_page)
                 return
 
-            cursor.execute(
-                """
-                SELECT id, title
-                FROM projects
-                WHERE id = ?
-                """,
-                (self.project_id,),
-            )
-            project = cursor.fetchone()
-
-            conn.close()
+            project = project_repo.get(self.project_id)
 
             if episode and project:
-                self.episode_data = {
-                    "id": episode[0],
-                    "episode_number": episode[1],
-                    "episode_name": episode[2],
-                    "file_path": episode[3],
-                }
-                self.project_data = {
-                    "id": project[0],
-                    "title": project[1],
-                }
+                self.episode_data = episode
+                self.project_data = project
 
                 self.update_ui()
                 self.load_storyboards()
@@ -330,61 +336,33 @@ class EpisodeDetailWidget(QWidget):
         self.title_label.setText(f"{project_title}-第{episode_number}集")
 
     def load_storyboards(self):
-        """加载分镜到表格"""
+        """在后台读取分镜，完成后刷新表格"""
+        storyboard_repo.list_by_episode_async(
+            self.episode_id, on_result=self._populate_storyboards, owner=self
+        )
+
+    def _populate_storyboards(self, storyboards):
+        """把分镜填入表格"""
         self.storyboards_table.setRowCount(0)
         self._row_indicator_bars.clear()
         self._row_background_widgets.clear()
         self._row_to_storyboard_id.clear()
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT id, sequence_number, title, screen_content,
-                       sound_effect, dialogue, duration,
-                       thumbnail_path, video_file, prompt, camera_movement,
-                       video_url, video_task_id, video_status
-                FROM storyboards
-                WHERE episode_id = ?
-                ORDER BY sequence_number ASC
-                """,
-                (self.episode_id,),
-            )
-            storyboards = cursor.fetchall()
-            conn.close()
-        except Exception as e:
-            from loguru import logger
-
-            logger.error(f"加载分镜列表失败: {e}")
-            return
 
         for storyboard in storyboards:
-            (
-                storyboard_id,
-                sequence_number,
-                title,
-                screen_content,
-                sound_effect,
-                dialogue,
-                duration,
-                thumbnail_path,
-                video_file,
-                prompt,
-                camera_movement,
-                video_url,
-                video_task_id,
-                video_status,
-            ) = storyboard
-
-            title = title or ""
-            screen_content = screen_content or ""
-            sound_effect = sound_effect or ""
-            dialogue = dialogue or ""
-            duration = duration or ""
-            thumbnail_path = thumbnail_path or ""
-            video_file = video_file or ""
-            prompt = prompt or ""
-            camera_movement = camera_movement or ""
+            storyboard_id = storyboard.id
+            sequence_number = storyboard.sequence_number
+            video_url = storyboard.video_url
+            video_task_id = storyboard.video_task_id
+            video_status = storyboard.video_status
+
+            title = storyboard.title or ""
+            screen_content = storyboard.screen_content or ""
+            sound_effect = storyboard.sound_effect or ""
+            dialogue = storyboard.dialogue or ""
+            duration = storyboard.duration or ""
+            thumbnail_path = storyboard.thumbnail_path or ""
+            prompt = storyboard.prompt or ""
+            camera_movement = storyboard.camera_movement or ""
 
             row = self.storyboards_table.rowCount()
             self.storyboards_table.insertRow(row)
@@ -600,12 +578,6 @@ class EpisodeDetailWidget(QWidget):
                 video_layout.addWidget(status_label)
                 
                 # 检查是否有场景图和提示词
-                # storyboard 元组结构: (id, sequence_number, title, screen_content, sound_effect, 
-                #                      dialogue, duration, thumbnail_path, video_file, prompt, camera_movement,
-                #                      video_url, video_task_id, video_status)
-                thumbnail_path = storyboard[7] if len(storyboard) > 7 else None  # thumbnail_path 在索引7
-                prompt = storyboard[9] if len(storyboard) > 9 else None  # prompt 在索引9
-                
                 if thumbnail_path and prompt:
                     # 有场景图和提示词，显示生成按钮
                     generate_btn = PrimaryPushButton("生成视频")
@@ -623,6 +595,62 @@ class EpisodeDetailWidget(QWidget):
             
             self.storyboards_table.setCellWidget(row, 4, video_widget)
 
+        # 重新加载后保持当前的搜索过滤
+        self._apply_search_filter()
+
+    # ---------------- 搜索 ----------------
+
+    def on_search_storyboards(self, text: str):
+        """按关键词过滤本集分镜（全文检索标题、画面内容、对白、提示词）"""
+        self._search_text = (text or "").strip()
+        self._apply_search_filter(notify_empty=True)
+
+    def on_search_cleared(self):
+        """清除搜索，显示全部分镜"""
+        self._search_text = ""
+        self._apply_search_filter()
+
+    def _apply_search_filter(self, notify_empty: bool = False):
+        """根据当前搜索词隐藏未命中的行（在后台检索，完成后更新表格）"""
+        if not self._search_text:
+            for row in range(self.storyboards_table.rowCount()):
+                self.storyboards_table.setRowHidden(row, False)
+            return
+
+        run_async(
+            db_manager.search,
+            self._search_text,
+            scope="storyboards",
+            limit=max(self.storyboards_table.rowCount(), 1),
+            episode_id=self.episode_id,
+            on_result=lambda hits: self._show_search_hits(hits, notify_empty),
+            owner=self,
+            tag="search",
+        )
+
+    def _show_search_hits(self, hits: list, notify_empty: bool):
+        """只显示命中的分镜行"""
+        if not self._search_text:
+            # 检索期间搜索已被清除
+            return
+        matched_ids = {hit["id"] for hit in hits}
+        visible = 0
+        for row, storyboard_id in self._row_to_storyboard_id.items():
+            hidden = storyboard_id not in matched_ids
+            self.storyboards_table.setRowHidden(row, hidden)
+            if not hidden:
+                visible += 1
+        if notify_empty and visible == 0:
+            InfoBar.info(
+                title="提示",
+                content="未找到匹配的分镜",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self,
+            )
+
     # ---------------- AI 编剧 ----------------
 
     def on_ai_script(self):
@@ -674,28 +702,20 @@ class EpisodeDetailWidget(QWidget):
     def on_ai_script_finished(self, storyboards: list):
         """AI编剧完成后，把分镜写入 storyboards 表"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            for sb in storyboards:
-                cursor.execute(
-                    """
-                    INSERT INTO storyboards
-                    (episode_id, sequence_number, title, duration,
-                     dialogue, screen_content, camera_movement)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        self.episode_id,
-                        sb.get("sequence_number", 0),
-                        sb.get("title", ""),
-                        sb.get("duration", ""),
-                        sb.get("dialogue", ""),
-                        sb.get("screen_content", ""),
-                        sb.get("camera_movement", ""),
-                    ),
-                )
-            conn.commit()
-            conn.close()
+            rows = [
+                {
+                    "sequence_number": sb.get("sequence_number", 0),
+                    "title": sb.get("title", ""),
+                    "duration": sb.get("duration", ""),
+                    "dialogue": sb.get("dialogue", ""),
+                    "screen_content": sb.get("screen_content", ""),
+                    "camera_movement": sb.get("camera_movement", ""),
+                }
+                for sb in storyboards
+            ]
+            # 追加为新分镜（与原先逐条插入一致），不覆盖已有分镜及其场景图、视频
+            if rows and not storyboard_repo.bulk_insert(self.episode_id, rows):
+                raise RuntimeError("写入数据库失败，详见日志")
 
             self.load_storyboards()
 
@@ -738,19 +758,7 @@ class EpisodeDetailWidget(QWidget):
     def on_generate_scene_batch(self):
         """一键场景图：为当前剧集所有有画面内容的分镜生成场景图"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT id, sequence_number, screen_content
-                FROM storyboards
-                WHERE episode_id = ?
-                ORDER BY sequence_number ASC
-                """,
-                (self.episode_id,),
-            )
-            storyboards = cursor.fetchall()
-            conn.close()
+            storyboards = storyboard_repo.list_by_episode(self.episode_id)
 
             if not storyboards:
                 InfoBar.warning(
@@ -764,32 +772,24 @@ class EpisodeDetailWidget(QWidget):
                 )
                 return
 
-            self.scene_generation_threads = []
-            valid_count = 0
+            valid_ids = []
+            regenerate_ids = []
             skipped = 0
 
             from loguru import logger
 
-            for sid, seq, screen_content in storyboards:
-                text = (screen_content or "").strip()
+            for storyboard in storyboards:
+                sid, seq = storyboard.id, storyboard.sequence_number
+                text = (storyboard.screen_content or "").strip()
                 if not text:
                     skipped += 1
                     logger.warning(f"分镜序号 {seq} (ID={sid}) 没有画面内容，跳过一键场景图")
                     continue
+                valid_ids.append(sid)
+                if storyboard.thumbnail_path:
+                    regenerate_ids.append(sid)
 
-                thread = SceneImageGenerationThread(sid, self.project_id, self)
-                thread.progress.connect(
-                    lambda msg, storyboard_id=sid: self.on_scene_generation_progress(
-                        storyboard_id, msg
-                    )
-                )
-                thread.finished.connect(self.on_scene_generation_finished)
-                thread.error.connect(self.on_scene_generation_error)
-                self.scene_generation_threads.append(thread)
-                thread.start()
-                valid_count += 1
-
-            if valid_count == 0:
+            if not valid_ids:
                 InfoBar.warning(
                     title="提示",
                     content="所有分镜都没有画面内容，无法生成场景图",
@@ -799,10 +799,39 @@ class EpisodeDetailWidget(QWidget):
                     duration=3000,
                     parent=self,
                 )
+                return
+
+            # 加入流水线任务队列，按并发上限依次生成（程序重启后自动继续）
+            # 已有场景图的分镜是要重新生成，不使用生成图片缓存（与单行按钮一致）
+            regenerate = set(regenerate_ids)
+            added_count = storyboard_pipeline.enqueue_scene_images(
+                [sid for sid in valid_ids if sid not in regenerate], self.project_id
+            )
+            added_count += storyboard_pipeline.enqueue_scene_images(
+                regenerate_ids, self.project_id, force_regenerate=True
+            )
+            queued_count = len(valid_ids) - added_count
+            self._start_scene_progress(valid_ids)
+
+            if added_count == 0:
+                InfoBar.info(
+                    title="提示",
+                    content=f"{queued_count} 个分镜的场景图已在生成队列中，请稍候…",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=3000,
+                    parent=self,
+                )
             else:
-                msg = f"正在为 {valid_count} 个分镜生成场景图，请稍候…"
+                msg = f"正在为 {added_count} 个分镜生成场景图，请稍候…"
+                notes = []
+                if queued_count:
+                    notes.append(f"{queued_count} 个分镜已在队列中")
                 if skipped:
-                    msg += f"（已跳过 {skipped} 个无画面内容的分镜）"
+                    notes.append(f"已跳过 {skipped} 个无画面内容的分镜")
+                if notes:
+                    msg += f"（{'，'.join(notes)}）"
                 InfoBar.info(
                     title="提示",
                     content=msg,
@@ -826,20 +855,9 @@ class EpisodeDetailWidget(QWidget):
     def on_generate_scene_single(self, storyboard_id: int):
         """单行生成场景图（行内按钮）"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT screen_content
-                FROM storyboards
-                WHERE id = ?
-                """,
-                (storyboard_id,),
-            )
-            result = cursor.fetchone()
-            conn.close()
+            storyboard = storyboard_repo.get(storyboard_id)
 
-            if not result or not (result[0] or "").strip():
+            if not storyboard or not (storyboard.screen_content or "").strip():
                 InfoBar.warning(
                     title="提示",
                     content="当前分镜没有画面内容，无法生成场景图",
@@ -851,15 +869,11 @@ class EpisodeDetailWidget(QWidget):
                 )
                 return
 
-            thread = SceneImageGenerationThread(storyboard_id, self.project_id, self)
-            thread.progress.connect(
-                lambda msg, sid=storyboard_id: self.on_scene_generation_progress(
-                    sid, msg
-                )
+            # 已有场景图时是要重新生成，不使用生成图片缓存
+            storyboard_pipeline.enqueue_scene_images(
+                [storyboard_id], self.project_id, force_regenerate=bool(storyboard.thumbnail_path)
             )
-            thread.finished.connect(self.on_scene_generation_finished)
-            thread.error.connect(self.on_scene_generation_error)
-            thread.start()
+            self._start_scene_progress([storyboard_id])
 
             InfoBar.info(
                 title="提示",
@@ -881,17 +895,54 @@ class EpisodeDetailWidget(QWidget):
                 parent=self,
             )
 
-    def on_scene_generation_progress(self, storyboard_id: int, message: str):
-        # 这里简单用日志；如需弹提示可按需打开
-        from loguru import logger
-
-        logger.info(f"分镜 {storyboard_id} 场景图生成进度: {message}")
+    def _start_scene_progress(self, storyboard_ids):
+        """开始（或追加）跟踪场景图生成进度"""
+        if self._scene_progress_timer.isActive():
+            self._scene_batch_ids += [sid for sid in storyboard_ids if sid not in self._scene_batch_ids]
+        else:
+            self._scene_batch_ids = list(storyboard_ids)
+        self.scene_progress_label.show()
+        self._refresh_scene_progress()
+        if self._scene_batch_ids:
+            self._scene_progress_timer.start()
+
+    def _refresh_scene_progress(self):
+        """刷新场景图进度；全部结束后停止跟踪"""
+        progress = storyboard_pipeline.scene_image_progress(self._scene_batch_ids)
+        text = (
+            f"场景图：排队 {progress['queued']} · 生成中 {progress['running']} · "
+            f"完成 {progress['done']} · 失败 {progress['failed']}"
+        )
+        if progress['per_minute']:
+            text += f" · {progress['per_minute']:.1f} 张/分钟"
+        self.scene_progress_label.setText(text)
+        if progress['queued'] or progress['running']:
+            return
+        self._scene_progress_timer.stop()
+        if self._reload_timer.isActive():
+            self._reload_timer.stop()
+            self.load_storyboards()
+        if len(self._scene_batch_ids) > 1:
+            InfoBar.success(
+                title="完成",
+                content=f"场景图生成结束：完成 {progress['done']} 个，失败 {progress['failed']} 个",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self,
+            )
+        self._scene_batch_ids = []
 
     def on_scene_generation_finished(self, storyboard_id: int, image_path: str):
         """场景图生成完成后刷新表格"""
         from loguru import logger
 
         logger.info(f"分镜 {storyboard_id} 场景图生成完成: {image_path}")
+        if len(self._scene_batch_ids) > 1 and self._scene_progress_timer.isActive():
+            # 批量生成中：合并刷新，进度显示在标题栏，结束时统一提示
+            self._reload_timer.start()
+            return
         self.load_storyboards()
         InfoBar.success(
             title="成功",
@@ -920,22 +971,9 @@ class EpisodeDetailWidget(QWidget):
         """生成视频提示词：根据分镜详情和项目风格，为每个分镜生成用于 Sora2 的提示词"""
         try:
             # 1. 读取当前剧集的所有分镜数据
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute(
-                """
-                SELECT id, sequence_number, title, duration, dialogue, screen_content, camera_movement
-                FROM storyboards
-                WHERE episode_id = ?
-                ORDER BY sequence_number ASC
-                """,
-                (self.episode_id,),
-            )
-            storyboards = cursor.fetchall()
+            storyboards = storyboard_repo.list_by_episode(self.episode_id)
 
             if not storyboards:
-                conn.close()
                 InfoBar.warning(
                     title="提示",
                     content="当前没有分镜数据，请先使用AI编剧生成分镜",
@@ -948,33 +986,16 @@ class EpisodeDetailWidget(QWidget):
                 return
 
             # 2. 获取项目风格
-            cursor.execute(
-                """
-                SELECT style
-                FROM projects
-                WHERE id = ?
-                """,
-                (self.project_id,),
-            )
-            project_row = cursor.fetchone()
-            style = (project_row[0] or "").strip() if project_row else ""
+            project = project_repo.get(self.project_id)
+            style = (project.style or "").strip() if project else ""
 
             # 3. 获取已绑定 Sora2 角色用户名的角色映射 {角色名: @username}
-            cursor.execute(
-                """
-                SELECT name, sora_character_username
-                FROM characters
-                WHERE project_id = ?
-                  AND sora_character_username IS NOT NULL
-                  AND sora_character_username != ''
-                """,
-                (self.project_id,),
-            )
             name_to_sora = {}
-            for name, sora_username in cursor.fetchall():
+            for character in character_repo.list_by_project(self.project_id):
+                name = character.name
                 if not name:
                     continue
-                display = sora_username.strip()
+                display = (character.sora_character_username or "").strip()
                 if not display:
                     continue
                 if not display.startswith("@"):
@@ -988,42 +1009,23 @@ class EpisodeDetailWidget(QWidget):
             else:
                 logger.warning(f"项目 {self.project_id} 没有找到已绑定Sora用户名的角色")
 
-            # 4. 为每个分镜生成提示词并写回数据库的 prompt 字段
-            updated_count = 0
-            for (
-                sid,
-                seq,
-                title,
-                duration,
-                dialogue,
-                screen_content,
-                camera_movement,
-            ) in storyboards:
-                prompt_text = self._build_video_prompt_for_storyboard(
-                    sequence_number=seq,
-                    title=title or "",
-                    duration=duration or "",
-                    dialogue=dialogue or "",
-                    screen_content=screen_content or "",
-                    camera_movement=camera_movement or "",
+            # 4. 为每个分镜生成提示词并写回数据库的 prompt 字段（单个事务）
+            prompts = {}
+            for storyboard in storyboards:
+                prompts[storyboard.id] = self._build_video_prompt_for_storyboard(
+                    sequence_number=storyboard.sequence_number,
+                    title=storyboard.title or "",
+                    duration=storyboard.duration or "",
+                    dialogue=storyboard.dialogue or "",
+                    screen_content=storyboard.screen_content or "",
+                    camera_movement=storyboard.camera_movement or "",
                     style=style,
                     name_to_sora=name_to_sora,
                 )
-                # 更新数据库
-                cursor.execute(
-                    "UPDATE storyboards SET prompt = ? WHERE id = ?",
-                    (prompt_text, sid),
-                )
-                updated_count += 1
-
-            # 提交事务
-            conn.commit()
-            
-            # 验证更新是否成功（可选，用于调试）
-            from loguru import logger
+            if not storyboard_repo.update_each("prompt", prompts):
+                raise RuntimeError("写入数据库失败，详见日志")
+            updated_count = len(prompts)
             logger.info(f"已更新 {updated_count} 个分镜的提示词")
-            
-            conn.close()
 
             # 5. 刷新界面中的"分镜提示词"列
             # 强制刷新表格，确保显示最新数据
@@ -1158,16 +1160,7 @@ class EpisodeDetailWidget(QWidget):
         """生成视频：为所有有场景图和提示词的分镜创建视频任务"""
         try:
             # 获取所有分镜
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, thumbnail_path, prompt, video_status
-                FROM storyboards
-                WHERE episode_id = ?
-                ORDER BY sequence_number ASC
-            """, (self.episode_id,))
-            storyboards = cursor.fetchall()
-            conn.close()
+            storyboards = storyboard_repo.list_by_episode(self.episode_id)
             
             if not storyboards:
                 InfoBar.warning(
@@ -1185,15 +1178,17 @@ class EpisodeDetailWidget(QWidget):
             valid_storyboards = []
             skipped_count = 0
             for storyboard in storyboards:
-                storyboard_id, thumbnail_path, prompt, video_status = storyboard
-                if not thumbnail_path or not prompt:
+                if not storyboard.thumbnail_path or not storyboard.prompt:
                     skipped_count += 1
                     continue
                 # 如果已经有视频或正在生成，跳过
-                if video_status in ['已完成', '生成中']:
+                if storyboard.video_status in ['已完成', '生成中']:
+                    skipped_count += 1
+                    continue
+                if storyboard_pipeline.is_video_queued(storyboard.id):
                     skipped_count += 1
                     continue
-                valid_storyboards.append(storyboard_id)
+                valid_storyboards.append(storyboard.id)
             
             if not valid_storyboards:
                 InfoBar.warning(
@@ -1207,29 +1202,11 @@ class EpisodeDetailWidget(QWidget):
                 )
                 return
             
-            # 为每个分镜创建视频生成线程
-            from threads.video_generation_sora2_thread import VideoGenerationSora2Thread
-            from threads.video_status_check_thread import VideoStatusCheckThread
-            
-            self.video_threads = getattr(self, 'video_threads', {})
-            self.status_threads = getattr(self, 'status_threads', {})
-            
+            # 为每个分镜加入视频流水线（上传场景图 → 创建任务 → 轮询状态）
             created_count = 0
             for storyboard_id in valid_storyboards:
-                # 创建视频生成线程
-                video_thread = VideoGenerationSora2Thread(storyboard_id, self.project_id, self)
-                video_thread.progress.connect(
-                    lambda sid, msg, sbid=storyboard_id: self.on_video_progress(sbid, msg)
-                )
-                video_thread.finished.connect(
-                    lambda sid, task_id, sbid=storyboard_id: self.on_video_finished(sbid, task_id)
-                )
-                video_thread.error.connect(
-                    lambda sid, error, sbid=storyboard_id: self.on_video_error(sbid, error)
-                )
-                self.video_threads[storyboard_id] = video_thread
-                video_thread.start()
-                created_count += 1
+                if storyboard_pipeline.enqueue_video(storyboard_id, self.project_id):
+                    created_count += 1
             
             InfoBar.success(
                 title="提示",
@@ -1254,31 +1231,12 @@ class EpisodeDetailWidget(QWidget):
                 parent=self,
             )
     
-    def on_video_progress(self, storyboard_id, message):
-        """视频生成进度回调"""
-        from loguru import logger
-        logger.info(f"分镜 {storyboard_id} 视频生成进度: {message}")
-    
     def on_video_finished(self, storyboard_id, task_id):
         """视频生成任务创建完成回调"""
         from loguru import logger
         logger.info(f"分镜 {storyboard_id} 视频任务已创建: {task_id}")
         
-        # 启动状态查询线程
-        from threads.video_status_check_thread import VideoStatusCheckThread
-        self.status_threads = getattr(self, 'status_threads', {})
-        
-        status_thread = VideoStatusCheckThread(storyboard_id, task_id, self)
-        status_thread.status_updated.connect(
-            lambda sid, status, url, sbid=storyboard_id: self.on_video_status_updated(sbid, status, url)
-        )
-        status_thread.error.connect(
-            lambda sid, error, sbid=storyboard_id: self.on_video_status_error(sbid, error)
-        )
-        self.status_threads[storyboard_id] = status_thread
-        status_thread.start()
-        
-        # 刷新表格显示
+        # 状态轮询由流水线的轮询任务交给调度器，这里只刷新表格显示
         self.load_storyboards()
     
     def on_video_error(self, storyboard_id, error_message):
@@ -1297,7 +1255,7 @@ class EpisodeDetailWidget(QWidget):
         )
         
         # 更新数据库状态
-        db_manager.update_storyboard_video_info(
+        storyboard_repo.update_video_info(
             storyboard_id=storyboard_id,
             video_status='生成失败'
         )
@@ -1305,24 +1263,44 @@ class EpisodeDetailWidget(QWidget):
         # 刷新表格显示
         self.load_storyboards()
     
+    def _is_own_storyboard(self, storyboard_id) -> bool:
+        storyboard = storyboard_repo.get(storyboard_id) if storyboard_id else None
+        return storyboard is not None and storyboard.episode_id == self.episode_id
+
+    def _on_job_succeeded(self, job_id, stage, payload, result):
+        """流水线任务完成，只处理本剧集的分镜"""
+        storyboard_id = payload.get('storyboard_id')
+        if not self._is_own_storyboard(storyboard_id):
+            return
+        if stage == storyboard_pipeline.STAGE_SCENE_IMAGE:
+            self.on_scene_generation_finished(storyboard_id, result.get('image_path', ''))
+        elif stage == storyboard_pipeline.STAGE_CREATE_VIDEO:
+            self.on_video_finished(storyboard_id, result.get('task_id', ''))
+
+    def _on_job_failed(self, job_id, stage, payload, error):
+        """流水线任务失败（已不再重试），只处理本剧集的分镜"""
+        storyboard_id = payload.get('storyboard_id')
+        if not self._is_own_storyboard(storyboard_id):
+            return
+        if stage == storyboard_pipeline.STAGE_SCENE_IMAGE:
+            self.on_scene_generation_error(storyboard_id, f"生成场景图失败: {error}")
+        elif stage in (storyboard_pipeline.STAGE_UPLOAD_IMAGE, storyboard_pipeline.STAGE_CREATE_VIDEO):
+            self.on_video_error(storyboard_id, error)
+
+    def _on_scheduled_status_updated(self, storyboard_id, status, video_url):
+        """轮询调度器的状态更新，只处理本剧集的分镜"""
+        storyboard = storyboard_repo.get(storyboard_id)
+        if storyboard is not None and storyboard.episode_id == self.episode_id:
+            self.on_video_status_updated(storyboard_id, status, video_url)
+
     def on_video_status_updated(self, storyboard_id, status, video_url):
         """视频状态更新回调"""
         from loguru import logger
         logger.info(f"分镜 {storyboard_id} 视频状态更新: {status}, URL: {video_url}")
         
-        # 刷新表格显示
-        try:
-            self.load_storyboards()
-        except Exception as e:
-            logger.error(f"刷新表格显示失败: {e}")
-    
-    def on_video_status_error(self, storyboard_id, error_message):
-        """视频状态查询错误回调"""
-        from loguru import logger
-        logger.error(f"分镜 {storyboard_id} 视频状态查询失败: {error_message}")
-        
-        # 刷新表格显示
+        # 刷新表格显示（先提交延迟写入，保证读到最新状态）
         try:
+            db_manager.flush_pending_writes()
             self.load_storyboards()
         except Exception as e:
             logger.error(f"刷新表格显示失败: {e}")
@@ -1333,17 +1311,7 @@ class EpisodeDetailWidget(QWidget):
             from components.export_video_dialog import ExportVideoDialog
             
             # 检查是否有已生成的视频
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*)
-                FROM storyboards
-                WHERE episode_id = ? 
-                  AND video_url IS NOT NULL 
-                  AND video_url != ''
-            """, (self.episode_id,))
-            count = cursor.fetchone()[0]
-            conn.close()
+            count = storyboard_repo.count_with_video(self.episode_id)
             
             if count == 0:
                 from qfluentwidgets import InfoBar, InfoBarPosition
@@ -1414,18 +1382,9 @@ class EpisodeDetailWidget(QWidget):
             from loguru import logger
             
             # 获取当前分镜数据
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, title, duration, dialogue, sound_effect, 
-                       screen_content, camera_movement
-                FROM storyboards
-                WHERE id = ?
-            """, (storyboard_id,))
-            result = cursor.fetchone()
-            conn.close()
+            storyboard = storyboard_repo.get(storyboard_id)
             
-            if not result:
+            if not storyboard:
                 InfoBar.warning(
                     title="提示",
                     content="无法获取分镜数据",
@@ -1439,13 +1398,13 @@ class EpisodeDetailWidget(QWidget):
             
             # 构建数据字典
             storyboard_data = {
-                'id': result[0],
-                'title': result[1] or '',
-                'duration': result[2] or '',
-                'dialogue': result[3] or '',
-                'sound_effect': result[4] or '',
-                'screen_content': result[5] or '',
-                'camera_movement': result[6] or '',
+                'id': storyboard.id,
+                'title': storyboard.title or '',
+                'duration': storyboard.duration or '',
+                'dialogue': storyboard.dialogue or '',
+                'sound_effect': storyboard.sound_effect or '',
+                'screen_content': storyboard.screen_content or '',
+                'camera_movement': storyboard.camera_movement or '',
             }
             
             # 打开编辑对话框
@@ -1454,24 +1413,17 @@ class EpisodeDetailWidget(QWidget):
                 # 保存修改
                 new_data = dialog.get_data()
                 
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE storyboards
-                    SET title = ?, duration = ?, dialogue = ?, 
-                        sound_effect = ?, screen_content = ?, camera_movement = ?
-                    WHERE id = ?
-                """, (
-                    new_data['title'] or None,
-                    new_data['duration'] or None,
-                    new_data['dialogue'] or None,
-                    new_data['sound_effect'] or None,
-                    new_data['screen_content'] or None,
-                    new_data['camera_movement'] or None,
-                    storyboard_id
-                ))
-                conn.commit()
-                conn.close()
+                saved = storyboard_repo.update(
+                    storyboard_id,
+                    title=new_data['title'] or None,
+                    duration=new_data['duration'] or None,
+                    dialogue=new_data['dialogue'] or None,
+                    sound_effect=new_data['sound_effect'] or None,
+                    screen_content=new_data['screen_content'] or None,
+                    camera_movement=new_data['camera_movement'] or None,
+                )
+                if not saved:
+                    raise RuntimeError("写入数据库失败，详见日志")
                 
                 # 刷新表格
                 self.load_storyboards()
@@ -1510,17 +1462,8 @@ class EpisodeDetailWidget(QWidget):
             from loguru import logger
             
             # 获取当前提示词
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT prompt
-                FROM storyboards
-                WHERE id = ?
-            """, (storyboard_id,))
-            result = cursor.fetchone()
-            conn.close()
-            
-            current_prompt = result[0] if result and result[0] else ''
+            storyboard = storyboard_repo.get(storyboard_id)
+            current_prompt = storyboard.prompt if storyboard and storyboard.prompt else ''
             
             # 打开编辑对话框
             dialog = EditStoryboardPromptDialog(current_prompt, self)
@@ -1528,15 +1471,8 @@ class EpisodeDetailWidget(QWidget):
                 # 保存修改
                 new_prompt = dialog.get_prompt()
                 
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE storyboards
-                    SET prompt = ?
-                    WHERE id = ?
-                """, (new_prompt or None, storyboard_id))
-                conn.commit()
-                conn.close()
+                if not storyboard_repo.update(storyboard_id, prompt=new_prompt or None):
+                    raise RuntimeError("写入数据库失败，详见日志")
                 
                 # 刷新表格
                 self.load_storyboards()
@@ -1571,18 +1507,7 @@ class EpisodeDetailWidget(QWidget):
         """手动刷新所有正在生成中的视频状态"""
         try:
             # 获取所有有video_task_id但状态为"生成中"或"等待中"的分镜
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, video_task_id
-                FROM storyboards
-                WHERE episode_id = ? 
-                  AND video_task_id IS NOT NULL 
-                  AND video_task_id != ''
-                  AND (video_status = '生成中' OR video_status = '等待中' OR video_url IS NULL)
-            """, (self.episode_id,))
-            storyboards = cursor.fetchall()
-            conn.close()
+            storyboards = storyboard_repo.list_pending_video(self.episode_id)
             
             if not storyboards:
                 InfoBar.info(
@@ -1596,32 +1521,10 @@ class EpisodeDetailWidget(QWidget):
                 )
                 return
             
-            # 为每个分镜创建状态查询线程
-            from threads.video_status_check_thread import VideoStatusCheckThread
-            
-            self.status_threads = getattr(self, 'status_threads', {})
-            
+            # 交给状态轮询调度器（已在轮询的任务立即查询一次）
             refreshed_count = 0
             for storyboard_id, video_task_id in storyboards:
-                # 如果已有线程在运行，先停止它
-                if storyboard_id in self.status_threads:
-                    old_thread = self.status_threads[storyboard_id]
-                    if old_thread.isRunning():
-                        old_thread.stop()
-                        old_thread.wait(1000)  # 等待1秒
-                
-                # 创建新的状态查询线程
-                status_thread = VideoStatusCheckThread(storyboard_id, video_task_id, self)
-                # 使用lambda但确保正确捕获storyboard_id（信号参数顺序：storyboard_id, status, video_url）
-                status_thread.status_updated.connect(
-                    lambda sid, status, url, sbid=storyboard_id: self.on_video_status_updated(sbid, status, url)
-                )
-                # 错误信号参数顺序：storyboard_id, error_message
-                status_thread.error.connect(
-                    lambda sid, error, sbid=storyboard_id: self.on_video_status_error(sbid, error)
-                )
-                self.status_threads[storyboard_id] = status_thread
-                status_thread.start()
+                status_poll_scheduler.watch_storyboard(storyboard_id, video_task_id, refresh=True)
                 refreshed_count += 1
             
             InfoBar.success(
@@ -1656,7 +1559,7 @@ class EpisodeDetailWidget(QWidget):
         """
         try:
             # 获取分镜信息
-            storyboard_data = db_manager.get_storyboard_by_id(storyboard_id)
+            storyboard_data = storyboard_repo.get(storyboard_id)
             if not storyboard_data:
                 InfoBar.warning(
                     title="提示",
@@ -1711,66 +1614,33 @@ class EpisodeDetailWidget(QWidget):
                 )
                 return
             
-                # 如果是重新生成，清除旧的视频数据
-                if regenerate:
-                    db_manager.update_storyboard_video_info(
-                        storyboard_id=storyboard_id,
-                        video_task_id=None,
-                        video_url=None,
-                        video_status='未生成'
-                    )
-                    # 停止旧的状态查询线程
-                    if hasattr(self, 'status_threads') and storyboard_id in self.status_threads:
-                        old_thread = self.status_threads[storyboard_id]
-                        if old_thread.isRunning():
-                            old_thread.stop()
-                            old_thread.wait(1000)
-                        del self.status_threads[storyboard_id]
-                    # 停止旧的视频生成线程
-                    if hasattr(self, 'video_threads') and storyboard_id in self.video_threads:
-                        old_thread = self.video_threads[storyboard_id]
-                        if old_thread.isRunning():
-                            old_thread.requestInterruption()
-                            old_thread.wait(1000)
-                        del self.video_threads[storyboard_id]
-                    # 刷新界面
-                    self.load_storyboards()
-            
-            # 创建视频生成线程
-            from threads.video_generation_sora2_thread import VideoGenerationSora2Thread
-            from threads.video_status_check_thread import VideoStatusCheckThread
-            
-            self.video_threads = getattr(self, 'video_threads', {})
-            self.status_threads = getattr(self, 'status_threads', {})
-            
-            # 如果该分镜已有线程在运行，不重复创建
-            if storyboard_id in self.video_threads:
-                existing_thread = self.video_threads[storyboard_id]
-                if existing_thread.isRunning():
-                    InfoBar.info(
-                        title="提示",
-                        content="该分镜视频正在生成中，请稍候",
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=2000,
-                        parent=self,
-                    )
-                    return
+            # 如果是重新生成，取消旧的视频任务并清除旧的视频数据
+            if regenerate:
+                storyboard_pipeline.cancel_video(storyboard_id)
+                storyboard_repo.update_video_info(
+                    storyboard_id=storyboard_id,
+                    video_task_id=None,
+                    video_url=None,
+                    video_status='未生成'
+                )
+                # 刷新界面
+                self.load_storyboards()
+            elif storyboard_pipeline.is_video_queued(storyboard_id):
+                # 该分镜已在流水线中，不重复创建
+                InfoBar.info(
+                    title="提示",
+                    content="该分镜视频正在生成中，请稍候",
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=2000,
+                    parent=self,
+                )
+                return
             
-            # 创建新的视频生成线程
-            video_thread = VideoGenerationSora2Thread(storyboard_id, self.project_id, self)
-            video_thread.progress.connect(
-                lambda msg, sid=storyboard_id: self.on_video_progress(sid, msg)
-            )
-            video_thread.finished.connect(
-                lambda task_id, sid=storyboard_id: self.on_video_finished(sid, task_id)
-            )
-            video_thread.error.connect(
-                lambda error, sid=storyboard_id: self.on_video_error(sid, error)
-            )
-            self.video_threads[storyboard_id] = video_thread
-            video_thread.start()
+            # 加入视频流水线（上传场景图 → 创建任务 → 轮询状态）
+            if not storyboard_pipeline.enqueue_video(storyboard_id, self.project_id):
+                raise RuntimeError("添加视频任务失败")
             
             InfoBar.success(
                 title="提示",
@@ -1809,22 +1679,13 @@ class EpisodeDetailWidget(QWidget):
         
         if dialog.exec():
             try:
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                
                 # 清除当前剧集所有分镜的提示词
-                cursor.execute(
-                    """
-                    UPDATE storyboards 
-                    SET prompt = NULL
-                    WHERE episode_id = ?
-                    """,
-                    (self.episode_id,),
+                affected_rows = storyboard_repo.bulk_update(
+                    list(self._row_to_storyboard_id.values()),
+                    {"prompt": None},
                 )
-                
-                affected_rows = cursor.rowcount
-                conn.commit()
-                conn.close()
+                if affected_rows is None:
+                    raise RuntimeError("写入数据库失败，详见日志")
                 
                 # 刷新界面
                 self.load_storyboards()
@@ -1865,27 +1726,20 @@ class EpisodeDetailWidget(QWidget):
         
         if dialog.exec():
             try:
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                
                 # 清除当前剧集所有分镜的详情（不包括提示词）
-                cursor.execute(
-                    """
-                    UPDATE storyboards 
-                    SET title = NULL,
-                        dialogue = NULL,
-                        screen_content = NULL,
-                        camera_movement = NULL,
-                        sound_effect = NULL,
-                        duration = NULL
-                    WHERE episode_id = ?
-                    """,
-                    (self.episode_id,),
+                affected_rows = storyboard_repo.bulk_update(
+                    list(self._row_to_storyboard_id.values()),
+                    {
+                        "title": None,
+                        "dialogue": None,
+                        "screen_content": None,
+                        "camera_movement": None,
+                        "sound_effect": None,
+                        "duration": None,
+                    },
                 )
-                
-                affected_rows = cursor.rowcount
-                conn.commit()
-                conn.close()
+                if affected_rows is None:
+                    raise RuntimeError("写入数据库失败，详见日志")
                 
                 # 刷新界面
                 self.load_storyboards()
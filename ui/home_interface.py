@@ -12,6 +12,7 @@ from qfluentwidgets import (
 from ui.flow_layout import FlowLayout
 from ui.drag_drop_text_edit import DragDropTextEdit
 from threads.image_upload_thread import ImageUploadThread
+from utils.task_executor import RESOURCE_UPLOAD, task_executor
 
 class HomeInterface(QWidget):
     """主页界面"""
@@ -170,7 +171,7 @@ class HomeInterface(QWidget):
         upload_thread = ImageUploadThread(file_path, token)
         upload_thread.progress.connect(self.on_upload_progress)
         upload_thread.finished.connect(self.on_upload_finished)
-        upload_thread.start()
+        task_executor.submit(upload_thread, resource=RESOURCE_UPLOAD)
 
         self.upload_threads.append(upload_thread)
 
@@ -10,7 +10,7 @@ from qfluentwidgets import (
     SegmentedWidget, Pivot
 )
 from database_manager import db_manager
-import sqlite3
+from repositories import character_repo, episode_repo, project_repo
 
 
 class EpisodeCard(CardWidget):
@@ -218,29 +218,10 @@ class ProjectDetailWidget(QWidget):
     def load_project_data(self):
         """加载项目数据"""
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, title, cover_image, novel_file_path, novel_folder_path, 
-                       style, aspect_ratio, description, chapter_name
-                FROM projects
-                WHERE id = ?
-            ''', (self.project_id,))
-            project = cursor.fetchone()
-            conn.close()
+            project = project_repo.get(self.project_id)
             
             if project:
-                self.project_data = {
-                    'id': project[0],
-                    'title': project[1],
-                    'cover_image': project[2],
-                    'novel_file_path': project[3],
-                    'novel_folder_path': project[4],
-                    'style': project[5],
-                    'aspect_ratio': project[6],
-                    'description': project[7],
-                    'chapter_name': project[8]
-                }
+                self.project_data = project
                 
                 # 更新界面
                 self.update_ui()
@@ -412,66 +393,44 @@ class ProjectDetailWidget(QWidget):
     def save_chapter_name(self):
         """保存章节名"""
         chapter_name = self.chapter_name_input.text().strip()
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE projects
-                SET chapter_name = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (chapter_name, self.project_id))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            from loguru import logger
-            logger.error(f"保存章节名失败: {e}")
+        project_repo.update(self.project_id, chapter_name=chapter_name)
             
     def load_episodes(self):
-        """加载剧集列表"""
+        """在后台读取剧集，完成后刷新网格"""
+        episode_repo.list_by_project_async(
+            self.project_id, on_result=self._populate_episodes, owner=self
+        )
+
+    def _populate_episodes(self, episodes):
+        """把剧集卡片填入网格"""
         # 清空现有剧集
         while self.episodes_grid.count():
             item = self.episodes_grid.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
         
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, episode_number, episode_name, file_path
-                FROM episodes
-                WHERE project_id = ?
-                ORDER BY episode_number ASC
-            ''', (self.project_id,))
-            episodes = cursor.fetchall()
-            conn.close()
-            
-            # 网格布局，每行6个（与角色库一致）
-            row = 0
-            col = 0
-            for episode in episodes:
-                episode_data = {
-                    'id': episode[0],
-                    'episode_number': episode[1],
-                    'episode_name': episode[2],
-                    'file_path': episode[3]
-                }
-                card = EpisodeCard(episode_data, self)
-                card.edit_clicked.connect(self.on_edit_episode)
-                card.delete_clicked.connect(self.on_delete_episode)
-                self.episodes_grid.addWidget(card, row, col)
-                
-                col += 1
-                if col >= 6:
-                    col = 0
-                    row += 1
-                
-        except Exception as e:
-            from loguru import logger
-            logger.error(f"加载剧集列表失败: {e}")
+        # 网格布局，每行6个（与角色库一致）
+        row = 0
+        col = 0
+        for episode in episodes:
+            card = EpisodeCard(episode, self)
+            card.edit_clicked.connect(self.on_edit_episode)
+            card.delete_clicked.connect(self.on_delete_episode)
+            self.episodes_grid.addWidget(card, row, col)
+            
+            col += 1
+            if col >= 6:
+                col = 0
+                row += 1
             
     def load_characters(self):
-        """加载角色列表"""
+        """在后台读取角色，完成后刷新网格"""
+        character_repo.list_by_project_async(
+            self.project_id, on_result=self._populate_characters, owner=self
+        )
+
+    def _populate_characters(self, characters):
+        """把角色卡片填入网格"""
         # 清空现有角色
         while self.characters_grid.count():
             item = self.characters_grid.takeAt(0)
@@ -485,43 +444,19 @@ class ProjectDetailWidget(QWidget):
                 # 延迟删除，避免在事件处理中删除对象
                 widget.deleteLater()
         
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, name, description, front_image, sora_character_username, sora_status
-                FROM characters
-                WHERE project_id = ?
-                ORDER BY created_at ASC
-            ''', (self.project_id,))
-            characters = cursor.fetchall()
-            conn.close()
-            
-            # 网格布局，每行6个（与项目卡片一致）
-            from ui.character_card import CharacterCard
-            row = 0
-            col = 0
-            for char in characters:
-                character_data = {
-                    'id': char[0],
-                    'name': char[1],
-                    'description': char[2],
-                    'front_image': char[3],
-                    'sora_character_username': char[4],
-                    'sora_status': char[5]
-                }
-                character_card = CharacterCard(character_data, self)
-                character_card.character_clicked.connect(self.on_character_clicked)
-                self.characters_grid.addWidget(character_card, row, col)
-                
-                col += 1
-                if col >= 6:
-                    col = 0
-                    row += 1
-                    
-        except Exception as e:
-            from loguru import logger
-            logger.error(f"加载角色列表失败: {e}")
+        # 网格布局，每行6个（与项目卡片一致）
+        from ui.character_card import CharacterCard
+        row = 0
+        col = 0
+        for character in characters:
+            character_card = CharacterCard(character, self)
+            character_card.character_clicked.connect(self.on_character_clicked)
+            self.characters_grid.addWidget(character_card, row, col)
+            
+            col += 1
+            if col >= 6:
+                col = 0
+                row += 1
             
     def on_character_clicked(self, character_id):
         """点击角色卡片"""
@@ -537,19 +472,11 @@ class ProjectDetailWidget(QWidget):
         from PyQt5.QtCore import Qt
         from loguru import logger
         from threads.character_image_generation_thread import CharacterImageGenerationThread
+        from utils.task_executor import PRIORITY_LOW, RESOURCE_IMAGE, task_executor
         
         # 获取所有角色
         try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, name
-                FROM characters
-                WHERE project_id = ?
-                ORDER BY created_at ASC
-            ''', (self.project_id,))
-            characters = cursor.fetchall()
-            conn.close()
+            characters = character_repo.list_by_project(self.project_id)
             
             if not characters:
                 InfoBar.warning(
@@ -563,13 +490,13 @@ class ProjectDetailWidget(QWidget):
                 )
                 return
             
-            # 检查是否有生成任务在运行
+            # 检查是否有生成任务在运行或排队
             if hasattr(self, 'batch_generation_threads') and self.batch_generation_threads:
-                running_count = sum(1 for t in self.batch_generation_threads.values() if t and t.isRunning())
+                running_count = sum(1 for t in self.batch_generation_threads.values() if t and not t.isFinished())
                 if running_count > 0:
                     InfoBar.warning(
                         title='提示',
-                        content=f'已有 {running_count} 个生成任务正在进行中，请稍候...',
+                        content=f'已有 {running_count} 个生成任务正在进行或排队中，请稍候...',
                         orient=Qt.Horizontal,
                         isClosable=True,
                         position=InfoBarPosition.TOP,
@@ -611,9 +538,15 @@ class ProjectDetailWidget(QWidget):
             self.batch_generation_completed = 0
             self.batch_generation_total = len(characters)
             
-            # 为每个角色创建生成线程
-            for character_id, character_name in characters:
-                thread = CharacterImageGenerationThread(character_id, self.project_id, self)
+            # 为每个角色创建生成线程；已有图片的角色是要重新生成，不使用生成图片缓存
+            for character in characters:
+                character_id = character.id
+                thread = CharacterImageGenerationThread(
+                    character_id,
+                    self.project_id,
+                    self,
+                    force_regenerate=bool(character.front_image),
+                )
                 # 使用闭包正确捕获 character_id
                 def make_progress_handler(cid):
                     return lambda msg: self.on_batch_generation_progress(cid, msg)
@@ -626,11 +559,8 @@ class ProjectDetailWidget(QWidget):
                 thread.finished.connect(make_finished_handler(character_id))
                 thread.error.connect(make_error_handler(character_id))
                 self.batch_generation_threads[character_id] = thread
-                thread.start()
-                
-                # 避免同时启动太多线程，每个线程启动后稍微延迟
-                from PyQt5.QtCore import QThread
-                QThread.msleep(100)
+                # 由任务执行器按生图并发上限依次启动
+                task_executor.submit(thread, resource=RESOURCE_IMAGE, priority=PRIORITY_LOW)
             
         except Exception as e:
             logger.error(f"批量生成角色图失败: {e}")
@@ -760,35 +690,19 @@ class ProjectDetailWidget(QWidget):
         """编辑剧集 - 打开剧集详情页面"""
         try:
             # 获取剧集信息
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT episode_number, project_id
-                FROM episodes
-                WHERE id = ?
-            ''', (episode_id,))
-            episode = cursor.fetchone()
-            
+            episode = episode_repo.get(episode_id)
             if not episode:
-                conn.close()
                 return
             
-            episode_number = episode[0]
-            project_id = episode[1]
+            episode_number = episode.episode_number
+            project_id = episode.project_id
             
             # 获取项目标题
-            cursor.execute('''
-                SELECT title
-                FROM projects
-                WHERE id = ?
-            ''', (project_id,))
-            project = cursor.fetchone()
-            conn.close()
-            
+            project = project_repo.get(project_id)
             if not project:
                 return
             
-            project_title = project[0]
+            project_title = project.title
             
             # 获取主窗口并添加剧集详情页面
             main_window = self.window()
@@ -822,11 +736,8 @@ class ProjectDetailWidget(QWidget):
                     main_window.remove_episode_detail_page(episode_id, delete_data=True)
                 else:
                     # 如果没有主窗口方法，直接删除数据库
-                    conn = sqlite3.connect(db_manager.db_path)
-                    cursor = conn.cursor()
-                    cursor.execute('DELETE FROM episodes WHERE id = ?', (episode_id,))
-                    conn.commit()
-                    conn.close()
+                    if not episode_repo.delete(episode_id):
+                        raise RuntimeError("写入数据库失败，详见日志")
                 
                 from qfluentwidgets import InfoBar, InfoBarPosition
                 InfoBar.success(
@@ -16,6 +16,8 @@ from qfluentwidgets import (
 
 from database_manager import db_manager
 from constants import APP_VERSION, DISPLAY_API_PROXY_URL, WECHAT_ID
+from threads import storyboard_pipeline
+from utils.image_gen_cache import enabled as image_gen_cache_enabled
 
 
 class SettingsInterface(QWidget):
@@ -142,6 +144,21 @@ class SettingsInterface(QWidget):
         self.image_model_combo.currentTextChanged.connect(self.save_image_model)
         api_layout.addWidget(self.image_model_combo)
 
+        # 场景图并发数（一键场景图同时生成的数量，过大容易被接口限流）
+        scene_concurrency_label = BodyLabel('场景图同时生成数量:')
+        api_layout.addWidget(scene_concurrency_label)
+        self.scene_concurrency_combo = QComboBox()
+        self.scene_concurrency_combo.addItems(
+            [str(n) for n in storyboard_pipeline.SCENE_IMAGE_CONCURRENCY_RANGE]
+        )
+        self.scene_concurrency_combo.currentTextChanged.connect(self.save_scene_concurrency)
+        api_layout.addWidget(self.scene_concurrency_combo)
+
+        # 生成图片缓存：提示词等参数完全相同时复用之前生成的图片（重新生成已有图片时不使用）
+        self.image_gen_cache_checkbox = CheckBox('缓存生成的图片（提示词相同时直接复用，节省时间和费用）')
+        self.image_gen_cache_checkbox.stateChanged.connect(self.save_image_gen_cache)
+        api_layout.addWidget(self.image_gen_cache_checkbox)
+
         # 保存按钮
         self.save_settings_btn = PrimaryPushButton('保存设置')
         self.save_settings_btn.clicked.connect(self.save_settings)
@@ -223,6 +240,17 @@ class SettingsInterface(QWidget):
         if index >= 0:
             self.image_model_combo.setCurrentIndex(index)
 
+        index = self.scene_concurrency_combo.findText(str(storyboard_pipeline.scene_image_concurrency()))
+        if index >= 0:
+            # 加载时不触发保存
+            self.scene_concurrency_combo.blockSignals(True)
+            self.scene_concurrency_combo.setCurrentIndex(index)
+            self.scene_concurrency_combo.blockSignals(False)
+
+        self.image_gen_cache_checkbox.blockSignals(True)
+        self.image_gen_cache_checkbox.setChecked(image_gen_cache_enabled())
+        self.image_gen_cache_checkbox.blockSignals(False)
+
         # 加载OSS配置
         oss_bucket = db_manager.load_config('oss_bucket_domain', '')
         self.oss_bucket_input.setText(oss_bucket)
@@ -263,6 +291,15 @@ class SettingsInterface(QWidget):
         """保存生图模型选择"""
         db_manager.save_config('image_model', model_name, 'string', '生图模型（用于生成角色图片和场景图片）')
 
+    def save_scene_concurrency(self, value):
+        """保存场景图并发数（立即生效）"""
+        storyboard_pipeline.set_scene_image_concurrency(int(value))
+
+    def save_image_gen_cache(self):
+        """保存是否缓存生成的图片"""
+        db_manager.save_config('image_gen_cache_enabled', self.image_gen_cache_checkbox.isChecked(), 'boolean',
+                               '缓存生成的图片（提示词相同时复用）')
+
     def save_oss_bucket(self):
         """保存OSS Bucket域名"""
         oss_bucket = self.oss_bucket_input.text().strip()
@@ -510,12 +547,12 @@ class SettingsInterface(QWidget):
         if dialog.exec():
             try:
                 db_manager.clear_tasks()
-                import sqlite3
-                conn = sqlite3.connect(db_manager.db_path)
+                conn = db_manager.get_connection()
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM config')
                 conn.commit()
                 conn.close()
+                db_manager.invalidate_config_cache()
 
                 db_manager.create_config_table()
 
@@ -3,15 +3,17 @@
 """
 
 from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QScrollArea, QMenu
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QScrollArea, QMenu, QApplication
+)
 from PyQt5.QtGui import QPixmap, QPainter, QFont, QContextMenuEvent
 from qfluentwidgets import (
-    TitleLabel, PushButton, PrimaryPushButton, CardWidget, BodyLabel
+    TitleLabel, PushButton, PrimaryPushButton, CardWidget, BodyLabel, SearchLineEdit
 )
 from constants import PROJECT_NAME
 from database_manager import db_manager
+from repositories import project_repo, run_async
 from ui.image_widget import ImageWidget
-import sqlite3
 
 
 class ProjectCard(CardWidget):
@@ -93,6 +95,14 @@ class TaskListWidget(QWidget):
         header_layout.addWidget(title)
         header_layout.addStretch()
 
+        # 全局搜索（提示词、分镜、角色）
+        self.search_edit = SearchLineEdit(self)
+        self.search_edit.setPlaceholderText("搜索提示词、分镜、角色")
+        self.search_edit.setFixedWidth(260)
+        self.search_edit.searchSignal.connect(self.on_search)
+        self.search_edit.returnPressed.connect(self.search_edit.search)
+        header_layout.addWidget(self.search_edit)
+
         # 添加项目按钮
         self.add_project_btn = PrimaryPushButton('添加项目')
         self.add_project_btn.clicked.connect(self.show_add_project_dialog)
@@ -115,49 +125,30 @@ class TaskListWidget(QWidget):
         layout.addWidget(scroll)
 
     def load_projects(self):
-        """加载项目列表"""
+        """在后台读取项目，完成后刷新网格"""
+        project_repo.list_all_async(on_result=self._populate_projects, owner=self)
+
+    def _populate_projects(self, projects):
+        """把项目卡片填入网格"""
         # 清空现有项目
         while self.grid_layout.count():
             item = self.grid_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
         
-        # 从数据库加载项目
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, title, cover_image, description, created_at
-                FROM projects
-                ORDER BY created_at DESC
-            ''')
-            projects = cursor.fetchall()
-            conn.close()
+        # 创建项目卡片（6个一行）
+        row = 0
+        col = 0
+        for project in projects:
+            card = ProjectCard(project, self)
+            card.project_clicked.connect(self.on_project_clicked)
+            card.delete_requested.connect(self.on_delete_project)
+            self.grid_layout.addWidget(card, row, col)
             
-            # 创建项目卡片（6个一行）
-            row = 0
-            col = 0
-            for project in projects:
-                project_data = {
-                    'id': project[0],
-                    'title': project[1],
-                    'cover_image': project[2],
-                    'description': project[3],
-                    'created_at': project[4]
-                }
-                card = ProjectCard(project_data, self)
-                card.project_clicked.connect(self.on_project_clicked)
-                card.delete_requested.connect(self.on_delete_project)
-                self.grid_layout.addWidget(card, row, col)
-                
-                col += 1
-                if col >= 6:
-                    col = 0
-                    row += 1
-                    
-        except Exception as e:
-            from loguru import logger
-            logger.error(f"加载项目列表失败: {e}")
+            col += 1
+            if col >= 6:
+                col = 0
+                row += 1
 
     def on_project_clicked(self, project_id):
         """点击项目卡片"""
@@ -179,6 +170,76 @@ class TaskListWidget(QWidget):
                 main_window.addSubInterface(detail_widget, None, "项目详情")
                 main_window.stackedWidget.setCurrentWidget(detail_widget)
 
+    def on_search(self, text: str):
+        """全文搜索，并在搜索框下方弹出结果菜单"""
+        text = (text or "").strip()
+        if not text:
+            return
+        run_async(
+            db_manager.search, text, scope='all', limit=20,
+            on_result=lambda hits: self._show_search_results(text, hits),
+            owner=self, tag='search',
+        )
+
+    def _show_search_results(self, text: str, hits: list):
+        """弹出搜索结果菜单"""
+        if not hits:
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.info(
+                title='搜索',
+                content=f'未找到与“{text}”相关的内容',
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self
+            )
+            return
+
+        menu = QMenu(self)
+        for hit in hits:
+            action = menu.addAction(self._format_search_hit(hit))
+            action.triggered.connect(lambda checked=False, h=hit: self.on_search_hit_selected(h))
+        menu.exec_(self.search_edit.mapToGlobal(self.search_edit.rect().bottomLeft()))
+
+    def _format_search_hit(self, hit: dict) -> str:
+        """搜索结果的菜单文本"""
+        snippet = (hit.get('snippet') or '').replace('\n', ' ')
+        if len(snippet) > 60:
+            snippet = snippet[:60] + '…'
+        if hit['scope'] == 'storyboards':
+            return (f"[分镜] {hit.get('project_title') or ''} 第{hit.get('episode_number')}集 "
+                    f"#{hit.get('sequence_number')}: {snippet}")
+        if hit['scope'] == 'characters':
+            return f"[角色] {hit.get('title') or ''} ({hit.get('project_title') or ''}): {snippet}"
+        return f"[任务] {hit.get('status') or ''}: {snippet}"
+
+    def on_search_hit_selected(self, hit: dict):
+        """打开搜索结果"""
+        scope = hit['scope']
+        if scope == 'storyboards':
+            main_window = self.window()
+            if hasattr(main_window, 'add_episode_detail_page'):
+                main_window.add_episode_detail_page(
+                    hit['episode_id'], hit['project_id'],
+                    hit['episode_number'], hit.get('project_title') or ''
+                )
+        elif scope == 'characters':
+            self.on_project_clicked(hit['project_id'])
+        else:
+            # 任务没有独立页面，复制任务ID便于查询
+            QApplication.clipboard().setText(hit.get('task_id') or '')
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.success(
+                title='已复制',
+                content=f"任务ID {hit.get('task_id')} 已复制到剪贴板",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self
+            )
+
     def on_delete_project(self, project_id):
         """删除项目"""
         from components.delete_project_dialog import DeleteProjectDialog
@@ -186,12 +247,9 @@ class TaskListWidget(QWidget):
         if dialog.exec_() == 1:  # QDialog.Accepted
             # 从数据库删除项目
             try:
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
                 # 删除项目（外键约束会自动删除关联的episodes、characters、storyboards）
-                cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-                conn.commit()
-                conn.close()
+                if not project_repo.delete(project_id):
+                    raise RuntimeError("写入数据库失败，详见日志")
                 
                 from qfluentwidgets import InfoBar, InfoBarPosition
                 InfoBar.success(
@@ -3,7 +3,6 @@
 """
 
 import os
-import sqlite3
 import shutil
 from pathlib import Path
 from PyQt5.QtCore import Qt, QUrl
@@ -14,6 +13,7 @@ from qfluentwidgets import (
     InfoBar, InfoBarPosition
 )
 from database_manager import db_manager
+from repositories import voice_repo
 from loguru import logger
 
 
@@ -106,14 +106,14 @@ class VoiceLibraryInterface(QWidget):
                 file_size = os.path.getsize(dest_path)
                 
                 # 保存到数据库
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO voice_library (sequence_number, name, file_path, file_size)
-                    VALUES (?, ?, ?, ?)
-                ''', (next_sequence, source_path.stem, str(dest_path), file_size))
-                conn.commit()
-                conn.close()
+                voice_id = voice_repo.create(
+                    sequence_number=next_sequence,
+                    name=source_path.stem,
+                    file_path=str(dest_path),
+                    file_size=file_size,
+                )
+                if voice_id is None:
+                    raise RuntimeError("写入数据库失败，详见日志")
                 
                 success_count += 1
                 logger.info(f"导入音色成功: {file_name} -> {dest_path}")
@@ -145,79 +145,62 @@ class VoiceLibraryInterface(QWidget):
     
     def get_next_sequence_number(self):
         """获取下一个序号"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT MAX(sequence_number) FROM voice_library')
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result and result[0] is not None:
-                return result[0] + 1
-            else:
-                return 1
-        except Exception as e:
-            logger.error(f"获取下一个序号失败: {e}")
-            return 1
+        return voice_repo.next_sequence_number()
     
     def load_voices(self):
-        """加载音色列表"""
-        try:
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, sequence_number, name, file_path
-                FROM voice_library
-                ORDER BY sequence_number ASC
-            ''')
-            voices = cursor.fetchall()
-            conn.close()
+        """在后台读取音色列表，完成后刷新表格"""
+        voice_repo.list_all_async(
+            on_result=self._populate_voices,
+            on_error=self._on_load_voices_error,
+            owner=self,
+        )
+
+    def _populate_voices(self, voices):
+        """把音色填入表格"""
+        # 清空表格
+        self.voice_table.setRowCount(0)
+        
+        # 填充表格
+        for voice in voices:
+            voice_id, sequence, name, file_path = voice.id, voice.sequence_number, voice.name, voice.file_path
+            row = self.voice_table.rowCount()
+            self.voice_table.insertRow(row)
             
-            # 清空表格
-            self.voice_table.setRowCount(0)
+            # 序号
+            sequence_item = QTableWidgetItem(str(sequence))
+            sequence_item.setTextAlignment(Qt.AlignCenter)
+            self.voice_table.setItem(row, 0, sequence_item)
             
-            # 填充表格
-            for voice in voices:
-                voice_id, sequence, name, file_path = voice
-                row = self.voice_table.rowCount()
-                self.voice_table.insertRow(row)
-                
-                # 序号
-                sequence_item = QTableWidgetItem(str(sequence))
-                sequence_item.setTextAlignment(Qt.AlignCenter)
-                self.voice_table.setItem(row, 0, sequence_item)
-                
-                # 名称
-                name_item = QTableWidgetItem(name)
-                self.voice_table.setItem(row, 1, name_item)
-                
-                # 文件路径
-                path_item = QTableWidgetItem(file_path)
-                path_item.setToolTip(file_path)
-                self.voice_table.setItem(row, 2, path_item)
-                
-                # 播放按钮
-                play_btn = PushButton("播放" if self.current_playing_id != voice_id else "停止")
-                play_btn.clicked.connect(lambda checked, vid=voice_id, fp=file_path: self.toggle_play(vid, fp))
-                self.voice_table.setCellWidget(row, 3, play_btn)
-                
-                # 删除按钮
-                delete_btn = PushButton("删除")
-                delete_btn.setStyleSheet("color: red;")
-                delete_btn.clicked.connect(lambda checked, vid=voice_id, fp=file_path: self.delete_voice(vid, fp))
-                self.voice_table.setCellWidget(row, 4, delete_btn)
-                
-        except Exception as e:
-            logger.error(f"加载音色列表失败: {e}")
-            InfoBar.error(
-                title='错误',
-                content=f'加载音色列表失败: {str(e)}',
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.TOP,
-                duration=3000,
-                parent=self
-            )
+            # 名称
+            name_item = QTableWidgetItem(name)
+            self.voice_table.setItem(row, 1, name_item)
+            
+            # 文件路径
+            path_item = QTableWidgetItem(file_path)
+            path_item.setToolTip(file_path)
+            self.voice_table.setItem(row, 2, path_item)
+            
+            # 播放按钮
+            play_btn = PushButton("播放" if self.current_playing_id != voice_id else "停止")
+            play_btn.clicked.connect(lambda checked, vid=voice_id, fp=file_path: self.toggle_play(vid, fp))
+            self.voice_table.setCellWidget(row, 3, play_btn)
+            
+            # 删除按钮
+            delete_btn = PushButton("删除")
+            delete_btn.setStyleSheet("color: red;")
+            delete_btn.clicked.connect(lambda checked, vid=voice_id, fp=file_path: self.delete_voice(vid, fp))
+            self.voice_table.setCellWidget(row, 4, delete_btn)
+
+    def _on_load_voices_error(self, message: str):
+        InfoBar.error(
+            title='错误',
+            content=f'加载音色列表失败: {message}',
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
     
     def toggle_play(self, voice_id, file_path):
         """切换播放/停止"""
@@ -271,26 +254,9 @@ class VoiceLibraryInterface(QWidget):
             if Path(file_path).exists():
                 os.remove(file_path)
             
-            # 获取当前序号
-            conn = sqlite3.connect(db_manager.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT sequence_number FROM voice_library WHERE id = ?', (voice_id,))
-            result = cursor.fetchone()
-            deleted_sequence = result[0] if result else None
-            
-            # 从数据库删除
-            cursor.execute('DELETE FROM voice_library WHERE id = ?', (voice_id,))
-            
-            # 重新排序序号（删除后，后面的序号都要减1）
-            if deleted_sequence:
-                cursor.execute('''
-                    UPDATE voice_library
-                    SET sequence_number = sequence_number - 1
-                    WHERE sequence_number > ?
-                ''', (deleted_sequence,))
-            
-            conn.commit()
-            conn.close()
+            # 从数据库删除（后面的序号依次减1）
+            if not voice_repo.delete(voice_id):
+                raise RuntimeError("写入数据库失败，详见日志")
             
             InfoBar.success(
                 title='删除成功',
@@ -0,0 +1,165 @@
+"""
+SQLite 连接管理
+每个线程持有一个长连接，统一设置 WAL 与常用 PRAGMA，并启用预编译语句缓存
+"""
+
+import sqlite3
+import threading
+import weakref
+from typing import Optional
+
+from loguru import logger
+
+
+# 每个连接缓存的预编译语句数量（sqlite3 默认 128）
+STATEMENT_CACHE_SIZE = 256
+
+# 连接级 PRAGMA，在连接创建时执行一次
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+)
+
+
+class _ThreadConnection:
+    """单个线程持有的连接及其引用计数"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.depth = 0
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """
+    线程连接的轻量句柄
+
+    用法与 sqlite3.Connection 一致；close() 只是归还连接而不真正关闭。
+    当线程内最后一个句柄归还时，未提交的事务会被回滚，
+    与原先“关闭连接即丢弃未提交修改”的行为保持一致。
+    """
+
+    __slots__ = ('_holder', '_released')
+
+    def __init__(self, holder: _ThreadConnection):
+        self._holder = holder
+        self._released = False
+        holder.depth += 1
+
+    def __getattr__(self, name):
+        if name in PooledConnection.__slots__:
+            raise AttributeError(name)
+        return getattr(self._holder.conn, name)
+
+    def __setattr__(self, name, value):
+        if name in PooledConnection.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._holder.conn, name, value)
+
+    def __enter__(self):
+        self._holder.conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._holder.conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        """归还连接"""
+        if self._released:
+            return
+        self._released = True
+        holder = self._holder
+        holder.depth -= 1
+        if holder.depth <= 0:
+            holder.depth = 0
+            try:
+                if holder.conn.in_transaction:
+                    holder.conn.rollback()
+                holder.conn.row_factory = None
+            except sqlite3.ProgrammingError:
+                # 连接已被 close_all 关闭
+                pass
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    """按线程分配长连接的连接管理器"""
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._holders = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wal_checked = False
+
+    def _create_connection(self) -> sqlite3.Connection:
+        # check_same_thread=False 仅用于在退出时由主线程统一关闭，连接本身不会跨线程使用
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        with self._lock:
+            if not self._wal_checked:
+                # journal_mode 是数据库级别的持久设置，只需设置一次
+                try:
+                    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()
+                    logger.info(f"SQLite journal_mode: {mode[0] if mode else 'unknown'}")
+                except sqlite3.Error as e:
+                    logger.warning(f"设置 WAL 模式失败: {e}")
+                self._wal_checked = True
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _holder(self) -> _ThreadConnection:
+        holder: Optional[_ThreadConnection] = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = _ThreadConnection(self._create_connection())
+            self._local.holder = holder
+            with self._lock:
+                self._holders.add(holder)
+        return holder
+
+    def connect(self) -> PooledConnection:
+        """获取当前线程的连接句柄"""
+        return PooledConnection(self._holder())
+
+    def close_current(self):
+        """关闭当前线程的连接（线程退出前可调用）"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None:
+            self._local.holder = None
+            with self._lock:
+                self._holders.discard(holder)
+            holder.close()
+
+    def close_all(self):
+        """关闭所有线程的连接（应用退出时调用）"""
+        with self._lock:
+            holders = list(self._holders)
+            self._holders.clear()
+        for holder in holders:
+            holder.close()
+        self._local = threading.local()
+        logger.info(f"已关闭 {len(holders)} 个数据库连接")
+
+    def connection_count(self) -> int:
+        """当前存活的连接数"""
+        with self._lock:
+            return len(self._holders)
@@ -0,0 +1,557 @@
+"""
+数据库结构版本迁移
+schema_version 表记录已执行的迁移版本，启动时只需读取一次版本号；
+有待执行的迁移时，在同一个事务中按顺序全部执行
+"""
+
+import sqlite3
+from typing import Callable, List, NamedTuple, Tuple
+
+from loguru import logger
+from constants import API_BASE_URL
+
+
+class Migration(NamedTuple):
+    """单个迁移步骤"""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+# 默认配置项 (key, value, type, description)
+DEFAULT_CONFIGS = [
+    ('api_key', '', 'string', 'Sora API Key'),
+    ('api_base_url', API_BASE_URL, 'string', 'API Base URL'),
+    ('image_token', '1c17b11693cb5ec63859b091c5b9c1b2', 'string', '图床Token'),
+    ('default_model', 'sora-2', 'string', '默认模型'),
+    ('default_duration', '10', 'integer', '默认时长(秒)'),
+    ('add_task_default_resolution', '16:9', 'string', '添加任务默认分辨率'),
+    ('add_task_default_duration', '10', 'integer', '添加任务默认时长'),
+    ('auto_download', 'true', 'boolean', '自动下载视频'),
+    ('video_save_path', '', 'string', '视频保存路径'),
+    ('theme', 'auto', 'string', '主题设置(light/dark/auto)'),
+    # AI 标题相关默认配置
+    ('ai_title_enabled', 'false', 'boolean', 'AI标题开关'),
+    ('ai_title_prompt', '只返回一个中文视频标题，不要返回任何解释或额外内容；不使用引号、编号、前后缀；不换行；不超过30字，风格有趣吸引人', 'string', 'AI标题提示词'),
+    # 提示词设置默认值
+    ('main_image_prompt', '根据提供的商品主图生成标准电商白底图：\n- 背景：纯白(#FFFFFF)，干净无纹理；\n- 主体：保持原始外观与质感，不改变颜色与结构；\n- 抠图：边缘干净无锯齿，无残留背景；\n- 光线：均匀柔和，无明显阴影或色偏；\n- 构图：产品居中，适度留白，画面整洁；\n- 分辨率：至少 2048×2048；\n- 输出：PNG(透明背景)或JPEG(白底)，适合电商展示。', 'string', '主图处理提示词(白底图生成)'),
+    ('scene_generation_prompt', '请基于白底图与商品标题生成一个 15 秒的产品介绍视频脚本与镜头计划。要求：\n1) 产品简短描述与核心卖点(中文)。\n2) 旁白文案(中文、自然口语，节奏紧凑)。\n3) 背景音乐风格：轻快现代，音量不压旁白。\n4) 运镜设计：推进/摇移/环绕等，流畅自然。\n5) 时间轴划分为 2–3 个镜头，每个镜头标注【时长/画面内容/镜头运动/旁白/字幕】。\n6) 画面以白底图为核心，可加入品牌色点缀。\n7) 结尾包含行动号召(如“立即了解/购买”)。\n总时长严格控制在 15 秒。\n请按如下格式输出：\nShot 1（0–5s）：画面内容…｜镜头运动…｜旁白…｜字幕…\nShot 2（5–10s）：…\nShot 3（10–15s）：…', 'string', '场景生成提示词(15秒产品介绍)')
+]
+
+# 迁移完成后必须存在的表
+REQUIRED_TABLES = ['config', 'tasks', 'voice_library']
+
+
+def insert_default_configs(cursor: sqlite3.Cursor):
+    """插入默认配置（已存在的键保持不变）"""
+    cursor.executemany('''
+        INSERT OR IGNORE INTO config (key, value, type, description)
+        VALUES (?, ?, ?, ?)
+    ''', DEFAULT_CONFIGS)
+
+
+def _table_columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: List[Tuple[str, str]]):
+    """为旧表补齐缺失的列"""
+    existing = _table_columns(cursor, table)
+    for name, col_type in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+            logger.info(f"已为{table}表添加{name}列")
+
+
+def _migration_1_base_schema(cursor: sqlite3.Cursor):
+    """基础表结构"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT UNIQUE NOT NULL,
+            value TEXT,
+            type TEXT DEFAULT 'string',
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    insert_default_configs(cursor)
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT UNIQUE NOT NULL,
+            prompt TEXT NOT NULL,
+            model TEXT DEFAULT 'sora-2',
+            orientation TEXT DEFAULT 'portrait',
+            size TEXT DEFAULT 'small',
+            duration INTEGER DEFAULT 10,
+            images TEXT,
+            video_url TEXT,
+            thumbnail_url TEXT,
+            status TEXT DEFAULT 'pending',
+            error_message TEXT,
+            progress INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_task_id ON tasks(task_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)')
+
+    # Chat模式任务
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT UNIQUE NOT NULL,
+            model TEXT NOT NULL,
+            is_chat_mode INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES tasks(task_id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_tasks_task_id ON chat_tasks(task_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_tasks_model ON chat_tasks(model)')
+
+    # 高清放大服务器
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upscale_servers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            enabled INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # 为url建立唯一索引，避免重复配置同一地址
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_upscale_servers_url ON upscale_servers(url)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_servers_enabled ON upscale_servers(enabled)')
+
+    # 项目
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            cover_image TEXT,
+            novel_file_path TEXT,
+            novel_folder_path TEXT,
+            style TEXT,
+            aspect_ratio TEXT DEFAULT '9:16',
+            description TEXT,
+            chapter_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_created_at ON projects(created_at)')
+
+    # 剧集
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS episodes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            episode_number INTEGER NOT NULL,
+            episode_name TEXT,
+            file_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_episodes_project_id ON episodes(project_id)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_episodes_project_episode ON episodes(project_id, episode_number)')
+
+    # 音色库（角色表引用）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS voice_library (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sequence_number INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_size INTEGER,
+            duration REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_voice_library_sequence ON voice_library(sequence_number)')
+
+    # 角色
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS characters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            front_image TEXT,
+            side_image TEXT,
+            back_image TEXT,
+            id_card_image TEXT,
+            sora_character_id TEXT,
+            sora_character_username TEXT,
+            sora_status TEXT DEFAULT '未上传',
+            voice_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE,
+            FOREIGN KEY (voice_id) REFERENCES voice_library(id) ON DELETE SET NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_characters_project_id ON characters(project_id)')
+
+    # 分镜
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS storyboards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            episode_id INTEGER NOT NULL,
+            sequence_number INTEGER NOT NULL,
+            storyboard_detail TEXT,
+            scene_image TEXT,
+            video_prompt TEXT,
+            video_url TEXT,
+            video_task_id TEXT,
+            video_status TEXT DEFAULT '未生成',
+            title TEXT,
+            duration TEXT,
+            dialogue TEXT,
+            screen_content TEXT,
+            sound_effect TEXT,
+            camera_movement TEXT,
+            prompt TEXT,
+            video_file TEXT,
+            thumbnail_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (episode_id) REFERENCES episodes(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_storyboards_episode_id ON storyboards(episode_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_storyboards_sequence ON storyboards(episode_id, sequence_number)')
+
+
+def _migration_2_legacy_columns(cursor: sqlite3.Cursor):
+    """兼容旧表结构：补齐后来新增的列"""
+    _add_missing_columns(cursor, 'characters', [('voice_id', 'INTEGER')])
+    _add_missing_columns(cursor, 'storyboards', [
+        ('title', 'TEXT'),
+        ('duration', 'TEXT'),
+        ('dialogue', 'TEXT'),
+        ('screen_content', 'TEXT'),
+        ('sound_effect', 'TEXT'),
+        ('camera_movement', 'TEXT'),
+        ('prompt', 'TEXT'),
+        ('video_file', 'TEXT'),
+        ('thumbnail_path', 'TEXT'),
+    ])
+
+
+def _migration_3_drop_goods_videos(cursor: sqlite3.Cursor):
+    """删除已废弃的带货视频表"""
+    cursor.execute('DROP TABLE IF EXISTS goods_videos')
+
+
+def _migration_4_listing_indexes(cursor: sqlite3.Cursor):
+    """任务/分镜列表与轮询查询使用的组合索引"""
+    # (status, created_at, id) 支持按状态的倒序游标分页；附带 task_id 使轮询查询只读索引
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_created_at ON tasks(status, created_at, id, task_id)')
+    # 按剧集查询生成中/等待中的分镜视频任务
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_storyboards_episode_video_status ON storyboards(episode_id, video_status, video_task_id)')
+
+    # 冗余索引：被组合索引前缀或 UNIQUE 约束自带的索引覆盖，删除以减少写入开销
+    cursor.execute('DROP INDEX IF EXISTS idx_tasks_status')
+    cursor.execute('DROP INDEX IF EXISTS idx_tasks_task_id')
+    cursor.execute('DROP INDEX IF EXISTS idx_storyboards_episode_id')
+
+
+# 全文索引：(索引表, 源表, 索引列)
+FTS_INDEXES = [
+    ('tasks_fts', 'tasks', ('prompt',)),
+    ('storyboards_fts', 'storyboards', ('title', 'screen_content', 'dialogue', 'prompt')),
+    ('characters_fts', 'characters', ('name', 'description')),
+]
+
+
+def fts5_available(cursor: sqlite3.Cursor) -> bool:
+    """当前 SQLite 是否支持 FTS5 及 trigram 分词器（中文检索依赖 trigram）"""
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+        cursor.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def _migration_5_fulltext_search(cursor: sqlite3.Cursor):
+    """任务提示词、分镜文本、角色的全文索引（外部内容表 + 触发器同步）"""
+    if not fts5_available(cursor):
+        logger.warning("当前 SQLite 不支持 FTS5 trigram 分词器，搜索将使用 LIKE 查询")
+        return
+
+    for fts_table, table, columns in FTS_INDEXES:
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                {column_list}, content='{table}', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+        # 只在被索引的列变化时更新，状态轮询等更新不会触发
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+                INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        ''')
+        cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def ensure_fulltext_search(conn) -> bool:
+    """
+    补建全文索引：v5 执行时 SQLite 不支持 FTS5 trigram 会跳过建表（版本号仍记录为已执行），
+    之后运行环境的 SQLite 支持时在启动时补建
+
+    Returns:
+        全文索引是否可用
+    """
+    names = [fts_table for fts_table, _, _ in FTS_INDEXES]
+    placeholders = ", ".join("?" for _ in names)
+    row = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", names
+    ).fetchone()
+    if row and row[0] == len(names):
+        return True
+
+    cursor = conn.cursor()
+    if not fts5_available(cursor):
+        return False
+    logger.info("补建全文检索索引")
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        _migration_5_fulltext_search(cursor)
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"补建全文检索索引失败: {e}")
+        return False
+
+
+def _migration_6_task_duration_stats(cursor: sqlite3.Cursor):
+    """视频任务完成耗时统计（按 模型|时长|尺寸 汇总），供状态轮询估算完成时间"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_duration_stats (
+            profile TEXT PRIMARY KEY,
+            samples INTEGER NOT NULL DEFAULT 0,
+            mean_seconds REAL NOT NULL DEFAULT 0,
+            var_seconds REAL NOT NULL DEFAULT 0,
+            min_seconds REAL,
+            max_seconds REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_7_job_queue(cursor: sqlite3.Cursor):
+    """生成流水线的持久化任务队列（utils.job_queue）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            dedup_key TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after REAL NOT NULL DEFAULT 0,
+            lease_until REAL,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_dependencies (
+            job_id INTEGER NOT NULL,
+            depends_on INTEGER NOT NULL,
+            PRIMARY KEY (job_id, depends_on)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_stage_status ON jobs(stage, status, run_after)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_dedup_key ON jobs(dedup_key)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_dependencies_parent ON job_dependencies(depends_on)')
+
+
+def _migration_8_media_cache(cursor: sqlite3.Cursor):
+    """本地视频缓存索引（utils.media_cache）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_cache (
+            url TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_cache_sha256 ON media_cache(sha256)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_cache_last_access ON media_cache(last_access)')
+
+
+def _migration_9_media_probe(cursor: sqlite3.Cursor):
+    """视频流参数缓存（utils.media_probe）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_probe (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            info TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_10_upload_cache(cursor: sqlite3.Cursor):
+    """上传去重缓存（utils.upload_cache）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_cache (
+            sha256 TEXT NOT NULL,
+            target TEXT NOT NULL,
+            url TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL,
+            PRIMARY KEY (sha256, target)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_cache_url ON upload_cache(url)')
+
+
+def _migration_11_image_gen_cache(cursor: sqlite3.Cursor):
+    """生成图片缓存索引（utils.image_gen_cache）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_gen_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            aspect_ratio TEXT,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_gen_cache_last_access ON image_gen_cache(last_access)')
+
+
+def _migration_12_storyboard_video_covering_index(cursor: sqlite3.Cursor):
+    """分镜视频状态索引附带 video_url，使待刷新分镜的查询只读索引"""
+    # 查询条件含 "OR video_url IS NULL"，索引不含该列时查询计划会改用 idx_storyboards_sequence 并回表
+    cursor.execute('DROP INDEX IF EXISTS idx_storyboards_episode_video_status')
+    cursor.execute('''
+        CREATE INDEX idx_storyboards_episode_video_status
+        ON storyboards(episode_id, video_status, video_task_id, video_url)
+    ''')
+
+
+# 按版本号递增排列；新增结构变更时在末尾追加，不要修改已发布的迁移
+MIGRATIONS: List[Migration] = [
+    Migration(1, '基础表结构', _migration_1_base_schema),
+    Migration(2, '补齐旧版本缺失的列', _migration_2_legacy_columns),
+    Migration(3, '删除废弃的 goods_videos 表', _migration_3_drop_goods_videos),
+    Migration(4, '任务与分镜列表组合索引', _migration_4_listing_indexes),
+    Migration(5, '全文检索索引', _migration_5_fulltext_search),
+    Migration(6, '视频任务耗时统计', _migration_6_task_duration_stats),
+    Migration(7, '生成流水线任务队列', _migration_7_job_queue),
+    Migration(8, '本地视频缓存索引', _migration_8_media_cache),
+    Migration(9, '视频流参数缓存', _migration_9_media_probe),
+    Migration(10, '上传去重缓存', _migration_10_upload_cache),
+    Migration(11, '生成图片缓存索引', _migration_11_image_gen_cache),
+    Migration(12, '分镜视频状态覆盖索引', _migration_12_storyboard_video_covering_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn) -> int:
+    """读取当前结构版本，schema_version 表不存在时返回 0"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return (row[0] or 0) if row else 0
+
+
+def migrate(conn) -> Tuple[int, int]:
+    """
+    执行所有待执行的迁移，并补建缺失的全文索引（见 ensure_fulltext_search）
+
+    Args:
+        conn: 数据库连接（不能处于事务中）
+
+    Returns:
+        Tuple[int, int]: (迁移前版本, 迁移后版本)
+    """
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        ensure_fulltext_search(conn)
+        return current, current
+
+    cursor = conn.cursor()
+    # IMMEDIATE 事务：获取写锁后再次读取版本，避免多个进程重复迁移
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        start = get_schema_version(conn)
+        for migration in MIGRATIONS:
+            if migration.version <= start:
+                continue
+            logger.info(f"执行数据库迁移 v{migration.version}: {migration.description}")
+            migration.apply(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (migration.version, migration.description)
+            )
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        missing_tables = [t for t in REQUIRED_TABLES if t not in tables]
+        if missing_tables:
+            raise Exception(f"数据库表创建失败: {missing_tables}")
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    ensure_fulltext_search(conn)
+    return start, LATEST_VERSION
@@ -0,0 +1,181 @@
+"""
+数据库延迟写队列
+合并同一行的多次更新，丢弃未改变任何值的更新，并在一个事务中批量提交
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+# (表名, 主键列, 主键值)
+RowKey = Tuple[str, str, Any]
+
+
+class WriteBehindQueue:
+    """按行合并的延迟写队列"""
+
+    def __init__(
+        self,
+        connect: Callable,
+        interval: float = 0.5,
+        max_pending: int = 200,
+        on_flushed: Optional[Callable[[List[RowKey]], None]] = None,
+    ):
+        """
+        Args:
+            connect: 返回数据库连接的函数
+            interval: 后台刷新间隔（秒）
+            max_pending: 待写行数超过该值时立即刷新
+            on_flushed: 每次提交后回调，参数为本次写入的行（在执行刷新的线程中调用）
+        """
+        self._connect = connect
+        self._on_flushed = on_flushed
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[RowKey, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self.stats = {
+            'queued': 0,      # 入队的更新次数
+            'coalesced': 0,   # 被合并到已有待写行的更新次数
+            'written': 0,     # 实际修改的行数
+            'unchanged': 0,   # 因值未变化而跳过的行数
+            'flushes': 0,     # 提交的事务数
+        }
+
+    def put(self, table: str, key_column: str, key: Any, fields: Dict[str, Any]):
+        """加入一条行更新，同一行的字段与之前未写入的更新合并（后写覆盖先写）"""
+        if not fields:
+            return
+        row_key = (table, key_column, key)
+        with self._lock:
+            pending = self._pending.get(row_key)
+            if pending is None:
+                self._pending[row_key] = dict(fields)
+            else:
+                pending.update(fields)
+                self.stats['coalesced'] += 1
+            self.stats['queued'] += 1
+            size = len(self._pending)
+        if self._stopped:
+            # 已停止（应用退出中），直接写入
+            self.flush()
+            return
+        self._ensure_thread()
+        if size >= self.max_pending:
+            self._wakeup.set()
+
+    def discard(self, table: str, key_column: str, key: Any, columns):
+        """丢弃某行待写的指定字段（该行被直接写入时调用，避免旧值覆盖新值）"""
+        row_key = (table, key_column, key)
+        # 等待进行中的刷新完成，保证直接写入发生在其之后
+        with self._flush_lock, self._lock:
+            pending = self._pending.get(row_key)
+            if pending is None:
+                return
+            for column in columns:
+                pending.pop(column, None)
+            if not pending:
+                del self._pending[row_key]
+
+    def pending_count(self) -> int:
+        """待写行数"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        立即写入所有待写更新（在调用线程中同步执行）
+
+        返回后，调用前入队的更新均已提交，可用于需要“读己所写”的场景。
+
+        Returns:
+            int: 实际修改的行数
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = OrderedDict()
+
+            # 按 (表, 主键列, 字段集合) 分组，每组使用一次 executemany
+            groups: Dict[Tuple[str, str, Tuple[str, ...]], List[tuple]] = OrderedDict()
+            for (table, key_column, key), fields in batch.items():
+                columns = tuple(fields.keys())
+                values = tuple(fields[c] for c in columns)
+                groups.setdefault((table, key_column, columns), []).append(values + (key,) + values)
+
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                written = 0
+                for (table, key_column, columns), params in groups.items():
+                    # 只有至少一个字段发生变化的行才会被更新
+                    set_clause = ", ".join(f"{c} = ?" for c in columns)
+                    changed = " OR ".join(f"{c} IS NOT ?" for c in columns)
+                    cursor.executemany(f'''
+                        UPDATE {table}
+                        SET {set_clause}, updated_at = CURRENT_TIMESTAMP
+                        WHERE {key_column} = ? AND ({changed})
+                    ''', params)
+                    written += max(cursor.rowcount, 0)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                # 写入失败时放回队列，队列中较新的更新优先
+                with self._lock:
+                    for row_key, fields in batch.items():
+                        newer = self._pending.get(row_key)
+                        if newer is not None:
+                            fields = {**fields, **newer}
+                        self._pending[row_key] = fields
+                logger.error(f"延迟写入数据库失败: {e}")
+                return 0
+            finally:
+                conn.close()
+
+            self.stats['flushes'] += 1
+            self.stats['written'] += written
+            self.stats['unchanged'] += len(batch) - written
+            logger.debug(f"延迟写入 {len(batch)} 行，实际修改 {written} 行")
+            if self._on_flushed is not None and written:
+                try:
+                    self._on_flushed(list(batch.keys()))
+                except Exception as e:
+                    logger.error(f"延迟写入回调出错: {e}")
+            return written
+
+    def stop(self):
+        """停止后台线程并写入剩余更新"""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None or self._stopped:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="db-write-behind", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"延迟写线程出错: {e}")
@@ -0,0 +1,332 @@
+"""
+可续传的分段并行下载
+先写入 .part 文件，进度保存在 .part.json 中，中断或网络异常后从已下载位置继续（HTTP Range）；
+服务器支持 Range 且文件较大时分多段并行下载。数据攒满缓冲区后再写盘，完成后校验大小再改名为目标文件
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+import requests
+from loguru import logger
+
+from utils import http_client
+
+
+# 每个文件最多并行的分段数
+MAX_SEGMENTS = 4
+# 每段至少的字节数，小文件不分段
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+# 网络读取块大小
+CHUNK_SIZE = 256 * 1024
+# 写盘缓冲区大小
+BUFFER_SIZE = 1024 * 1024
+# 单个分段连续失败的最多重试次数（有新数据写入后重新计数）
+MAX_RETRIES = 5
+# 连接超时、读取超时（秒）
+TIMEOUT = (10, 60)
+# 进度回调与进度文件保存的最小间隔（秒）
+PROGRESS_INTERVAL = 0.5
+STATE_INTERVAL = 1.0
+
+ProgressCallback = Callable[[int, int], None]   # (已下载字节数, 总字节数，未知时为 0)
+
+
+class DownloadError(Exception):
+    """下载失败"""
+
+
+class DownloadCancelled(DownloadError):
+    """下载被取消（.part 文件保留，下次可继续）"""
+
+
+class _Segment:
+    __slots__ = ('start', 'end', 'pos')
+
+    def __init__(self, start: int, end: int, pos: Optional[int] = None):
+        self.start = start
+        self.end = end          # 包含
+        self.pos = start if pos is None else pos
+
+    @property
+    def done(self) -> bool:
+        return self.pos > self.end
+
+
+class _Download:
+    """单个文件的下载过程"""
+
+    def __init__(self, url: str, dest: str, segments: int, progress: Optional[ProgressCallback],
+                 should_stop: Optional[Callable[[], bool]], trust_env: bool):
+        self.url = url
+        self.dest = dest
+        self.part_path = f"{dest}.part"
+        self.state_path = f"{dest}.part.json"
+        self.max_segments = max(1, int(segments))
+        self.progress = progress
+        self.should_stop = should_stop
+        self.trust_env = trust_env
+        self.total = 0
+        self.validator = ''
+        self.segments: List[_Segment] = []
+        self._lock = threading.Lock()
+        self._downloaded = 0
+        self._last_progress = 0.0
+        self._last_state = 0.0
+        self._error: Optional[BaseException] = None
+
+    # ---------------- 入口 ----------------
+
+    def run(self) -> int:
+        os.makedirs(os.path.dirname(os.path.abspath(self.dest)), exist_ok=True)
+        accept_ranges = self._probe()
+        if not accept_ranges:
+            return self._run_single_stream()
+
+        if not self._load_state():
+            self._plan()
+            with open(self.part_path, 'wb') as f:
+                f.truncate(self.total)
+            self._save_state(force=True)
+        self._downloaded = sum(s.pos - s.start for s in self.segments)
+        if self._downloaded:
+            logger.info(f"继续下载 {self.url}: 已完成 {self._downloaded}/{self.total} bytes")
+
+        pending = [s for s in self.segments if not s.done]
+        try:
+            if len(pending) == 1:
+                self._fetch_segment(pending[0])
+            elif pending:
+                threads = [
+                    threading.Thread(target=self._fetch_segment_safe, args=(s,), name=f"download-seg-{i}", daemon=True)
+                    for i, s in enumerate(pending)
+                ]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                if self._error is not None:
+                    raise self._error
+        except BaseException:
+            # 进度文件按 STATE_INTERVAL 节流保存，失败或取消时写入最新进度，下次从这里继续
+            self._save_state(force=True)
+            raise
+        return self._finish()
+
+    # ---------------- 探测与分段 ----------------
+
+    def _probe(self) -> bool:
+        """请求第一个字节，判断服务器是否支持 Range 并获取文件大小"""
+        with http_client.get(self.url, headers={'Range': 'bytes=0-0'}, stream=True,
+                             timeout=TIMEOUT, trust_env=self.trust_env) as response:
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            self.validator = response.headers.get('ETag') or response.headers.get('Last-Modified') or ''
+            if response.status_code == 206 and '/' in content_range:
+                size = content_range.rsplit('/', 1)[1].strip()
+                if size.isdigit():
+                    self.total = int(size)
+                    return self.total > 0
+            return False
+
+    def _plan(self):
+        count = max(1, min(self.max_segments, self.total // MIN_SEGMENT_SIZE))
+        step = -(-self.total // count)
+        self.segments = [
+            _Segment(start, min(start + step, self.total) - 1)
+            for start in range(0, self.total, step)
+        ]
+
+    def _load_state(self) -> bool:
+        """读取上次的下载进度；文件已变化（大小、ETag）时丢弃"""
+        try:
+            if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != self.total:
+                return False
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('url') != self.url or state.get('total') != self.total \
+                    or state.get('validator') != self.validator:
+                return False
+            self.segments = [_Segment(*s) for s in state['segments']]
+            return bool(self.segments)
+        except Exception:
+            return False
+
+    def _save_state(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_state < STATE_INTERVAL:
+                return
+            self._last_state = now
+            state = {
+                'url': self.url,
+                'total': self.total,
+                'validator': self.validator,
+                'segments': [[s.start, s.end, s.pos] for s in self.segments],
+            }
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"保存下载进度失败: {e}")
+
+    # ---------------- 下载 ----------------
+
+    def _check_stop(self):
+        if self._error is not None:
+            raise DownloadCancelled("其他分段下载失败")
+        if self.should_stop and self.should_stop():
+            raise DownloadCancelled("下载已取消")
+
+    def _fetch_segment_safe(self, segment: _Segment):
+        try:
+            self._fetch_segment(segment)
+        except BaseException as e:
+            with self._lock:
+                if self._error is None or isinstance(self._error, DownloadCancelled):
+                    self._error = e
+
+    def _fetch_segment(self, segment: _Segment):
+        failures = 0
+        with open(self.part_path, 'r+b') as f:
+            while not segment.done:
+                self._check_stop()
+                pos_before = segment.pos
+                try:
+                    self._stream_range(segment, f)
+                except DownloadCancelled:
+                    raise
+                except (requests.RequestException, DownloadError) as e:
+                    failures = 0 if segment.pos > pos_before else failures + 1
+                    if failures > MAX_RETRIES:
+                        raise DownloadError(f"下载失败（已重试 {MAX_RETRIES} 次）: {e}") from e
+                    delay = min(2 ** failures, 30) * 0.5
+                    logger.warning(f"下载中断，{delay:.1f} 秒后从 {segment.pos} 继续: {e}")
+                    time.sleep(delay)
+
+    def _stream_range(self, segment: _Segment, f):
+        headers = {'Range': f"bytes={segment.pos}-{segment.end}"}
+        with http_client.get(self.url, headers=headers, stream=True,
+                             timeout=TIMEOUT, trust_env=self.trust_env) as response:
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code != 206 or not content_range.startswith(f"bytes {segment.pos}-"):
+                raise DownloadError(f"服务器未按请求返回分段: {response.status_code} {content_range}")
+            f.seek(segment.pos)
+            buffer = bytearray()
+            try:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    buffer += chunk
+                    if len(buffer) >= BUFFER_SIZE:
+                        self._flush(segment, f, buffer)
+                        self._check_stop()
+            finally:
+                # 已收到的数据先写盘，续传时不必重新下载
+                if buffer:
+                    self._flush(segment, f, buffer)
+        if not segment.done:
+            raise DownloadError(f"连接提前结束，分段剩余 {segment.end - segment.pos + 1} bytes")
+
+    def _flush(self, segment: _Segment, f, buffer: bytearray):
+        size = min(len(buffer), segment.end - segment.pos + 1)
+        f.write(buffer[:size])
+        segment.pos += size
+        buffer.clear()
+        with self._lock:
+            self._downloaded += size
+        self._report()
+        self._save_state()
+
+    def _report(self, force: bool = False):
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_progress < PROGRESS_INTERVAL:
+                return
+            self._last_progress = now
+            downloaded = self._downloaded
+        try:
+            self.progress(downloaded, self.total)
+        except Exception as e:
+            logger.warning(f"下载进度回调失败: {e}")
+
+    def _run_single_stream(self) -> int:
+        """服务器不支持 Range 时整体下载（无法续传）"""
+        logger.info(f"服务器不支持分段下载，整体下载: {self.url}")
+        with http_client.get(self.url, stream=True, timeout=TIMEOUT, trust_env=self.trust_env) as response:
+            response.raise_for_status()
+            self.total = int(response.headers.get('Content-Length') or 0)
+            segment = _Segment(0, self.total - 1 if self.total else float('inf'))
+            with open(self.part_path, 'wb') as f:
+                buffer = bytearray()
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    buffer += chunk
+                    if len(buffer) >= BUFFER_SIZE:
+                        self._flush(segment, f, buffer)
+                        self._check_stop()
+                if buffer:
+                    self._flush(segment, f, buffer)
+        return self._finish()
+
+    def _finish(self) -> int:
+        size = os.path.getsize(self.part_path)
+        if self.total and size != self.total:
+            raise DownloadError(f"文件大小不符: 期望 {self.total} bytes，实际 {size} bytes")
+        if self.segments and any(not s.done for s in self.segments):
+            raise DownloadError("部分分段未下载完成")
+        os.replace(self.part_path, self.dest)
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+        self._report(force=True)
+        return size
+
+
+def download(
+    url: str,
+    dest: str,
+    segments: int = MAX_SEGMENTS,
+    progress: Optional[ProgressCallback] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    trust_env: bool = True,
+) -> int:
+    """
+    下载文件到 dest，返回文件大小（字节）
+
+    Args:
+        url: 下载地址
+        dest: 保存路径；下载过程中写入 dest.part，完成后改名
+        segments: 最多并行分段数（服务器支持 Range 且文件足够大时生效）
+        progress: 进度回调 (已下载字节数, 总字节数)，按 PROGRESS_INTERVAL 节流，可能在工作线程中调用
+        should_stop: 返回 True 时取消下载并抛出 DownloadCancelled，.part 文件保留以便续传
+        trust_env: 是否使用系统代理
+
+    Raises:
+        DownloadError: 重试后仍失败、大小校验失败或被取消
+        requests.RequestException: 探测请求失败
+    """
+    started = time.monotonic()
+    size = _Download(url, dest, segments, progress, should_stop, trust_env).run()
+    elapsed = time.monotonic() - started
+    logger.info(f"下载完成: {dest} ({size} bytes, {elapsed:.1f} s, {size / max(elapsed, 1e-6) / 1048576:.1f} MB/s)")
+    return size
+
+
+def discard_partial(dest: str):
+    """删除未完成下载留下的 .part 与进度文件"""
+    for path in (f"{dest}.part", f"{dest}.part.json"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,172 @@
+"""
+进程级共享 HTTP 传输
+所有网络请求复用同一组连接池（按主机分池、长连接、连接级自动重试），避免每次请求重新握手
+"""
+
+import socket
+import threading
+from typing import Dict
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+from constants import API_HOST
+from utils import rate_limiter
+
+
+# 缓存的主机连接池数量
+POOL_CONNECTIONS = 20
+# 未单独设置上限的主机，每个主机保留的空闲连接数
+POOL_MAXSIZE = 16
+# 单独设置的主机连接上限（达到上限时请求排队等待空闲连接）
+HOST_LIMITS: Dict[str, int] = {
+    API_HOST: 32,
+}
+
+# TCP keep-alive，长时间轮询时保持连接不被中间设备断开
+SOCKET_OPTIONS = list(HTTPConnection.default_socket_options) + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+for _name, _value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 20), ('TCP_KEEPCNT', 3)):
+    if hasattr(socket, _name):
+        SOCKET_OPTIONS.append((socket.IPPROTO_TCP, getattr(socket, _name), _value))
+
+
+class _RetryPolicy(Retry):
+    """
+    只对 503 按 Retry-After 重试；429 交给 utils.rate_limiter（整个接口类别一起暂停），
+    不能在连接池中被悄悄重试
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+
+def _retry_policy() -> Retry:
+    """
+    连接失败对所有方法重试（请求尚未发出）；
+    读超时与 502/503/504 仅对幂等方法重试，避免重复创建任务
+    """
+    return _RetryPolicy(
+        total=3,
+        connect=3,
+        read=2,
+        status=2,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+
+
+class _TunedAdapter(HTTPAdapter):
+    """启用 TCP keep-alive 的连接池适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+_sessions: Dict[bool, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def _mount_host_limits(session: requests.Session):
+    for host, limit in HOST_LIMITS.items():
+        for scheme in ('https://', 'http://'):
+            session.mount(f"{scheme}{host}", _TunedAdapter(
+                pool_connections=1,
+                pool_maxsize=limit,
+                pool_block=True,
+                max_retries=_retry_policy(),
+            ))
+
+
+def _create_session(trust_env: bool) -> requests.Session:
+    session = requests.Session()
+    session.trust_env = trust_env
+    if not trust_env:
+        session.proxies = {"http": None, "https": None}
+    adapter = _TunedAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=_retry_policy(),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    _mount_host_limits(session)
+    return session
+
+
+def get_session(trust_env: bool = True) -> requests.Session:
+    """
+    获取共享会话
+
+    Args:
+        trust_env: 是否使用系统代理等环境设置；为 False 时直连（原先各处禁用代理的请求）
+
+    注意：共享会话不携带任何业务请求头（如 Authorization），请在每次请求时传入 headers。
+    """
+    session = _sessions.get(trust_env)
+    if session is None:
+        with _lock:
+            session = _sessions.get(trust_env)
+            if session is None:
+                session = _create_session(trust_env)
+                _sessions[trust_env] = session
+    return session
+
+
+def set_host_limit(host: str, max_connections: int):
+    """设置某个主机的最大并发连接数（对之后的请求生效）"""
+    with _lock:
+        HOST_LIMITS[host] = max(1, int(max_connections))
+        for session in _sessions.values():
+            _mount_host_limits(session)
+
+
+def request(method: str, url: str, trust_env: bool = True, **kwargs) -> requests.Response:
+    """
+    通过共享连接池发送请求，参数与 requests.request 一致
+
+    发往 API 代理的请求经过 utils.rate_limiter 限流；接口熔断时抛出
+    rate_limiter.CircuitOpenError（requests.RequestException 的子类）
+    """
+    family = rate_limiter.family_for(method, url)
+    if family is None:
+        return get_session(trust_env).request(method, url, **kwargs)
+    rate_limiter.before_request(family)
+    try:
+        response = get_session(trust_env).request(method, url, **kwargs)
+    except Exception:
+        rate_limiter.after_request(family, None)
+        raise
+    rate_limiter.after_request(family, response)
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    return request('PUT', url, **kwargs)
+
+
+def close_all():
+    """关闭所有共享会话（应用退出时调用）"""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        try:
+            session.close()
+        except Exception as e:
+            logger.warning(f"关闭 HTTP 会话失败: {e}")
@@ -0,0 +1,160 @@
+"""
+生成图片缓存（可选，配置项 image_gen_cache_enabled 开启）
+按 (模型, 提示词, 画面比例, 参考图内容哈希) 保存生图模型生成的图片，image_gen_cache 表记录索引；
+相同参数再次生成时直接复用本地图片，不再调用模型。总大小超过上限时按最近使用时间淘汰
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from loguru import logger
+
+from database_manager import db_manager
+from utils.upload_cache import upload_cache
+
+
+# 默认缓存上限（MB），可通过配置 image_gen_cache_max_mb 修改
+DEFAULT_MAX_MB = 1024
+
+
+def enabled() -> bool:
+    """是否开启生成图片缓存（默认关闭）"""
+    return bool(db_manager.load_config('image_gen_cache_enabled', False))
+
+
+def cache_key(model: str, prompt: str, aspect_ratio: str = '', reference_images: Iterable[str] = ()) -> str:
+    """缓存键：模型、提示词、画面比例与参考图内容（按文件哈希，与文件名无关）"""
+    refs = [upload_cache.file_hash(path)[0] for path in reference_images]
+    raw = json.dumps([model, prompt, aspect_ratio or '', refs], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ImageGenCache:
+    """生成图片的本地缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.path.join(db_manager.app_data_dir, "image_gen_cache")
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return int(db_manager.load_config('image_gen_cache_max_mb', DEFAULT_MAX_MB)) * 1024 * 1024
+
+    def lookup(self, key: str) -> Optional[str]:
+        """已缓存时返回缓存文件路径并更新使用时间（未开启缓存时返回 None）；调用方应复制后使用"""
+        if not enabled():
+            return None
+        conn = db_manager.get_connection()
+        try:
+            row = conn.execute('SELECT path, size FROM image_gen_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            path, size = row[0], row[1]
+            if not os.path.isfile(path) or os.path.getsize(path) != size:
+                # 文件被删除或损坏
+                conn.execute('DELETE FROM image_gen_cache WHERE key = ?', (key,))
+                conn.commit()
+                return None
+            conn.execute('UPDATE image_gen_cache SET last_access = ? WHERE key = ?', (time.time(), key))
+            conn.commit()
+            return path
+        except Exception as e:
+            logger.error(f"读取生成图片缓存失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def store(self, key: str, image_path: str, model: str, aspect_ratio: str = ''):
+        """把生成的图片复制到缓存（未开启缓存时不做任何事）"""
+        if not enabled() or not image_path or not os.path.isfile(image_path):
+            return
+        ext = os.path.splitext(image_path)[1] or '.png'
+        path = os.path.join(self.cache_dir, key[:2], f"{key}{ext}")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            shutil.copyfile(image_path, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"保存生成图片缓存失败: {e}")
+            return
+
+        now = time.time()
+        conn = db_manager.get_connection()
+        try:
+            old = conn.execute('SELECT path FROM image_gen_cache WHERE key = ?', (key,)).fetchone()
+            conn.execute('''
+                INSERT INTO image_gen_cache (key, model, aspect_ratio, path, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    path = excluded.path,
+                    size = excluded.size,
+                    created_at = excluded.created_at,
+                    last_access = excluded.last_access
+            ''', (key, model, aspect_ratio, path, os.path.getsize(path), now, now))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"保存生成图片缓存失败: {e}")
+            return
+        finally:
+            conn.close()
+        if old and old[0] != path:
+            # 同一参数重新生成为不同格式的图片，删除旧文件
+            try:
+                os.remove(old[0])
+            except OSError:
+                pass
+        self.evict()
+
+    def evict(self) -> int:
+        """淘汰最久未使用的图片直到总大小不超过上限，返回释放的字节数"""
+        with self._lock:
+            limit = self.max_bytes
+            conn = db_manager.get_connection()
+            freed = 0
+            try:
+                rows = conn.execute('SELECT key, path, size FROM image_gen_cache ORDER BY last_access').fetchall()
+                total = sum(row[2] for row in rows)
+                for key, path, size in rows:
+                    if total <= limit:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        logger.warning(f"删除缓存图片失败: {path}, {e}")
+                        continue
+                    conn.execute('DELETE FROM image_gen_cache WHERE key = ?', (key,))
+                    total -= size
+                    freed += size
+                conn.commit()
+                if freed:
+                    logger.info(f"生成图片缓存淘汰 {freed / 1048576:.1f} MB，当前 {total / 1048576:.1f} MB")
+                return freed
+            except Exception as e:
+                logger.error(f"生成图片缓存淘汰失败: {e}")
+                return freed
+            finally:
+                conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存的图片数与总大小"""
+        conn = db_manager.get_connection()
+        try:
+            count, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_gen_cache').fetchone()
+            return {'images': count, 'bytes': size, 'max_bytes': self.max_bytes}
+        finally:
+            conn.close()
+
+
+# 全局生成图片缓存
+image_gen_cache = ImageGenCache()
@@ -0,0 +1,461 @@
+"""
+持久化任务队列
+生成流水线的每个阶段（场景图、上传、创建视频、轮询……）作为一条任务保存在 jobs 表中，
+支持状态、重试次数、租约与依赖；程序重启后未完成的任务自动恢复执行
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+
+
+# 任务状态
+PENDING = 'pending'      # 等待执行（依赖完成且到达 run_after 后可被领取）
+RUNNING = 'running'      # 已被工作线程领取，租约到期前由其执行
+WAITING = 'waiting'      # 已交给外部（如状态轮询调度器），等待外部通知结束
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+ACTIVE_STATUSES = (PENDING, RUNNING, WAITING)
+_ACTIVE_SQL = "({})".format(', '.join(f"'{status}'" for status in ACTIVE_STATUSES))
+
+# 已结束任务的保留天数
+RETENTION_DAYS = 7
+
+
+class JobDeferred(Exception):
+    """处理函数抛出：稍后再执行本任务，不计入重试次数"""
+
+    def __init__(self, delay: float, message: str = ''):
+        super().__init__(message or f"{delay:.0f} 秒后继续")
+        self.delay = delay
+
+
+class JobWaiting(Exception):
+    """处理函数抛出：任务已交给外部处理，等待 complete_key / fail_key 通知结束"""
+
+
+class JobAbort(Exception):
+    """处理函数抛出：任务无法完成（如缺少必要数据），不再重试"""
+
+
+class Job:
+    """从队列领取的一条任务"""
+
+    __slots__ = ('id', 'stage', 'payload', 'dedup_key', 'attempts', 'max_attempts', 'inputs')
+
+    def __init__(self, id, stage, payload, dedup_key, attempts, max_attempts, inputs=None):
+        self.id = id
+        self.stage = stage
+        self.payload: Dict[str, Any] = payload
+        self.dedup_key = dedup_key
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        # 依赖任务的结果（按依赖顺序合并）
+        self.inputs: Dict[str, Any] = inputs or {}
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.stage}, {self.dedup_key or self.payload})"
+
+
+def _loads(text: Optional[str]) -> Dict[str, Any]:
+    if not text:
+        return {}
+    try:
+        value = json.loads(text)
+        return value if isinstance(value, dict) else {}
+    except ValueError:
+        return {}
+
+
+class JobQueue:
+    """jobs / job_dependencies 表的访问接口，可在任意线程中调用"""
+
+    def __init__(self):
+        # 领取与状态变更在进程内串行，写事务使用 BEGIN IMMEDIATE 以兼容多进程
+        self._lock = threading.Lock()
+
+    def _write(self, fn, *args):
+        with self._lock:
+            conn = db_manager.get_connection()
+            try:
+                if conn.in_transaction:
+                    conn.commit()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    result = fn(conn, *args)
+                    conn.commit()
+                    return result
+                except Exception:
+                    conn.rollback()
+                    raise
+            finally:
+                conn.close()
+
+    # ---------------- 入队 ----------------
+
+    def enqueue(
+        self,
+        stage: str,
+        payload: Optional[Dict[str, Any]] = None,
+        depends_on: Iterable[int] = (),
+        dedup_key: Optional[str] = None,
+        max_attempts: int = 3,
+        delay: float = 0,
+        update_pending: bool = False,
+    ) -> Tuple[Optional[int], bool]:
+        """
+        添加任务
+
+        Args:
+            stage: 阶段名
+            payload: 任务参数（可 JSON 序列化）
+            depends_on: 依赖的任务ID，全部完成后才会执行；任一失败或取消时本任务随之失败
+            dedup_key: 去重键；已有同键的未结束任务时不重复添加，返回已有任务的ID
+            max_attempts: 最多执行次数
+            delay: 首次执行前的等待时间（秒）
+            update_pending: 命中去重且已有任务尚未开始执行时，把 payload 合并到已有任务的参数中
+
+        Returns:
+            (任务ID, 是否新添加)；命中去重时为 (已有任务ID, False)，失败返回 (None, False)
+        """
+        try:
+            return self._write(
+                self._enqueue, stage, payload or {}, list(depends_on), dedup_key, max_attempts, delay,
+                update_pending,
+            )
+        except Exception as e:
+            logger.error(f"添加任务失败 ({stage}): {e}")
+            return None, False
+
+    @staticmethod
+    def _enqueue(conn, stage, payload, depends_on, dedup_key, max_attempts, delay,
+                 update_pending=False) -> Tuple[int, bool]:
+        if dedup_key:
+            row = conn.execute(
+                f"SELECT id, status, payload FROM jobs WHERE dedup_key = ? AND status IN {_ACTIVE_SQL}",
+                (dedup_key,)
+            ).fetchone()
+            if row:
+                if update_pending and row[1] == PENDING and payload:
+                    merged = {**_loads(row[2]), **payload}
+                    conn.execute('UPDATE jobs SET payload = ? WHERE id = ?',
+                                 (json.dumps(merged, ensure_ascii=False), row[0]))
+                return row[0], False
+        cursor = conn.execute('''
+            INSERT INTO jobs (stage, payload, dedup_key, max_attempts, run_after)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (stage, json.dumps(payload, ensure_ascii=False), dedup_key,
+              max(1, int(max_attempts)), time.time() + max(delay, 0)))
+        job_id = cursor.lastrowid
+        if depends_on:
+            conn.executemany(
+                'INSERT OR IGNORE INTO job_dependencies (job_id, depends_on) VALUES (?, ?)',
+                [(job_id, parent) for parent in depends_on if parent]
+            )
+            # 依赖已失败或已取消时，新任务直接失败
+            failed = conn.execute(f'''
+                SELECT COUNT(*) FROM job_dependencies d JOIN jobs p ON p.id = d.depends_on
+                WHERE d.job_id = ? AND p.status IN ('{FAILED}', '{CANCELLED}')
+            ''', (job_id,)).fetchone()[0]
+            if failed:
+                JobQueue._finish_tree(conn, [job_id], FAILED, '依赖任务失败')
+        return job_id, True
+
+    # ---------------- 领取与续约 ----------------
+
+    def claim(self, stage: str, limit: int, lease_seconds: float) -> List[Job]:
+        """
+        领取可执行的任务（依赖均已完成、已到执行时间；或租约已过期的执行中任务）
+
+        领取后任务进入 running 状态，attempts 加一
+        """
+        if limit <= 0:
+            return []
+        try:
+            return self._write(self._claim, stage, limit, lease_seconds)
+        except Exception as e:
+            logger.error(f"领取任务失败 ({stage}): {e}")
+            return []
+
+    @staticmethod
+    def _claim(conn, stage, limit, lease_seconds) -> List[Job]:
+        now = time.time()
+        rows = conn.execute(f'''
+            SELECT id, stage, payload, dedup_key, attempts, max_attempts FROM jobs j
+            WHERE stage = ?
+              AND ((status = '{PENDING}' AND run_after <= ?) OR (status = '{RUNNING}' AND lease_until < ?))
+              AND NOT EXISTS (
+                  SELECT 1 FROM job_dependencies d JOIN jobs p ON p.id = d.depends_on
+                  WHERE d.job_id = j.id AND p.status != '{DONE}'
+              )
+            ORDER BY run_after, id
+            LIMIT ?
+        ''', (stage, now, now, limit)).fetchall()
+        if not rows:
+            return []
+        conn.executemany(f'''
+            UPDATE jobs SET status = '{RUNNING}', attempts = attempts + 1, lease_until = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', [(now + lease_seconds, row[0]) for row in rows])
+
+        jobs = []
+        for job_id, stage_, payload, dedup_key, attempts, max_attempts in rows:
+            inputs: Dict[str, Any] = {}
+            for (result,) in conn.execute('''
+                SELECT p.result FROM job_dependencies d JOIN jobs p ON p.id = d.depends_on
+                WHERE d.job_id = ? ORDER BY p.id
+            ''', (job_id,)):
+                inputs.update(_loads(result))
+            jobs.append(Job(job_id, stage_, _loads(payload), dedup_key, attempts + 1, max_attempts, inputs))
+        return jobs
+
+    def renew(self, job_ids: Iterable[int], lease_seconds: float):
+        """延长执行中任务的租约"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        until = time.time() + lease_seconds
+        try:
+            self._write(lambda conn: conn.executemany(
+                f"UPDATE jobs SET lease_until = ? WHERE id = ? AND status = '{RUNNING}'",
+                [(until, job_id) for job_id in job_ids]
+            ))
+        except Exception as e:
+            logger.error(f"续约任务失败: {e}")
+
+    # ---------------- 结束 ----------------
+
+    def complete(self, job_id: int, result: Optional[Dict[str, Any]] = None) -> bool:
+        """标记任务完成，result 会传给依赖本任务的后续任务"""
+        try:
+            self._write(lambda conn: conn.execute(f'''
+                UPDATE jobs SET status = '{DONE}', result = ?, error = NULL, lease_until = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN {_ACTIVE_SQL}
+            ''', (json.dumps(result or {}, ensure_ascii=False), job_id)))
+            return True
+        except Exception as e:
+            logger.error(f"标记任务完成失败 ({job_id}): {e}")
+            return False
+
+    def fail(self, job_id: int, error: str, retry_delay: Optional[float] = None) -> bool:
+        """
+        任务执行失败
+
+        Args:
+            retry_delay: 重试前的等待时间；为 None 或已达最多执行次数时任务失败，依赖它的任务随之失败
+
+        Returns:
+            bool: 是否会重试
+        """
+        try:
+            return self._write(self._fail, job_id, error, retry_delay)
+        except Exception as e:
+            logger.error(f"标记任务失败出错 ({job_id}): {e}")
+            return False
+
+    @staticmethod
+    def _fail(conn, job_id, error, retry_delay) -> bool:
+        row = conn.execute('SELECT attempts, max_attempts, status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or row[2] not in ACTIVE_STATUSES:
+            return False
+        attempts, max_attempts, _ = row
+        if retry_delay is not None and attempts < max_attempts:
+            conn.execute(f'''
+                UPDATE jobs SET status = '{PENDING}', error = ?, run_after = ?, lease_until = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (error, time.time() + retry_delay, job_id))
+            return True
+        JobQueue._finish_tree(conn, [job_id], FAILED, error)
+        return False
+
+    def defer(self, job_id: int, delay: float):
+        """任务稍后再执行，不计入执行次数"""
+        try:
+            self._write(lambda conn: conn.execute(f'''
+                UPDATE jobs SET status = '{PENDING}', attempts = MAX(attempts - 1, 0), run_after = ?,
+                    lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = '{RUNNING}'
+            ''', (time.time() + delay, job_id)))
+        except Exception as e:
+            logger.error(f"推迟任务失败 ({job_id}): {e}")
+
+    def wait(self, job_id: int):
+        """任务交给外部处理，等待 complete_key / fail_key"""
+        try:
+            self._write(lambda conn: conn.execute(f'''
+                UPDATE jobs SET status = '{WAITING}', lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = '{RUNNING}'
+            ''', (job_id,)))
+        except Exception as e:
+            logger.error(f"挂起任务失败 ({job_id}): {e}")
+
+    def _active_id(self, dedup_key: str) -> Optional[int]:
+        conn = db_manager.get_connection()
+        try:
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE dedup_key = ? AND status IN {_ACTIVE_SQL}", (dedup_key,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def is_active(self, dedup_key: str) -> bool:
+        """是否有该去重键的未结束任务"""
+        try:
+            return self._active_id(dedup_key) is not None
+        except Exception as e:
+            logger.error(f"查询任务失败 ({dedup_key}): {e}")
+            return False
+
+    def complete_key(self, dedup_key: str, result: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """按去重键完成未结束的任务，返回任务ID"""
+        job_id = self._active_id(dedup_key)
+        if job_id is not None and self.complete(job_id, result):
+            return job_id
+        return None
+
+    def fail_key(self, dedup_key: str, error: str) -> Optional[int]:
+        """按去重键使未结束的任务失败（不重试），返回任务ID"""
+        job_id = self._active_id(dedup_key)
+        if job_id is not None:
+            self.fail(job_id, error)
+        return job_id
+
+    def cancel(self, dedup_keys: Iterable[str]) -> int:
+        """取消指定去重键的未结束任务（及依赖它们的任务），返回取消的数量"""
+        keys = [key for key in dedup_keys if key]
+        if not keys:
+            return 0
+
+        def cancel(conn):
+            placeholders = ','.join('?' * len(keys))
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM jobs WHERE dedup_key IN ({placeholders}) AND status IN {_ACTIVE_SQL}",
+                keys
+            )]
+            return JobQueue._finish_tree(conn, ids, CANCELLED, '已取消') if ids else 0
+
+        try:
+            return self._write(cancel)
+        except Exception as e:
+            logger.error(f"取消任务失败: {e}")
+            return 0
+
+    def prioritize(self, dedup_keys: Iterable[str]) -> int:
+        """
+        等待执行的任务提前到同阶段其他任务之前（最近一次调用的最先执行），返回调整的数量
+
+        正在退避等待重试的任务不受影响
+        """
+        keys = [key for key in dedup_keys if key]
+        if not keys:
+            return 0
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        try:
+            # run_after 越小越先领取；取负的当前时间，使后调整的排在前面
+            return self._write(lambda conn: conn.execute(f'''
+                UPDATE jobs SET run_after = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE dedup_key IN ({placeholders}) AND status = '{PENDING}' AND run_after <= ?
+            ''', (-now, *keys, now)).rowcount)
+        except Exception as e:
+            logger.error(f"调整任务顺序失败: {e}")
+            return 0
+
+    @staticmethod
+    def _finish_tree(conn, job_ids: List[int], status: str, error: str) -> int:
+        """将任务及（递归）依赖它们的未结束任务标记为 status"""
+        placeholders = ','.join('?' * len(job_ids))
+        # WITH 开头的语句 rowcount 恒为 -1，按 total_changes 计数
+        before = conn.total_changes
+        conn.execute(f'''
+            WITH RECURSIVE tree(id) AS (
+                SELECT id FROM jobs WHERE id IN ({placeholders})
+                UNION
+                SELECT d.job_id FROM job_dependencies d JOIN tree ON d.depends_on = tree.id
+            )
+            UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (SELECT id FROM tree) AND status IN {_ACTIVE_SQL}
+        ''', (*job_ids, status, error))
+        return conn.total_changes - before
+
+    # ---------------- 恢复与清理 ----------------
+
+    def recover(self) -> int:
+        """
+        启动时调用：上次运行中（running / waiting）的任务重新进入等待执行状态
+
+        running 任务因程序退出而中断，不计入执行次数
+        """
+        def recover(conn):
+            cursor = conn.execute(f'''
+                UPDATE jobs SET status = '{PENDING}', run_after = 0, lease_until = NULL,
+                    attempts = CASE WHEN status = '{RUNNING}' THEN MAX(attempts - 1, 0) ELSE attempts END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE status IN ('{RUNNING}', '{WAITING}')
+            ''')
+            conn.execute(f'''
+                DELETE FROM jobs
+                WHERE status IN ('{DONE}', '{FAILED}', '{CANCELLED}')
+                  AND updated_at < datetime('now', '-{RETENTION_DAYS} days')
+            ''')
+            conn.execute('DELETE FROM job_dependencies WHERE job_id NOT IN (SELECT id FROM jobs)')
+            return cursor.rowcount
+
+        try:
+            count = self._write(recover)
+            if count:
+                logger.info(f"恢复了 {count} 个未完成的流水线任务")
+            return count
+        except Exception as e:
+            logger.error(f"恢复任务失败: {e}")
+            return 0
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """各阶段各状态的任务数"""
+        conn = db_manager.get_connection()
+        try:
+            rows = conn.execute('SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status').fetchall()
+        except Exception as e:
+            logger.error(f"统计任务失败: {e}")
+            rows = []
+        finally:
+            conn.close()
+        result: Dict[str, Dict[str, int]] = {}
+        for stage, status, count in rows:
+            result.setdefault(stage, {})[status] = count
+        return result
+
+    def key_counts(self, dedup_keys: Iterable[str]) -> Dict[str, int]:
+        """指定去重键各自最新一条任务的状态统计 {状态: 数量}"""
+        keys = [key for key in dedup_keys if key]
+        if not keys:
+            return {}
+        conn = db_manager.get_connection()
+        try:
+            placeholders = ','.join('?' * len(keys))
+            rows = conn.execute(f'''
+                SELECT status, COUNT(*) FROM jobs
+                WHERE id IN (SELECT MAX(id) FROM jobs WHERE dedup_key IN ({placeholders}) GROUP BY dedup_key)
+                GROUP BY status
+            ''', keys).fetchall()
+            return {status: count for status, count in rows}
+        except Exception as e:
+            logger.error(f"统计任务失败: {e}")
+            return {}
+        finally:
+            conn.close()
+
+
+# 全局任务队列
+job_queue = JobQueue()
@@ -0,0 +1,138 @@
+"""
+批量视频处理
+多个 ffmpeg 进程并行处理一批文件（并发数由任务执行器的 ffmpeg 资源上限决定，按 CPU 核数设置），
+逐个文件回报结果与耗时，结束后汇总吞吐量
+"""
+
+import os
+import subprocess
+import time
+from concurrent.futures import as_completed
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from utils.task_executor import RESOURCE_FFMPEG, task_executor
+
+
+# 去首帧时视频重新编码的参数：偏重速度，略降低 crf 弥补快速预设的画质损失
+TRIM_PRESET = 'veryfast'
+TRIM_CRF = '20'
+
+
+class MediaJobResult:
+    """单个文件的处理结果"""
+
+    __slots__ = ('path', 'success', 'error', 'elapsed', 'size')
+
+    def __init__(self, path: str, success: bool, error: str = '', elapsed: float = 0.0, size: int = 0):
+        self.path = path
+        self.success = success
+        self.error = error
+        self.elapsed = elapsed
+        self.size = size
+
+
+def threads_per_job() -> int:
+    """每个 ffmpeg 进程使用的线程数，使并行的进程合计占满 CPU"""
+    return max(1, (os.cpu_count() or 2) // task_executor.limit(RESOURCE_FFMPEG))
+
+
+def _run_ffmpeg(cmd: List[str]) -> subprocess.CompletedProcess:
+    logger.debug(f"执行ffmpeg命令: {' '.join(cmd)}")
+    return subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace')
+
+
+def remove_first_frame(ffmpeg_exe: str, path: str):
+    """
+    移除视频第一帧并覆盖原文件，失败时抛出 RuntimeError
+
+    视频必须重新编码（使用快速预设）；音频内容不变，直接复制音频流，
+    容器不支持复制时再转码为 AAC
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError("文件不存在")
+    tmp_out = path + ".tmp.mp4"
+    base = [
+        ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", path,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-vf", "select='not(eq(n,0))',setpts=PTS-STARTPTS",
+        "-c:v", "libx264", "-preset", TRIM_PRESET, "-crf", TRIM_CRF,
+        "-threads", str(threads_per_job()),
+    ]
+    tail = ["-movflags", "+faststart", tmp_out]
+    try:
+        proc = _run_ffmpeg(base + ["-c:a", "copy"] + tail)
+        if proc.returncode != 0:
+            logger.info(f"音频流无法直接复制，改为转码: {path}")
+            proc = _run_ffmpeg(base + ["-af", "asetpts=PTS-STARTPTS", "-c:a", "aac"] + tail)
+        if proc.returncode != 0:
+            raise RuntimeError((proc.stderr or "ffmpeg执行失败").strip())
+        os.replace(tmp_out, path)
+    finally:
+        if os.path.exists(tmp_out):
+            try:
+                os.remove(tmp_out)
+            except OSError:
+                pass
+
+
+def run_batch(
+    paths: List[str],
+    job: Callable[[str], None],
+    on_result: Optional[Callable[[MediaJobResult], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> List[MediaJobResult]:
+    """
+    并行处理一批文件
+
+    Args:
+        paths: 文件路径
+        job: 处理单个文件的函数，失败时抛出异常
+        on_result: 每个文件完成时调用（在调用 run_batch 的线程中，按完成顺序）
+        should_stop: 返回 True 时取消尚未开始的文件（已开始的文件处理完后返回）
+
+    Returns:
+        List[MediaJobResult]: 已处理文件的结果（按完成顺序）
+    """
+    def timed(path: str) -> MediaJobResult:
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+        started = time.monotonic()
+        try:
+            job(path)
+            return MediaJobResult(path, True, elapsed=time.monotonic() - started, size=size)
+        except Exception as e:
+            logger.error(f"处理失败 file={path} err={e}")
+            return MediaJobResult(path, False, str(e), time.monotonic() - started, size)
+
+    started = time.monotonic()
+    futures = [task_executor.submit_call(timed, path, resource=RESOURCE_FFMPEG) for path in paths]
+    results: List[MediaJobResult] = []
+    stopped = False
+    for future in as_completed(futures):
+        if future.cancelled():
+            continue
+        result = future.result()
+        results.append(result)
+        if on_result:
+            on_result(result)
+        if not stopped and should_stop and should_stop():
+            stopped = True
+            cancelled = sum(1 for f in futures if task_executor.cancel(f))
+            logger.info(f"批量处理已停止，取消 {cancelled} 个未开始的文件")
+    _log_summary(results, time.monotonic() - started)
+    return results
+
+
+def _log_summary(results: List[MediaJobResult], wall: float):
+    if not results:
+        return
+    busy = sum(r.elapsed for r in results)
+    size_mb = sum(r.size for r in results) / 1048576
+    ok = sum(1 for r in results if r.success)
+    logger.info(
+        f"批量处理完成: 成功 {ok}/{len(results)}，总耗时 {wall:.1f} s，"
+        f"单文件平均 {busy / len(results):.1f} s，吞吐 {len(results) / max(wall, 1e-6) * 60:.1f} 个/分钟、"
+        f"{size_mb / max(wall, 1e-6):.1f} MB/s，平均并发 {busy / max(wall, 1e-6):.1f}"
+    )
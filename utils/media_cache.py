@@ -0,0 +1,231 @@
+"""
+本地视频缓存
+按内容哈希（SHA-256）保存下载过的视频，media_cache 表记录 URL → 内容的对应关系；
+同一 URL 再次使用时直接读取本地文件，多个 URL 内容相同时只保存一份。
+总大小超过上限时按最近使用时间淘汰
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from database_manager import db_manager
+from utils.downloader import ProgressCallback, download
+
+
+# 默认缓存上限（MB），可通过配置 media_cache_max_mb 修改
+DEFAULT_MAX_MB = 5120
+# 最近该时间内使用过的文件不淘汰（正在导出、放大的视频）
+EVICT_GRACE_SECONDS = 600
+# 计算哈希时的读取块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """内容寻址的本地视频缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.path.join(db_manager.app_data_dir, "media_cache")
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return int(db_manager.load_config('media_cache_max_mb', DEFAULT_MAX_MB)) * 1024 * 1024
+
+    def _content_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, sha256[:2], f"{sha256}{ext}")
+
+    def _incoming_path(self, url: str, ext: str) -> str:
+        # 同一 URL 的未完成下载使用固定路径，中断后可续传
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "incoming", f"{name}{ext}")
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            lock = self._url_locks.get(url)
+            if lock is None:
+                lock = self._url_locks[url] = threading.Lock()
+            return lock
+
+    # ---------------- 读取 ----------------
+
+    def lookup(self, url: str) -> Optional[str]:
+        """已缓存时返回本地文件路径并更新使用时间，否则返回 None"""
+        conn = db_manager.get_connection()
+        try:
+            row = conn.execute('SELECT path, size FROM media_cache WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            path, size = row[0], row[1]
+            if not os.path.isfile(path) or os.path.getsize(path) != size:
+                # 文件被删除或损坏
+                conn.execute('DELETE FROM media_cache WHERE url = ?', (url,))
+                conn.commit()
+                return None
+            conn.execute('UPDATE media_cache SET last_access = ? WHERE url = ?', (time.time(), url))
+            conn.commit()
+            return path
+        except Exception as e:
+            logger.error(f"读取视频缓存失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def fetch(
+        self,
+        url: str,
+        progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """
+        返回 URL 对应的本地缓存文件路径，未缓存时先下载
+
+        参数与异常同 utils.downloader.download；返回的文件属于缓存，调用方不要修改或删除
+        """
+        with self._url_lock(url):
+            path = self.lookup(url)
+            if path:
+                logger.info(f"视频缓存命中: {url}")
+                if progress:
+                    size = os.path.getsize(path)
+                    progress(size, size)
+                return path
+
+            ext = os.path.splitext(url.split('?', 1)[0])[1][:8] or '.mp4'
+            incoming = self._incoming_path(url, ext)
+            download(url, incoming, progress=progress, should_stop=should_stop)
+            return self._store(url, incoming, ext)
+
+    def copy_to(
+        self,
+        url: str,
+        dest: str,
+        progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> int:
+        """经缓存获取 URL 并复制到 dest，返回文件大小"""
+        path = self.fetch(url, progress=progress, should_stop=should_stop)
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        shutil.copyfile(path, dest)
+        return os.path.getsize(dest)
+
+    # ---------------- 写入与淘汰 ----------------
+
+    def _store(self, url: str, incoming: str, ext: str) -> str:
+        sha256 = file_sha256(incoming)
+        size = os.path.getsize(incoming)
+        path = self._content_path(sha256, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.isfile(path) and os.path.getsize(path) == size:
+            # 内容已存在（其他 URL 下载过相同文件）
+            os.remove(incoming)
+        else:
+            os.replace(incoming, path)
+
+        now = time.time()
+        conn = db_manager.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO media_cache (url, sha256, size, path, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    size = excluded.size,
+                    path = excluded.path,
+                    last_access = excluded.last_access
+            ''', (url, sha256, size, path, now, now))
+            conn.commit()
+        finally:
+            conn.close()
+        self.evict()
+        return path
+
+    def evict(self) -> int:
+        """淘汰最久未使用的文件直到总大小不超过上限，返回释放的字节数"""
+        limit = self.max_bytes
+        conn = db_manager.get_connection()
+        freed = 0
+        try:
+            rows = conn.execute('''
+                SELECT sha256, MAX(size), MAX(path), MAX(last_access) AS used
+                FROM media_cache GROUP BY sha256 ORDER BY used
+            ''').fetchall()
+            total = sum(row[1] for row in rows)
+            if total <= limit:
+                return 0
+            grace_start = time.time() - EVICT_GRACE_SECONDS
+            for sha256, size, path, used in rows:
+                if total <= limit or used >= grace_start:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除缓存文件失败: {path}, {e}")
+                    continue
+                conn.execute('DELETE FROM media_cache WHERE sha256 = ?', (sha256,))
+                total -= size
+                freed += size
+            conn.commit()
+            if freed:
+                logger.info(f"视频缓存淘汰 {freed / 1048576:.1f} MB，当前 {total / 1048576:.1f} MB")
+            return freed
+        except Exception as e:
+            logger.error(f"视频缓存淘汰失败: {e}")
+            return freed
+        finally:
+            conn.close()
+
+    def invalidate(self, url: str):
+        """移除 URL 的缓存记录（内容文件在没有其他 URL 引用时删除）"""
+        conn = db_manager.get_connection()
+        try:
+            row = conn.execute('SELECT sha256, path FROM media_cache WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return
+            conn.execute('DELETE FROM media_cache WHERE url = ?', (url,))
+            others = conn.execute('SELECT COUNT(*) FROM media_cache WHERE sha256 = ?', (row[0],)).fetchone()[0]
+            conn.commit()
+            if not others:
+                try:
+                    os.remove(row[1])
+                except OSError:
+                    pass
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存的 URL 数、文件数与总大小"""
+        conn = db_manager.get_connection()
+        try:
+            urls, files, size = conn.execute('''
+                SELECT COUNT(*), COUNT(DISTINCT sha256),
+                       COALESCE((SELECT SUM(s) FROM (SELECT MAX(size) AS s FROM media_cache GROUP BY sha256)), 0)
+                FROM media_cache
+            ''').fetchone()
+            return {'urls': urls, 'files': files, 'bytes': size, 'max_bytes': self.max_bytes}
+        finally:
+            conn.close()
+
+
+# 全局视频缓存
+media_cache = MediaCache()
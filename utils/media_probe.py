@@ -0,0 +1,239 @@
+"""
+视频流参数探测与格式统一
+用 ffmpeg 读取视频的编码、分辨率、帧率、音频参数（结果按文件缓存在 media_probe 表中），
+判断多个视频能否直接拼接（concat -c copy），并把参数不一致的视频转码为统一格式
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+
+
+# 目标视频编码对应的编码器；不在表中的编码统一转为 H.264
+VIDEO_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+AUDIO_ENCODERS = {'aac': 'aac', 'mp3': 'libmp3lame', 'opus': 'libopus'}
+# H.264 profile 名称 → libx264 参数
+H264_PROFILES = {'high': 'high', 'main': 'main', 'baseline': 'baseline', 'constrained baseline': 'baseline'}
+CHANNEL_COUNTS = {'mono': 1, 'stereo': 2, '2.1': 3, '4.0': 4, '5.1': 6, '5.1(side)': 6, '7.1': 8}
+# 转码质量
+ENCODE_PRESET = 'veryfast'
+ENCODE_CRF = '18'
+
+_VIDEO_RE = re.compile(r'Stream #\S+.*?: Video: (\w+)(?: \(([^)]*)\))?.*?, (\w+)(?:\([^)]*\))?, (\d+)x(\d+)')
+_FPS_RE = re.compile(r'([\d.]+) fps')
+_TBN_RE = re.compile(r'([\d.]+)k? tbn')
+_AUDIO_RE = re.compile(r'Stream #\S+.*?: Audio: (\w+).*?, (\d+) Hz, ([^,]+)')
+_DURATION_RE = re.compile(r'Duration: (\d+):(\d+):([\d.]+)')
+
+
+class StreamInfo:
+    """视频文件的流参数"""
+
+    __slots__ = ('video_codec', 'profile', 'pix_fmt', 'width', 'height', 'fps', 'tbn',
+                 'audio_codec', 'sample_rate', 'channels', 'duration')
+
+    def __init__(self, video_codec: str = '', profile: str = '', pix_fmt: str = '', width: int = 0,
+                 height: int = 0, fps: str = '', tbn: str = '', audio_codec: str = '',
+                 sample_rate: int = 0, channels: str = '', duration: float = 0.0):
+        self.video_codec = video_codec
+        self.profile = profile
+        self.pix_fmt = pix_fmt
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.tbn = tbn
+        self.audio_codec = audio_codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.duration = duration
+
+    def signature(self) -> Tuple:
+        """直接拼接要求一致的参数"""
+        return (self.video_codec, self.profile, self.pix_fmt, self.width, self.height, self.fps,
+                self.audio_codec, self.sample_rate, self.channels)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StreamInfo':
+        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+
+    def __repr__(self):
+        audio = f"{self.audio_codec} {self.sample_rate}Hz {self.channels}" if self.audio_codec else '无音频'
+        return f"{self.video_codec}({self.profile}) {self.width}x{self.height} {self.fps}fps {self.pix_fmt}, {audio}"
+
+
+def parse_ffmpeg_info(text: str) -> Optional[StreamInfo]:
+    """从 `ffmpeg -i` 的输出中解析第一个视频流与音频流"""
+    info = StreamInfo()
+    for line in text.splitlines():
+        if not info.video_codec:
+            m = _VIDEO_RE.search(line)
+            if m:
+                info.video_codec = m.group(1)
+                info.profile = (m.group(2) or '') if '/' not in (m.group(2) or '') else ''
+                info.pix_fmt = m.group(3)
+                info.width, info.height = int(m.group(4)), int(m.group(5))
+                fps = _FPS_RE.search(line)
+                info.fps = fps.group(1) if fps else ''
+                tbn = _TBN_RE.search(line)
+                info.tbn = tbn.group(1) if tbn and 'k tbn' not in line else ''
+                continue
+        if not info.audio_codec:
+            m = _AUDIO_RE.search(line)
+            if m:
+                info.audio_codec = m.group(1)
+                info.sample_rate = int(m.group(2))
+                info.channels = m.group(3).strip()
+                continue
+        m = _DURATION_RE.search(line)
+        if m and not info.duration:
+            info.duration = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    return info if info.video_codec else None
+
+
+class MediaProbe:
+    """视频参数探测（结果按 路径+大小+修改时间 缓存）"""
+
+    def __init__(self):
+        self._memory: Dict[Tuple[str, int, int], StreamInfo] = {}
+        self._lock = threading.Lock()
+
+    def probe(self, path: str, ffmpeg_exe: str) -> Optional[StreamInfo]:
+        """读取视频流参数，无法识别时返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.error(f"读取视频文件失败: {path}, {e}")
+            return None
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+        info = self._load(key)
+        if info is None:
+            proc = subprocess.run([ffmpeg_exe, '-hide_banner', '-i', path], capture_output=True,
+                                  text=True, encoding='utf-8', errors='replace')
+            info = parse_ffmpeg_info(proc.stderr)
+            if info is None:
+                logger.warning(f"无法识别视频参数: {path}")
+                return None
+            self._save(key, info)
+        with self._lock:
+            self._memory[key] = info
+        return info
+
+    def _load(self, key: Tuple[str, int, int]) -> Optional[StreamInfo]:
+        conn = db_manager.get_connection()
+        try:
+            row = conn.execute('SELECT info FROM media_probe WHERE path = ? AND size = ? AND mtime_ns = ?',
+                               key).fetchone()
+            return StreamInfo.from_dict(json.loads(row[0])) if row else None
+        except Exception as e:
+            logger.warning(f"读取视频参数缓存失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def _save(self, key: Tuple[str, int, int], info: StreamInfo):
+        conn = db_manager.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO media_probe (path, size, mtime_ns, info, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns,
+                    info = excluded.info,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (*key, json.dumps(info.to_dict())))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"保存视频参数缓存失败: {e}")
+        finally:
+            conn.close()
+
+
+def choose_target(infos: Sequence[Optional[StreamInfo]]) -> Optional[StreamInfo]:
+    """
+    选择拼接的目标格式：出现次数最多的参数组合（并列时取靠前的），
+    使尽量多的视频无需转码；编码无法用内置编码器生成时改为 H.264
+    """
+    counts: Dict[Tuple, int] = {}
+    first: Dict[Tuple, StreamInfo] = {}
+    for info in infos:
+        if info is None:
+            continue
+        sig = info.signature()
+        counts[sig] = counts.get(sig, 0) + 1
+        first.setdefault(sig, info)
+    if not counts:
+        return None
+    target = StreamInfo.from_dict(first[max(counts, key=counts.get)].to_dict())
+    if target.video_codec not in VIDEO_ENCODERS:
+        target.video_codec, target.profile = 'h264', 'High'
+    if target.video_codec == 'h264' and target.profile.lower() not in H264_PROFILES:
+        target.profile = 'High'
+    if target.audio_codec and target.audio_codec not in AUDIO_ENCODERS:
+        target.audio_codec = 'aac'
+    if not target.fps:
+        target.fps = '30'
+    return target
+
+
+def clips_to_normalize(infos: Sequence[Optional[StreamInfo]], target: StreamInfo) -> List[int]:
+    """参数与目标不一致（或无法识别）的视频序号"""
+    sig = target.signature()
+    return [i for i, info in enumerate(infos) if info is None or info.signature() != sig]
+
+
+def normalize_clip(ffmpeg_exe: str, src: str, dst: str, target: StreamInfo, info: Optional[StreamInfo] = None):
+    """
+    把视频转码为目标格式：等比缩放并补边到目标分辨率，统一帧率、像素格式与音频参数；
+    目标有音频而原视频没有时补静音。失败时抛出 RuntimeError
+    """
+    w, h = target.width, target.height
+    cmd = [ffmpeg_exe, '-hide_banner', '-loglevel', 'error', '-y', '-i', src]
+    add_silence = bool(target.audio_codec) and (info is None or not info.audio_codec)
+    if add_silence:
+        layout = target.channels if target.channels in CHANNEL_COUNTS else 'stereo'
+        cmd += ['-f', 'lavfi', '-i', f"anullsrc=channel_layout={layout}:sample_rate={target.sample_rate or 44100}"]
+        cmd += ['-map', '0:v:0', '-map', '1:a:0', '-shortest']
+    else:
+        cmd += ['-map', '0:v:0', '-map', '0:a:0?']
+    cmd += [
+        '-vf', f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+               f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={target.fps}",
+        '-c:v', VIDEO_ENCODERS[target.video_codec],
+        '-preset', ENCODE_PRESET,
+        '-crf', ENCODE_CRF,
+        '-pix_fmt', target.pix_fmt or 'yuv420p',
+    ]
+    profile = H264_PROFILES.get(target.profile.lower()) if target.video_codec == 'h264' else None
+    if profile:
+        cmd += ['-profile:v', profile]
+    if target.tbn and target.tbn.isdigit():
+        cmd += ['-video_track_timescale', target.tbn]
+    if target.audio_codec:
+        cmd += ['-c:a', AUDIO_ENCODERS[target.audio_codec], '-ar', str(target.sample_rate or 44100),
+                '-ac', str(CHANNEL_COUNTS.get(target.channels, 2))]
+    else:
+        cmd += ['-an']
+    cmd += ['-movflags', '+faststart', dst]
+    logger.debug(f"执行ffmpeg转码命令: {' '.join(cmd)}")
+    proc = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    if proc.returncode != 0:
+        raise RuntimeError((proc.stderr or "ffmpeg转码失败").strip())
+
+
+# 全局视频参数探测
+media_probe = MediaProbe()
@@ -15,13 +15,13 @@ nanobanana_util
 import sys
 import argparse
 from pathlib import Path
-import requests
-import http.client
 import json
 from typing import Optional, Dict, Any
 
 from database_manager import db_manager
 from constants import API_BASE_URL, API_HOST, API_CHAT_COMPLETIONS_URL
+from utils import http_client
+from utils.upload_cache import files_target, files_ttl, upload_cache
 
 
 def upload_image_to_bed(file_path: str, token: Optional[str] = None, timeout: int = 180) -> str:
@@ -31,9 +31,19 @@ def upload_image_to_bed(file_path: str, token: Optional[str] = None, timeout: in
     if not p.exists() or not p.is_file():
         raise FileNotFoundError(f"图片文件不存在: {file_path}")
 
+    endpoint = f"{API_BASE_URL.rstrip('/')}/v1/files"
+    # 相同图片已上传过时直接复用 URL
+    return upload_cache.get_or_upload(
+        file_path, files_target(endpoint),
+        lambda: _post_image_to_bed(p, endpoint, timeout),
+        ttl=files_ttl(),
+    )
+
+
+def _post_image_to_bed(p: Path, endpoint: str, timeout: int) -> str:
     base_url = API_BASE_URL
     api_key = db_manager.load_config('api_key', '') or ''
-    endpoint = f"{base_url.rstrip('/')}/v1/files"
+    file_path = str(p)
 
     def _ct(suf: str) -> str:
         s = suf.lower()
@@ -65,21 +75,15 @@ def upload_image_to_bed(file_path: str, token: Optional[str] = None, timeout: in
         'file': (p.name, f, content_type)
     }
 
-    session = requests.Session()
-    session.trust_env = False
     try:
-        resp = session.post(
+        resp = http_client.post(
             endpoint,
             files=files,
             headers=headers,
             timeout=timeout,
-            proxies={"http": None, "https": None}
+            trust_env=False
         )
     finally:
-        try:
-            session.close()
-        except Exception:
-            pass
         try:
             f.close()
         except Exception:
@@ -149,7 +153,7 @@ def call_image_chat_completion(
         ],
     }
 
-    resp = requests.post(url, json=payload, headers=headers, timeout=timeout)
+    resp = http_client.post(url, json=payload, headers=headers, timeout=timeout)
     if resp.status_code != 200:
         raise RuntimeError(f"API 调用失败: {resp.status_code} - {resp.text}")
     return resp.json()
@@ -163,7 +167,7 @@ def call_nano_banana_image_generation(
 ) -> Dict[str, Any]:
     """直接调用 NanoBanana 图片生成接口 /v1/images/generations。
 
-    使用标准库 http.client 建立 HTTPS 连接，固定 base_url 为 https://api.shaohua.fun，
+    通过共享连接池发送 HTTPS 请求，固定 base_url 为 https://api.shaohua.fun，
     并从配置表读取 api_key（config.api_key）。
 
     参数：
@@ -200,24 +204,17 @@ def call_nano_banana_image_generation(
         'Accept': 'application/json',
     }
 
-    conn = http.client.HTTPSConnection(host, timeout=timeout)
-    try:
-        body = json.dumps(payload)
-        conn.request('POST', path, body, headers)
-        res = conn.getresponse()
-        data = res.read()
-        text = data.decode('utf-8')
+    res = http_client.post(f"https://{host}{path}", data=json.dumps(payload), headers=headers, timeout=timeout)
+    text = res.content.decode('utf-8')
 
-        if res.status != 200:
-            raise RuntimeError(f"NanoBanana 接口失败: {res.status} - {text}")
+    if res.status_code != 200:
+        raise RuntimeError(f"NanoBanana 接口失败: {res.status_code} - {text}")
 
-        try:
-            return json.loads(text)
-        except Exception:
-            # 返回原始文本以便上层记录
-            return {"raw": text}
-    finally:
-        conn.close()
+    try:
+        return json.loads(text)
+    except Exception:
+        # 返回原始文本以便上层记录
+        return {"raw": text}
 
 
 def main():
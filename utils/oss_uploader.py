@@ -3,17 +3,159 @@
 支持图片和视频上传到阿里云 OSS（公共写模式）
 """
 
+import hashlib
+import json
 import os
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Tuple, Union
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
 import requests
 import urllib3
 from loguru import logger
 
+from database_manager import db_manager
+from utils import http_client
+from utils.upload_cache import oss_target, upload_cache
+
 # 禁用 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+UPLOAD_TIMEOUT = 300
+# 不小于该大小的文件使用分片上传
+MULTIPART_THRESHOLD = 32 * 1024 * 1024
+# 分片大小（OSS 要求除最后一片外不小于 100KB，最多 10000 片）
+PART_SIZE = 8 * 1024 * 1024
+# 同时上传的分片数
+PART_CONCURRENCY = 4
+# 单个分片失败后的重试次数
+PART_RETRIES = 3
+# 进度回调的最小间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+ProgressCallback = Callable[[int, int], None]   # (已上传字节数, 总字节数)
+
+
+def _part_length(number: int, size: int) -> int:
+    """第 number 个分片（从 1 开始）的长度"""
+    return max(0, min(PART_SIZE, size - (number - 1) * PART_SIZE))
+
+
+def _xml_text(content: bytes, tag: str) -> str:
+    try:
+        return ElementTree.fromstring(content).findtext(f'{{*}}{tag}', '') or ''
+    except ElementTree.ParseError:
+        return ''
+
+
+def _load_json(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(path: str, data: dict):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.warning(f"保存上传进度失败: {e}")
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _ProgressTracker:
+    """汇总多个分片的上传进度，按间隔节流回调"""
+
+    def __init__(self, total: int, callback: ProgressCallback):
+        self.total = total
+        self.callback = callback
+        self.sent = 0
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, n: int):
+        now = time.monotonic()
+        with self._lock:
+            self.sent += n
+            if now - self._last < PROGRESS_INTERVAL and self.sent < self.total:
+                return
+            self._last = now
+            sent = self.sent
+        try:
+            self.callback(sent, self.total)
+        except Exception as e:
+            logger.warning(f"上传进度回调失败: {e}")
+
+
+class _StreamBody:
+    """
+    已知长度的流式请求体：从文件对象（当前位置起）或字节块迭代器读取，最多 size 字节。
+    requests 按 len() 设置 Content-Length，并分块调用 read() 发送，不整体读入内存
+    """
+
+    def __init__(self, source: Union[BinaryIO, Iterable[bytes]], size: int,
+                 on_read: Optional[Union[Callable[[int], None], _ProgressTracker]] = None):
+        self._source = source
+        self._size = size
+        self._remaining = size
+        self._on_read = on_read.add if isinstance(on_read, _ProgressTracker) else on_read
+        self._iter = None if hasattr(source, 'read') else iter(source)
+        self._pending = b''
+        self._start = None
+        if self._iter is None:
+            try:
+                self._start = source.tell()
+            except (AttributeError, OSError):
+                pass
+
+    def __len__(self):
+        return self._size
+
+    def read(self, n: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if n is None or n < 0 or n > self._remaining:
+            n = self._remaining
+        if self._iter is None:
+            chunk = self._source.read(n)
+        else:
+            while len(self._pending) < n:
+                block = next(self._iter, None)
+                if block is None:
+                    break
+                self._pending += block
+            chunk, self._pending = self._pending[:n], self._pending[n:]
+        if not chunk:
+            raise IOError(f"数据长度不足：还差 {self._remaining} bytes")
+        self._remaining -= len(chunk)
+        if self._on_read:
+            self._on_read(len(chunk))
+        return chunk
+
+    def rewind(self) -> bool:
+        """回到起始位置以便重发，不支持时返回 False"""
+        if self._start is None:
+            return False
+        if self._on_read and self._remaining < self._size:
+            self._on_read(-(self._size - self._remaining))
+        self._source.seek(self._start)
+        self._remaining = self._size
+        return True
+
 
 class OSSUploader:
     """阿里云 OSS 上传器"""
@@ -149,13 +291,19 @@ class OSSUploader:
         else:
             return 'application/octet-stream'
     
-    def upload_file(self, file_path: str, prefix: str = '', custom_key: Optional[str] = None) -> str:
+    def upload_file(self, file_path: str, prefix: str = '', custom_key: Optional[str] = None,
+                    progress: Optional[ProgressCallback] = None) -> str:
         """上传文件到 OSS（公共写模式）
         
+        未指定 custom_key 时经上传缓存去重：相同内容已上传过则直接返回已有 URL。
+        小文件从文件流式 PUT（不整体读入内存）；不小于 MULTIPART_THRESHOLD 的文件使用分片上传，
+        多个分片并行，中断后再次上传同一文件时从已完成的分片继续
+        
         Args:
             file_path: 本地文件路径
             prefix: 前缀路径，如 'images/' 或 'videos/'
             custom_key: 自定义对象键，如果提供则使用此值
+            progress: 进度回调 (已上传字节数, 总字节数)，可能在工作线程中调用
         
         Returns:
             文件的访问 URL
@@ -163,6 +311,23 @@ class OSSUploader:
         p = Path(file_path)
         if not p.exists() or not p.is_file():
             raise FileNotFoundError(f"文件不存在: {file_path}")
+        if custom_key:
+            return self._upload_file(p, prefix, custom_key, progress)
+        # 相同内容已上传到该 Bucket 时直接复用 URL
+        return upload_cache.get_or_upload(
+            file_path, oss_target(self.bucket_domain),
+            lambda: self._upload_file(p, prefix, None, progress),
+        )
+    
+    def _upload_file(self, p: Path, prefix: str, custom_key: Optional[str],
+                     progress: Optional[ProgressCallback]) -> str:
+        file_path = str(p)
+        # 获取 Content-Type 与文件大小
+        content_type = self._guess_content_type(p.suffix)
+        file_size = p.stat().st_size
+        
+        if file_size >= MULTIPART_THRESHOLD:
+            return self._multipart_upload(p, file_size, prefix, custom_key, content_type, progress)
         
         # 生成对象键
         if custom_key:
@@ -170,84 +335,250 @@ class OSSUploader:
         else:
             object_key = self._generate_object_key(file_path, prefix)
         
-        # 获取 Content-Type
-        content_type = self._guess_content_type(p.suffix)
-        
         logger.info(f"开始上传文件到 OSS: {file_path} -> {object_key}")
-        
-        # 使用公共写模式（HTTP PUT 直接上传）
-        upload_url = f"{self.bucket_domain.rstrip('/')}/{object_key}"
-        
-        # 获取文件大小
-        file_size = p.stat().st_size
-        
-        # 读取文件内容
         with open(file_path, 'rb') as f:
-            file_data = f.read()
+            return self.upload_stream(f, file_size, object_key, content_type, progress)
+    
+    def upload_stream(self, data: Union[BinaryIO, Iterable[bytes]], size: int, object_key: str,
+                      content_type: str = 'application/octet-stream',
+                      progress: Optional[ProgressCallback] = None) -> str:
+        """从文件对象或字节块迭代器流式上传（需已知总长度）
         
-        # 准备请求头
+        Args:
+            data: 可读文件对象，或依次产生字节块的迭代器
+            size: 数据总长度（作为 Content-Length）
+            object_key: OSS 对象键
+            content_type: Content-Type
+            progress: 进度回调 (已上传字节数, 总字节数)
+        
+        Returns:
+            文件的访问 URL
+        """
+        upload_url = self._object_url(object_key)
         headers = {
             'Content-Type': content_type,
-            'Content-Length': str(file_size),
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent': USER_AGENT,
         }
+        body = _StreamBody(data, size, _ProgressTracker(size, progress) if progress else None)
         
-        # 创建 session 并禁用代理
-        session = requests.Session()
-        session.trust_env = False
-        session.proxies = {"http": None, "https": None}
-        
-        logger.info(f"开始上传到 OSS（公共写模式）: {upload_url}, 文件大小: {file_size} bytes")
-        
+        logger.info(f"开始上传到 OSS（公共写模式）: {upload_url}, 文件大小: {size} bytes")
         try:
-            try:
-                response = session.put(
-                    upload_url,
-                    data=file_data,
-                    headers=headers,
-                    timeout=300,
-                    verify=True  # 保持 SSL 验证
-                )
-            except requests.exceptions.SSLError as ssl_err:
-                # 如果 SSL 验证失败，尝试不验证（仅作为备选方案）
-                logger.warning(f"SSL 验证失败，尝试不验证 SSL: {ssl_err}")
-                response = session.put(
-                    upload_url,
-                    data=file_data,
-                    headers=headers,
-                    timeout=300,
-                    verify=False  # 不验证 SSL（仅用于调试）
-                )
+            response = self._request('PUT', upload_url, body, headers)
             
             if response.status_code == 200:
                 # 上传成功，返回访问 URL
-                url = upload_url
-                logger.info(f"文件上传成功（公共写模式）: {url}")
-                return url
-            else:
-                error_msg = response.text[:500] if response.text else "无响应内容"
-                logger.error(f"OSS 公共写模式上传失败: 状态码={response.status_code}, 响应={error_msg}")
-                raise RuntimeError(
-                    f"OSS 上传失败（状态码: {response.status_code}）。\n"
-                    f"请检查 Bucket 是否已开启公共读写权限。\n"
-                    f"错误详情: {error_msg}"
-                )
-        
+                logger.info(f"文件上传成功（公共写模式）: {upload_url}")
+                return upload_url
+            self._raise_upload_error(response)
         except requests.exceptions.SSLError as ssl_err:
-            logger.error(f"OSS 上传 SSL 错误: {ssl_err}")
-            raise RuntimeError(
-                f"OSS 上传失败：SSL 连接错误。\n"
-                f"这可能是由于网络问题或 OSS 配置问题导致的。\n"
-                f"建议：\n"
-                f"1. 检查网络连接是否正常\n"
-                f"2. 检查 Bucket 域名是否正确\n"
-                f"3. 确认 Bucket 已开启公共读写权限\n"
-                f"错误详情: {str(ssl_err)}"
-            )
+            self._raise_ssl_error(ssl_err)
         except Exception as e:
             logger.error(f"上传文件到 OSS 失败: {str(e)}")
             raise
     
+    # ---------------- 请求与错误处理 ----------------
+    
+    def _object_url(self, object_key: str) -> str:
+        return f"{self.bucket_domain.rstrip('/')}/{object_key}"
+    
+    def _request(self, method: str, url: str, body=None, headers: Optional[dict] = None,
+                 params: Optional[dict] = None) -> requests.Response:
+        """通过共享连接池发送请求（不使用代理）；SSL 验证失败时不验证重试一次"""
+        try:
+            return http_client.request(
+                method, url, data=body, headers=headers, params=params,
+                timeout=UPLOAD_TIMEOUT,
+                verify=True,  # 保持 SSL 验证
+                trust_env=False  # 禁用代理
+            )
+        except requests.exceptions.SSLError as ssl_err:
+            # 如果 SSL 验证失败，尝试不验证（仅作为备选方案）
+            if isinstance(body, _StreamBody) and not body.rewind():
+                raise
+            logger.warning(f"SSL 验证失败，尝试不验证 SSL: {ssl_err}")
+            return http_client.request(
+                method, url, data=body, headers=headers, params=params,
+                timeout=UPLOAD_TIMEOUT,
+                verify=False,  # 不验证 SSL（仅用于调试）
+                trust_env=False
+            )
+    
+    @staticmethod
+    def _raise_upload_error(response: requests.Response):
+        error_msg = response.text[:500] if response.text else "无响应内容"
+        logger.error(f"OSS 公共写模式上传失败: 状态码={response.status_code}, 响应={error_msg}")
+        raise RuntimeError(
+            f"OSS 上传失败（状态码: {response.status_code}）。\n"
+            f"请检查 Bucket 是否已开启公共读写权限。\n"
+            f"错误详情: {error_msg}"
+        )
+    
+    @staticmethod
+    def _raise_ssl_error(ssl_err: Exception):
+        logger.error(f"OSS 上传 SSL 错误: {ssl_err}")
+        raise RuntimeError(
+            f"OSS 上传失败：SSL 连接错误。\n"
+            f"这可能是由于网络问题或 OSS 配置问题导致的。\n"
+            f"建议：\n"
+            f"1. 检查网络连接是否正常\n"
+            f"2. 检查 Bucket 域名是否正确\n"
+            f"3. 确认 Bucket 已开启公共读写权限\n"
+            f"错误详情: {str(ssl_err)}"
+        )
+    
+    # ---------------- 分片上传 ----------------
+    
+    def _multipart_upload(self, path: Path, size: int, prefix: str, custom_key: Optional[str],
+                          content_type: str, progress: Optional[ProgressCallback]) -> str:
+        """分片上传：初始化 → 并行上传分片 → 合并；进度保存在本地，中断后继续"""
+        state_path = self._multipart_state_path(path, size, prefix, custom_key)
+        state = _load_json(state_path)
+        object_key = state.get('object_key')
+        upload_id = state.get('upload_id')
+        done_parts: Dict[int, str] = {}
+        
+        try:
+            if object_key and upload_id:
+                listed = self._list_parts(object_key, upload_id)
+                if listed is None:
+                    logger.info(f"分片上传已失效，重新开始: {path}")
+                    upload_id = None
+                else:
+                    done_parts = {
+                        n: etag for n, (etag, part_size) in listed.items()
+                        if part_size == _part_length(n, size)
+                    }
+                    logger.info(f"继续分片上传 {path}: 已完成 {len(done_parts)} 个分片")
+            if not upload_id:
+                object_key = custom_key or self._generate_object_key(str(path), prefix)
+                upload_id = self._initiate_multipart(object_key, content_type)
+                _save_json(state_path, {'object_key': object_key, 'upload_id': upload_id})
+            
+            part_count = -(-size // PART_SIZE)
+            pending = [n for n in range(1, part_count + 1) if n not in done_parts]
+            tracker = _ProgressTracker(size, progress) if progress else None
+            if tracker:
+                tracker.add(sum(_part_length(n, size) for n in done_parts))
+            logger.info(
+                f"开始分片上传到 OSS: {self._object_url(object_key)}, 文件大小: {size} bytes, "
+                f"分片 {part_count} 个（待上传 {len(pending)} 个）"
+            )
+            with ThreadPoolExecutor(max_workers=PART_CONCURRENCY, thread_name_prefix="oss-part") as pool:
+                futures = {
+                    pool.submit(self._upload_part, path, object_key, upload_id, n, size, tracker): n
+                    for n in pending
+                }
+                for future in as_completed(futures):
+                    done_parts[futures[future]] = future.result()
+            
+            self._complete_multipart(object_key, upload_id, done_parts)
+        except requests.exceptions.SSLError as ssl_err:
+            self._raise_ssl_error(ssl_err)
+        except Exception as e:
+            logger.error(f"分片上传到 OSS 失败（再次上传同一文件时继续）: {str(e)}")
+            raise
+        
+        _remove_file(state_path)
+        url = self._object_url(object_key)
+        logger.info(f"文件上传成功（分片上传）: {url}")
+        return url
+    
+    def _multipart_state_path(self, path: Path, size: int, prefix: str, custom_key: Optional[str]) -> str:
+        stat = path.stat()
+        identity = '|'.join([self.bucket_domain, str(path.resolve()), str(size), str(stat.st_mtime_ns),
+                             prefix or '', custom_key or ''])
+        name = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        return os.path.join(db_manager.app_data_dir, "oss_uploads", f"{name}.json")
+    
+    def _initiate_multipart(self, object_key: str, content_type: str) -> str:
+        response = self._request('POST', self._object_url(object_key), headers={
+            'Content-Type': content_type,
+            'User-Agent': USER_AGENT,
+        }, params={'uploads': ''})
+        if response.status_code != 200:
+            self._raise_upload_error(response)
+        upload_id = _xml_text(response.content, 'UploadId')
+        if not upload_id:
+            raise RuntimeError(f"OSS 初始化分片上传失败: {response.text[:500]}")
+        return upload_id
+    
+    def _list_parts(self, object_key: str, upload_id: str) -> Optional[Dict[int, Tuple[str, int]]]:
+        """已上传的分片 {序号: (ETag, 大小)}；上传已失效时返回 None"""
+        parts: Dict[int, Tuple[str, int]] = {}
+        marker = ''
+        while True:
+            params = {'uploadId': upload_id, 'max-parts': '1000'}
+            if marker:
+                params['part-number-marker'] = marker
+            response = self._request('GET', self._object_url(object_key), headers={'User-Agent': USER_AGENT},
+                                     params=params)
+            if response.status_code == 404:
+                return None
+            if response.status_code != 200:
+                self._raise_upload_error(response)
+            root = ElementTree.fromstring(response.content)
+            for part in root.iter():
+                if part.tag.rsplit('}', 1)[-1] != 'Part':
+                    continue
+                number = int(part.findtext('{*}PartNumber', '0'))
+                parts[number] = (part.findtext('{*}ETag', ''), int(part.findtext('{*}Size', '0')))
+            if root.findtext('{*}IsTruncated', 'false').lower() != 'true':
+                return parts
+            marker = root.findtext('{*}NextPartNumberMarker', '')
+            if not marker:
+                return parts
+    
+    def _upload_part(self, path: Path, object_key: str, upload_id: str, number: int, size: int,
+                     tracker: Optional['_ProgressTracker']) -> str:
+        """上传一个分片，失败时重试，返回 ETag"""
+        offset = (number - 1) * PART_SIZE
+        length = _part_length(number, size)
+        params = {'partNumber': str(number), 'uploadId': upload_id}
+        last_error: Optional[Exception] = None
+        for attempt in range(PART_RETRIES + 1):
+            if attempt:
+                time.sleep(min(2 ** attempt, 10))
+            sent = 0
+            
+            def on_read(n: int):
+                nonlocal sent
+                sent += n
+                if tracker:
+                    tracker.add(n)
+            
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    body = _StreamBody(f, length, on_read)
+                    response = self._request('PUT', self._object_url(object_key), body,
+                                             headers={'User-Agent': USER_AGENT}, params=params)
+                if response.status_code == 200 and response.headers.get('ETag'):
+                    return response.headers['ETag']
+                last_error = RuntimeError(f"分片 {number} 上传失败（状态码: {response.status_code}）: "
+                                          f"{response.text[:200]}")
+            except requests.exceptions.SSLError:
+                raise
+            except requests.exceptions.RequestException as e:
+                last_error = e
+            if tracker and sent:
+                tracker.add(-sent)
+            logger.warning(f"分片 {number} 上传失败（第 {attempt + 1} 次）: {last_error}")
+        raise RuntimeError(f"分片 {number} 上传失败: {last_error}")
+    
+    def _complete_multipart(self, object_key: str, upload_id: str, parts: Dict[int, str]):
+        body = ''.join(
+            f"<Part><PartNumber>{n}</PartNumber><ETag>{escape(parts[n])}</ETag></Part>"
+            for n in sorted(parts)
+        )
+        response = self._request(
+            'POST', self._object_url(object_key),
+            f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode('utf-8'),
+            headers={'Content-Type': 'application/xml', 'User-Agent': USER_AGENT},
+            params={'uploadId': upload_id},
+        )
+        if response.status_code != 200:
+            self._raise_upload_error(response)
+    
     def upload_image(self, image_path: str) -> str:
         """上传图片到 OSS
         
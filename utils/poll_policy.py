@@ -0,0 +1,251 @@
+"""
+视频任务轮询策略
+按 模型|时长|尺寸 学习任务的典型完成耗时：预计完成前稀疏轮询、进入预计完成区间后密集轮询，
+查询出错时按带抖动的指数退避重试。统计数据保存在 task_duration_stats 表中
+"""
+
+import calendar
+import math
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+
+
+# 没有足够统计数据时的轮询间隔（秒，与原先的固定间隔一致）
+BASE_INTERVAL = 10
+# 预计完成区间内的轮询间隔
+DENSE_INTERVAL = 5
+# 预计完成前的最大轮询间隔
+MAX_SPARSE_INTERVAL = 60
+# 查询出错时的最大退避间隔
+MAX_ERROR_BACKOFF = 120
+# 间隔随机抖动比例，避免大量任务同时查询
+JITTER = 0.1
+# 样本数达到该值后才使用学习到的耗时
+MIN_SAMPLES = 3
+# 预计完成区间 = 均值 ± WINDOW_STDDEVS 个标准差
+WINDOW_STDDEVS = 2.0
+# 新样本的最小权重：样本较少时为算术平均，之后按指数加权，跟随服务端速度变化
+EWMA_MIN_WEIGHT = 0.1
+# 超出该耗时的样本视为异常（如程序关闭期间完成的任务），不参与统计
+MAX_SAMPLE_SECONDS = 3 * 3600
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def profile_key(model: Optional[str], duration: Any, size: Optional[str]) -> str:
+    """任务类别：模型|时长|尺寸"""
+    try:
+        seconds = int(str(duration).rstrip('s'))
+    except (TypeError, ValueError):
+        seconds = 10
+    return f"{model or 'sora-2'}|{seconds}|{size or 'small'}"
+
+
+def _jitter(interval: float) -> float:
+    return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class _DurationStats:
+    """一个任务类别的耗时统计"""
+
+    __slots__ = ('samples', 'mean', 'var', 'min', 'max')
+
+    def __init__(self, samples=0, mean=0.0, var=0.0, min_seconds=None, max_seconds=None):
+        self.samples = samples
+        self.mean = mean
+        self.var = var
+        self.min = min_seconds
+        self.max = max_seconds
+
+    def add(self, seconds: float):
+        self.samples += 1
+        weight = max(1.0 / self.samples, EWMA_MIN_WEIGHT)
+        delta = seconds - self.mean
+        self.mean += weight * delta
+        self.var = (1 - weight) * (self.var + weight * delta * delta)
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.var, 0.0))
+
+
+class PollPolicy:
+    """基于历史完成耗时的自适应轮询间隔"""
+
+    def __init__(self):
+        self._stats: Dict[str, _DurationStats] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    # ---------------- 统计数据 ----------------
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                conn = db_manager.get_connection()
+                try:
+                    rows = conn.execute('''
+                        SELECT profile, samples, mean_seconds, var_seconds, min_seconds, max_seconds
+                        FROM task_duration_stats
+                    ''').fetchall()
+                finally:
+                    conn.close()
+                for profile, samples, mean, var, min_seconds, max_seconds in rows:
+                    self._stats[profile] = _DurationStats(samples, mean, var, min_seconds, max_seconds)
+                if not rows:
+                    self._seed_from_history()
+            except Exception as e:
+                logger.error(f"加载任务耗时统计失败: {e}")
+            self._loaded = True
+
+    def _seed_from_history(self):
+        """（持有锁时调用）首次使用时从任务列表的历史记录中学习"""
+        conn = db_manager.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT model, duration, size, created_at, completed_at
+                FROM tasks
+                WHERE status = 'completed' AND completed_at IS NOT NULL
+                ORDER BY id
+            ''').fetchall()
+        finally:
+            conn.close()
+
+        seeded = set()
+        for model, duration, size, created_at, completed_at in rows:
+            try:
+                # created_at 为 SQLite CURRENT_TIMESTAMP（UTC），completed_at 为本地时间
+                created = calendar.timegm(time.strptime(created_at, TIME_FORMAT))
+                completed = time.mktime(time.strptime(completed_at, TIME_FORMAT))
+            except (TypeError, ValueError):
+                continue
+            profile = profile_key(model, duration, size)
+            if self._add_sample(profile, completed - created):
+                seeded.add(profile)
+        for profile in seeded:
+            self._save(profile)
+        if seeded:
+            logger.info(f"已从 {len(rows)} 条历史任务中学习 {len(seeded)} 类任务的完成耗时")
+
+    def _add_sample(self, profile: str, seconds: float) -> bool:
+        if not 0 < seconds <= MAX_SAMPLE_SECONDS:
+            return False
+        self._stats.setdefault(profile, _DurationStats()).add(seconds)
+        return True
+
+    def _save(self, profile: str):
+        stats = self._stats[profile]
+        conn = db_manager.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO task_duration_stats
+                    (profile, samples, mean_seconds, var_seconds, min_seconds, max_seconds, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(profile) DO UPDATE SET
+                    samples = excluded.samples,
+                    mean_seconds = excluded.mean_seconds,
+                    var_seconds = excluded.var_seconds,
+                    min_seconds = excluded.min_seconds,
+                    max_seconds = excluded.max_seconds,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (profile, stats.samples, stats.mean, stats.var, stats.min, stats.max))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record(self, profile: str, seconds: float):
+        """记录一个任务从提交到完成的耗时"""
+        self._ensure_loaded()
+        with self._lock:
+            if not self._add_sample(profile, seconds):
+                return
+            try:
+                self._save(profile)
+            except Exception as e:
+                logger.error(f"保存任务耗时统计失败: {e}")
+        logger.debug(f"任务耗时样本: {profile} {seconds:.0f}s")
+
+    def expected_window(self, profile: str) -> Optional[Tuple[float, float]]:
+        """预计完成区间（提交后的秒数），样本不足时返回 None"""
+        self._ensure_loaded()
+        with self._lock:
+            stats = self._stats.get(profile)
+            if stats is None or stats.samples < MIN_SAMPLES:
+                return None
+            spread = WINDOW_STDDEVS * stats.std
+            start = max(stats.mean - spread, 0.0)
+            if stats.min is not None:
+                # 不早于历史最快完成时间的 90%
+                start = max(start, min(stats.min * 0.9, stats.mean))
+            return start, stats.mean + spread
+
+    # ---------------- 轮询间隔 ----------------
+
+    def next_interval(self, profile: Optional[str], elapsed: Optional[float], errors: int = 0) -> float:
+        """
+        计算下次查询前的等待时间（秒）
+
+        Args:
+            profile: 任务类别（profile_key），未知时为 None
+            elapsed: 任务提交后经过的秒数，未知时为 None
+            errors: 连续查询失败次数
+        """
+        if errors > 0:
+            return _jitter(min(MAX_ERROR_BACKOFF, BASE_INTERVAL * 2 ** (errors - 1)))
+        window = self.expected_window(profile) if profile and elapsed is not None else None
+        if window is None:
+            return _jitter(BASE_INTERVAL)
+        start, end = window
+        if elapsed < start:
+            # 预计完成前：每次等待剩余时间的一半，越接近区间查询越密
+            return _jitter(min(MAX_SPARSE_INTERVAL, max(DENSE_INTERVAL, (start - elapsed) / 2)))
+        if elapsed <= end:
+            return _jitter(DENSE_INTERVAL)
+        # 已超出预计区间（排队或服务端变慢），恢复默认间隔
+        return _jitter(BASE_INTERVAL)
+
+    # ---------------- 报告 ----------------
+
+    def report(self) -> List[Dict[str, Any]]:
+        """各类任务的耗时统计，按样本数降序"""
+        self._ensure_loaded()
+        with self._lock:
+            items = list(self._stats.items())
+        result = []
+        for profile, stats in sorted(items, key=lambda item: -item[1].samples):
+            window = self.expected_window(profile)
+            result.append({
+                'profile': profile,
+                'samples': stats.samples,
+                'mean_seconds': round(stats.mean, 1),
+                'std_seconds': round(stats.std, 1),
+                'min_seconds': stats.min,
+                'max_seconds': stats.max,
+                'window': (round(window[0]), round(window[1])) if window else None,
+            })
+        return result
+
+    def log_report(self):
+        """将耗时统计写入日志"""
+        for item in self.report():
+            window = f"{item['window'][0]}~{item['window'][1]}s" if item['window'] else '样本不足'
+            logger.info(
+                f"任务耗时 {item['profile']}: 样本 {item['samples']}，"
+                f"平均 {item['mean_seconds']}s ± {item['std_seconds']}s，预计完成区间 {window}"
+            )
+
+
+# 全局轮询策略
+poll_policy = PollPolicy()
@@ -0,0 +1,289 @@
+"""
+API 代理限流与熔断
+按接口类别（创建视频、查询视频、对话、图片生成）共享令牌桶限流；
+收到 429 时整个类别按 Retry-After 一起暂停，持续失败时熔断，所有调用方一起退避
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger
+
+from constants import API_HOST
+
+
+# 受限流保护的主机（按主机名匹配，不含端口）
+LIMITED_HOSTS = {API_HOST}
+
+# 各接口类别的默认配置：rate 每秒令牌数，burst 令牌桶容量
+FAMILY_LIMITS: Dict[str, Dict[str, float]] = {
+    'video_create': {'rate': 1.0, 'burst': 5},
+    'video_query': {'rate': 10.0, 'burst': 20},
+    'chat': {'rate': 2.0, 'burst': 4},
+    'image': {'rate': 1.0, 'burst': 3},
+    'default': {'rate': 5.0, 'burst': 10},
+}
+
+# 连续失败（429、5xx、连接错误）达到该次数时熔断
+FAILURE_THRESHOLD = 5
+# 熔断后首次试探前的等待时间（秒），再次熔断时翻倍
+RECOVERY_TIMEOUT = 15.0
+MAX_RECOVERY_TIMEOUT = 120.0
+# 429 未携带 Retry-After 时的暂停时间（秒）
+DEFAULT_RETRY_AFTER = 2.0
+MAX_RETRY_AFTER = 60.0
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """接口类别已熔断，请求未发送"""
+
+    def __init__(self, family: str, retry_in: float):
+        super().__init__(f"服务繁忙（{family} 已暂停请求），请 {retry_in:.0f} 秒后重试")
+        self.family = family
+        self.retry_in = retry_in
+
+
+def family_for(method: str, url: str) -> Optional[str]:
+    """根据请求确定接口类别，不受保护的主机返回 None"""
+    parts = urlsplit(url)
+    if (parts.hostname or '') not in LIMITED_HOSTS:
+        return None
+    path = parts.path
+    if '/video' in path:
+        # /v1/video/create、/v1/video/query、/v2/videos/generations[/{id}]
+        return 'video_query' if method.upper() == 'GET' else 'video_create'
+    if path.endswith('/chat/completions'):
+        return 'chat'
+    if ':generateContent' in path or path.endswith('/images/generations'):
+        return 'image'
+    return 'default'
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，最多连续 burst 个"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(float(rate), 0.01)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        # 上次补充令牌的时间；暂停期间为暂停结束时间
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        # 各次暂停累计顺延的秒数，等待中的调用方据此顺延已预约的时刻
+        self._shift = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """（持有锁时调用）预约一个令牌，返回需要等待的秒数"""
+        now = time.monotonic()
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+        self._tokens -= 1
+        wait = max(self._updated - now, 0.0)
+        if self._tokens < 0:
+            wait += -self._tokens / self.rate
+        return wait
+
+    def acquire(self):
+        """取得一个令牌，令牌不足或暂停期间阻塞等待（先到先得）"""
+        with self._lock:
+            wait = self._reserve()
+            deadline = time.monotonic() + wait
+            shift = self._shift
+        while wait > 0:
+            time.sleep(wait)
+            # 令牌已在上面预约，不再重复预约；等待期间收到 429 暂停的，预约的时刻随暂停顺延，
+            # 且不早于暂停结束
+            with self._lock:
+                deadline += self._shift - shift
+                shift = self._shift
+                wait = max(deadline, self._resume_at) - time.monotonic()
+
+    def pause(self, seconds: float):
+        """暂停发放令牌，之后的请求一起顺延"""
+        with self._lock:
+            now = time.monotonic()
+            resume_at = max(self._resume_at, now + seconds)
+            # 已预约令牌的等待者整体顺延，暂停结束后仍按原来的间隔依次发出
+            self._shift += resume_at - max(self._resume_at, now)
+            self._resume_at = resume_at
+            # 暂停结束后从空桶开始，避免积压的请求同时发出
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, self._resume_at)
+
+    def configure(self, rate: Optional[float] = None, burst: Optional[float] = None):
+        with self._lock:
+            if rate is not None:
+                self.rate = max(float(rate), 0.01)
+            if burst is not None:
+                self.burst = max(float(burst), 1.0)
+                self._tokens = min(self._tokens, self.burst)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    closed: 正常放行；连续失败 failure_threshold 次后进入 open
+    open: 直接拒绝，recovery_timeout 后进入 half_open
+    half_open: 只放行一个试探请求，成功则恢复，失败则以加倍的等待时间重新熔断
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 recovery_timeout: float = RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = float(recovery_timeout)
+        self.state = self.CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._opened_at = 0.0
+        self._timeout = self.recovery_timeout
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def configure(self, failure_threshold: Optional[int] = None, recovery_timeout: Optional[float] = None):
+        with self._lock:
+            if failure_threshold is not None:
+                self.failure_threshold = max(1, int(failure_threshold))
+            if recovery_timeout is not None:
+                self.recovery_timeout = float(recovery_timeout)
+                if self._trips == 0:
+                    self._timeout = self.recovery_timeout
+
+    def before_request(self):
+        """请求前检查，熔断中抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self._opened_at + self._timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info(f"接口 {self.name} 熔断试探请求")
+                return
+            raise CircuitOpenError(self.name, max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"接口 {self.name} 已恢复，解除熔断")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._timeout = self.recovery_timeout
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                # 熔断前已发出的请求陆续失败，不重复计时
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.CLOSED:
+                    self._timeout = min(self.recovery_timeout * 2 ** self._trips, MAX_RECOVERY_TIMEOUT)
+                self._trips += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                logger.warning(
+                    f"接口 {self.name} 连续失败 {self._failures} 次，熔断 {self._timeout:.0f} 秒"
+                )
+
+
+class _FamilyGuard:
+    __slots__ = ('bucket', 'breaker')
+
+    def __init__(self, family: str, limits: Dict[str, float]):
+        self.bucket = TokenBucket(limits['rate'], limits['burst'])
+        self.breaker = CircuitBreaker(family)
+
+
+_guards: Dict[str, _FamilyGuard] = {}
+_lock = threading.Lock()
+
+
+def _guard(family: str) -> _FamilyGuard:
+    guard = _guards.get(family)
+    if guard is None:
+        with _lock:
+            guard = _guards.get(family)
+            if guard is None:
+                guard = _FamilyGuard(family, FAMILY_LIMITS.get(family, FAMILY_LIMITS['default']))
+                _guards[family] = guard
+    return guard
+
+
+def configure(family: str, rate: Optional[float] = None, burst: Optional[float] = None,
+              failure_threshold: Optional[int] = None, recovery_timeout: Optional[float] = None):
+    """调整某个接口类别的限流与熔断参数（立即生效）"""
+    with _lock:
+        limits = FAMILY_LIMITS.setdefault(family, dict(FAMILY_LIMITS['default']))
+        if rate is not None:
+            limits['rate'] = rate
+        if burst is not None:
+            limits['burst'] = burst
+    guard = _guard(family)
+    guard.bucket.configure(rate, burst)
+    guard.breaker.configure(failure_threshold, recovery_timeout)
+
+
+def before_request(family: str):
+    """请求前调用：熔断中抛出 CircuitOpenError，否则按限流等待"""
+    guard = _guard(family)
+    guard.breaker.before_request()
+    guard.bucket.acquire()
+
+
+def _retry_after(response: requests.Response) -> float:
+    value = response.headers.get('Retry-After')
+    try:
+        seconds = float(value) if value else DEFAULT_RETRY_AFTER
+    except ValueError:
+        seconds = DEFAULT_RETRY_AFTER
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def after_request(family: str, response: Optional[requests.Response]):
+    """
+    请求后调用
+
+    Args:
+        family: 接口类别
+        response: 响应；请求异常（连接失败、超时）时为 None
+    """
+    guard = _guard(family)
+    if response is None or response.status_code >= 500:
+        guard.breaker.record_failure()
+    elif response.status_code == 429:
+        pause = _retry_after(response)
+        logger.warning(f"接口 {family} 返回 429，暂停 {pause:.1f} 秒")
+        guard.bucket.pause(pause)
+        guard.breaker.record_failure()
+    else:
+        guard.breaker.record_success()
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    """各接口类别当前的限流与熔断状态"""
+    with _lock:
+        guards = dict(_guards)
+    return {
+        family: {
+            'rate': guard.bucket.rate,
+            'burst': guard.bucket.burst,
+            'state': guard.breaker.state,
+        }
+        for family, guard in guards.items()
+    }
@@ -0,0 +1,108 @@
+"""
+API 请求日志
+每个请求记录一行摘要（DEBUG，写入日志文件），状态轮询接口按比例采样，失败请求始终记录；
+请求头与响应体只在开启详细日志时记录，且敏感字段已脱敏。
+格式化均为惰性求值，对应级别未启用时不产生开销
+"""
+
+import itertools
+import json
+import os
+from typing import Any, Dict, Mapping, Optional
+
+from loguru import logger
+
+
+# 详细日志：记录脱敏后的请求头、请求体和响应体（环境变量 SORA2_HTTP_TRACE=1 开启）
+VERBOSE = os.environ.get('SORA2_HTTP_TRACE') == '1'
+# 状态轮询接口每 N 次请求记录一次摘要
+SAMPLED_ENDPOINTS = {
+    '/v1/video/query': 20,
+    '/v2/videos/generations/': 20,
+}
+# 详细日志中请求体、响应体的最大长度
+MAX_BODY_CHARS = 2000
+
+# 需要脱敏的请求头与参数（小写）
+SENSITIVE_KEYS = frozenset({'authorization', 'api_key', 'apikey', 'key', 'x-api-key', 'token', 'access_token'})
+
+_counters: Dict[str, Any] = {prefix: itertools.count() for prefix in SAMPLED_ENDPOINTS}
+
+
+def set_verbose(enabled: bool):
+    """开启或关闭详细日志"""
+    global VERBOSE
+    VERBOSE = bool(enabled)
+
+
+def _mask(value: Any) -> str:
+    text = str(value)
+    if len(text) <= 8:
+        return '***'
+    return f"{text[:3]}***{text[-4:]}"
+
+
+def redact(mapping: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """返回脱敏后的请求头或参数"""
+    if not mapping:
+        return {}
+    return {
+        k: (_mask(v) if str(k).lower() in SENSITIVE_KEYS else v)
+        for k, v in mapping.items()
+    }
+
+
+def _body(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False)
+    else:
+        text = str(value)
+    if len(text) > MAX_BODY_CHARS:
+        return f"{text[:MAX_BODY_CHARS]}...({len(text)} chars)"
+    return text
+
+
+def _sampled(endpoint: str) -> bool:
+    for prefix, every in SAMPLED_ENDPOINTS.items():
+        if endpoint.startswith(prefix):
+            return next(_counters[prefix]) % every == 0
+    return True
+
+
+def log_request(method: str, endpoint: str, headers: Mapping[str, Any], kwargs: Mapping[str, Any]):
+    """记录请求内容（仅详细日志）"""
+    if not VERBOSE:
+        return
+    logger.opt(lazy=True).debug(
+        "API请求 {} {} headers={} params={} body={}",
+        lambda: method,
+        lambda: endpoint,
+        lambda: redact(headers),
+        lambda: redact(kwargs.get('params')),
+        lambda: _body(kwargs.get('json', kwargs.get('data', ''))),
+    )
+
+
+def log_response(method: str, endpoint: str, status_code: int, elapsed: float,
+                 size: int, body: Any = None):
+    """
+    记录响应摘要
+
+    Args:
+        method: HTTP方法
+        endpoint: API端点（不含主机）
+        status_code: 状态码
+        elapsed: 耗时（秒）
+        size: 响应字节数
+        body: 响应内容，仅详细日志时记录
+    """
+    failed = status_code >= 400
+    if not failed and not VERBOSE and not _sampled(endpoint):
+        return
+    log = logger.opt(lazy=True)
+    (log.warning if failed else log.debug)(
+        "API响应 {} {} -> {} ({:.0f} ms, {} bytes)",
+        lambda: method, lambda: endpoint, lambda: status_code, lambda: elapsed * 1000, lambda: size,
+    )
+    if VERBOSE and body is not None:
+        log.debug("API响应内容 {} {}: {}", lambda: method, lambda: endpoint, lambda: _body(body))
@@ -0,0 +1,320 @@
+"""
+全局任务执行器
+按资源类别（上传、下载、大模型、生图、创建视频、ffmpeg）限制同时执行的任务数，
+排队任务按优先级执行，可取消排队中的任务，并统计排队长度与等待、执行耗时。
+既可提交 QThread（在界面线程中启动），也可提交普通函数（在共享工作线程中执行）
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from loguru import logger
+
+
+# 优先级（数值越小越先执行）
+PRIORITY_HIGH = 0      # 用户单独触发、正在等待结果的操作
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10      # 批量操作、后台流水线
+
+# 资源类别
+RESOURCE_UPLOAD = 'upload'
+RESOURCE_DOWNLOAD = 'download'
+RESOURCE_LLM = 'llm'
+RESOURCE_IMAGE = 'image'
+RESOURCE_SORA_CREATE = 'sora_create'
+RESOURCE_FFMPEG = 'ffmpeg'
+RESOURCE_DEFAULT = 'default'
+
+# 各资源同时执行的任务数上限
+RESOURCE_LIMITS: Dict[str, int] = {
+    RESOURCE_UPLOAD: 4,
+    RESOURCE_DOWNLOAD: 4,
+    RESOURCE_LLM: 2,
+    RESOURCE_IMAGE: 3,
+    RESOURCE_SORA_CREATE: 2,
+    RESOURCE_FFMPEG: max(2, (os.cpu_count() or 2) // 2),   # 每个 ffmpeg 进程约占两个核心
+    RESOURCE_DEFAULT: 4,
+}
+# 所有资源合计同时执行的任务数上限
+MAX_WORKERS = 16
+
+
+class _WorkItem:
+    __slots__ = ('priority', 'seq', 'resource', 'thread', 'call', 'future',
+                 'submitted_at', 'started_at', 'cancelled')
+
+    def __init__(self, priority: int, seq: int, resource: str,
+                 thread: Optional[QThread] = None, call: Optional[Callable[[], Any]] = None,
+                 future: Optional[Future] = None):
+        self.priority = priority
+        self.seq = seq
+        self.resource = resource
+        self.thread = thread
+        self.call = call
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.started_at = 0.0
+        self.cancelled = False
+
+    def __lt__(self, other: '_WorkItem'):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ResourceState:
+    __slots__ = ('limit', 'queue', 'running', 'submitted', 'completed', 'cancelled',
+                 'wait_total', 'wait_max', 'run_total')
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self.queue: List[_WorkItem] = []
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+
+class TaskExecutor(QObject):
+    """
+    按资源限流、按优先级排队的任务执行器
+
+    submit(thread) 需在界面线程中调用；submit_call 可在任意线程中调用。
+    """
+
+    # 内部信号：在非界面线程中空出位置时，由界面线程启动排队的 QThread
+    _pump_requested = pyqtSignal()
+
+    def __init__(self, max_workers: int = MAX_WORKERS, parent=None):
+        super().__init__(parent)
+        self.max_workers = max(1, int(max_workers))
+        self._resources: Dict[str, _ResourceState] = {}
+        self._items: Dict[int, _WorkItem] = {}     # id(thread 或 future) -> 排队或执行中的任务
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+        self._running_total = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pump_requested.connect(self._pump_all)
+
+    # ---------------- 配置 ----------------
+
+    def _state(self, resource: str) -> _ResourceState:
+        state = self._resources.get(resource)
+        if state is None:
+            state = _ResourceState(RESOURCE_LIMITS.get(resource, RESOURCE_LIMITS[RESOURCE_DEFAULT]))
+            self._resources[resource] = state
+        return state
+
+    def set_limit(self, resource: str, limit: int):
+        """设置某个资源同时执行的任务数上限"""
+        with self._lock:
+            self._state(resource).limit = max(1, int(limit))
+        self._pump_requested.emit()
+
+    def limit(self, resource: str) -> int:
+        with self._lock:
+            return self._state(resource).limit
+
+    def set_max_workers(self, n: int):
+        """设置合计同时执行的任务数上限"""
+        with self._lock:
+            self.max_workers = max(1, int(n))
+        self._pump_requested.emit()
+
+    # ---------------- 提交与取消 ----------------
+
+    def submit(self, thread: QThread, resource: str = RESOURCE_DEFAULT, priority: int = PRIORITY_NORMAL) -> QThread:
+        """提交 QThread，有空闲位置时启动，否则按优先级排队"""
+        item = _WorkItem(priority, next(self._seq), resource, thread=thread)
+        # 子类常以同名的 finished 信号传递结果，这里连接 QThread 自身的结束信号
+        QThread.finished.__get__(thread, QThread).connect(lambda: self._on_thread_finished(item))
+        self._enqueue(item, id(thread))
+        return thread
+
+    def submit_call(self, fn: Callable, *args, resource: str = RESOURCE_DEFAULT,
+                    priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """提交函数，在共享工作线程中执行，返回 Future（排队中可 cancel）"""
+        future: Future = Future()
+        item = _WorkItem(priority, next(self._seq), resource,
+                         call=lambda: fn(*args, **kwargs), future=future)
+        self._enqueue(item, id(future))
+        return future
+
+    def _enqueue(self, item: _WorkItem, key: int):
+        with self._lock:
+            state = self._state(item.resource)
+            state.submitted += 1
+            self._items[key] = item
+            heapq.heappush(state.queue, item)
+            self._pump(item.resource)
+
+    def cancel(self, task: Union[QThread, Future]) -> bool:
+        """
+        取消任务
+
+        排队中的任务直接移除并返回 True；执行中的 QThread 请求中断，执行中的函数无法取消，返回 False
+        """
+        with self._lock:
+            item = self._items.get(id(task))
+            if item is None:
+                return False
+            if item.started_at:
+                if item.thread is not None:
+                    item.thread.requestInterruption()
+                return False
+            self._drop(item, id(task))
+        if item.future is not None:
+            item.future.cancel()
+        return True
+
+    def cancel_all(self, resource: Optional[str] = None) -> int:
+        """取消排队中的任务（可只取消某个资源的），返回取消的数量"""
+        with self._lock:
+            pending = [
+                (key, item) for key, item in self._items.items()
+                if not item.started_at and (resource is None or item.resource == resource)
+            ]
+            for key, item in pending:
+                self._drop(item, key)
+        for _, item in pending:
+            if item.future is not None:
+                item.future.cancel()
+        return len(pending)
+
+    def _drop(self, item: _WorkItem, key: int):
+        # 堆中的条目延迟删除
+        item.cancelled = True
+        self._items.pop(key, None)
+        self._state(item.resource).cancelled += 1
+
+    # ---------------- 调度 ----------------
+
+    def _on_gui_thread(self) -> bool:
+        return QThread.currentThread() is self.thread()
+
+    def _pump_all(self):
+        with self._lock:
+            for resource in list(self._resources):
+                self._pump(resource)
+
+    def _pump(self, resource: str):
+        """（持有锁时调用）启动该资源排队中的任务，直到达到上限"""
+        state = self._state(resource)
+        while state.queue and state.running < state.limit and self._running_total < self.max_workers:
+            item = state.queue[0]
+            if item.cancelled:
+                heapq.heappop(state.queue)
+                continue
+            if item.thread is not None and not self._on_gui_thread():
+                # QThread 需在界面线程中启动
+                self._pump_requested.emit()
+                return
+            heapq.heappop(state.queue)
+            self._start(item, state)
+
+    def _start(self, item: _WorkItem, state: _ResourceState):
+        item.started_at = time.monotonic()
+        wait = item.started_at - item.submitted_at
+        state.wait_total += wait
+        state.wait_max = max(state.wait_max, wait)
+        state.running += 1
+        self._running_total += 1
+        if item.thread is not None:
+            item.thread.start()
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="task-executor")
+        self._pool.submit(self._run_call, item)
+
+    def _run_call(self, item: _WorkItem):
+        future = item.future
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(item.call())
+            except BaseException as e:
+                future.set_exception(e)
+        self._finish(item, id(future))
+
+    def _on_thread_finished(self, item: _WorkItem):
+        if item.started_at:
+            self._finish(item, id(item.thread))
+
+    def _finish(self, item: _WorkItem, key: int):
+        with self._lock:
+            state = self._state(item.resource)
+            state.running -= 1
+            state.completed += 1
+            state.run_total += time.monotonic() - item.started_at
+            self._running_total -= 1
+            self._items.pop(key, None)
+            # 空出的位置优先给同一资源，其余资源在合计上限内补充
+            self._pump(item.resource)
+            for resource in self._resources:
+                if resource != item.resource:
+                    self._pump(resource)
+
+    # ---------------- 统计 ----------------
+
+    def active_count(self) -> int:
+        """执行中的任务数"""
+        with self._lock:
+            return self._running_total
+
+    def queued_count(self, resource: Optional[str] = None) -> int:
+        """排队中的任务数"""
+        with self._lock:
+            return sum(
+                1 for item in self._items.values()
+                if not item.started_at and (resource is None or item.resource == resource)
+            )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各资源的排队长度、执行数与平均等待、执行耗时（毫秒）"""
+        with self._lock:
+            queued: Dict[str, int] = {}
+            for item in self._items.values():
+                if not item.started_at:
+                    queued[item.resource] = queued.get(item.resource, 0) + 1
+            result = {}
+            for resource, state in self._resources.items():
+                started = state.submitted - state.cancelled - queued.get(resource, 0)
+                result[resource] = {
+                    'limit': state.limit,
+                    'queued': queued.get(resource, 0),
+                    'running': state.running,
+                    'submitted': state.submitted,
+                    'completed': state.completed,
+                    'cancelled': state.cancelled,
+                    'avg_wait_ms': round(state.wait_total / started * 1000, 1) if started else 0.0,
+                    'max_wait_ms': round(state.wait_max * 1000, 1),
+                    'avg_run_ms': round(state.run_total / state.completed * 1000, 1) if state.completed else 0.0,
+                }
+            return result
+
+    def log_stats(self):
+        """将统计写入日志"""
+        for resource, item in self.stats().items():
+            logger.info(
+                f"任务执行器 {resource}: 上限 {item['limit']}，排队 {item['queued']}，执行中 {item['running']}，"
+                f"已完成 {item['completed']}，已取消 {item['cancelled']}，"
+                f"平均等待 {item['avg_wait_ms']} ms（最长 {item['max_wait_ms']} ms），平均执行 {item['avg_run_ms']} ms"
+            )
+
+    def shutdown(self):
+        """取消排队中的任务，不再接受函数任务（应用退出时调用）"""
+        self.cancel_all()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+# 全局任务执行器
+task_executor = TaskExecutor()
@@ -3,7 +3,7 @@ AI 标题生成与文件名清理工具
 """
 
 import re
-import requests
+from utils import http_client
 from constants import API_CHAT_COMPLETIONS_URL
 from typing import Optional
 
@@ -64,7 +64,7 @@ def generate_ai_title(api_key: str, system_prompt: str, task_prompt: Optional[st
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
-        resp = requests.post(base_url, json=payload, headers=headers, timeout=20)
+        resp = http_client.post(base_url, json=payload, headers=headers, timeout=20)
         if resp.status_code != 200:
             return None
         data = resp.json()
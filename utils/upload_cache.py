@@ -0,0 +1,152 @@
+"""
+上传去重缓存
+按 文件内容哈希（SHA-256）+ 上传目标 记录上传后得到的 URL，同一文件再次上传到同一目标时直接返回记录的 URL。
+上传目标：OSS Bucket（oss:<bucket 域名>）、文件服务（files:<接口地址>，图床同样使用该接口）
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+from utils.media_cache import file_sha256
+
+
+# 文件服务返回的 URL 默认有效期（小时），可通过配置 upload_cache_files_ttl_hours 修改；0 表示不过期
+DEFAULT_FILES_TTL_HOURS = 24
+
+
+def oss_target(bucket_domain: str) -> str:
+    return f"oss:{bucket_domain.rstrip('/')}"
+
+
+def files_target(endpoint: str) -> str:
+    return f"files:{endpoint.rstrip('/')}"
+
+
+def files_ttl() -> Optional[float]:
+    """文件服务 URL 的缓存有效期（秒），不过期时返回 None"""
+    try:
+        hours = float(db_manager.load_config('upload_cache_files_ttl_hours', DEFAULT_FILES_TTL_HOURS))
+    except (TypeError, ValueError):
+        hours = DEFAULT_FILES_TTL_HOURS
+    return hours * 3600 if hours > 0 else None
+
+
+class UploadCache:
+    """内容哈希 + 上传目标 → URL"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (绝对路径, 大小, 修改时间) → SHA-256，避免重复计算未修改文件的哈希
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def file_hash(self, path: str) -> Tuple[str, int]:
+        """文件的 SHA-256 与大小"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            sha256 = self._hashes.get(key)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+            with self._lock:
+                self._hashes[key] = sha256
+        return sha256, stat.st_size
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    # ---------------- 查询与记录 ----------------
+
+    def lookup(self, sha256: str, target: str) -> Optional[str]:
+        """已上传且未过期时返回 URL"""
+        conn = db_manager.get_connection()
+        try:
+            row = conn.execute('SELECT url, expires_at FROM upload_cache WHERE sha256 = ? AND target = ?',
+                               (sha256, target)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= time.time():
+                conn.execute('DELETE FROM upload_cache WHERE sha256 = ? AND target = ?', (sha256, target))
+                conn.commit()
+                return None
+            return row[0]
+        except Exception as e:
+            logger.error(f"读取上传缓存失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def store(self, sha256: str, target: str, url: str, size: int, ttl: Optional[float] = None):
+        """记录上传结果；ttl 为 URL 的有效期（秒），None 表示不过期"""
+        now = time.time()
+        conn = db_manager.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO upload_cache (sha256, target, url, size, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(sha256, target) DO UPDATE SET
+                    url = excluded.url,
+                    size = excluded.size,
+                    created_at = excluded.created_at,
+                    expires_at = excluded.expires_at
+            ''', (sha256, target, url, size, now, now + ttl if ttl else None))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"保存上传缓存失败: {e}")
+        finally:
+            conn.close()
+
+    def lookup_file(self, path: str, target: str) -> Optional[str]:
+        """文件已上传到该目标时返回 URL"""
+        try:
+            sha256, _ = self.file_hash(path)
+        except OSError:
+            return None
+        return self.lookup(sha256, target)
+
+    def store_file(self, path: str, target: str, url: str, ttl: Optional[float] = None):
+        try:
+            sha256, size = self.file_hash(path)
+        except OSError as e:
+            logger.warning(f"记录上传缓存失败: {path}, {e}")
+            return
+        self.store(sha256, target, url, size, ttl)
+
+    def get_or_upload(self, path: str, target: str, upload: Callable[[], str],
+                      ttl: Optional[float] = None) -> str:
+        """
+        返回文件在该目标上的 URL：已上传过相同内容时直接返回，否则调用 upload() 上传并记录。
+        同一文件同时上传到同一目标时只上传一次
+        """
+        sha256, size = self.file_hash(path)
+        with self._key_lock((sha256, target)):
+            url = self.lookup(sha256, target)
+            if url:
+                logger.info(f"上传缓存命中，跳过上传: {path} -> {url}")
+                return url
+            url = upload()
+            if url:
+                self.store(sha256, target, url, size, ttl)
+            return url
+
+    def invalidate(self, url: str):
+        """移除 URL 的记录（例如 URL 已失效）"""
+        conn = db_manager.get_connection()
+        try:
+            conn.execute('DELETE FROM upload_cache WHERE url = ?', (url,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# 全局上传缓存
+upload_cache = UploadCache()